@@ -0,0 +1,64 @@
+"""Fixed-point amounts.
+
+Amounts travel as Decimal on the API and are converted to integer counts of the
+asset's smallest unit (satoshi, wei, ...) for arithmetic, the same
+representation the escrow canister uses for its Nat amounts.
+"""
+from decimal import ROUND_HALF_EVEN, Context, Decimal
+from pydantic import Field
+from typing import Tuple, Union
+from typing_extensions import Annotated
+
+Number = Union[Decimal, int, float, str]
+
+# fiat amounts are kept to the minor unit (kobo, cent, ...)
+FIAT_DECIMALS = 2
+
+# enough precision that scaling by 10**decimals never rounds
+_EXACT = Context(prec=78)
+
+def to_decimal(value: Number) -> Decimal:
+    """Convert to Decimal; floats go through their shortest repr"""
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+
+def to_units(value: Number, decimals: int) -> int:
+    """Scale an amount to an integer count of the asset's smallest unit.
+
+    Raises ValueError when the amount has more precision than decimals allows.
+    """
+    scaled = to_decimal(value).scaleb(decimals, context=_EXACT)
+    if not scaled.is_finite():
+        raise ValueError("Amount must be a finite number")
+    units = int(scaled)
+    if units != scaled:
+        raise ValueError(f"Amount has more than {decimals} decimal places")
+    return units
+
+def round_units(value: Number, decimals: int) -> int:
+    """Like to_units, rounding half to even instead of raising on excess precision.
+
+    For amounts read back from float columns, whose shortest repr can carry
+    digits past the asset's decimals.
+    """
+    scaled = to_decimal(value).scaleb(decimals, context=_EXACT)
+    if not scaled.is_finite():
+        raise ValueError("Amount must be a finite number")
+    return int(scaled.quantize(Decimal(1), rounding=ROUND_HALF_EVEN, context=_EXACT))
+
+def from_units(units: int, decimals: int) -> Decimal:
+    """Convert smallest-unit integers back to a Decimal amount"""
+    return Decimal(units).scaleb(-decimals, context=_EXACT)
+
+def fee_ratio(fee_percentage: Number) -> Tuple[int, int]:
+    """Exact (numerator, denominator) of a percentage fee"""
+    return (to_decimal(fee_percentage) / 100).as_integer_ratio()
+
+def fee_units(units: int, numerator: int, denominator: int) -> int:
+    """Fee on a smallest-unit amount, rounded up to a whole unit"""
+    return -(-units * numerator // denominator)
+
+# Amount fields on the API: Decimal in, decimal string out, never float
+Amount = Annotated[Decimal, Field(ge=0, max_digits=40, decimal_places=18)]
+FiatAmount = Annotated[Decimal, Field(ge=0, max_digits=20, decimal_places=FIAT_DECIMALS)]
@@ -0,0 +1,90 @@
+from typing import AsyncIterable, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import tempfile
+from app.core.metrics import registry
+
+# directory blobs are stored under, named by their SHA-256
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "./blobs")
+# largest upload accepted, in bytes
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(20 * 1024 * 1024)))
+# bytes gathered from the request before each write to disk
+BLOB_WRITE_BUFFER = int(os.getenv("BLOB_WRITE_BUFFER", str(1024 * 1024)))
+
+blob_bytes_written = registry.counter("blob_bytes_written_total", "Bytes of uploads written to the blob store")
+blob_uploads = registry.counter("blob_uploads_total", "Uploads to the blob store by result")
+
+class BlobTooLarge(ValueError):
+    pass
+
+class BlobStore:
+    """Content-addressed files on local disk.
+
+    An upload is written to a temporary file while its SHA-256 is computed,
+    then renamed to blobs/ab/cd/<sha256>; a blob already stored under that
+    hash is kept and the upload discarded, so identical files are stored
+    once. Blobs are immutable and never rewritten, which is what lets
+    downloads be cached and resumed by hash.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_PATH, max_bytes: int = BLOB_MAX_BYTES,
+                 write_buffer: int = BLOB_WRITE_BUFFER):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.write_buffer = write_buffer
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    async def write(self, chunks: AsyncIterable[bytes], max_bytes: Optional[int] = None) -> Tuple[str, int]:
+        """Store a stream of chunks; returns (sha256, size).
+
+        At most write_buffer bytes are held in memory; disk writes run in a
+        thread so the event loop keeps serving while the file is written.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        incoming = os.path.join(self.root, "incoming")
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        pending = []
+        pending_bytes = 0
+        fd, temporary = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, "wb", buffering=0) as file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        blob_uploads.inc(result="too_large")
+                        raise BlobTooLarge(f"Upload exceeds {max_bytes} bytes")
+                    digest.update(chunk)
+                    pending.append(chunk)
+                    pending_bytes += len(chunk)
+                    if pending_bytes >= self.write_buffer:
+                        await asyncio.to_thread(file.write, b"".join(pending))
+                        pending, pending_bytes = [], 0
+                if pending:
+                    await asyncio.to_thread(file.write, b"".join(pending))
+            sha256 = digest.hexdigest()
+            await asyncio.to_thread(self._commit, temporary, sha256)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        blob_bytes_written.inc(size)
+        return sha256, size
+
+    def _commit(self, temporary: str, sha256: str):
+        path = self.path(sha256)
+        if os.path.exists(path):
+            blob_uploads.inc(result="duplicate")
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # rename within one file system is atomic: readers never see a partial blob
+        os.replace(temporary, path)
+        blob_uploads.inc(result="stored")
+
+blob_store = BlobStore()
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import time
+from app.core.metrics import registry
+from app.database import session_scope
+
+# how long a stored response is replayed for its key
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# stored responses kept per process; the oldest are evicted first
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+
+MAX_KEY_LENGTH = 255
+
+idempotent_requests = registry.counter("idempotent_requests_total", "Requests with an Idempotency-Key by outcome")
+
+class StoredResponse(NamedTuple):
+    fingerprint: bytes  # digest of the request parameters
+    status_code: int
+    body: bytes  # JSON
+    expires_at: float
+
+def digest(*parts: str) -> bytes:
+    return hashlib.sha256("\0".join(parts).encode()).digest()[:16]
+
+class IdempotencyStore:
+    """Responses by Idempotency-Key, with one execution per key in flight.
+
+    Keys are kept as 16 byte digests in insertion order; with a single TTL
+    that is also expiry order, so eviction only ever pops from the front.
+    A duplicate arriving while the first request is still running awaits
+    its result instead of executing again. Only outcomes the client would
+    get again (success and 4xx errors) are stored; when the first request
+    fails otherwise, the next duplicate in line executes.
+
+    The store is per process: retries routed to another API instance are
+    executed again and rejected by the trade state checks as before.
+    """
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL_SECONDS, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._responses: "OrderedDict[bytes, StoredResponse]" = OrderedDict()
+        self._inflight: Dict[bytes, asyncio.Task] = {}
+
+    def get(self, key: bytes) -> Optional[StoredResponse]:
+        stored = self._responses.get(key)
+        if stored and stored.expires_at <= time.monotonic():
+            return None
+        return stored
+
+    async def run(self, key: bytes, fingerprint: bytes, fn: Callable[..., Any], *args) -> Tuple[StoredResponse, str]:
+        """Stored response of key, executing fn(*args) in the threadpool if there is none; returns (response, outcome)"""
+        outcome = "replayed"
+        while True:
+            stored = self.get(key)
+            if stored:
+                break
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._execute(key, fingerprint, fn, args))
+                self._inflight[key] = task
+                # mark the exception retrieved even if the first caller went away
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+                # the first caller's failures are its own; a disconnect does not cancel the execution
+                stored = await asyncio.shield(task)
+                outcome = "executed"
+                break
+            try:
+                stored = await asyncio.shield(task)
+                outcome = "waited"
+                break
+            except Exception:
+                # the first request failed without a response to replay; execute as the next in line
+                continue
+
+        if stored.fingerprint != fingerprint:
+            idempotent_requests.inc(outcome="mismatch")
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with different parameters"
+            )
+        idempotent_requests.inc(outcome=outcome)
+        return stored, outcome
+
+    async def _execute(self, key: bytes, fingerprint: bytes, fn: Callable[..., Any], args) -> StoredResponse:
+        try:
+            try:
+                status_code, content = status.HTTP_200_OK, await run_in_threadpool(fn, *args)
+            except HTTPException as error:
+                if error.status_code >= 500:
+                    raise
+                status_code, content = error.status_code, {"detail": error.detail}
+            except ValueError as error:
+                status_code, content = status.HTTP_400_BAD_REQUEST, {"detail": str(error)}
+
+            stored = StoredResponse(
+                fingerprint, status_code, json.dumps(jsonable_encoder(content)).encode(),
+                time.monotonic() + self.ttl
+            )
+            self._save(key, stored)
+            return stored
+        finally:
+            # before waiters resume, so they see the stored response or retry
+            self._inflight.pop(key, None)
+
+    def _save(self, key: bytes, stored: StoredResponse):
+        self._responses.pop(key, None)
+        self._responses[key] = stored
+        now = time.monotonic()
+        while self._responses:
+            oldest = next(iter(self._responses.values()))
+            if oldest.expires_at > now and len(self._responses) <= self.max_keys:
+                break
+            self._responses.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+# shared by the escrow mutation endpoints
+idempotency_store = IdempotencyStore()
+
+def in_session(user_id: int, fn: Callable[[Session], Any]) -> Any:
+    """fn(db) over a session of its own, which outlives the request that started it"""
+    with session_scope() as db:
+        # keeps the user's reads on the primary right after they write, as get_current_user does
+        db.info["user_id"] = user_id
+        return fn(db)
+
+async def idempotent(request: Request, user_id: int, idempotency_key: Optional[str],
+                     fn: Callable[[Session], Any]) -> Any:
+    """Run a mutation fn(db) once per Idempotency-Key and caller, replaying its response to retries.
+
+    fn runs in the threadpool with a session of its own: the request's
+    session is closed when the client goes away, while the execution
+    carries on. Without a key the mutation just runs. Either way a
+    ValueError from the service is a 400.
+    """
+    if idempotency_key is None:
+        try:
+            return await run_in_threadpool(in_session, user_id, fn)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+    key = digest(str(user_id), request.method, request.url.path, idempotency_key)
+    fingerprint = digest(*sorted(f"{name}={value}" for name, value in request.query_params.multi_items()))
+    stored, outcome = await idempotency_store.run(key, fingerprint, in_session, user_id, fn)
+    headers = {"Idempotent-Replayed": "true"} if outcome != "executed" else None
+    return Response(stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
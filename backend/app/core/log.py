@@ -0,0 +1,169 @@
+from collections import deque
+from datetime import datetime, timezone
+from json.encoder import encode_basestring as quote
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from app.core.metrics import registry
+from app.core.tracing import current_span
+
+# root log level, and "json" for one JSON object per line or "text" for plain lines
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# access log lines held before new ones are dropped, and seconds between writes
+ACCESS_LOG_QUEUE = int(os.getenv("ACCESS_LOG_QUEUE", "100000"))
+ACCESS_LOG_INTERVAL = float(os.getenv("ACCESS_LOG_INTERVAL", "0.5"))
+
+access_lines_dropped = registry.counter("access_log_dropped_total", "Access log lines dropped with the queue full")
+
+# LogRecord attributes that are not extra fields
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, trace ids and any extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TraceFilter(logging.Filter):
+    """Stamp records with the trace and span of the code that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+class BackgroundHandler(QueueHandler):
+    """Hand records to the writer thread; tracebacks are rendered here, where the exception still is"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener: Optional[QueueListener] = None
+_stream = None
+
+def configure_logging(stream=None):
+    """Send every log record through a queue to a thread writing them to stderr"""
+    global _listener, _stream
+    if _listener is not None:
+        # reconfigured, e.g. by a script after importing the app
+        _listener.stop()
+    else:
+        atexit.register(lambda: _listener.stop())
+    _stream = stream
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s %(message)s"
+    ))
+    records = queue.SimpleQueue()
+    handler = BackgroundHandler(records)
+    handler.addFilter(TraceFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    _listener = QueueListener(records, output)
+    _listener.start()
+
+class AccessLog:
+    """One line per request, in the format of the other log lines, written in batches by a thread.
+
+    Requests only append a tuple to a bounded queue: going through a logger
+    builds a LogRecord and formats it per request, which costs more than a
+    cheap request does. Lines are written every ACCESS_LOG_INTERVAL; with
+    the queue full new lines are dropped and counted.
+    """
+
+    def __init__(self, max_queue: int = ACCESS_LOG_QUEUE, interval: float = ACCESS_LOG_INTERVAL):
+        self.max_queue = max_queue
+        self.interval = interval
+        self._lines: deque = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def write(self, method: str, path: str, route: str, status: int, duration_ms: float, client: Optional[str],
+              trace_id: str, span_id: str):
+        if len(self._lines) >= self.max_queue:
+            access_lines_dropped.inc()
+            return
+        self._lines.append((time.time(), method, path, route, status, duration_ms, client, trace_id, span_id))
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._wake.clear()
+                self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Write what is queued and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._wake.wait(self.interval):
+            self.flush()
+
+    def flush(self) -> int:
+        lines = []
+        second, prefix = None, ""
+        while self._lines:
+            created, method, path, route, status, duration_ms, client, trace_id, span_id = self._lines.popleft()
+            if int(created) != second:
+                second = int(created)
+                prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            ts = f"{prefix}.{int(created % 1 * 1000):03d}+00:00"
+            if LOG_FORMAT == "json":
+                # assembled by hand: json.dumps of a dict per line costs more than the rest of the log
+                lines.append(
+                    f'{{"ts": "{ts}", "level": "INFO", "logger": "app.access", '
+                    f'"message": {quote(f"{method} {path} {status}")}, "method": {quote(method)}, '
+                    f'"path": {quote(path)}, "route": {quote(route)}, "status": {status}, '
+                    f'"duration_ms": {duration_ms}, "client": {quote(client) if client else "null"}, '
+                    f'"trace_id": "{trace_id}", "span_id": "{span_id}"}}'
+                )
+            else:
+                lines.append(f"{ts} INFO app.access {method} {path} {status} {duration_ms}ms trace_id={trace_id}")
+        if lines:
+            stream = _stream or sys.stderr
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        return len(lines)
+
+access_log = AccessLog()
+atexit.register(access_log.stop)
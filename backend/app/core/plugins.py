@@ -0,0 +1,8 @@
+from importlib import import_module
+
+def load_object(path: str):
+    """Load an object from a "package.module:attribute" path"""
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise ValueError(f"Expected 'module:attribute', got {path!r}")
+    return getattr(import_module(module_name), attribute)
@@ -0,0 +1,54 @@
+from sqlalchemy import event
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+class QueryCount:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+# counter of the code being measured; tasks and threadpool calls it starts inherit it,
+# background workers started earlier (escrow pipeline, outbox, pollers) do not
+_current: ContextVar[Optional[QueryCount]] = ContextVar("query_count", default=None)
+
+@contextmanager
+def count_queries(*engines):
+    """Record the statements the calling context executes on engines (primary, replicas and shards by default)"""
+    if not engines:
+        from app.database import engine, replica_engines, shard_engines
+        engines = (engine, *replica_engines, *shard_engines)
+
+    counter = QueryCount()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is counter:
+            counter.statements.append(statement)
+
+    token = _current.set(counter)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+        _current.reset(token)
+
+class QueryCountingApp:
+    """ASGI wrapper counting the statements of each HTTP request (tests); last holds the latest count"""
+
+    def __init__(self, app, *engines):
+        self.app = app
+        self.engines = engines
+        self.last: Optional[QueryCount] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with count_queries(*self.engines) as counter:
+            self.last = counter
+            await self.app(scope, receive, send)
@@ -0,0 +1,129 @@
+from fastapi import HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError
+from collections import OrderedDict
+from typing import Optional, Tuple
+import math
+import os
+import threading
+import time
+from app.core.plugins import load_object
+
+# defaults for public endpoints: sustained requests per minute and burst size
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "300"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+# "module:Class" of a BucketBackend shared between instances, in-memory if unset
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND")
+
+class BucketBackend:
+    """Token bucket storage. take() must be atomic per key."""
+
+    def take(self, key: str, rate: float, capacity: int, cost: float = 1.0) -> Tuple[bool, float]:
+        """Remove cost tokens from the bucket; returns (allowed, retry_after_seconds)"""
+        raise NotImplementedError
+
+def refill(tokens: float, elapsed: float, rate: float, capacity: int) -> float:
+    return min(capacity, tokens + max(elapsed, 0.0) * rate)
+
+class InMemoryBucketBackend(BucketBackend):
+    """Per-process buckets; the least recently used are dropped once max_keys is reached"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated), least recently used first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: int, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = refill(bucket[0], now - bucket[1], rate, capacity) if bucket else float(capacity)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            # one key is added per call, so this evicts at most one; the oldest has had longest to refill
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+class DatabaseBucketBackend(BucketBackend):
+    """Buckets in the rate_limit_buckets table, shared by every API instance"""
+
+    def take(self, key: str, rate: float, capacity: int, cost: float = 1.0) -> Tuple[bool, float]:
+        from app.database import session_scope
+        from app.models.rate_limit import RateLimitBucket
+
+        for _ in range(2):
+            with session_scope() as db:
+                now = time.time()
+                bucket = db.query(RateLimitBucket).filter(
+                    RateLimitBucket.key == key
+                ).with_for_update().first()
+
+                if bucket:
+                    tokens = refill(bucket.tokens, now - bucket.updated_at, rate, capacity)
+                else:
+                    tokens = float(capacity)
+                    bucket = RateLimitBucket(key=key)
+                    db.add(bucket)
+
+                allowed = tokens >= cost
+                bucket.tokens = tokens - cost if allowed else tokens
+                bucket.updated_at = now
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # another instance created the bucket first; retry against its row
+                    db.rollback()
+                    continue
+                return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+        return False, 1.0 / rate
+
+_backend: Optional[BucketBackend] = None
+
+def get_backend() -> BucketBackend:
+    """Return the configured bucket backend"""
+    global _backend
+    if _backend is None:
+        _backend = load_object(RATE_LIMIT_BACKEND)() if RATE_LIMIT_BACKEND else InMemoryBucketBackend()
+    return _backend
+
+def set_backend(backend: BucketBackend):
+    """Replace the bucket backend (tests, custom deployments)"""
+    global _backend
+    _backend = backend
+
+def client_key(request: Request) -> str:
+    """Identify the caller by user id when the bearer token is valid, else by client IP.
+
+    Keying on the raw token would give every made-up token its own bucket.
+    """
+    from app.services.auth_service import AuthService
+
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        user_id = AuthService(None).verify_token(token)
+        if user_id is not None:
+            return f"user:{user_id}"
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+def rate_limit(scope: str, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: int = RATE_LIMIT_BURST):
+    """Dependency enforcing a token bucket per client for the given scope"""
+    rate = per_minute / 60
+    def dependency(request: Request):
+        allowed, retry_after = get_backend().take(f"{scope}:{client_key(request)}", rate, burst)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
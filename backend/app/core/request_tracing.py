@@ -0,0 +1,67 @@
+from typing import Optional
+import logging
+import time
+from app.core.log import access_log
+from app.core.tracing import reset_current_span, set_current_span, start_trace
+
+logger = logging.getLogger(__name__)
+
+class TraceMiddleware:
+    """Trace every HTTP request and write its access log line.
+
+    A plain ASGI middleware: the route, service and query spans of the
+    request run inside its root span, the response carries a traceparent
+    header so clients can quote the trace id, and unhandled errors are
+    logged with the request and trace they failed in.
+    """
+
+    def __init__(self, app, access_log: bool = True, tracing: bool = True, sample_rate: Optional[float] = None):
+        self.app = app
+        self.access_log = access_log
+        self.tracing = tracing
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        if self.tracing:
+            for header, value in scope["headers"]:
+                if header == b"traceparent":
+                    traceparent = value.decode("latin-1")
+                    break
+        method = scope["method"]
+        # without tracing requests still get a trace id for their log lines, but are never sampled
+        root = start_trace(method, traceparent, self.sample_rate if self.tracing else 0.0)
+        token = set_current_span(root)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_traced(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"traceparent", root.traceparent.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        except Exception as e:
+            root.error = type(e).__name__
+            logger.exception("Unhandled error in %s %s", method, scope["path"])
+            raise
+        finally:
+            # the router leaves the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            if root.sampled:
+                root.name = f"{method} {path}"
+                root.attributes.update({"http.method": method, "http.route": path, "http.status_code": status})
+            root.finish()
+            if self.access_log:
+                client = scope.get("client")
+                access_log.write(method, scope["path"], path, status, round((time.perf_counter() - started) * 1000, 3),
+                                 client[0] if client else None, root.trace_id, root.span_id)
+            reset_current_span(token)
@@ -0,0 +1,87 @@
+"""Wallet signature checks.
+
+Kept free of app imports: these run in the login verification processes,
+which import only this module.
+"""
+from typing import Optional
+import base64
+import hashlib
+import re
+import zlib
+
+EVM_ADDRESS = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+# DER SubjectPublicKeyInfo prefix of an ed25519 key
+ED25519_DER_PREFIX = bytes.fromhex("302a300506032b6570032100")
+# last byte of a principal derived from a public key
+SELF_AUTHENTICATING = b"\x02"
+
+def is_evm_address(address: str) -> bool:
+    return bool(EVM_ADDRESS.match(address))
+
+def principal_from_public_key(der_public_key: bytes) -> str:
+    """Text form of the self-authenticating ICP principal of a DER encoded public key"""
+    principal = hashlib.sha224(der_public_key).digest() + SELF_AUTHENTICATING
+    checksum = zlib.crc32(principal).to_bytes(4, "big")
+    text = base64.b32encode(checksum + principal).decode().lower().rstrip("=")
+    return "-".join(text[i:i + 5] for i in range(0, len(text), 5))
+
+def canonical_principal(text: str) -> Optional[str]:
+    """Dashed lowercase form of an ICP principal in any letter case or grouping, None when the checksum fails"""
+    compact = text.replace("-", "").upper()
+    if not compact or len(compact) > 60:
+        return None
+    try:
+        raw = base64.b32decode(compact + "=" * (-len(compact) % 8))
+    except ValueError:
+        return None
+    checksum, principal = raw[:4], raw[4:]
+    if len(raw) < 4 or zlib.crc32(principal).to_bytes(4, "big") != checksum:
+        return None
+    text = compact.lower()
+    return "-".join(text[i:i + 5] for i in range(0, len(text), 5))
+
+def verify_evm(address: str, message: str, signature: str) -> bool:
+    """personal_sign (EIP-191) signature of message by address"""
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+
+    try:
+        signer = Account.recover_message(encode_defunct(text=message), signature=signature)
+    except Exception:
+        # malformed signatures raise a variety of errors from the eth libraries
+        return False
+    return signer.lower() == address.lower()
+
+def verify_icp(principal: str, message: str, signature: str, public_key: str) -> bool:
+    """ed25519 signature of message by the key the principal is derived from (hex signature and DER key)"""
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    try:
+        der = bytes.fromhex(public_key)
+        raw_signature = bytes.fromhex(signature)
+    except ValueError:
+        return False
+    if len(der) != len(ED25519_DER_PREFIX) + 32 or not der.startswith(ED25519_DER_PREFIX):
+        return False
+    if principal_from_public_key(der) != principal:
+        return False
+    try:
+        Ed25519PublicKey.from_public_bytes(der[len(ED25519_DER_PREFIX):]).verify(raw_signature, message.encode())
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+def warm_up():
+    """Import the signature libraries ahead of the first check"""
+    import eth_account.messages
+    import cryptography.hazmat.primitives.asymmetric.ed25519
+
+def verify_signature(address: str, message: str, signature: str, public_key: Optional[str] = None) -> bool:
+    """Check a wallet's signature of message; EVM addresses by recovery, ICP principals by their public key"""
+    if is_evm_address(address):
+        return verify_evm(address, message, signature)
+    if public_key:
+        return verify_icp(address, message, signature, public_key)
+    return False
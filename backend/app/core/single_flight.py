@@ -0,0 +1,34 @@
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Callable, Dict, Hashable
+import asyncio
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers with the same key.
+
+    The computation runs in the threadpool as its own task, so a caller that
+    disconnects does not cancel it for the others. Results are not cached once
+    the computation finishes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # mark the exception retrieved even if every waiter went away
+            task.exception()
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+# shared by the public read endpoints
+single_flight = SingleFlight()
@@ -0,0 +1,127 @@
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from functools import lru_cache
+from pydantic import TypeAdapter
+from typing import Any, Iterable, List, Optional, Tuple, Type
+from urllib.parse import quote
+import os
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+def dump_list(items: Iterable[Any], schema: Type) -> bytes:
+    """ORM rows as a JSON array of schema, validated and serialized by pydantic in one pass each"""
+    adapter = list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(list(items), from_attributes=True))
+
+def json_list_response(items: Iterable[Any], schema: Type) -> Response:
+    """A whole JSON list response, skipping FastAPI's response_model encoding (jsonable_encoder, then json.dumps)"""
+    return Response(dump_list(items, schema), media_type="application/json")
+
+def json_array_chunks(batches: Iterable[List[Any]], schema: Type) -> Iterable[bytes]:
+    """A JSON array written batch by batch, so no more than one batch is held serialized"""
+    yield b"["
+    separator = b""
+    for batch in batches:
+        if batch:
+            yield separator + dump_list(batch, schema)[1:-1]
+            separator = b","
+    yield b"]"
+
+def json_array_response(batches: Iterable[List[Any]], schema: Type) -> StreamingResponse:
+    """Stream a JSON array of schema; the first rows go out while later batches are still being read"""
+    return StreamingResponse(json_array_chunks(batches, schema), media_type="application/json")
+
+# bytes read per chunk when a file is sent without zero-copy
+FILE_CHUNK_SIZE = 256 * 1024
+
+def byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single-range Range header; None for the whole file.
+
+    Raises ValueError when the range lies outside the file. Multiple ranges
+    are answered with the whole file, which the RFC allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, dash, last = header[6:].strip().partition("-")
+    if not dash or not (first or last) or not (first or "0").isdigit() or not (last or "0").isdigit() or (
+        first and last and int(last) < int(first)
+    ):
+        return None  # invalid ranges are ignored
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix: the last N bytes
+        start, end = max(size - int(last), 0), size - 1 if int(last) else -1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+class FileRangeResponse(Response):
+    """An immutable file, with Range, If-Range and If-None-Match support.
+
+    Always sent as a download (Content-Disposition: attachment, nosniff):
+    the files are user uploads served from the API's origin.
+
+    The body is handed to the server as a file descriptor when it offers the
+    ASGI zero-copy send extension (sendfile), and read in FILE_CHUNK_SIZE
+    pieces from a thread otherwise.
+    """
+
+    def __init__(self, path: str, etag: str, media_type: str = "application/octet-stream",
+                 filename: Optional[str] = None, max_age: int = 31536000):
+        self.path = path
+        self.etag = f'"{etag}"'
+        self.media_type = media_type
+        self.filename = filename
+        self.max_age = max_age
+        self.background = None
+
+    async def __call__(self, scope, receive, send):
+        request_headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        size = os.stat(self.path).st_size
+        headers = [
+            (b"accept-ranges", b"bytes"),
+            (b"etag", self.etag.encode()),
+            (b"cache-control", f"private, max-age={self.max_age}, immutable".encode()),
+            (b"content-disposition", b"attachment" + (
+                f"; filename*=UTF-8''{quote(self.filename)}".encode() if self.filename else b""
+            )),
+            (b"x-content-type-options", b"nosniff"),
+        ]
+
+        if self.etag in request_headers.get("if-none-match", ""):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if_range = request_headers.get("if-range")
+        try:
+            requested = byte_range(request_headers.get("range"), size) if if_range in (None, self.etag) else None
+        except ValueError:
+            headers.append((b"content-range", f"bytes */{size}".encode()))
+            await send({"type": "http.response.start", "status": 416, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        start, end = requested or (0, size - 1)
+        length = end - start + 1 if size else 0
+        headers += [(b"content-type", self.media_type.encode()), (b"content-length", str(length).encode())]
+        if requested:
+            headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+        await send({"type": "http.response.start", "status": 206 if requested else 200, "headers": headers})
+        if scope["method"] == "HEAD" or not length:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as file:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": start, "count": length})
+                return
+            position = start
+            while position <= end:
+                chunk = await run_in_threadpool(os.pread, file.fileno(), min(FILE_CHUNK_SIZE, end + 1 - position),
+                                                position)
+                position += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": position <= end})
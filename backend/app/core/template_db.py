@@ -0,0 +1,230 @@
+"""
+Seeded template databases cloned per test.
+
+The schema is created and seeded once into a template, and every test gets
+a copy of it instead of running create_all and the seeds again:
+
+- sqlite:// (the default): the template file is loaded into memory once per
+  process and each clone is an in-memory database filled through SQLite's
+  backup API
+- sqlite:///path/test.db: each clone is a file copy of the template, next to it
+- postgresql://.../test: each clone is CREATE DATABASE ... TEMPLATE, a
+  server-side file copy
+
+Templates are named after a fingerprint of the schema and the seed, so a
+model change builds a new one and unchanged ones are reused across runs.
+Concurrent builds (pytest-xdist workers starting together) write under a
+temporary name and rename into place, the loser dropping its copy. Clones
+are named by worker and process, so parallel workers never share one.
+
+Sessions over a clone are plain RoutingSessions: sharding and replicas are
+not part of the clone, and process-wide caches (crypto configs, rates, the
+offer book) are not reset between tests.
+
+With pytest installed the module is also a plugin (``-p app.core.template_db``)
+providing the ``template_database`` and ``db`` fixtures.
+"""
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.pool import NullPool, StaticPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+import hashlib
+import itertools
+import os
+import shutil
+import sqlite3
+import tempfile
+from app.database import Base, RoutingSession, import_models, init_db
+
+try:
+    import pytest
+except ImportError:  # the fixtures are only defined where pytest is installed
+    pytest = None
+
+# where templates and clones live: sqlite:// clones in memory, a sqlite file
+# URL copies files next to it, a postgres URL creates databases on its server
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite://")
+
+def seed_defaults(db):
+    """The rows every environment starts with"""
+    from app.services.crypto_service import CryptoService
+    CryptoService(db).seed_default_cryptocurrencies()
+
+def fingerprint(dialect, seed: Callable) -> str:
+    """Changes with the schema DDL and the seed function"""
+    import_models()
+    digest = hashlib.sha256(f"{seed.__module__}.{seed.__qualname__}".encode())
+    # line by line, sorted: table, column constraint and index order in the DDL can differ from run to run
+    statements = []
+    for table in Base.metadata.tables.values():
+        statements += [line.strip().rstrip(",") for line in str(CreateTable(table).compile(dialect=dialect)).splitlines()]
+        statements += [str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes]
+    for statement in sorted(statements):
+        digest.update(statement.encode())
+    return digest.hexdigest()[:12]
+
+def worker_id() -> str:
+    """pytest-xdist worker (gw0, gw1, ...) and process, unique among concurrent test processes"""
+    return f"{os.getenv('PYTEST_XDIST_WORKER', 'main')}_{os.getpid()}"
+
+class TemplateDatabase:
+    """A seeded template and the clones made from it"""
+
+    def __init__(self, url: str = TEST_DATABASE_URL, seed: Callable = seed_defaults):
+        self.url = make_url(url)
+        self.seed = seed
+        self.backend = self.url.get_backend_name()
+        if self.backend not in ("sqlite", "postgresql"):
+            raise ValueError(f"Template databases need SQLite or PostgreSQL, not {self.backend}")
+        self.in_memory = self.backend == "sqlite" and self.url.database in (None, "", ":memory:")
+        self._clones = itertools.count()
+        self._source: Optional[sqlite3.Connection] = None
+        self.template: Optional[str] = None  # file path (SQLite) or database name (PostgreSQL)
+
+    def _populate(self, engine: Engine):
+        init_db(bind=engine)
+        with RoutingSession(bind=engine) as db:
+            self.seed(db)
+            db.commit()
+
+    # building
+
+    def build(self) -> str:
+        """Create the template unless one with the same fingerprint exists; returns its path or name"""
+        if self.template is None:
+            self.template = self._build_sqlite() if self.backend == "sqlite" else self._build_postgres()
+        return self.template
+
+    def _build_sqlite(self) -> str:
+        from sqlalchemy.dialects import sqlite
+        name = fingerprint(sqlite.dialect(), self.seed)
+        if self.in_memory:
+            directory, stem = tempfile.gettempdir(), "trustpeer-template"
+        else:
+            directory, filename = os.path.split(os.path.abspath(self.url.database))
+            stem = os.path.splitext(filename)[0]
+        path = os.path.join(directory, f"{stem}-{name}.db")
+        if not os.path.exists(path):
+            building = f"{path}.{worker_id()}"
+            engine = create_engine(f"sqlite:///{building}", poolclass=NullPool)
+            try:
+                self._populate(engine)
+            except Exception:
+                os.remove(building)
+                raise
+            finally:
+                engine.dispose()
+            # atomic: a concurrent builder's template is as good as ours
+            os.replace(building, path)
+        return path
+
+    def _admin_engine(self) -> Engine:
+        # CREATE and DROP DATABASE run outside transactions, from the maintenance database
+        return create_engine(self.url.set(database="postgres"), isolation_level="AUTOCOMMIT", poolclass=NullPool)
+
+    def _build_postgres(self) -> str:
+        from sqlalchemy.dialects import postgresql
+        name = f"{self.url.database}_template_{fingerprint(postgresql.dialect(), self.seed)}"
+        admin = self._admin_engine()
+        try:
+            with admin.connect() as conn:
+                exists = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}).scalar()
+                if exists:
+                    return name
+                building = f"{name}_{worker_id()}".lower()
+                conn.execute(text(f'CREATE DATABASE "{building}"'))
+            engine = create_engine(self.url.set(database=building), poolclass=NullPool)
+            try:
+                self._populate(engine)
+            finally:
+                engine.dispose()
+            with admin.connect() as conn:
+                try:
+                    conn.execute(text(f'ALTER DATABASE "{building}" RENAME TO "{name}"'))
+                except ProgrammingError:
+                    # another worker renamed its build first
+                    conn.execute(text(f'DROP DATABASE "{building}"'))
+            return name
+        finally:
+            admin.dispose()
+
+    # cloning
+
+    def clone(self) -> Engine:
+        """A fresh engine over a copy of the template"""
+        template = self.build()
+        clone = f"clone_{worker_id()}_{next(self._clones)}".lower()
+        if self.in_memory:
+            if self._source is None:
+                # read the template file once, back up every clone from memory
+                self._source = sqlite3.connect(":memory:", check_same_thread=False)
+                file = sqlite3.connect(template)
+                try:
+                    file.backup(self._source)
+                finally:
+                    file.close()
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._source.backup(conn)
+            # one connection for the clone's lifetime: closing it discards the database
+            return create_engine("sqlite://", creator=lambda: conn, poolclass=StaticPool)
+        if self.backend == "sqlite":
+            path = f"{os.path.splitext(template)[0]}-{clone}.db"
+            shutil.copyfile(template, path)
+            return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        admin = self._admin_engine()
+        try:
+            with admin.connect() as conn:
+                conn.execute(text(f'CREATE DATABASE "{template}_{clone}" TEMPLATE "{template}"'))
+        finally:
+            admin.dispose()
+        return create_engine(self.url.set(database=f"{template}_{clone}"))
+
+    def drop(self, engine: Engine):
+        """Dispose of a clone's engine and delete its database"""
+        database = engine.url.database
+        # closes the in-memory clone's only connection, which discards it
+        engine.dispose()
+        if self.in_memory:
+            return
+        if self.backend == "sqlite":
+            os.remove(database)
+        else:
+            admin = self._admin_engine()
+            try:
+                with admin.connect() as conn:
+                    conn.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+            finally:
+                admin.dispose()
+
+    @contextmanager
+    def session(self) -> Iterator[RoutingSession]:
+        """A session over a fresh clone, dropped afterwards"""
+        engine = self.clone()
+        try:
+            with RoutingSession(bind=engine) as db:
+                yield db
+        finally:
+            self.drop(engine)
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+if pytest is not None:
+    @pytest.fixture(scope="session")
+    def template_database() -> Iterator[TemplateDatabase]:
+        """Built (or found) once per test process"""
+        template = TemplateDatabase()
+        template.build()
+        yield template
+        template.close()
+
+    @pytest.fixture
+    def db(template_database: TemplateDatabase) -> Iterator[RoutingSession]:
+        """A session over a seeded database of the test's own"""
+        with template_database.session() as session:
+            yield session
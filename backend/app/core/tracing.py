@@ -0,0 +1,264 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from functools import wraps
+from typing import Any, Dict, List, Optional
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# share of requests traced, decided when a request arrives without a traceparent header;
+# requests that bring one follow its sampled flag
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+# file the exporter appends sampled spans to, one OTLP JSON export request per line
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+# spans held for export before new ones are dropped, and seconds between writes
+TRACE_EXPORT_QUEUE = int(os.getenv("TRACE_EXPORT_QUEUE", "10000"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "1"))
+# service name reported with exported spans
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "trustpeer-api")
+# longest SQL statement recorded on a query span
+TRACE_STATEMENT_LENGTH = 1000
+
+SERVER = "SPAN_KIND_SERVER"
+INTERNAL = "SPAN_KIND_INTERNAL"
+CLIENT = "SPAN_KIND_CLIENT"
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+spans_exported = registry.counter("trace_spans_exported_total", "Sampled spans written by the trace exporter")
+spans_dropped = registry.counter("trace_spans_dropped_total", "Sampled spans dropped with the export queue full")
+
+_random = random.Random()
+
+class Span:
+    """A timed operation of a trace.
+
+    Every request gets a root span so logs carry its trace id; only sampled
+    traces create child spans and are exported.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled", "start", "end", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str, sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{_random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def finish(self):
+        self.end = time.time_ns()
+        if self.sampled:
+            exporter.export(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": otlp_attributes(self.attributes),
+            "status": {"code": "STATUS_CODE_ERROR", "message": self.error} if self.error else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def set_current_span(current: Optional[Span]) -> Token:
+    """Make a span current in this context; pass the token to reset_current_span when it ends"""
+    return _current.set(current)
+
+def reset_current_span(token: Token):
+    _current.reset(token)
+
+def otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            values.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            values.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            values.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            values.append({"key": key, "value": {"stringValue": str(value)}})
+    return values
+
+def start_trace(name: str, traceparent: Optional[str] = None, sample_rate: Optional[float] = None, **attributes) -> Span:
+    """Root span of a request: continues the caller's trace when given a valid traceparent"""
+    match = TRACEPARENT.match(traceparent) if traceparent else None
+    if match and match.group(1) != "0" * 32:
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1)
+    else:
+        trace_id, parent_id = f"{_random.getrandbits(128):032x}", None
+        rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        sampled = _random.random() < rate
+    return Span(trace_id, parent_id, name, SERVER, sampled, attributes)
+
+@contextmanager
+def span(name: str, kind: str = INTERNAL, **attributes):
+    """Child span of the current span; yields None, at the cost of one lookup, outside sampled traces"""
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        yield None
+        return
+    child = Span(parent.trace_id, parent.span_id, name, kind, True, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        child.finish()
+
+def traced(function):
+    """Run a function in a span named after it when its caller is traced"""
+    name = function.__qualname__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        parent = _current.get()
+        if parent is None or not parent.sampled:
+            return function(*args, **kwargs)
+        with span(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+# database queries
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current.get()
+    if parent is None or not parent.sampled or context is None:
+        return
+    context._trace_span = Span(parent.trace_id, parent.span_id, statement.split(None, 1)[0], CLIENT, True, {
+        "db.system": conn.dialect.name,
+        "db.statement": statement[:TRACE_STATEMENT_LENGTH],
+    })
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    query_span = getattr(context, "_trace_span", None)
+    if query_span is not None:
+        context._trace_span = None
+        query_span.finish()
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    query_span = getattr(context, "_trace_span", None)
+    if query_span is not None:
+        context._trace_span = None
+        query_span.error = type(exception_context.original_exception).__name__
+        query_span.finish()
+
+def trace_queries():
+    """Record a span for every query run by any engine (primary, replicas and shards) inside a sampled trace"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+def untrace_queries():
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.remove(Engine, "handle_error", _handle_error)
+
+# export
+
+class SpanExporter:
+    """Write finished spans to a file from a background thread.
+
+    Requests only append spans to a bounded queue; a thread wakes every
+    TRACE_EXPORT_INTERVAL to serialize them in the OTLP JSON format an
+    OpenTelemetry collector's file receiver reads. Spans arriving with the
+    queue full are dropped and counted rather than slowing requests down.
+    """
+
+    def __init__(self, path: str = TRACE_EXPORT_PATH, max_queue: int = TRACE_EXPORT_QUEUE,
+                 interval: float = TRACE_EXPORT_INTERVAL):
+        self.path = path
+        self.max_queue = max_queue
+        self.interval = interval
+        self._spans: deque = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, finished: Span):
+        if len(self._spans) >= self.max_queue:
+            spans_dropped.inc()
+            return
+        self._spans.append(finished)
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._wake.clear()
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Write what is queued and stop the thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._wake.set()
+            thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._wake.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Span export failed")
+
+    def flush(self) -> int:
+        spans = []
+        while self._spans:
+            spans.append(self._spans.popleft().to_otlp())
+        if not spans:
+            return 0
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]}, separators=(",", ":"))
+        with open(self.path, "a") as out:
+            out.write(line + "\n")
+        spans_exported.inc(len(spans))
+        return len(spans)
+
+exporter = SpanExporter()
+atexit.register(exporter.stop)
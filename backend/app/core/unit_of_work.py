@@ -0,0 +1,86 @@
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from app.core.tracing import traced
+
+class UnitOfWork:
+    """Per-session state shared by every service built on that session.
+
+    get/get_by serve repeated primary-key and natural-key lookups from the
+    session's identity map instead of issuing the same query again, and
+    transaction() nests so a request has a single commit point: only the
+    outermost transactional call commits, inner ones flush.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._keys: Dict[Tuple[Type, str, Any], Any] = {}  # (model, column, value) -> primary key
+        self._depth = 0
+        self._on_commit: List[Callable[[], None]] = []
+
+    def get(self, model: Type, pk: Any) -> Optional[Any]:
+        """Row by primary key, from the identity map when already loaded"""
+        return self.db.get(model, pk)
+
+    def get_by(self, model: Type, column: str, value: Any) -> Optional[Any]:
+        """Row by a unique column, remembered for the rest of the session"""
+        key = (model, column, value)
+        pk = self._keys.get(key)
+        if pk is not None:
+            obj = self.db.get(model, pk)
+            # the column may have changed since it was remembered
+            if obj is not None and getattr(obj, column) == value:
+                return obj
+            del self._keys[key]
+
+        obj = self.db.query(model).filter(getattr(model, column) == value).first()
+        if obj is not None:
+            self._keys[key] = obj.id
+        return obj
+
+    def on_commit(self, callback: Callable[[], None]):
+        """Run callback once the current unit of work has committed"""
+        self._on_commit.append(callback)
+
+    @contextmanager
+    def transaction(self):
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.rollback()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.commit()
+        else:
+            self.db.flush()
+
+    def commit(self):
+        self.db.commit()
+        callbacks, self._on_commit = self._on_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.db.rollback()
+        self._on_commit = []
+        self._keys.clear()
+
+def unit_of_work(db: Session) -> UnitOfWork:
+    """The unit of work of a session, created on first use"""
+    uow = db.info.get("uow")
+    if uow is None:
+        uow = db.info["uow"] = UnitOfWork(db)
+    return uow
+
+def transactional(method):
+    """Run a service method (session in self.db) inside the session's unit of work"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with unit_of_work(self.db).transaction():
+            return method(self, *args, **kwargs)
+    return traced(wrapper)
@@ -1,22 +1,296 @@
-from sqlalchemy import create_engine
+from sqlalchemy import (
+    create_engine, event, inspect, insert, text, update, BigInteger, Column, MetaData, String, Table
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+import itertools
+import pkgutil
+import random
+import threading
+import time
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# database 
+# after load_dotenv: tracing reads its settings from the environment on import
+from app.core.tracing import traced
+
+# database
 DATABASE_URL=os.getenv("DATABASE_URL", "sqlite:///./trustpeer.db")
 
+# alembic revision the running code expects; when the database is already
+# stamped with it, the startup create_all schema check is skipped
+DATABASE_SCHEMA_REVISION = os.getenv("DATABASE_SCHEMA_REVISION")
+
+# comma separated read replicas; read_only service methods are spread across them
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+
+# seconds a user's reads stay on the primary after they write, so they see their own writes
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# comma separated databases users, trades and ratings are split across by user id;
+# everything else stays in DATABASE_URL. Replicas are not used when sharded.
+SHARD_DATABASE_URLS = [url.strip() for url in os.getenv("SHARD_DATABASE_URLS", "").split(",") if url.strip()]
+
+def make_engine(url: str):
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False} if "sqlite" in url else {}
+    )
+
 # create engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+engine = make_engine(DATABASE_URL)
+replica_engines = [make_engine(url) for url in REPLICA_DATABASE_URLS]
+_replicas = itertools.cycle(replica_engines)
+
+shard_engines = [make_engine(url) for url in SHARD_DATABASE_URLS]
+
+# user id -> monotonic time of their last committed write
+_recent_writes: Dict[int, float] = {}
+_recent_writes_lock = threading.Lock()
+
+def record_write(user_id: int):
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[user_id] = now
+        if len(_recent_writes) > 100_000:
+            for key in [k for k, t in _recent_writes.items() if now - t > READ_YOUR_WRITES_SECONDS]:
+                del _recent_writes[key]
+
+def wrote_recently(user_id: int) -> bool:
+    written = _recent_writes.get(user_id)
+    return written is not None and time.monotonic() - written < READ_YOUR_WRITES_SECONDS
+
+class RoutingSession(Session):
+    """Session that sends statements issued under read_only to a replica.
+
+    Everything else, writes, and reads by a user who wrote within
+    READ_YOUR_WRITES_SECONDS (info["user_id"]) or in the current transaction,
+    goes to the session's bind, the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_engines
+            and self.info.get("read_only")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and not getattr(clause, "is_dml", False)
+            and not wrote_recently(self.info.get("user_id"))
+        ):
+            return next(_replicas)
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+@event.listens_for(RoutingSession, "after_flush")
+def _track_write(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        record_write(session.info["user_id"])
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+def read_only(method):
+    """Let a service method's queries go to a replica (services keep their session in self.db)"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        info = self.db.info
+        previous = info.get("read_only", False)
+        info["read_only"] = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            info["read_only"] = previous
+    return traced(wrapper)
+
+# sharding
+
+# sharded table -> user id column its rows are placed by (trades by seller, falling back to buyer)
+SHARDED_TABLES = {
+    "users": ("id",), "trades": ("seller_id", "buyer_id"), "trades_archive": ("seller_id", "buyer_id"),
+    "ratings": ("rated_user_id",),
+}
+# shard id of DATABASE_URL, home of the tables that are not sharded
+GLOBAL_SHARD = "global"
+
+# per-shard id blocks: ids allocated on shard k are k mod N, so an id alone names its shard
+shard_metadata = MetaData()
+shard_sequences = Table(
+    "shard_sequences", shard_metadata,
+    Column("name", String(32), primary_key=True),
+    Column("next_value", BigInteger, nullable=False),
 )
 
+def shard_of(user_id: int) -> str:
+    """Shard holding a user and the rows placed by their id"""
+    return str(user_id % len(shard_engines))
+
+def allocate_ids(conn, table: str, shard: int, count: int = 1) -> List[int]:
+    """Reserve count ids of table on a shard, in the transaction of conn"""
+    for _ in range(2):
+        first = conn.execute(
+            update(shard_sequences).where(shard_sequences.c.name == table)
+            .values(next_value=shard_sequences.c.next_value + count).returning(shard_sequences.c.next_value)
+        ).scalar()
+        if first is not None:
+            first -= count
+            break
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(shard_sequences).values(name=table, next_value=1 + count))
+            first = 1
+            break
+        except IntegrityError:
+            # another transaction created the sequence; take from it
+            continue
+    else:
+        raise RuntimeError(f"Could not allocate {table} ids on shard {shard}")
+    return [value * len(shard_engines) + shard for value in range(first, first + count)]
+
+def _placement_shard(table: str, values: Dict[str, Any]) -> int:
+    for column in SHARDED_TABLES[table]:
+        if column != "id" and values.get(column) is not None:
+            return values[column] % len(shard_engines)
+    return random.randrange(len(shard_engines))
+
+def _choose_shard(mapper, instance, clause=None):
+    table = mapper.local_table.name if mapper is not None else None
+    if table not in SHARDED_TABLES:
+        return GLOBAL_SHARD
+    if instance is not None and instance.id is not None:
+        return shard_of(instance.id)
+    raise ValueError(f"No shard for a {table} row without an id")
+
+def _choose_identity_shards(mapper, primary_key, **kw):
+    if mapper.local_table.name in SHARDED_TABLES:
+        return [shard_of(primary_key[0])]
+    return [GLOBAL_SHARD]
+
+def _criteria_user_ids(whereclause, table: str, columns, parameters) -> Optional[List[int]]:
+    """Values an AND-ed equality or IN criterion pins one of table's columns to, None when unpinned"""
+    if whereclause is None:
+        return None
+    clauses = whereclause.clauses if (
+        isinstance(whereclause, BooleanClauseList) and whereclause.operator is operators.and_
+    ) else [whereclause]
+    for clause in clauses:
+        if not isinstance(clause, BinaryExpression) or not isinstance(clause.right, BindParameter):
+            continue
+        left_table = getattr(clause.left, "table", None)
+        if getattr(clause.left, "key", None) not in columns or getattr(left_table, "name", None) != table:
+            continue
+        value = clause.right.effective_value
+        if value is None and isinstance(parameters, dict):
+            # primary key loads bind the identity at execution
+            value = parameters.get(clause.right.key)
+        if clause.operator is operators.eq and value is not None:
+            return [value]
+        if clause.operator is operators.in_op and value:
+            return list(value)
+    return None
+
+def _choose_execute_shards(state) -> List[str]:
+    mapper = state.bind_mapper
+    table = mapper.local_table.name if mapper is not None else None
+    if table not in SHARDED_TABLES:
+        return [GLOBAL_SHARD]
+    if state.is_insert:
+        raise ValueError(f"Insert {table} rows with insert_rows() so they are placed on their shards")
+    # ids name their shard; other criteria only when the column places the rows
+    columns = {"id", SHARDED_TABLES[table][0]}
+    user_ids = _criteria_user_ids(getattr(state.statement, "whereclause", None), table, columns, state.parameters)
+    if user_ids is None:
+        return [str(shard) for shard in range(len(shard_engines))]
+    return sorted({shard_of(user_id) for user_id in user_ids})
+
+class ShardedRoutingSession(ShardedSession):
+    """Session over DATABASE_URL and the shards.
+
+    Rows of SHARDED_TABLES get ids from their shard's sequence when first
+    flushed, so loads by primary key go to exactly one shard. Statements go
+    to the shards pinned by an equality or IN criterion on the id or the
+    placement column, and to every shard otherwise, with results
+    concatenated in shard order: aggregates, ordering and limits across
+    shards need scatter(). Transactions touching several databases commit
+    them one after the other.
+    """
+
+    def __init__(self, **kwargs):
+        shards = {GLOBAL_SHARD: engine, **{str(i): shard for i, shard in enumerate(shard_engines)}}
+        super().__init__(
+            shard_chooser=_choose_shard,
+            identity_chooser=_choose_identity_shards,
+            execute_chooser=_choose_execute_shards,
+            shards=shards,
+            **kwargs
+        )
+
+@event.listens_for(ShardedRoutingSession, "before_flush")
+def _assign_shard_ids(session, flush_context, instances):
+    for instance in session.new:
+        table = inspect(instance).mapper.local_table.name
+        if table in SHARDED_TABLES and instance.id is None:
+            shard = _placement_shard(table, {column: getattr(instance, column) for column in SHARDED_TABLES[table]})
+            conn = session.connection(bind_arguments={"shard_id": str(shard)})
+            instance.id = allocate_ids(conn, table, shard)[0]
+
+def insert_rows(db: Session, model, rows: List[Dict[str, Any]]):
+    """Bulk insert; sharded rows get ids and are inserted on their shards"""
+    table = model.__table__.name
+    if not shard_engines or table not in SHARDED_TABLES:
+        db.execute(insert(model), rows)
+        return
+    by_shard: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        shard = row["id"] % len(shard_engines) if row.get("id") is not None else _placement_shard(table, row)
+        by_shard.setdefault(shard, []).append(row)
+    for shard, shard_rows in by_shard.items():
+        missing = [row for row in shard_rows if row.get("id") is None]
+        conn = db.connection(bind_arguments={"shard_id": str(shard)})
+        for row, row_id in zip(missing, allocate_ids(conn, table, shard, len(missing))):
+            row["id"] = row_id
+        # the ORM bulk insert path does not route per shard, the table insert on the shard connection does
+        conn.execute(insert(model.__table__), shard_rows)
+
+T = TypeVar("T")
+
+_scatter_pool = ThreadPoolExecutor(max_workers=max(len(shard_engines), 1), thread_name_prefix="scatter")
+_shard_sessions = sessionmaker(autocommit=False, autoflush=False)
+
+def scatter(db: Session, fn: Callable[[Session], T]) -> List[T]:
+    """fn's result on every shard, run in parallel with a session per shard; just fn(db) when not sharded.
+
+    Objects returned from shard sessions are detached; callers merge the
+    partial results (re-sort, re-limit, sum).
+    """
+    if not shard_engines:
+        return [fn(db)]
+
+    def run(shard_engine):
+        with _shard_sessions(bind=shard_engine) as shard_db:
+            return fn(shard_db)
+
+    return list(_scatter_pool.map(run, shard_engines))
+
 # create session local class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+SessionLocal = sessionmaker(
+    class_=ShardedRoutingSession if shard_engines else RoutingSession, autocommit=False, autoflush=False
+)
 
 # create base class
 Base = declarative_base()
@@ -28,13 +302,78 @@ def get_db():
         yield db
     finally:
         db.close()
-# create base class
-Base = declarative_base()
 
-# dependency to get database session
-def get_db():
+@contextmanager
+def session_scope():
+    """Session for work outside a request (workers, shared computations)"""
     db = SessionLocal(bind=engine)
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_schema_revision(bind=engine):
+    """Return the alembic revision the database is stamped with, if any"""
+    try:
+        with bind.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except SQLAlchemyError:
+        return None
+
+def create_tables_without_foreign_keys(bind, tables: Iterable[Table]):
+    """Create missing tables whose foreign keys may point into another database"""
+    with bind.begin() as conn:
+        existing = set(inspect(conn).get_table_names())
+        for table in tables:
+            if table.name in existing:
+                continue
+            conn.execute(CreateTable(table, include_foreign_key_constraints=[]))
+            for index in table.indexes:
+                conn.execute(CreateIndex(index))
+
+# tables pointing at trades.id: finished trades move to trades_archive with their ids,
+# so these keep no foreign key to trades
+TRADE_REFERENCING_TABLES = ("ratings", "reports", "moderation_cases")
+
+def drop_foreign_keys(bind, tables: Iterable[str], referred_table: str):
+    """Drop the foreign keys from tables to referred_table that the database has"""
+    if bind.dialect.name == "sqlite":
+        # sqlite cannot drop a constraint, and only enforces foreign keys when asked to
+        return
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        quote = conn.dialect.identifier_preparer.quote
+        existing = set(inspector.get_table_names())
+        for table in tables:
+            if table not in existing:
+                continue
+            for foreign_key in inspector.get_foreign_keys(table):
+                if foreign_key["referred_table"] == referred_table and foreign_key["name"]:
+                    conn.execute(text(f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(foreign_key['name'])}"))
+
+def import_models():
+    """Register every model on Base.metadata"""
+    models = import_module("app.models")
+    for module in pkgutil.iter_modules(models.__path__):
+        import_module(f"app.models.{module.name}")
+
+def init_db(bind=engine) -> bool:
+    """Create missing tables unless the database is at the expected revision.
+
+    Returns True when the schema check ran.
+    """
+    if DATABASE_SCHEMA_REVISION and get_schema_revision(bind) == DATABASE_SCHEMA_REVISION:
+        return False
+    # routers load lazily, so register every model before creating tables
+    import_models()
+    if not shard_engines or bind is not engine:
+        Base.metadata.create_all(bind=bind)
+        drop_foreign_keys(bind, TRADE_REFERENCING_TABLES, "trades")
+        return True
+
+    tables = Base.metadata.sorted_tables
+    create_tables_without_foreign_keys(engine, [table for table in tables if table.name not in SHARDED_TABLES])
+    for shard_engine in shard_engines:
+        create_tables_without_foreign_keys(shard_engine, [table for table in tables if table.name in SHARDED_TABLES])
+        shard_metadata.create_all(bind=shard_engine)
+    return True
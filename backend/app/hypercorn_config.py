@@ -0,0 +1,28 @@
+"""
+Hypercorn settings for the production entry point:
+
+    hypercorn --config file:app/hypercorn_config.py app.main:app
+
+Serves HTTP/2 over TLS (negotiated by ALPN, falling back to HTTP/1.1) when
+SSL_CERTFILE and SSL_KEYFILE are set, and cleartext HTTP/1.1 plus h2c (prior
+knowledge or upgrade, for a TLS-terminating proxy speaking HTTP/2) otherwise.
+"""
+import logging
+import os
+
+bind = [os.getenv("SERVER_BIND", "0.0.0.0:8000")]
+# 0 serves from this process; worker processes are daemonic, so login signature
+# checks fall back from a process pool to threads in them
+workers = int(os.getenv("SERVER_WORKERS", "0"))
+keep_alive_timeout = float(os.getenv("SERVER_KEEP_ALIVE_TIMEOUT", "5"))
+
+certfile = os.getenv("SSL_CERTFILE") or None
+keyfile = os.getenv("SSL_KEYFILE") or None
+alpn_protocols = ["h2", "http/1.1"]
+
+# streams a client may have open on one HTTP/2 connection
+h2_max_concurrent_streams = int(os.getenv("HTTP2_MAX_CONCURRENT_STREAMS", "100"))
+
+# the app writes its own JSON access log; server errors go through its JSON logging
+accesslog = None
+errorlog = logging.getLogger("hypercorn.error")
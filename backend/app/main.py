@@ -1,18 +1,104 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-import uvicorn
-from app.database import engine, Base
-from app.routes import auth, traders, trades, escrow, ratings, crypto
+from importlib import import_module
+import os
+from app.database import init_db
+
+# router module, url prefix and tag; modules are only imported when enabled
+ROUTERS = {
+    "auth": ("/api/auth", "Authentication"),
+    "traders": ("/api/traders", "Traders"),
+    "trades": ("/api/trades", "Trades"),
+    "escrow": ("/api/escrow", "Escrow"),
+    "ratings": ("/api/ratings", "Ratings"),
+    "crypto": ("/api/crypto", "Cryptocurrencies"),
+    "offers": ("/api/offers", "Offers"),
+    "rates": ("/api/rates", "Exchange rates"),
+    "admin": ("/api/admin", "Moderation"),
+    "attachments": ("/api/attachments", "Attachments"),
+}
+
+# comma separated subset of ROUTERS to serve, e.g. "auth,crypto"; all by default
+ENABLED_ROUTERS = [
+    name.strip() for name in os.getenv("API_ROUTERS", ",".join(ROUTERS)).split(",") if name.strip()
+]
+
+# trace requests (sampled by TRACE_SAMPLE_RATE) and write a JSON access log line per request
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+ACCESS_LOG = os.getenv("ACCESS_LOG", "true").lower() == "true"
+# brotli/gzip response compression (see app/core/compression.py for its settings)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
 
 # create tables on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # create database table
-    Base.metadata.create_all(bind=engine)
+    # log records and access log lines are written by background threads
+    from app.core.log import access_log, configure_logging
+    from app.core.tracing import exporter, trace_queries
+    configure_logging()
+    if TRACING_ENABLED:
+        trace_queries()
+    # create database tables unless already at the expected revision
+    init_db()
+    # post-commit side effects (trust scores, trader stats, trade notifications)
+    from app.services.outbox_worker import outbox_worker
+    from app.services.notifier import notifier
+    if outbox_worker.concurrency:
+        await notifier.start()
+        await outbox_worker.start()
+    pipeline = None
+    if "escrow" in ENABLED_ROUTERS:
+        # verify deposits and execute releases in the background
+        from app.services.escrow_verification import escrow_pipeline as pipeline
+        await pipeline.start()
+    rates = None
+    if "rates" in ENABLED_ROUTERS or "trades" in ENABLED_ROUTERS:
+        # market rates for conversions and trade rate checks
+        from app.services.rate_service import rate_cache as rates
+        await rates.start()
+    book = None
+    if "offers" in ENABLED_ROUTERS:
+        # load the active offers into the matching book
+        from app.services.offer_book import offer_book as book
+        await book.start()
+    lookups = None
+    if "traders" in ENABLED_ROUTERS:
+        # answer lookups of unknown traders without a query
+        from app.services.user_lookup import lookup_filter as lookups
+        await lookups.start()
+    verifier = None
+    if "auth" in ENABLED_ROUTERS:
+        # wallet login signature checks
+        from app.services.wallet_auth import wallet_auth
+        verifier = wallet_auth.verifier
+        verifier.start()
+    sync = None
+    if os.getenv("CANISTER_SYNC_ENABLED", "false").lower() == "true":
+        # mirror on-chain trades and profiles into the database
+        from app.services.canister_sync import canister_sync as sync
+        await sync.start()
     yield
-    
+    if sync:
+        await sync.stop()
+    if verifier:
+        verifier.stop()
+    if lookups:
+        await lookups.stop()
+    if book:
+        await book.stop()
+    if rates:
+        await rates.stop()
+    if pipeline:
+        await pipeline.stop()
+    await outbox_worker.stop()
+    # send the notifications still batched
+    await notifier.stop()
+    exporter.stop()
+    access_log.stop()
+
 app = FastAPI(
     title="TrustPeer P2P Escrow API",
     description="Backend API for P2P crypto escrow platform",
@@ -29,16 +115,28 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+if COMPRESSION_ENABLED:
+    from app.core.compression import CompressionMiddleware
+    app.add_middleware(CompressionMiddleware)
+
+if TRACING_ENABLED or ACCESS_LOG:
+    from app.core.request_tracing import TraceMiddleware
+    app.add_middleware(TraceMiddleware, access_log=ACCESS_LOG, tracing=TRACING_ENABLED)
+
 # security
 security = HTTPBearer()
 
 # include routers
-app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
-app.include_router(traders.router, prefix="/api/traders", tags=["Traders"])
-app.include_router(trades.router, prefix="/api/trades", tags=["Trades"])
-app.include_router(escrow.router, prefix="/api/escrow", tags=["Escrow"])
-app.include_router(ratings.router, prefix="/api/ratings", tags=["Ratings"])
-app.include_router(crypto.router, prefix="/api/crypto", tags=["Cryptocurrencies"])
+def include_routers(app: FastAPI, names=ENABLED_ROUTERS):
+    """Import and mount the enabled routers"""
+    for name in names:
+        if name not in ROUTERS:
+            raise ValueError(f"Unknown router {name}")
+        prefix, tag = ROUTERS[name]
+        module = import_module(f"app.routes.{name}")
+        app.include_router(module.router, prefix=prefix, tags=[tag])
+
+include_routers(app)
 
 @app.get("/")
 async def root():
@@ -46,13 +144,19 @@ async def root():
         "message": "TrustPeer P2P Escrow API",
         "status": "running"
     }
-    
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "message": "API is running smoothly"
     }
-    
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    from app.core.metrics import registry
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("main:app",  host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,22 @@
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+
+class TradeAttachment(Base):
+    __tablename__ = "trade_attachments"
+
+    # files uploaded to a trade (payment proofs); the bytes live in the blob store under sha256
+    id = Column(Integer, primary_key=True, index=True)
+    # trades.id, without a foreign key: finished trades move to trades_archive with their ids
+    trade_id = Column(Integer, nullable=False, index=True)
+    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(127), nullable=False)
+    filename = Column(String(255))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # the same file uploaded to a trade twice is one attachment
+    __table_args__ = (
+        UniqueConstraint("trade_id", "sha256", name="uq_trade_attachments_trade_sha256"),
+    )
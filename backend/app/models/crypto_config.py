@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class CryptoConfig(Base):
+    __tablename__ = "crypto_configs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String, unique=True, index=True, nullable=False)
+    name = Column(String, nullable=False)
+    network = Column(String, nullable=False)
+    contract_address = Column(String)
+    decimals = Column(Integer, default=18)  # of the asset's smallest unit
+    minimum_amount_trade = Column(Float, default=0.0)
+    maximum_amount_trade = Column(Float, default=1000000.0)
+    trade_percentage_fee = Column(Float, default=0.1)  # percent of the amount
+    icon_url = Column(String)
+    color = Column(String)
+    is_active = Column(Boolean, default=True)
+    is_testnet = Column(Boolean, default=False)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
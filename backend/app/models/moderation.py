@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Numeric, ForeignKey, Index
+from sqlalchemy.sql import func
+from datetime import datetime
+from app.database import Base
+
+class ModerationCase(Base):
+    __tablename__ = "moderation_cases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(16), nullable=False)  # report, dispute, risk, payout
+    report_id = Column(Integer, ForeignKey("reports.id"), unique=True)
+    # trades.id, without a foreign key: finished trades move to trades_archive with their ids
+    trade_id = Column(Integer, index=True)
+    reported_user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    opened_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    reason = Column(Text)
+    status = Column(String(16), nullable=False, default="open")  # open, claimed, resolved, dismissed
+    priority = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(20, 2), nullable=False, default=0)  # fiat amount at stake, 0 without a trade
+    reporter_trust = Column(Float, nullable=False, default=0)  # opener's trust score when opened
+    claimed_by = Column(Integer, ForeignKey("users.id"))
+    lease_until = Column(DateTime)
+    resolution = Column(Text)
+    resolved_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    resolved_at = Column(DateTime)
+
+    # one index per queue order, each led by status
+    __table_args__ = (
+        Index("ix_moderation_cases_priority", "status", "priority", "created_at"),
+        Index("ix_moderation_cases_age", "status", "created_at"),
+        Index("ix_moderation_cases_amount", "status", "amount"),
+        Index("ix_moderation_cases_reporter_trust", "status", "reporter_trust"),
+    )
+
+class ModerationCounts(Base):
+    __tablename__ = "moderation_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    open_reports = Column(Integer, nullable=False, default=0)
+    total_reports = Column(Integer, nullable=False, default=0)
+    open_disputes = Column(Integer, nullable=False, default=0)
+    total_disputes = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Numeric, Enum, ForeignKey, Index
+from sqlalchemy.sql import func
+from datetime import datetime
+from app.database import Base
+from app.models.trade import TradeType
+
+class Offer(Base):
+    __tablename__ = "offers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    side = Column(Enum(TradeType), nullable=False)  # sell: the maker sells crypto for fiat
+    crypto_currency = Column(String(16), nullable=False)
+    fiat_currency = Column(String(8), nullable=False)
+    price = Column(Numeric(20, 2), nullable=False)  # fiat per unit of crypto
+    min_amount = Column(Numeric(40, 18), nullable=False)  # crypto per trade
+    max_amount = Column(Numeric(40, 18), nullable=False)
+    payment_methods = Column(JSON, nullable=False)
+    terms = Column(Text)
+    status = Column(String(16), nullable=False, default="active")  # active, paused, closed
+    queued_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # time priority, reset on price change
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_offers_book", "status", "crypto_currency", "fiat_currency"),
+        Index("ix_offers_updated_at", "updated_at"),
+    )
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from sqlalchemy.sql import func
+from datetime import datetime
+from app.database import Base
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(16), nullable=False, default="pending")  # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # not claimed before this time
+    locked_until = Column(DateTime)  # lease of the worker processing the event
+    last_error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    processed_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_outbox_events_claim", "status", "available_at"),
+    )
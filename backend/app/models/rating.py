@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Float, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class Rating(Base):
+    __tablename__ = "ratings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rater_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    rated_user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # trades.id, without a foreign key: finished trades move to trades_archive with their ids
+    trade_id = Column(Integer, nullable=False, index=True)
+    rating = Column(Float, nullable=False)  # 1-5 stars
+    comment = Column(Text)
+    communication_rating = Column(Float)
+    reliability_rating = Column(Float)
+    speed_rating = Column(Float)
+    created_at = Column(DateTime, server_default=func.now())
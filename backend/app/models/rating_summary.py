@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from app.database import Base
+
+class RatingSummary(Base):
+    __tablename__ = "rating_summaries"
+
+    # running totals of the ratings a user received, one row per rated dimension
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    dimension = Column(String(16), primary_key=True)  # overall, communication, reliability, speed
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)  # sum of the ratings
+    # ratings per whole star, rounded to the nearest
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
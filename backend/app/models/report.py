@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, ForeignKey
+from sqlalchemy.sql import func
+import enum
+from app.database import Base
+
+class ReportType(str, enum.Enum):
+    FRAUD = "fraud"
+    SCAM = "scam"
+    HARASSMENT = "harassment"
+    FAKE_PAYMENT = "fake_payment"
+    OTHER = "other"
+
+class ReportStatus(str, enum.Enum):
+    PENDING = "pending"
+    INVESTIGATING = "investigating"
+    RESOLVED = "resolved"
+    DISMISSED = "dismissed"
+
+class Report(Base):
+    __tablename__ = "reports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reporter_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    reported_user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # trades.id, without a foreign key: finished trades move to trades_archive with their ids
+    trade_id = Column(Integer, index=True)
+    report_type = Column(Enum(ReportType), nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=False)
+    evidence = Column(Text)
+    status = Column(Enum(ReportStatus), default=ReportStatus.PENDING)
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey
+from app.database import Base
+
+class RiskCounter(Base):
+    __tablename__ = "risk_counters"
+
+    # sliding window counter: events in the current and previous fixed window
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    feature = Column(String(32), primary_key=True)  # e.g. "cancellations_7d"
+    window_start = Column(BigInteger, nullable=False)  # unix time of the current window
+    current = Column(Integer, nullable=False, default=0)
+    previous = Column(Integer, nullable=False, default=0)
+
+class RiskComplaint(Base):
+    __tablename__ = "risk_complaints"
+
+    # the last time a complainant's report or dispute was counted against a user
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    complainant_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    event = Column(String(32), primary_key=True)  # e.g. "report_received"
+    counted_at = Column(BigInteger, nullable=False)  # unix time
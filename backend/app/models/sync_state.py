@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    stream = Column(String(64), primary_key=True)  # e.g. "canister.trades"
+    position = Column(BigInteger, nullable=False, default=0)  # high-water mark (change sequence)
+    head = Column(BigInteger, nullable=False, default=0)  # latest sequence seen upstream
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
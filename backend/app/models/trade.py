@@ -0,0 +1,59 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Enum, ForeignKey
+from sqlalchemy.sql import func
+import enum
+from app.database import Base
+
+class TradeStatus(str, enum.Enum):
+    INITIATED = "initiated"
+    ESCROW_FUNDED = "escrow_funded"
+    PAYMENT_SENT = "payment_sent"
+    PAYMENT_CONFIRMED = "payment_confirmed"
+    COMPLETED = "completed"
+    DISPUTED = "disputed"
+    CANCELLED = "cancelled"
+
+class TradeType(str, enum.Enum):
+    BUY = "buy"
+    SELL = "sell"
+
+class CryptoCurrency(str, enum.Enum):
+    USDT = "USDT"
+    BTC = "BTC"
+    ETH = "ETH"
+    USDC = "USDC"
+    BNB = "BNB"
+    ADA = "ADA"
+    SOL = "SOL"
+    DOT = "DOT"
+    MATIC = "MATIC"
+    AVAX = "AVAX"
+
+class Trade(Base):
+    __tablename__ = "trades"
+
+    # trades_archive is a copy of this table, indexes included: column indexes take the
+    # archive's name there, a named Index here would clash with its copy
+    id = Column(Integer, primary_key=True, index=True)
+    trade_id = Column(String, unique=True, index=True, nullable=False)  # public id, TP... or mirrored from the canister
+    buyer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    seller_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    crypto_amount = Column(Float, nullable=False)  # exact amount in trade_amounts
+    fiat_amount = Column(Float, nullable=False)
+    exchange_rate = Column(Float, nullable=False)  # fiat per unit of crypto
+    crypto_currency = Column(Enum(CryptoCurrency), nullable=False)
+    fiat_currency = Column(String, default="NGN")
+    trade_type = Column(Enum(TradeType), nullable=False)
+    payment_method = Column(String, nullable=False)
+    status = Column(Enum(TradeStatus), default=TradeStatus.INITIATED, index=True)
+    escrow_address = Column(String)
+    escrow_tx_hash = Column(String)  # the seller's deposit, verified by the escrow pipeline
+    release_tx_hash = Column(String)  # the payout to the buyer
+    payment_reference = Column(String)
+    payment_proof = Column(Text)  # reference to a trade attachment
+    expires_at = Column(DateTime)
+    payment_deadline = Column(DateTime)
+    is_disputed = Column(Boolean, default=False)
+    dispute_reason = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
+    completed_at = Column(DateTime)
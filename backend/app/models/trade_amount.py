@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+class TradeAmount(Base):
+    __tablename__ = "trade_amounts"
+
+    # the trade's crypto amount in the asset's smallest unit, exactly as requested; the trades
+    # table keeps amounts as floats, which cannot hold 18 decimal places
+    # trades.trade_id, without a foreign key: finished trades move to trades_archive
+    trade_id = Column(String(64), primary_key=True)
+    # decimal digits: some drivers (sqlite) bind Numeric through float
+    crypto_units = Column(String(40), nullable=False)
+    decimals = Column(Integer, nullable=False)
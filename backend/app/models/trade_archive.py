@@ -0,0 +1,13 @@
+from sqlalchemy import Index
+from app.database import Base
+from app.models.trade import Trade
+
+# completed and cancelled trades moved out of the hot table, with their ids and columns unchanged
+trades_archive = Trade.__table__.to_metadata(Base.metadata, name="trades_archive")
+
+# history listings: a user's archived trades, newest first
+Index("ix_trades_archive_buyer_id", trades_archive.c.buyer_id, trades_archive.c.created_at)
+Index("ix_trades_archive_seller_id", trades_archive.c.seller_id, trades_archive.c.created_at)
+
+class ArchivedTrade(Base):
+    __table__ = trades_archive
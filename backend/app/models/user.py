@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True)
+    wallet_address = Column(String, unique=True, index=True)  # EVM address or ICP principal
+    telegram_handle = Column(String, index=True)
+    username = Column(String, unique=True, index=True, nullable=False)
+    full_name = Column(String)
+    phone_number = Column(String)
+    profile_image = Column(String)
+    trust_score = Column(Float, default=50.0)  # 0-100, recomputed from trades and ratings
+    total_trades = Column(Integer, default=0)
+    successful_trades = Column(Integer, default=0)
+    is_active = Column(Boolean, default=True)
+    is_verified = Column(Boolean, default=False)
+    kyc_status = Column(String, default="pending")  # pending, approved, rejected
+    created_at = Column(DateTime, server_default=func.now())
+    last_login = Column(DateTime)
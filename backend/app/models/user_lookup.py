@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.database import Base
+
+class UserLookupKey(Base):
+    __tablename__ = "user_lookup_keys"
+
+    # normalized identifiers a user can be found by, written with the user
+    kind = Column(String(16), primary_key=True)  # username, telegram, wallet
+    key = Column(String(255), primary_key=True)  # e.g. "alice" for "@Alice", lowercase EVM address
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, index=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_user_lookup_keys_created_at", "created_at"),
+    )
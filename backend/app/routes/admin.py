@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db
+from app.schemas.moderation import CaseResolve, CaseResponse, ModerationCountsResponse
+from app.services.moderation_service import ModerationService
+from app.services.auth_service import AuthService
+
+router = APIRouter()
+
+SORT_PATTERN = "^(priority|age|amount|reporter_trust)$"
+
+@router.get("/cases", response_model=List[CaseResponse])
+async def list_cases(
+    status: str = Query("open", pattern="^(open|claimed|resolved|dismissed)$"),
+    kind: Optional[str] = Query(None, pattern="^(report|dispute|risk|payout)$"),
+    sort: str = Query("priority", pattern=SORT_PATTERN),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """A page of the moderation queue"""
+    moderation_service = ModerationService(db)
+    return moderation_service.list_cases(status, kind, sort, limit, offset)
+
+@router.post("/cases/claim", response_model=Optional[CaseResponse])
+async def claim_next_case(
+    kind: Optional[str] = Query(None, pattern="^(report|dispute|risk|payout)$"),
+    sort: str = Query("priority", pattern=SORT_PATTERN),
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """Lease the next case in queue order; null when the queue is empty"""
+    moderation_service = ModerationService(db)
+    return moderation_service.claim_next(moderator_id, kind, sort)
+
+@router.get("/cases/{case_id}", response_model=CaseResponse)
+async def get_case(
+    case_id: int,
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """Get a case"""
+    moderation_service = ModerationService(db)
+    case = moderation_service.get_case(case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return case
+
+@router.post("/cases/{case_id}/claim", response_model=CaseResponse)
+async def claim_case(
+    case_id: int,
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """Lease a case, or extend the caller's lease"""
+    moderation_service = ModerationService(db)
+    try:
+        return moderation_service.claim(case_id, moderator_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/cases/{case_id}/release", response_model=CaseResponse)
+async def release_case(
+    case_id: int,
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """Return a leased case to the queue"""
+    moderation_service = ModerationService(db)
+    try:
+        return moderation_service.release(case_id, moderator_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/cases/{case_id}/resolve", response_model=CaseResponse)
+async def resolve_case(
+    case_id: int,
+    body: CaseResolve,
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """Resolve or dismiss a leased case"""
+    moderation_service = ModerationService(db)
+    try:
+        return moderation_service.resolve(case_id, moderator_id, body.resolution, body.dismiss)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/users/{user_id}/counts", response_model=ModerationCountsResponse)
+async def get_user_counts(
+    user_id: int,
+    db: Session = Depends(get_db),
+    moderator_id: int = Depends(AuthService.get_current_admin)
+):
+    """Open and total reports and disputes against a user"""
+    moderation_service = ModerationService(db)
+    counts = moderation_service.get_user_counts(user_id)
+    return counts or ModerationCountsResponse(user_id=user_id)
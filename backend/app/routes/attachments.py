@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db
+from app.core.blob_store import BlobTooLarge, blob_store
+from app.core.streaming import FileRangeResponse
+from app.schemas.attachment import AttachmentResponse
+from app.services.attachment_service import AttachmentService
+from app.services.auth_service import AuthService
+
+router = APIRouter()
+
+@router.post("/trades/{trade_id}", response_model=AttachmentResponse)
+async def upload_attachment(
+    trade_id: str,
+    request: Request,
+    filename: Optional[str] = Query(None, max_length=255),
+    content_type: str = Header("application/octet-stream", max_length=127),
+    content_length: Optional[int] = Header(None),
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Attach a file (e.g. a payment proof) to a trade; the request body is the file itself"""
+    attachment_service = AttachmentService(db)
+    try:
+        # refuse before reading the body
+        attachment_service.get_trade_for_upload(trade_id, current_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if content_length is not None and content_length > blob_store.max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {blob_store.max_bytes} bytes")
+
+    try:
+        sha256, size = await blob_store.write(request.stream())
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        return attachment_service.attach(trade_id, current_user_id, sha256, size, content_type, filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/trades/{trade_id}", response_model=List[AttachmentResponse])
+async def get_trade_attachments(
+    trade_id: str,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """A trade's attachments"""
+    attachment_service = AttachmentService(db)
+    try:
+        return attachment_service.get_trade_attachments(trade_id, current_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{attachment_id}")
+async def download_attachment(
+    attachment_id: int,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """An attachment's file; supports Range requests and caching by ETag (the file's SHA-256)"""
+    attachment_service = AttachmentService(db)
+    try:
+        attachment = attachment_service.get_attachment(attachment_id, current_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FileRangeResponse(
+        blob_store.path(attachment.sha256), attachment.sha256, attachment.content_type, attachment.filename
+    )
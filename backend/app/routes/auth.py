@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.user import UserCreate, UserResponse, UserLogin
-from app.services.auth_service import AuthService
+from app.core.rate_limit import rate_limit
+from app.schemas.user import (
+    EmailCodeRequest, UserCreate, UserResponse, UserLogin, WalletChallengeRequest, WalletChallengeResponse
+)
+from app.services.auth_service import AuthService, send_email_code
 from app.services.user_service import UserService
+from app.services.wallet_auth import wallet_auth, WALLET_SIGNATURE_REQUIRED
 
 router = APIRouter()
 
@@ -34,6 +38,22 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     user = user_service.create_user(user_data)
     return user
 
+@router.post("/challenge", response_model=WalletChallengeResponse, dependencies=[Depends(rate_limit("auth.challenge"))])
+async def wallet_challenge(challenge_request: WalletChallengeRequest):
+    """Issue a message for the wallet to sign and log in with"""
+    nonce, message, expires_at = wallet_auth.challenge(challenge_request.wallet_address)
+    return WalletChallengeResponse(nonce=nonce, message=message, expires_at=expires_at)
+
+@router.post("/email-code", status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(rate_limit("auth.email_code"))])
+async def email_code(code_request: EmailCodeRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Email a sign-in code to log in with; the response does not tell whether the email is registered"""
+    user = UserService(db).get_user_by_email(code_request.email)
+    if user:
+        # sent after the response, so its timing does not tell either
+        background_tasks.add_task(send_email_code, user.email, AuthService(db).create_email_code(user))
+    return {"message": "If the email is registered, a sign-in code has been sent to it"}
+
 @router.post("/login")
 async def login(login_data: UserLogin, db: Session = Depends(get_db)):
     """Login user with wallet or email"""
@@ -51,16 +71,27 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db)):
                 detail="Wallet not registered"
             )
         
-        # In production, verify the signature here
-        # For now, we'll skip signature verification
+        if WALLET_SIGNATURE_REQUIRED:
+            if not login_data.nonce or not login_data.signature:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Sign a challenge from /auth/challenge to log in with a wallet"
+                )
+            # checked in the verification process pool
+            if not await wallet_auth.verify_login(login_data.wallet_address, login_data.nonce,
+                                                  login_data.signature, login_data.public_key):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid or expired wallet signature"
+                )
         
     elif login_data.email:
-        # Email-based authentication
+        # Email-based authentication with a code from /auth/email-code
         user = user_service.get_user_by_email(login_data.email)
-        if not user:
+        if not user or not login_data.email_code or not auth_service.verify_email_code(login_data.email_code, user):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Email not registered"
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired email sign-in code"
             )
     
     if not user:
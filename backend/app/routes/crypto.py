@@ -1,24 +1,56 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from app.database import get_db
-from app.schemas.crypto import CryptoOption, CryptoConfigResponse
-from app.services.crypto_service import CryptoService
+from typing import List, Dict, Optional
+from decimal import Decimal
+from app.database import get_db, session_scope
+from app.schemas.crypto import CryptoOption, CryptoConfigResponse, QuoteRequest, QuoteResponse, QuoteItem, TradingFeeResponse
+from app.services.crypto_service import CryptoService, encode_quotes
 from app.services.auth_service import AuthService
+from app.core.rate_limit import rate_limit
+from app.core.single_flight import single_flight
 
 router = APIRouter()
 
-@router.get("/supported", response_model=List[CryptoOption])
-async def get_supported_cryptocurrencies(db:Session =  Depends(get_db)):
+def _supported_cryptocurrencies() -> List[CryptoOption]:
+    with session_scope() as db:
+        return CryptoService(db).get_supported_cryptocurrencies()
+
+def _trading_fee(symbol: str, amount: Decimal) -> Optional[Dict]:
+    with session_scope() as db:
+        crypto_service = CryptoService(db)
+        terms = crypto_service.get_quote_terms(symbol)
+        if not terms:
+            return None
+        
+        try:
+            fee = crypto_service.calculate_trading_fee(symbol, amount)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {
+            "symbol": symbol,
+            "amount": amount,
+            "fee": fee,
+            "fee_percentage": terms.fee_percentage,
+            "total_amount": amount + fee
+        }
+
+def _quote(items: List[QuoteItem]) -> List[Dict]:
+    with session_scope() as db:
+        return CryptoService(db).quote(items)
+
+@router.get("/supported", response_model=List[CryptoOption], dependencies=[Depends(rate_limit("crypto.supported"))])
+async def get_supported_cryptocurrencies():
     """get all supported cryptocurrencies for trading"""
-    crypto_service = CryptoService(db)
-    return crypto_service.get_supported_cryptocurrencies()
+    # concurrent identical requests share one query
+    return await single_flight.do("crypto.supported", _supported_cryptocurrencies)
 
 @router.get("/{symbol}/config", response_model=CryptoConfigResponse)
 async def get_crypto_config(symbol: str, db: Session = Depends(get_db)):
     """get configuration for a specific cryptocurrency"""
     crypto_service = CryptoService(db)
-    config = crypto_service.get_crypto_config(Symbol)
+    config = crypto_service.get_crypto_config(symbol)
     
     if not config:
         raise HTTPException(
@@ -28,7 +60,7 @@ async def get_crypto_config(symbol: str, db: Session = Depends(get_db)):
     return config
 
 @router.get("/{symbol}/netwrok-info")
-async def get_network_info(symbol" str, db: Session = Depends(get_db)):
+async def get_network_info(symbol: str, db: Session = Depends(get_db)):
     """get network information for a specific cryptocurrency"""
     crypto_service = CryptoService(db)
     network_info = crypto_service.get_network_info(symbol)
@@ -41,7 +73,7 @@ async def get_network_info(symbol" str, db: Session = Depends(get_db)):
     return network_info
     
 @router.post("/{symbol}/validate-amount")
-async def validate_trade_amount(symbol: str, amount: float, db: Session = Depends(get_db), current_user_id: int =  Depends(AuthService.get_current_user)):
+async def validate_trade_amount(symbol: str, amount: Decimal, db: Session = Depends(get_db), current_user_id: int =  Depends(AuthService.get_current_user)):
     """ valide trade amount if its within allowed limts"""
     crypto_service = CryptoService(db)
     is_valid = crypto_service.validate_trade_amount(symbol, amount)
@@ -64,26 +96,25 @@ async def validate_trade_amount(symbol: str, amount: float, db: Session = Depend
         "message": "Amount is valid"
     }
     
-@router.get("/{symbol}/fee")
-async def calculate_trading_fee(symbol: str, amount: float, db: Session = Depends(get_db)):
+@router.get("/{symbol}/fee", response_model=TradingFeeResponse, dependencies=[Depends(rate_limit("crypto.fee"))])
+async def calculate_trading_fee(symbol: str, amount: Decimal):
     """Calculate trading fee for a cryptocurrency trade"""
-    crypto_service = CryptoService(db)
-    fee = crypto_service.calculate_trading_fee(symbol, amount)
-    config = crypto_service.get_crypto_config(symbol)
+    fee = await single_flight.do(("crypto.fee", symbol.upper(), amount), _trading_fee, symbol, amount)
     
-    if not config:
+    if not fee:
         raise HTTPException(
             status_code=404,
             detail=f"Cryptocurrency {symbol} not found"
         )
     
-    return {
-        "symbol": symbol,
-        "amount": amount,
-        "fee": fee,
-        "fee_percentage": config.trade_percentage_fee,
-        "total_amount": amount + fee
-    }
+    return fee
+
+@router.post("/quote", response_model=QuoteResponse, dependencies=[Depends(rate_limit("crypto.quote"))])
+async def quote(quote_request: QuoteRequest):
+    """Quote fees, limits and totals for many (symbol, amount, fiat) items"""
+    quotes = await run_in_threadpool(_quote, quote_request.quotes)
+    # the results are built in QuoteResult's shape; returning a Response skips validating them again
+    return Response(encode_quotes(quotes), media_type="application/json")
 
 @router.post("/seed-defaults")
 async def seed_default_cryptocurrencies(
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.database import get_db
+from app.core.idempotency import idempotent
 from app.services.escrow_service import EscrowService
 from app.services.auth_service import AuthService
 
@@ -10,37 +12,38 @@ router = APIRouter()
 async def fund_escrow(
     trade_id: str,
     tx_hash: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     current_user_id: int = Depends(AuthService.get_current_user)
 ):
     """Fund escrow for a trade"""
-    escrow_service = EscrowService(db)
-    result = escrow_service.fund_escrow(trade_id, current_user_id, tx_hash)
-    return result
+    return await idempotent(request, current_user_id, idempotency_key,
+                            lambda db: EscrowService(db).fund_escrow(trade_id, current_user_id, tx_hash))
 
 @router.post("/{trade_id}/confirm-payment")
 async def confirm_payment(
     trade_id: str,
     payment_reference: str,
-    payment_proof: str = None,
-    db: Session = Depends(get_db),
+    request: Request,
+    payment_proof_id: Optional[int] = None,
+    idempotency_key: Optional[str] = Header(None),
     current_user_id: int = Depends(AuthService.get_current_user)
 ):
-    """Confirm fiat payment has been sent"""
-    escrow_service = EscrowService(db)
-    result = escrow_service.confirm_payment(trade_id, current_user_id, payment_reference, payment_proof)
-    return result
+    """Confirm fiat payment has been sent; upload the proof to /api/attachments first and pass its id"""
+    return await idempotent(request, current_user_id, idempotency_key,
+                            lambda db: EscrowService(db).confirm_payment(trade_id, current_user_id, payment_reference,
+                                                                         payment_proof_id))
 
 @router.post("/{trade_id}/release")
 async def release_escrow(
     trade_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     current_user_id: int = Depends(AuthService.get_current_user)
 ):
     """Release escrow funds to buyer"""
-    escrow_service = EscrowService(db)
-    result = escrow_service.release_escrow(trade_id, current_user_id)
-    return result
+    return await idempotent(request, current_user_id, idempotency_key,
+                            lambda db: EscrowService(db).release_escrow(trade_id, current_user_id))
 
 @router.get("/{trade_id}/status")
 async def get_escrow_status(
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from decimal import Decimal
+from app.database import get_db
+from app.schemas.offer import OfferCreate, OfferMatch, OfferResponse, OfferUpdate
+from app.services.offer_service import OfferService
+from app.services.offer_book import offer_book
+from app.services.auth_service import AuthService
+from app.models.trade import TradeType
+
+router = APIRouter()
+
+@router.post("/", response_model=OfferResponse)
+async def create_offer(
+    offer_data: OfferCreate,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Post a buy or sell offer"""
+    offer_service = OfferService(db)
+    try:
+        return offer_service.create_offer(current_user_id, offer_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", response_model=List[OfferResponse])
+async def get_my_offers(
+    include_closed: bool = False,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Get the current user's offers"""
+    offer_service = OfferService(db)
+    return offer_service.get_user_offers(current_user_id, include_closed)
+
+@router.get("/match", response_model=List[OfferMatch])
+def match_offers(
+    crypto: str,
+    fiat: str = "NGN",
+    side: TradeType = Query(..., description="what the caller wants to do: buy or sell crypto"),
+    amount: Optional[Decimal] = Query(None, ge=0),
+    payment_method: Optional[str] = None,
+    min_trust_score: float = Query(0, ge=0, le=100),
+    limit: int = Query(10, ge=1, le=50),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Best counterparty offers, by price then time, from the in-memory book"""
+    # a plain def: matching runs in the threadpool, not on the event loop
+    return offer_book.match(crypto, fiat, side, amount, payment_method, min_trust_score,
+                            exclude_user_id=current_user_id, limit=limit)
+
+@router.get("/depth")
+async def get_depth(crypto: str, fiat: str = "NGN"):
+    """Number of live offers on each side of a pair"""
+    return offer_book.depth(crypto, fiat)
+
+@router.patch("/{offer_id}", response_model=OfferResponse)
+async def update_offer(
+    offer_id: int,
+    offer_update: OfferUpdate,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Reprice, resize, pause or resume an offer"""
+    offer_service = OfferService(db)
+    try:
+        return offer_service.update_offer(offer_id, current_user_id, offer_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{offer_id}", response_model=OfferResponse)
+async def close_offer(
+    offer_id: int,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Close an offer"""
+    offer_service = OfferService(db)
+    try:
+        return offer_service.close_offer(offer_id, current_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
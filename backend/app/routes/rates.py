@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from app.schemas.rate import ConversionResponse, RateResponse
+from app.services.rate_service import rate_cache
+
+router = APIRouter()
+
+@router.get("/", response_model=List[RateResponse])
+async def get_rates(crypto: Optional[str] = None, fiat: Optional[str] = None):
+    """Current market rates, optionally for one crypto or fiat"""
+    return [
+        RateResponse(
+            crypto=rate.crypto,
+            fiat=rate.fiat,
+            rate=rate.value,
+            source=rate.source,
+            updated_at=datetime.utcfromtimestamp(rate.fetched_at),
+            age_seconds=round(rate.age, 3)
+        )
+        for rate in rate_cache.all()
+        if (not crypto or rate.crypto == crypto.upper()) and (not fiat or rate.fiat == fiat.upper())
+    ]
+
+@router.get("/convert", response_model=ConversionResponse)
+async def convert(crypto: str, amount: Decimal = Query(..., ge=0), fiat: str = "NGN"):
+    """Fiat value of a crypto amount at the current market rate"""
+    rate = rate_cache.get(crypto, fiat)
+    if rate is None:
+        raise HTTPException(status_code=404, detail=f"No current exchange rate for {crypto.upper()}/{fiat.upper()}")
+    return {
+        "crypto": rate.crypto,
+        "fiat": rate.fiat,
+        "amount": amount,
+        "rate": rate.value,
+        "fiat_amount": rate_cache.convert(amount, crypto, fiat)
+    }
@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
-from app.schemas.rating import RatingCreate, RatingResponse
+from app.core.streaming import json_list_response
+from app.schemas.rating import RatingCreate, RatingResponse, RatingSummaryResponse
 from app.schemas.report import ReportCreate, ReportResponse
 from app.services.rating_service import RatingService
 from app.services.auth_service import AuthService
@@ -30,7 +31,16 @@ async def get_user_ratings(
     """Get ratings for a specific user"""
     rating_service = RatingService(db)
     ratings = rating_service.get_user_ratings(user_id, limit, offset)
-    return ratings
+    return json_list_response(ratings, RatingResponse)
+
+@router.get("/user/{user_id}/summary", response_model=RatingSummaryResponse)
+async def get_user_rating_summary(
+    user_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get a user's rating count, average and star histogram per dimension"""
+    rating_service = RatingService(db)
+    return rating_service.get_rating_summary(user_id)
 
 @router.post("/report", response_model=ReportResponse)
 async def create_report(
@@ -43,12 +53,14 @@ async def create_report(
     report = rating_service.create_report(current_user_id, report_data)
     return report
 
-@router.get("/reports/my")
+@router.get("/reports/my", response_model=List[ReportResponse])
 async def get_my_reports(
+    limit: int = Query(20, le=100),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     current_user_id: int = Depends(AuthService.get_current_user)
 ):
     """Get reports made by current user"""
     rating_service = RatingService(db)
-    reports = rating_service.get_user_reports(current_user_id)
+    reports = rating_service.get_user_reports(current_user_id, limit, offset)
     return reports
@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, session_scope
 from app.schemas.user import UserSearchResponse
 from app.services.user_service import UserService
 from app.services.auth_service import AuthService
+from app.core.rate_limit import rate_limit
+from app.core.single_flight import single_flight
 
 router = APIRouter()
 
+def _top_traders(limit: int) -> List[UserSearchResponse]:
+    with session_scope() as db:
+        return [UserSearchResponse.from_orm(user) for user in UserService(db).get_top_traders(limit)]
+
 @router.get("/search", response_model=List[UserSearchResponse])
 async def search_traders(
     query: str = Query(..., min_length=1),
@@ -29,10 +35,8 @@ async def verify_trader(
     """Verify a trader by username, telegram handle, or wallet address"""
     user_service = UserService(db)
     
-    # Try to find user by different identifiers
-    user = (user_service.get_user_by_username(identifier) or 
-            user_service.get_user_by_telegram(identifier) or
-            user_service.get_user_by_wallet(identifier))
+    # Try the identifier as a username, telegram handle and wallet address in one lookup
+    user = user_service.find_trader(identifier)
     
     if not user:
         raise HTTPException(
@@ -55,12 +59,10 @@ async def verify_trader(
         }
     }
 
-@router.get("/top", response_model=List[UserSearchResponse])
+@router.get("/top", response_model=List[UserSearchResponse], dependencies=[Depends(rate_limit("traders.top"))])
 async def get_top_traders(
-    limit: int = Query(10, le=50),
-    db: Session = Depends(get_db)
+    limit: int = Query(10, le=50)
 ):
     """Get top traders by trust score"""
-    user_service = UserService(db)
-    traders = user_service.get_top_traders(limit)
-    return traders
+    # concurrent identical requests share one query
+    return await single_flight.do(("traders.top", limit), _top_traders, limit)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
+from app.core.streaming import json_array_response, json_list_response
 from app.schemas.trade import TradeCreate, TradeResponse, TradeUpdate
 from app.services.trade_service import TradeService
 from app.services.auth_service import AuthService
@@ -17,7 +18,10 @@ async def create_trade(
 ):
     """Create a new trade"""
     trade_service = TradeService(db)
-    trade = trade_service.create_trade(current_user_id, trade_data)
+    try:
+        trade = trade_service.create_trade(current_user_id, trade_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return trade
 
 @router.get("/", response_model=List[TradeResponse])
@@ -31,7 +35,17 @@ async def get_user_trades(
     """Get user's trades"""
     trade_service = TradeService(db)
     trades = trade_service.get_user_trades(current_user_id, status, limit, offset)
-    return trades
+    return json_list_response(trades, TradeResponse)
+
+@router.get("/export", response_model=List[TradeResponse])
+async def export_user_trades(
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(AuthService.get_current_user)
+):
+    """Stream all of the user's trades, archived ones included, newest first"""
+    trade_service = TradeService(db)
+    # read batch by batch while the response streams; the session closes once it is sent
+    return json_array_response(trade_service.iter_user_trades(current_user_id), TradeResponse)
 
 @router.get("/{trade_id}", response_model=TradeResponse)
 async def get_trade(
@@ -59,9 +73,12 @@ async def update_trade(
     db: Session = Depends(get_db),
     current_user_id: int = Depends(AuthService.get_current_user)
 ):
-    """Update trade status or details"""
+    """Update trade details"""
     trade_service = TradeService(db)
-    trade = trade_service.update_trade(trade_id, current_user_id, trade_update)
+    try:
+        trade = trade_service.update_trade(trade_id, current_user_id, trade_update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return trade
 
 @router.post("/{trade_id}/cancel")
@@ -73,7 +90,10 @@ async def cancel_trade(
 ):
     """Cancel a trade"""
     trade_service = TradeService(db)
-    result = trade_service.cancel_trade(trade_id, current_user_id, reason)
+    try:
+        result = trade_service.cancel_trade(trade_id, current_user_id, reason)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return result
 
 @router.post("/{trade_id}/dispute")
@@ -86,5 +106,8 @@ async def dispute_trade(
 ):
     """Dispute a trade"""
     trade_service = TradeService(db)
-    result = trade_service.dispute_trade(trade_id, current_user_id, reason, evidence)
+    try:
+        result = trade_service.dispute_trade(trade_id, current_user_id, reason, evidence)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return result
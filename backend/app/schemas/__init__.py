@@ -2,12 +2,13 @@ from .user import UserCreate, UserResponse, UserLogin, UserUpdate
 from .trade import TradeCreate, TradeResponse, TradeUpdate
 from .rating import RatingCreate, RatingResponse
 from .report import ReportCreate, ReportResponse
-from .crypto import CryptoConfigCreate, CryptoConfigResponse, CryptoOption
+from .crypto import CryptoConfigCreate, CryptoConfigResponse, CryptoOption, QuoteRequest, QuoteResponse
 
 __all__ = [
     "UserCreate", "UserResponse", "UserLogin", "UserUpdate",
     "TradeCreate", "TradeResponse", "TradeUpdate",
     "RatingCreate", "RatingResponse",
     "ReportCreate", "ReportResponse",
-    "CryptoConfigCreate", "CryptoConfigResponse", "CryptoOption"
+    "CryptoConfigCreate", "CryptoConfigResponse", "CryptoOption",
+    "QuoteRequest", "QuoteResponse"
 ]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class AttachmentResponse(BaseModel):
+    id: int
+    trade_id: int
+    uploaded_by: int
+    sha256: str
+    size: int
+    content_type: str
+    filename: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
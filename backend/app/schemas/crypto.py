@@ -1,6 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from decimal import Decimal
 from datetime import datetime
+from app.core.amounts import Amount
 
 class CryptoConfigBase(BaseModel):
     symbol: str
@@ -8,9 +10,9 @@ class CryptoConfigBase(BaseModel):
     network: str
     contract_address: Optional[str] = None
     decimals: int = 18
-    minimum_amount_trade: float = 0.0
-    maximum_amount_trade: float = 1000000.0
-    trade_percentage_fee: float = 0.1
+    minimum_amount_trade: Amount = Decimal("0")
+    maximum_amount_trade: Amount = Decimal("1000000")
+    trade_percentage_fee: Decimal = Decimal("0.1")
     icon_url: Optional[str] = None
     color: Optional[str] = None
     is_active: bool = True
@@ -32,7 +34,35 @@ class CryptoOption(BaseModel):
     name: str
     icon_url: Optional[str] = None
     network: str
-    min_amount: float
-    max_amount: float
+    min_amount: Amount
+    max_amount: Amount
     decimals: int
     is_active: bool
+
+class TradingFeeResponse(BaseModel):
+    symbol: str
+    amount: Amount
+    fee: Amount
+    fee_percentage: Decimal
+    total_amount: Amount
+
+class QuoteItem(BaseModel):
+    symbol: str
+    amount: Amount
+    fiat: str = "NGN"
+
+class QuoteRequest(BaseModel):
+    quotes: List[QuoteItem] = Field(..., min_length=1, max_length=10000)
+
+class QuoteResult(BaseModel):
+    symbol: str
+    fiat: str
+    amount: Amount
+    fee: Optional[Amount] = None
+    fee_percentage: Optional[Decimal] = None
+    total_amount: Optional[Amount] = None
+    valid: bool
+    message: Optional[str] = None
+
+class QuoteResponse(BaseModel):
+    quotes: List[QuoteResult]
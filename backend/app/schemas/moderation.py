@@ -0,0 +1,40 @@
+from pydantic import BaseModel
+from typing import Optional
+from decimal import Decimal
+from datetime import datetime
+
+class CaseResolve(BaseModel):
+    resolution: str
+    dismiss: bool = False
+
+class CaseResponse(BaseModel):
+    id: int
+    kind: str
+    report_id: Optional[int] = None
+    trade_id: Optional[int] = None
+    reported_user_id: int
+    opened_by: int
+    reason: Optional[str] = None
+    status: str
+    priority: int
+    amount: Decimal
+    reporter_trust: float
+    claimed_by: Optional[int] = None
+    lease_until: Optional[datetime] = None
+    resolution: Optional[str] = None
+    resolved_by: Optional[int] = None
+    created_at: datetime
+    resolved_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ModerationCountsResponse(BaseModel):
+    user_id: int
+    open_reports: int = 0
+    total_reports: int = 0
+    open_disputes: int = 0
+    total_disputes: int = 0
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from decimal import Decimal
+from datetime import datetime
+from app.models.trade import TradeType
+from app.core.amounts import Amount, FiatAmount
+
+class OfferBase(BaseModel):
+    side: TradeType
+    crypto_currency: str
+    fiat_currency: str = "NGN"
+    price: FiatAmount
+    min_amount: Amount
+    max_amount: Amount
+    payment_methods: List[str] = Field(..., min_length=1)
+    terms: Optional[str] = None
+
+class OfferCreate(OfferBase):
+    pass
+
+class OfferUpdate(BaseModel):
+    price: Optional[FiatAmount] = None
+    min_amount: Optional[Amount] = None
+    max_amount: Optional[Amount] = None
+    payment_methods: Optional[List[str]] = Field(None, min_length=1)
+    terms: Optional[str] = None
+    status: Optional[str] = Field(None, pattern="^(active|paused)$")
+
+class OfferResponse(OfferBase):
+    id: int
+    user_id: int
+    status: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class OfferMatch(BaseModel):
+    offer_id: int
+    user_id: int
+    side: TradeType
+    price: Decimal
+    min_amount: Decimal
+    max_amount: Decimal
+    payment_methods: List[str]
+    trust_score: float
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from decimal import Decimal
+from datetime import datetime
+from app.core.amounts import Amount, FiatAmount
+
+class RateResponse(BaseModel):
+    crypto: str
+    fiat: str
+    rate: Decimal
+    source: str
+    updated_at: datetime
+    age_seconds: float
+
+class ConversionResponse(BaseModel):
+    crypto: str
+    fiat: str
+    amount: Amount
+    rate: Decimal
+    fiat_amount: FiatAmount
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
 class RatingBase(BaseModel):
@@ -22,3 +22,15 @@ class RatingResponse(RatingBase):
 
     class Config:
         from_attributes = True
+
+class DimensionSummary(BaseModel):
+    count: int
+    average: Optional[float] = None
+    histogram: Dict[int, int]  # stars -> ratings
+
+class RatingSummaryResponse(BaseModel):
+    user_id: int
+    overall: DimensionSummary
+    communication: DimensionSummary
+    reliability: DimensionSummary
+    speed: DimensionSummary
@@ -1,13 +1,15 @@
 from pydantic import BaseModel
 from typing import Optional
+from decimal import Decimal
 from datetime import datetime
 from app.models.trade import TradeStatus, TradeType, CryptoCurrency
+from app.core.amounts import Amount, FiatAmount
 
 class TradeBase(BaseModel):
-    crypto_amount: float
-    fiat_amount: float
-    exchange_brate: float
-    crypto_currency: str = CryptoCurrency
+    crypto_amount: Amount
+    fiat_amount: FiatAmount
+    exchange_rate: Decimal
+    crypto_currency: CryptoCurrency
     fiat_currency: str = "NGN"
     trade_type: TradeType
     payment_method: str
@@ -17,11 +19,11 @@ class TradeCreate(TradeBase):
     buyer_id: Optional[int] = None   # For sell orders
 
 class TradeUpdate(BaseModel):
-    status: Optional[TradeStatus] = None
+    # status and transaction hashes only change through the escrow endpoints
     payment_reference: Optional[str] = None
-    payment_proof: Optional[str] = None
-    escrow_tx_hash: Optional[str] = None
-    release_tx_hash: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
 
 class TradeResponse(TradeBase):
     id: int
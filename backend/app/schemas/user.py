@@ -1,7 +1,19 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, AfterValidator
 from typing import Optional
+from typing_extensions import Annotated
 from datetime import datetime
 
+def _validate_email(value: str) -> str:
+    # email-validator pulls in dnspython, so only import it once an email is validated
+    from email_validator import validate_email, EmailNotValidError
+
+    try:
+        return validate_email(value, check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError(f"value is not a valid email address: {e}")
+
+EmailStr = Annotated[str, AfterValidator(_validate_email)]
+
 class UserBase(BaseModel):
     email: Optional[EmailStr] = None
     wallet_address: Optional[str] = None
@@ -16,7 +28,21 @@ class UserCreate(UserBase):
 class UserLogin(BaseModel):
     wallet_address: Optional[str] = None
     email: Optional[EmailStr] = None
-    signature: Optional[str] = None  # For wallet authentication
+    nonce: Optional[str] = None  # from /auth/challenge, for wallet authentication
+    email_code: Optional[str] = None  # from the email sent by /auth/email-code, for email authentication
+    signature: Optional[str] = None  # of the challenge message, hex
+    public_key: Optional[str] = None  # DER hex, for ICP principals
+
+class EmailCodeRequest(BaseModel):
+    email: EmailStr
+
+class WalletChallengeRequest(BaseModel):
+    wallet_address: str
+
+class WalletChallengeResponse(BaseModel):
+    nonce: str
+    message: str
+    expires_at: datetime
 
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
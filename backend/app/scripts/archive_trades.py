@@ -0,0 +1,20 @@
+"""
+Script to move completed and cancelled trades older than TRADE_ARCHIVE_AFTER_DAYS
+out of the hot trades table into trades_archive. Safe to rerun, e.g. nightly.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+
+from app.services.trade_archive_job import TradeArchiveJob, TRADE_ARCHIVE_AFTER_DAYS, TRADE_ARCHIVE_BATCH_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=TRADE_ARCHIVE_BATCH_SIZE, help="trades moved per transaction")
+    args = parser.parse_args()
+
+    stats = TradeArchiveJob(args.batch_size).execute()
+    print(f"Archived {stats['archived']:,} trades finished over {TRADE_ARCHIVE_AFTER_DAYS} days ago "
+          f"in {stats['seconds']:.1f} s")
@@ -0,0 +1,47 @@
+"""
+Script to write the user_lookup_keys rows (normalized username, telegram handle
+and wallet address) of every existing user. Run it once after upgrading, before
+serving: wallet logins and trader lookups read these keys. Safe to rerun.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import time
+
+from app.database import init_db, scatter, session_scope
+from app.models.user import User
+from app.services.user_lookup import replace_keys, user_keys
+
+def backfill(chunk_size: int) -> int:
+    def index_users(users_db) -> int:
+        after = 0
+        indexed = 0
+        while True:
+            rows = users_db.query(User.id, User.username, User.telegram_handle, User.wallet_address).filter(
+                User.id > after
+            ).order_by(User.id).limit(chunk_size).all()
+            # release the read snapshot: keys are written through another session
+            users_db.rollback()
+            if not rows:
+                return indexed
+            after = rows[-1].id
+            with session_scope() as db:
+                replace_keys(db, {
+                    row.id: user_keys(row.username, row.telegram_handle, row.wallet_address) for row in rows
+                })
+                db.commit()
+            indexed += len(rows)
+
+    with session_scope() as db:
+        return sum(scatter(db, index_users))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=5_000, help="users indexed per transaction")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    print(f"Indexed {backfill(args.chunk_size):,} users in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,68 @@
+"""
+Script to benchmark fixed-point fee math against the old float-and-round approach
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import math
+import random
+import time
+from decimal import Decimal, ROUND_CEILING
+
+from app.core.amounts import to_units, from_units, fee_ratio, fee_units
+
+def float_fees(amounts, fee_percentage: float, decimals: int):
+    """Previous behaviour: float fee, rounded up to the smallest unit afterwards"""
+    scale = 10 ** decimals
+    return [math.ceil(amount * (fee_percentage / 100) * scale) / scale for amount in amounts]
+
+def unit_fees(units, numerator: int, denominator: int):
+    return [fee_units(u, numerator, denominator) for u in units]
+
+def run(count: int, decimals: int, fee_percentage: str, seed: int = 11):
+    rng = random.Random(seed)
+    units = [rng.randrange(1, 10 ** (decimals + 5)) for _ in range(count)]
+    decimal_amounts = [from_units(u, decimals) for u in units]
+    float_amounts = [float(a) for a in decimal_amounts]
+    numerator, denominator = fee_ratio(fee_percentage)
+
+    started = time.perf_counter()
+    by_float = float_fees(float_amounts, float(fee_percentage), decimals)
+    float_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    by_units = unit_fees(units, numerator, denominator)
+    unit_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for a in decimal_amounts:
+        to_units(a, decimals)
+    convert_elapsed = time.perf_counter() - started
+
+    # exact reference: Decimal fee rounded up to the smallest unit
+    quantum = Decimal(1).scaleb(-decimals)
+    rate = Decimal(fee_percentage) / 100
+    mismatched_float = sum(
+        to_units(Decimal(repr(f)).quantize(quantum), decimals)
+        != to_units((a * rate).quantize(quantum, rounding=ROUND_CEILING), decimals)
+        for f, a in zip(by_float, decimal_amounts)
+    )
+    mismatched_units = sum(
+        u != to_units((a * rate).quantize(quantum, rounding=ROUND_CEILING), decimals)
+        for u, a in zip(by_units, decimal_amounts)
+    )
+
+    print(f"{count:,} fees at {fee_percentage}% with {decimals} decimals")
+    print(f"  float + round:      {float_elapsed * 1000:8.1f} ms, {mismatched_float:,} off the exact fee")
+    print(f"  integer units:      {unit_elapsed * 1000:8.1f} ms, {mismatched_units:,} off the exact fee")
+    print(f"  Decimal -> units:   {convert_elapsed * 1000:8.1f} ms (API boundary conversion)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--fee", default="0.12", help="fee percentage")
+    args = parser.parse_args()
+    for decimals in (6, 8, 18):
+        run(args.count, decimals, args.fee)
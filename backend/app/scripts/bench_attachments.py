@@ -0,0 +1,175 @@
+"""
+Script to measure trade attachment uploads and downloads: concurrent 10 MB
+uploads streamed into the blob store against the same uploads buffered whole
+in memory first, the Python memory each needs at its peak, re-uploads of
+stored files (deduplicated), and full and ranged downloads.
+
+Drives the ASGI app directly, feeding request bodies in 64 KiB pieces as a
+server does, into a blob store in a temporary directory.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import Depends, FastAPI, Request
+from app.core.blob_store import blob_store
+from app.database import get_db, init_db, session_scope
+from app.main import include_routers
+from app.models.trade import Trade, TradeStatus
+from app.models.user import User
+from app.services.attachment_service import AttachmentService
+from app.services.auth_service import AuthService
+
+PIECE = 64 * 1024
+
+def seed() -> tuple:
+    run = int(time.time())
+    with session_scope() as db:
+        buyer = User(username=f"attach-buyer-{run}", email=f"attach-buyer-{run}@example.com", trust_score=50.0)
+        seller = User(username=f"attach-seller-{run}", email=f"attach-seller-{run}@example.com", trust_score=50.0)
+        db.add_all([buyer, seller])
+        db.flush()
+        trade = Trade(trade_id=f"TA{run}", buyer_id=buyer.id, seller_id=seller.id, crypto_amount="100",
+                      fiat_amount="150000", exchange_rate="1500", crypto_currency="USDT", fiat_currency="NGN",
+                      trade_type="buy", payment_method="bank_transfer", status=TradeStatus.ESCROW_FUNDED)
+        db.add(trade)
+        db.commit()
+        return buyer.id, trade.trade_id
+
+def bench_app(user_id: int) -> FastAPI:
+    app = FastAPI()
+    include_routers(app, ["attachments"])
+    app.dependency_overrides[AuthService.get_current_user] = lambda: user_id
+
+    # what reading the whole body first looks like, into the same store
+    @app.post("/buffered/{trade_id}")
+    async def buffered(trade_id: str, request: Request, db=Depends(get_db)):
+        body = await request.body()
+
+        async def whole():
+            yield body
+
+        sha256, size = await blob_store.write(whole())
+        return {"id": AttachmentService(db).attach(trade_id, user_id, sha256, size, "image/png").id}
+
+    return app
+
+async def call(app, method: str, path: str, body: bytes = b"", headers=()) -> tuple:
+    """(status, response body)"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-length", str(len(body)).encode()), *headers],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    # views, not copies: only what the app allocates counts
+    view = memoryview(body)
+    pieces = [view[i:i + PIECE] for i in range(0, len(body), PIECE)] or [b""]
+    position = 0
+    status = None
+    response = []
+
+    async def receive():
+        nonlocal position
+        if position < len(pieces):
+            position += 1
+            # let the other uploads' pieces arrive in between
+            await asyncio.sleep(0)
+            return {"type": "http.request", "body": pieces[position - 1], "more_body": position < len(pieces)}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            response.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(response)
+
+async def uploads(app, path: str, files, concurrency: int) -> float:
+    """Seconds to upload files, concurrency at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(data):
+        async with semaphore:
+            status, body = await call(app, "POST", path, data)
+            assert status == 200, (status, body)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(data) for data in files))
+    return time.perf_counter() - started
+
+async def peak_memory(app, path: str, files, concurrency: int) -> int:
+    """Peak bytes Python allocated for a round of uploads, beyond what the files themselves take"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await uploads(app, path, files, concurrency)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return peak
+
+async def measure(app, trade_id: str, files, concurrency: int, downloads: int):
+    size = sum(len(data) for data in files)
+    streamed_path, buffered_path = f"/api/attachments/trades/{trade_id}", f"/buffered/{trade_id}"
+
+    for label, path in (("streamed", streamed_path), ("buffered", buffered_path)):
+        fresh = [os.urandom(len(data)) for data in files]
+        seconds = await uploads(app, path, fresh, concurrency)
+        peak = await peak_memory(app, path, [os.urandom(len(data)) for data in files[:concurrency]], concurrency)
+        print(f"  {label:<9} {len(files)} uploads in {seconds:5.2f} s, {size / seconds / 2**20:7.1f} MiB/s, "
+              f"peak memory at {concurrency} concurrent {peak / 2**20:6.1f} MiB")
+
+    await uploads(app, streamed_path, files, concurrency)
+    seconds = await uploads(app, streamed_path, files, concurrency)
+    print(f"  re-upload {len(files)} uploads in {seconds:5.2f} s, {size / seconds / 2**20:7.1f} MiB/s (stored once)")
+
+    status, body = await call(app, "GET", f"/api/attachments/trades/{trade_id}")
+    attachment_ids = [attachment["id"] for attachment in json.loads(body)]
+    rng = random.Random(1)
+    started = time.perf_counter()
+    sent = 0
+    for i in range(downloads):
+        status, body = await call(app, "GET", f"/api/attachments/{rng.choice(attachment_ids)}")
+        assert status == 200
+        sent += len(body)
+    seconds = time.perf_counter() - started
+    print(f"  download  {downloads} whole files, {sent / seconds / 2**20:7.1f} MiB/s")
+    ranges = downloads * 10
+    started = time.perf_counter()
+    for i in range(ranges):
+        offset = rng.randrange(len(files[0]) - PIECE)
+        status, body = await call(app, "GET", f"/api/attachments/{rng.choice(attachment_ids)}",
+                                  headers=[(b"range", f"bytes={offset}-{offset + PIECE - 1}".encode())])
+        assert status == 206 and len(body) == PIECE
+    print(f"  download  {ranges} 64 KiB ranges, {(time.perf_counter() - started) / ranges * 1e3:.2f} ms each")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10 * 2**20, help="bytes per upload")
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--downloads", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    user_id, trade_id = seed()
+    blob_store.root = tempfile.mkdtemp(prefix="trustpeer-blobs-")
+    blob_store.max_bytes = max(blob_store.max_bytes, args.size)
+    files = [os.urandom(args.size) for _ in range(args.uploads)]
+    print(f"{args.uploads} uploads of {args.size / 2**20:.0f} MiB, {args.concurrency} at a time")
+    try:
+        asyncio.run(measure(bench_app(user_id), trade_id, files, args.concurrency, args.downloads))
+    finally:
+        shutil.rmtree(blob_store.root)
@@ -0,0 +1,57 @@
+"""
+Script to benchmark the canister mirror against the synthetic stand-in: full sync, then incremental catch-up
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.core.metrics import registry
+from app.database import init_db
+from app.services.canister_sync import CanisterSyncWorker, PROFILES, TRADES
+from app.services.chain_client import SyntheticCanisterClient, TradeState
+
+async def run(trades: int, profiles: int, changes: int, batch_size: int):
+    client = SyntheticCanisterClient(trades=trades, profiles=profiles)
+    worker = CanisterSyncWorker(client_factory=lambda: client, batch_size=batch_size)
+
+    started = time.perf_counter()
+    applied = await worker.sync(PROFILES)
+    print(f"profiles: {applied:,} in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    applied = await worker.sync(TRADES)
+    elapsed = time.perf_counter() - started
+    print(f"trades:   {applied:,} in {elapsed:.1f} s ({applied / elapsed:,.0f}/s, {client.calls} canister calls)")
+
+    # later activity: a few thousand trades change state on chain
+    rng = random.Random(3)
+    for trade_id in rng.sample(range(1, trades + 1), changes):
+        client.touch(trade_id, TradeState.COMPLETED)
+    calls = client.calls
+    started = time.perf_counter()
+    applied = await worker.sync(TRADES)
+    print(f"incremental: {applied:,} changed trades in {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"({client.calls - calls} canister calls)")
+
+    # nothing new: one cheap call
+    started = time.perf_counter()
+    await worker.sync(TRADES)
+    print(f"idle poll: {(time.perf_counter() - started) * 1000:.1f} ms")
+    print()
+    print(registry.render(), end="")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--profiles", type=int, default=10_000)
+    parser.add_argument("--changes", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    init_db()
+    asyncio.run(run(args.trades, args.profiles, args.changes, args.batch_size))
@@ -0,0 +1,153 @@
+"""
+Script to measure a user's 1,000-trade history on the wire: bytes sent, time
+to the first body byte and time to the last, for FastAPI's response_model
+encoding, the single-pass JSON list response and the streamed export, each
+uncompressed, gzipped and brotli-compressed.
+
+Drives the ASGI app directly, so the times are the app's own (serialization,
+compression and queries) without a network in the way; HTTP/2 is the
+server's business and is not part of the measurement.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import insert
+from app.core.compression import CompressionMiddleware, brotli
+from app.core.streaming import json_list_response
+from app.database import get_db, init_db, session_scope
+from app.main import include_routers
+from app.models.trade import Trade, TradeStatus, TradeType, CryptoCurrency
+from app.models.user import User
+from app.schemas.trade import TradeResponse
+from app.services.auth_service import AuthService
+from app.services.trade_service import TradeService
+
+def seed(trades: int):
+    """A user with a history of trades against a handful of counterparties"""
+    rng = random.Random(7)
+    run = int(time.time())
+    now = datetime.utcnow()
+    with session_scope() as db:
+        db.execute(insert(User.__table__), [
+            {"username": f"compress-{run}-{i}", "email": f"compress-{run}-{i}@example.com", "trust_score": 50.0}
+            for i in range(10)
+        ])
+        first_id = db.query(User.id).filter(User.username == f"compress-{run}-0").scalar()
+        rows = []
+        for i in range(trades):
+            created = now - timedelta(seconds=rng.randrange(365 * 86400))
+            counterparty = first_id + rng.randrange(1, 10)
+            buyer, seller = (first_id, counterparty) if rng.random() < 0.5 else (counterparty, first_id)
+            rows.append({
+                "trade_id": f"CP{run % 100000:05d}{i:08d}", "buyer_id": buyer, "seller_id": seller,
+                "crypto_amount": rng.randrange(10, 5000), "fiat_amount": rng.randrange(15_000, 7_500_000),
+                "exchange_rate": 1500, "crypto_currency": rng.choice(list(CryptoCurrency)), "fiat_currency": "NGN",
+                "trade_type": rng.choice(list(TradeType)), "payment_method": "bank_transfer",
+                "status": TradeStatus.COMPLETED, "is_disputed": False,
+                "created_at": created, "updated_at": created, "completed_at": created + timedelta(hours=1),
+            })
+        db.execute(insert(Trade.__table__), rows)
+        db.commit()
+    return first_id
+
+def bench_app(user_id: int, trades: int) -> FastAPI:
+    app = FastAPI()
+    include_routers(app, ["trades"])
+    app.dependency_overrides[AuthService.get_current_user] = lambda: user_id
+
+    # the whole history through FastAPI's response_model encoding and through the single-pass response
+    @app.get("/default", response_model=List[TradeResponse])
+    async def default(db=Depends(get_db)):
+        return TradeService(db).get_user_trades(user_id, limit=trades)
+
+    @app.get("/single-pass")
+    async def single_pass(db=Depends(get_db)):
+        return json_list_response(TradeService(db).get_user_trades(user_id, limit=trades), TradeResponse)
+
+    return CompressionMiddleware(app)
+
+async def call(app, path: str, accept_encoding: str):
+    """(bytes sent, seconds to first body byte, seconds to last)"""
+    headers = [(b"host", b"bench")]
+    if accept_encoding:
+        headers.append((b"accept-encoding", accept_encoding.encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": headers, "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    sent = 0
+    first_byte = None
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        # the request once, then a disconnect when the response is done (streamed responses listen for it)
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal sent, first_byte
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, (path, message["status"])
+        elif message.get("body"):
+            sent += len(message["body"])
+            if first_byte is None:
+                first_byte = time.perf_counter()
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return sent, first_byte - started, time.perf_counter() - started
+
+async def measure(app, runs: int):
+    endpoints = {"response_model": "/default", "single pass": "/single-pass", "streamed": "/api/trades/export"}
+    encodings = {"identity": "", "gzip": "gzip"}
+    if brotli is not None:
+        encodings["br"] = "br"
+    cases = {
+        (endpoint, encoding): (path, accept)
+        for endpoint, path in endpoints.items() for encoding, accept in encodings.items()
+    }
+    samples = {case: [] for case in cases}
+    for run in range(runs + 1):
+        # cases take turns so drift in the machine hits them all alike; the first run warms up
+        for case, (path, accept) in cases.items():
+            sample = await call(app, path, accept)
+            if run:
+                samples[case].append(sample)
+    return {
+        case: (taken[0][0], statistics.median(run[1] for run in taken), statistics.median(run[2] for run in taken))
+        for case, taken in samples.items()
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=1_000)
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    init_db()
+    user_id = seed(args.trades)
+    results = asyncio.run(measure(bench_app(user_id, args.trades), args.runs))
+
+    baseline = results["response_model", "identity"]
+    print(f"{'endpoint':<15} {'encoding':<9} {'bytes':>9} {'of plain':>9} {'first byte':>11} {'last byte':>10}")
+    for (endpoint, encoding), (sent, first_byte, last_byte) in results.items():
+        print(f"{endpoint:<15} {encoding:<9} {sent:>9,} {sent / baseline[0] * 100:>8.1f}% "
+              f"{first_byte * 1e3:>8.1f} ms {last_byte * 1e3:>7.1f} ms")
@@ -0,0 +1,115 @@
+"""
+Script to benchmark escrow funding with inline chain verification against the batched pipeline
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from app.core.amounts import to_units
+from app.database import init_db, session_scope
+from app.models.trade import Trade, TradeStatus
+from app.models.user import User
+from app.services.chain_client import Deposit, LocalCanisterClient, deposit_memo, set_chain_client
+from app.services.crypto_service import CryptoService
+from app.services.escrow_service import EscrowService
+from app.services.escrow_verification import escrow_pipeline
+
+def create_trades(client: LocalCanisterClient, count: int, amount: str = "100"):
+    """Seller/buyer pair with count INITIATED USDT trades, each with a deposit on the local ledger"""
+    run = uuid.uuid4().hex[:8]
+    with session_scope() as db:
+        CryptoService(db).seed_default_cryptocurrencies()
+        decimals = CryptoService(db).get_quote_terms("USDT").decimals
+        seller = User(email=f"seller-{run}@bench.local", wallet_address=f"seller-{run}", username=f"seller-{run}")
+        buyer = User(email=f"buyer-{run}@bench.local", wallet_address=f"buyer-{run}", username=f"buyer-{run}")
+        db.add_all([seller, buyer])
+        db.flush()
+        trades = []
+        for i in range(count):
+            trade_id = f"BENCH-{run}-{i}"
+            tx_hash = uuid.uuid4().hex
+            db.add(Trade(
+                trade_id=trade_id, buyer_id=buyer.id, seller_id=seller.id,
+                crypto_amount=amount, fiat_amount="150000", exchange_rate="1500",
+                crypto_currency="USDT", fiat_currency="NGN", trade_type="buy",
+                payment_method="bank_transfer", status=TradeStatus.INITIATED,
+            ))
+            client.record_transfer(tx_hash, seller.wallet_address, client.escrow_account, to_units(amount, decimals),
+                                   memo=deposit_memo(trade_id))
+            trades.append((trade_id, tx_hash))
+        db.commit()
+        return seller.id, trades, decimals
+
+def inline(count: int, latency: float):
+    """Previous shape with real verification: one chain round trip inside every request"""
+    client = LocalCanisterClient(latency=latency)
+    seller_id, trades, decimals = create_trades(client, count)
+    latencies = []
+    for trade_id, tx_hash in trades:
+        started = time.perf_counter()
+        with session_scope() as db:
+            trade = db.query(Trade).filter(Trade.trade_id == trade_id).first()
+            seller = db.query(User).filter(User.id == seller_id).first()
+            deposit = Deposit(tx_hash, to_units(trade.crypto_amount, decimals), seller.wallet_address, deposit_memo(trade_id))
+            status = asyncio.run(client.verify_deposits([deposit]))
+            if status[tx_hash] == "confirmed":
+                trade.status = TradeStatus.ESCROW_FUNDED
+                trade.escrow_tx_hash = tx_hash
+            db.commit()
+        latencies.append(time.perf_counter() - started)
+    return latencies, sum(latencies), client.calls
+
+async def pipelined(count: int, latency: float, batch_size: int):
+    """Requests record the hash and enqueue; the pipeline verifies in batches"""
+    client = LocalCanisterClient(latency=latency)
+    set_chain_client(client)
+    seller_id, trades, _ = create_trades(client, count)
+    pipeline = escrow_pipeline
+    pipeline.batch_size = batch_size
+    await pipeline.start(recover=False)
+
+    def fund(trade_id, tx_hash):
+        started = time.perf_counter()
+        with session_scope() as db:
+            EscrowService(db).fund_escrow(trade_id, seller_id, tx_hash)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = [await asyncio.to_thread(fund, trade_id, tx_hash) for trade_id, tx_hash in trades]
+    await pipeline.drain()
+    settled = time.perf_counter() - started
+    await pipeline.stop()
+
+    with session_scope() as db:
+        funded = db.query(Trade).filter(
+            Trade.trade_id.in_([trade_id for trade_id, _ in trades]),
+            Trade.status == TradeStatus.ESCROW_FUNDED
+        ).count()
+    return latencies, settled, client.calls, funded
+
+def report(name, latencies, total, calls):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {name:<10} p50 {statistics.median(ordered) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms  "
+          f"all funded in {total:6.2f} s  chain calls {calls}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--chain-ms", type=float, default=500, help="simulated chain round trip")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    init_db()
+    latency = args.chain_ms / 1000
+    print(f"{args.count} fund_escrow requests, {args.chain_ms:.0f} ms chain round trip")
+    report("inline", *inline(args.count, latency))
+    latencies, settled, calls, funded = asyncio.run(pipelined(args.count, latency, args.batch_size))
+    report("pipeline", latencies, settled, calls)
+    print(f"  {funded}/{args.count} trades moved to ESCROW_FUNDED by the pipeline")
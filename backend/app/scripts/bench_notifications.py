@@ -0,0 +1,177 @@
+"""
+Script to measure trade notifications: how long handing a notification to the
+notifier takes (what an outbox handler pays), how many messages batching per
+user saves, that retried events are not sent twice, that a channel's rate
+limit holds under a burst, and that a slow channel makes the notifier refuse
+work (the outbox retries it) instead of growing without bound.
+
+Then runs payment confirmations for many trades through the services and the
+outbox into the in-memory channel.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from app.database import init_db, session_scope
+from app.models.trade import Trade, TradeStatus
+from app.models.user import User
+from app.services.escrow_service import EscrowService
+from app.services.notification_channels import MemoryChannel
+from app.services.notifier import Notification, NotificationBacklogFull, Notifier, notifier
+from app.services.outbox_worker import OutboxWorker
+
+class SlowChannel(MemoryChannel):
+    """The in-memory sink behind a round trip and a rate limit, recording when each message went out"""
+
+    name = "slow"
+
+    def __init__(self, latency: float, rate: float, burst: int):
+        super().__init__()
+        self.latency = latency
+        self.rate = rate
+        self.burst = burst
+        self.sent_at = []
+
+    async def send(self, address: str, text: str):
+        await asyncio.sleep(self.latency)
+        self.sent_at.append(time.monotonic())
+        await super().send(address, text)
+
+def notifications(count: int, users: int, duplicates: float, rng: random.Random):
+    """count notifications about random trades of users, a share of them repeated as retried events would be"""
+    made = []
+    for i in range(count):
+        if made and rng.random() < duplicates:
+            made.append(rng.choice(made))
+            continue
+        user_id = rng.randrange(users)
+        made.append(Notification(user_id, f"T{i}:payment_sent", f"Trade T{i} has news.", {"user_id": user_id}))
+    return made
+
+def peak_rate(sent_at) -> float:
+    """Most messages sent within any one second"""
+    peak, start = 0, 0
+    for end in range(len(sent_at)):
+        while sent_at[end] - sent_at[start] > 1.0:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+async def burst(args, rng: random.Random):
+    channel = SlowChannel(args.latency / 1e3, args.rate, args.burst)
+    bench_notifier = Notifier([channel], workers=args.workers, batch_window=args.window)
+    await bench_notifier.start()
+    batch = notifications(args.count, args.users, args.duplicates, rng)
+    samples = []
+    started = time.monotonic()
+
+    def submit_all():
+        # from a thread, as outbox handlers do
+        for notification in batch:
+            submitted_at = time.perf_counter()
+            bench_notifier.submit(notification)
+            samples.append(time.perf_counter() - submitted_at)
+
+    await asyncio.to_thread(submit_all)
+    await bench_notifier.drain()
+    seconds = time.monotonic() - started
+    await bench_notifier.stop()
+
+    unique = len({(n.user_id, n.key) for n in batch})
+    samples.sort()
+    print(f"burst of {args.count} notifications to {args.users} users ({unique} unique), "
+          f"{args.window:.1f} s batches, channel {args.latency:.0f} ms at {args.rate:.0f}/s")
+    print(f"  submit     p50 {statistics.median(samples) * 1e6:6.1f} us, p99 {samples[int(len(samples) * 0.99)] * 1e6:6.1f} us")
+    print(f"  delivered  {len(channel.sent)} messages in {seconds:5.2f} s, "
+          f"{unique / max(len(channel.sent), 1):.1f} notifications per message")
+    print(f"  rate       peak {peak_rate(channel.sent_at):.0f} messages in one second (limit {args.rate:.0f}/s, burst {args.burst})")
+
+async def backpressure(args, rng: random.Random):
+    channel = SlowChannel(args.latency / 1e3, args.rate / 10, 1)
+    bench_notifier = Notifier([channel], workers=2, batch_window=0.05, batch_size=1, queue_size=20,
+                              max_pending=args.max_pending)
+    await bench_notifier.start()
+    refused = 0
+    peak = 0
+    for notification in notifications(args.count, args.count, 0.0, rng):
+        try:
+            bench_notifier.submit(notification)
+        except NotificationBacklogFull:
+            refused += 1
+        peak = max(peak, bench_notifier.pending())
+        if notification.user_id % 100 == 0:
+            await asyncio.sleep(0)
+    await bench_notifier.stop(timeout=0.1)
+    print(f"\nslow channel ({args.rate / 10:.0f}/s), {args.count} notifications to different users, "
+          f"at most {args.max_pending} waiting")
+    print(f"  refused    {refused}, left to outbox retries; peak waiting {peak}")
+
+def seed_trades(count: int):
+    run = uuid.uuid4().hex[:8]
+    with session_scope() as db:
+        users = [User(email=f"notify-{run}-{i}@bench.local", username=f"notify-{run}-{i}",
+                      telegram_handle=f"notify_{run}_{i}") for i in range(20)]
+        db.add_all(users)
+        db.flush()
+        trades = []
+        for i in range(count):
+            buyer, seller = random.sample(users, 2)
+            trades.append(Trade(trade_id=f"NOTIFY-{run}-{i}", buyer_id=buyer.id, seller_id=seller.id,
+                                crypto_amount="100", fiat_amount="150000", exchange_rate="1500",
+                                crypto_currency="USDT", fiat_currency="NGN", trade_type="buy",
+                                payment_method="bank_transfer", status=TradeStatus.ESCROW_FUNDED))
+        db.add_all(trades)
+        db.commit()
+        return [(trade.trade_id, trade.buyer_id) for trade in trades]
+
+async def end_to_end(trades: int):
+    channel = MemoryChannel()
+    notifier.channels = [channel]
+    notifier.batch_window = 0.2
+    await notifier.start()
+    seeded = await asyncio.to_thread(seed_trades, trades)
+    samples = []
+
+    def confirm_all():
+        for trade_id, buyer_id in seeded:
+            with session_scope() as db:
+                started = time.perf_counter()
+                EscrowService(db).confirm_payment(trade_id, buyer_id, f"REF-{trade_id}")
+                samples.append(time.perf_counter() - started)
+
+    await asyncio.to_thread(confirm_all)
+    started = time.perf_counter()
+    handled = await OutboxWorker(concurrency=1).drain()
+    await notifier.drain()
+    seconds = time.perf_counter() - started
+    await notifier.stop()
+    print(f"\n{trades} payment confirmations through the outbox")
+    print(f"  request    p50 {statistics.median(samples) * 1e3:.2f} ms (the outbox row is written with the trade)")
+    print(f"  outbox     {handled} events handled and {len(channel.sent)} messages to sellers in {seconds:.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="notifications in the burst")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of notifications repeated")
+    parser.add_argument("--window", type=float, default=0.5, help="batch window in seconds")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=20, help="channel round trip in ms")
+    parser.add_argument("--rate", type=float, default=200, help="channel messages per second")
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--max-pending", type=int, default=1000)
+    parser.add_argument("--trades", type=int, default=200, help="trades confirmed end to end")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    asyncio.run(burst(args, rng))
+    asyncio.run(backpressure(args, rng))
+    init_db()
+    asyncio.run(end_to_end(args.trades))
@@ -0,0 +1,111 @@
+"""
+Script to benchmark the offer book: rebuild from the offers table, then match latency with 100k live offers
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+from app.database import init_db, session_scope
+from app.models.offer import Offer
+from app.models.trade import TradeType
+from app.models.user import User
+from app.services.offer_book import OfferBook
+
+PAIRS = [("USDT", "NGN"), ("USDT", "KES"), ("BTC", "NGN"), ("ETH", "NGN")]
+PRICES = {"USDT": 1500, "BTC": 95_000_000, "ETH": 4_000_000}
+PAYMENT_METHODS = ["bank_transfer", "opay", "palmpay", "kuda", "mpesa", "chipper"]
+
+def seed(offers: int, users: int):
+    rng = random.Random(7)
+    run = int(time.time())
+    with session_scope() as db:
+        db.execute(insert(User), [
+            {"username": f"maker-{run}-{i}", "email": f"maker-{run}-{i}@example.com",
+             "trust_score": rng.uniform(20, 100)}
+            for i in range(users)
+        ])
+        first_user = db.query(User.id).filter(User.username == f"maker-{run}-0").scalar()
+
+        now = datetime.utcnow()
+        rows = []
+        for i in range(offers):
+            crypto, fiat = rng.choice(PAIRS)
+            price = Decimal(PRICES[crypto]) * Decimal(rng.uniform(0.97, 1.03))
+            rows.append({
+                "user_id": first_user + rng.randrange(users),
+                "side": rng.choice([TradeType.BUY, TradeType.SELL]),
+                "crypto_currency": crypto,
+                "fiat_currency": fiat,
+                "price": price.quantize(Decimal("0.01")),
+                "min_amount": Decimal(10) if crypto == "USDT" else Decimal("0.01"),
+                "max_amount": Decimal(rng.choice([500, 2000, 10000])) if crypto == "USDT" else Decimal(rng.choice([1, 5])),
+                "payment_methods": rng.sample(PAYMENT_METHODS, rng.randint(1, 3)),
+                "status": "active",
+                "queued_at": now - timedelta(seconds=rng.randrange(86400)),
+                "updated_at": now,
+            })
+        for start in range(0, len(rows), 10_000):
+            db.execute(insert(Offer), rows[start:start + 10_000])
+        db.commit()
+        return first_user
+
+def timed(fn, runs: int):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return result, samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+def run(offers: int, users: int, runs: int):
+    started = time.perf_counter()
+    first_user = seed(offers, users)
+    print(f"seeded {offers:,} offers from {users:,} makers in {time.perf_counter() - started:.1f} s")
+
+    book = OfferBook()
+    with session_scope() as db:
+        started = time.perf_counter()
+        loaded = book.rebuild(db)
+    print(f"rebuild: {loaded:,} active offers in {time.perf_counter() - started:.2f} s "
+          f"(USDT/NGN depth {book.depth('USDT', 'NGN')})")
+    print()
+
+    cases = {
+        "best 10, no filters": dict(),
+        "best 10, amount 1000": dict(amount=Decimal(1000)),
+        "best 10, amount + opay": dict(amount=Decimal(1000), payment_method="opay"),
+        "best 10, trust >= 90": dict(min_trust_score=90),
+        "best 10, amount + opay + trust >= 95": dict(amount=Decimal(5000), payment_method="opay", min_trust_score=95),
+        # filters few or no offers pass: bounded by the payment method index and max_scan
+        "best 10, absent payment method": dict(payment_method="paypal"),
+        "best 10, trust >= 99.99": dict(min_trust_score=99.99),
+        "best 10, amount above every max": dict(amount=Decimal(50000)),
+    }
+    print(f"{'match (USDT/NGN, taker buys)':<40} {'p50 us':>8} {'p99 us':>8} {'found':>6}")
+    for name, filters in cases.items():
+        found, p50, p99 = timed(lambda: book.match("USDT", "NGN", TradeType.BUY, exclude_user_id=first_user,
+                                                   **filters), runs)
+        print(f"{name:<40} {p50:>8.1f} {p99:>8.1f} {len(found):>6}")
+
+    with session_scope() as db:
+        offer = db.query(Offer).filter(Offer.crypto_currency == "USDT", Offer.fiat_currency == "NGN").first()
+        _, p50, p99 = timed(lambda: book.put(offer), runs)
+    print(f"{'reprice (remove + insert)':<40} {p50:>8.1f} {p99:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--offers", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--runs", type=int, default=2_000)
+    args = parser.parse_args()
+
+    init_db()
+    run(args.offers, args.users, args.runs)
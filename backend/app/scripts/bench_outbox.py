@@ -0,0 +1,95 @@
+"""
+Script to show rating requests are unaffected by a backlogged outbox: request latency
+with idle workers versus workers buried under slow events
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from app.database import init_db, session_scope
+from app.models.trade import Trade, TradeStatus
+from app.models.user import User
+from app.schemas.rating import RatingCreate
+from app.services.outbox_service import OutboxService
+from app.services.outbox_worker import OutboxWorker, handles
+from app.services.rating_service import RatingService
+
+SLOW_TOPIC = "bench.slow"
+
+def create_trades(count: int):
+    """Two users and count completed trades between them, ready to be rated"""
+    run = uuid.uuid4().hex[:8]
+    with session_scope() as db:
+        rater = User(email=f"rater-{run}@bench.local", username=f"rater-{run}")
+        rated = User(email=f"rated-{run}@bench.local", username=f"rated-{run}")
+        db.add_all([rater, rated])
+        db.flush()
+        trades = [
+            Trade(trade_id=f"BENCH-{run}-{i}", buyer_id=rater.id, seller_id=rated.id,
+                  crypto_amount="100", fiat_amount="150000", exchange_rate="1500",
+                  crypto_currency="USDT", fiat_currency="NGN", trade_type="buy",
+                  payment_method="bank_transfer", status=TradeStatus.COMPLETED)
+            for i in range(count)
+        ]
+        db.add_all(trades)
+        db.commit()
+        return rater.id, rated.id, [trade.id for trade in trades]
+
+def rate(rater_id: int, rated_id: int, trade_id: int) -> float:
+    started = time.perf_counter()
+    with session_scope() as db:
+        RatingService(db).create_rating(rater_id, RatingCreate(rating=5, rated_user_id=rated_id, trade_id=trade_id))
+    return time.perf_counter() - started
+
+def backlog() -> int:
+    with session_scope() as db:
+        return OutboxService(db).backlog()
+
+async def measure(name: str, count: int):
+    rater_id, rated_id, trade_ids = await asyncio.to_thread(create_trades, count)
+    latencies = [await asyncio.to_thread(rate, rater_id, rated_id, trade_id) for trade_id in trade_ids]
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {name:<12} p50 {statistics.median(ordered) * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  "
+          f"outbox backlog {await asyncio.to_thread(backlog):,}")
+
+async def run(count: int, backlog_size: int, handler_ms: float):
+    @handles(SLOW_TOPIC)
+    def slow_handler(db, payload):
+        time.sleep(handler_ms / 1000)
+
+    worker = OutboxWorker(concurrency=4)
+    print(f"{count} create_rating calls")
+
+    await worker.start()
+    await measure("idle", count)
+    await worker.drain()
+
+    with session_scope() as db:
+        outbox = OutboxService(db)
+        for i in range(backlog_size):
+            outbox.enqueue(SLOW_TOPIC, {"n": i})
+        db.commit()
+    await asyncio.sleep(0.1)
+    await measure("backlogged", count)
+    await worker.stop()
+
+    started = time.perf_counter()
+    handled = await OutboxWorker().drain()
+    print(f"  drained {handled:,} remaining events in {time.perf_counter() - started:.1f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--backlog", type=int, default=5000)
+    parser.add_argument("--handler-ms", type=float, default=20, help="time each backlogged event takes")
+    args = parser.parse_args()
+
+    init_db()
+    asyncio.run(run(args.count, args.backlog, args.handler_ms))
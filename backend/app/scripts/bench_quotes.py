@@ -0,0 +1,62 @@
+"""
+Script to benchmark the batched quote engine behind POST /api/crypto/quote
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.schemas.crypto import QuoteRequest, QuoteResponse
+from app.services.crypto_service import (
+    DEFAULT_CRYPTOCURRENCIES, SUPPORTED_FIAT_CURRENCIES, QuoteTerms, encode_quotes, quote_batch
+)
+
+def build_items(count: int, seed: int = 7):
+    """Random (symbol, amount, fiat) matrix across every default asset"""
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        crypto = rng.choice(DEFAULT_CRYPTOCURRENCIES)
+        amount = Decimal(str(round(rng.uniform(crypto["minimum_amount_trade"] / 2, crypto["maximum_amount_trade"] * 1.1), 6)))
+        items.append({"symbol": crypto["symbol"], "amount": str(amount), "fiat": rng.choice(SUPPORTED_FIAT_CURRENCIES)})
+    return items
+
+def run(count: int, repeat: int):
+    terms = {c["symbol"]: QuoteTerms.from_config(SimpleNamespace(**c)) for c in DEFAULT_CRYPTOCURRENCIES}
+    payload = {"quotes": build_items(count)}
+
+    parse, engine, serialize, validated = [], [], [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        request = QuoteRequest(**payload)
+        parsed = time.perf_counter()
+        results = quote_batch(terms, request.quotes)
+        quoted = time.perf_counter()
+        # what the route sends, and what validating the results against response_model would add
+        body = encode_quotes(results)
+        finished = time.perf_counter()
+        QuoteResponse(quotes=results).model_dump_json()
+        parse.append(parsed - started)
+        engine.append(quoted - parsed)
+        serialize.append(finished - quoted)
+        validated.append(time.perf_counter() - finished)
+
+    valid = sum(result["valid"] for result in results)
+    print(f"{count} quotes per request, best of {repeat}:")
+    print(f"  request parsing:    {min(parse) * 1000:8.1f} ms")
+    print(f"  quote engine:       {min(engine) * 1000:8.1f} ms ({count / min(engine):,.0f} quotes/s)")
+    print(f"  response encoding:  {min(serialize) * 1000:8.1f} ms ({len(body) / 1024:.0f} KiB)")
+    print(f"  (response_model:    {min(validated) * 1000:8.1f} ms)")
+    print(f"  valid quotes:       {valid}/{count}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.count, args.repeat)
@@ -0,0 +1,95 @@
+"""
+Script to show read_only service calls spreading across read replicas, and
+read-your-writes stickiness after a user writes.
+
+Without REPLICA_DATABASE_URLS it builds a SQLite primary and two replica copies
+in a temporary directory.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import collections
+import shutil
+import sqlite3
+import tempfile
+import time
+
+def local_databases(directory: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/primary.db"
+    os.environ["REPLICA_DATABASE_URLS"] = f"sqlite:///{directory}/replica1.db,sqlite:///{directory}/replica2.db"
+
+def replicate(directory: str):
+    """Stand-in for streaming replication: copy the primary into each replica file"""
+    source = sqlite3.connect(f"{directory}/primary.db")
+    for name in ("replica1", "replica2"):
+        target = sqlite3.connect(f"{directory}/{name}.db")
+        source.backup(target)
+        target.close()
+    source.close()
+
+def run(calls: int, directory: str = None):
+    from sqlalchemy import event
+    from app import database
+    from app.database import init_db, session_scope, READ_YOUR_WRITES_SECONDS
+    from app.models.user import User
+    from app.services.crypto_service import CryptoService
+    from app.services.user_service import UserService
+
+    engines = {"primary": database.engine}
+    engines.update({f"replica{i + 1}": e for i, e in enumerate(database.replica_engines)})
+    counts = collections.Counter()
+    for name, engine in engines.items():
+        event.listen(engine, "before_cursor_execute", lambda *a, name=name: counts.update([name]))
+
+    init_db()
+    with session_scope() as db:
+        CryptoService(db).seed_default_cryptocurrencies()
+        user = User(email="replica@bench.local", username=f"replica-{int(time.time())}")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    if directory:
+        replicate(directory)
+
+    counts.clear()
+    with session_scope() as db:
+        for _ in range(calls):
+            UserService(db).get_top_traders(10)
+            UserService(db).search_traders("replica")
+            CryptoService(db).get_supported_cryptocurrencies()
+    print(f"{calls * 3} read_only calls:")
+    for name in engines:
+        print(f"  {name:<9} {counts[name]:>6} queries")
+
+    with session_scope() as db:
+        db.info["user_id"] = user_id
+        user = db.query(User).filter(User.id == user_id).first()
+        user.full_name = "Replica Bench"
+        db.commit()
+
+        counts.clear()
+        UserService(db).search_traders("replica")
+        print(f"\nread right after the user's write: {dict(counts)}")
+
+        time.sleep(READ_YOUR_WRITES_SECONDS)
+        counts.clear()
+        UserService(db).search_traders("replica")
+        print(f"read {READ_YOUR_WRITES_SECONDS:g} s later:            {dict(counts)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ.setdefault("READ_YOUR_WRITES_SECONDS", "1")
+    if os.getenv("REPLICA_DATABASE_URLS"):
+        run(args.calls)
+    else:
+        directory = tempfile.mkdtemp(prefix="trustpeer-replicas-")
+        try:
+            local_databases(directory)
+            run(args.calls, directory)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,155 @@
+"""
+Script to benchmark risk checks on the create_trade hot path, and the risk feature store against ad-hoc count queries
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, or_
+from app.database import init_db, session_scope
+from app.models.report import Report, ReportType
+from app.models.trade import Trade, TradeStatus, TradeType, CryptoCurrency
+from app.models.user import User
+from app.schemas.trade import TradeCreate
+from app.services import trade_service
+from app.services.crypto_service import CryptoService
+from app.services.rate_service import FixtureRateProvider, rate_cache, set_rate_provider
+from app.services.risk_service import (
+    RiskService, TRADE_CREATED, TRADE_CANCELLED, DISPUTE_RECEIVED, REPORT_RECEIVED
+)
+
+def seed(users: int, trades: int, reports: int):
+    """Users with a trade and report history, recorded both as rows and as risk events"""
+    rng = random.Random(3)
+    run = int(time.time())
+    now = datetime.utcnow()
+    with session_scope() as db:
+        db.execute(insert(User), [
+            {"username": f"risk-{run}-{i}", "email": f"risk-{run}-{i}@example.com", "trust_score": 50.0}
+            for i in range(users)
+        ])
+        first_id = db.query(User.id).filter(User.username == f"risk-{run}-0").scalar()
+
+        rows = []
+        for i in range(trades):
+            buyer, seller = rng.sample(range(first_id, first_id + users), 2)
+            status = rng.choice([TradeStatus.COMPLETED] * 6 + [TradeStatus.CANCELLED, TradeStatus.DISPUTED])
+            created = now - timedelta(seconds=rng.randrange(30 * 86400))
+            rows.append({
+                "trade_id": f"RB{run % 100000:05d}{i:08d}", "buyer_id": buyer, "seller_id": seller,
+                "crypto_amount": Decimal(100), "fiat_amount": Decimal(150000), "exchange_rate": Decimal(1500),
+                "crypto_currency": CryptoCurrency.USDT, "fiat_currency": "NGN", "trade_type": TradeType.BUY,
+                "payment_method": "bank_transfer", "status": status, "is_disputed": status == TradeStatus.DISPUTED,
+                "created_at": created, "updated_at": created,
+            })
+        for start in range(0, len(rows), 10_000):
+            db.execute(insert(Trade), rows[start:start + 10_000])
+        report_rows = [
+            {"reporter_id": first_id + rng.randrange(users), "reported_user_id": first_id + rng.randrange(users),
+             "report_type": ReportType.SCAM, "title": "bench", "description": "bench",
+             "created_at": now - timedelta(seconds=rng.randrange(30 * 86400))}
+            for _ in range(reports)
+        ]
+        db.execute(insert(Report), report_rows)
+
+        # replay the history into the feature store, oldest first
+        risk = RiskService(db)
+        events = []
+        for row in rows:
+            at = (row["created_at"] - datetime(1970, 1, 1)).total_seconds()
+            # bench trades are buys, created by the buyer
+            events.append((at, row["buyer_id"], TRADE_CREATED))
+            if row["status"] == TradeStatus.CANCELLED:
+                events.append((at, row["buyer_id"], TRADE_CANCELLED))
+            elif row["status"] == TradeStatus.DISPUTED:
+                events.append((at, row["seller_id"], DISPUTE_RECEIVED))
+        for row in report_rows:
+            at = (row["created_at"] - datetime(1970, 1, 1)).total_seconds()
+            events.append((at, row["reported_user_id"], REPORT_RECEIVED))
+        for at, user_id, event in sorted(events):
+            risk.record(user_id, event, now=at)
+        db.commit()
+    return first_id
+
+def ad_hoc_features(db, user_id: int) -> dict:
+    """What create_trade would have to query without the feature store"""
+    now = datetime.utcnow()
+    involved = or_(Trade.buyer_id == user_id, Trade.seller_id == user_id)
+    count = lambda *criteria: db.query(func.count(Trade.id)).filter(*criteria).scalar()
+    return {
+        "trades_1h": count(involved, Trade.created_at >= now - timedelta(hours=1)),
+        "trades_24h": count(involved, Trade.created_at >= now - timedelta(days=1)),
+        "cancellations_7d": count(involved, Trade.status == TradeStatus.CANCELLED,
+                                  Trade.updated_at >= now - timedelta(days=7)),
+        "disputes_30d": count(involved, Trade.is_disputed.is_(True), Trade.updated_at >= now - timedelta(days=30)),
+        "reports_30d": db.query(func.count(Report.id)).filter(
+            Report.reported_user_id == user_id, Report.created_at >= now - timedelta(days=30)
+        ).scalar(),
+    }
+
+def timed(fn, runs: int) -> dict:
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {"p50": statistics.median(samples) * 1e3, "p99": samples[int(len(samples) * 0.99)] * 1e3}
+
+def create_trade(first_id: int, users: int, checks: bool):
+    rng = random.Random(int(checks))
+    trade_service.RISK_CHECKS_ENABLED = checks
+
+    def create(_):
+        buyer, seller = rng.sample(range(first_id, first_id + users), 2)
+        with session_scope() as db:
+            try:
+                trade_service.TradeService(db).create_trade(buyer, TradeCreate(
+                    crypto_amount=Decimal(100), fiat_amount=Decimal(150000),
+                    exchange_rate=rate_cache.get("USDT", "NGN").value,
+                    crypto_currency=CryptoCurrency.USDT, fiat_currency="NGN", trade_type=TradeType.BUY,
+                    payment_method="bank_transfer", seller_id=seller
+                ))
+            except ValueError:
+                pass  # blocked by risk checks
+    return create
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--trades", type=int, default=50_000)
+    parser.add_argument("--reports", type=int, default=5_000)
+    parser.add_argument("--runs", type=int, default=2_000)
+    args = parser.parse_args()
+
+    init_db()
+    with session_scope() as db:
+        CryptoService(db).seed_default_cryptocurrencies()
+    set_rate_provider(FixtureRateProvider())
+    rate_cache.refresh()
+
+    started = time.perf_counter()
+    first_id = seed(args.users, args.trades, args.reports)
+    print(f"seeded {args.users:,} users, {args.trades:,} trades and {args.reports:,} reports "
+          f"in {time.perf_counter() - started:.1f} s")
+
+    rng = random.Random(1)
+    sample = lambda _: rng.randrange(first_id, first_id + args.users)
+    with session_scope() as db:
+        risk = RiskService(db)
+        store = timed(lambda i: risk.features([sample(i), sample(i)]), args.runs)
+        ad_hoc = timed(lambda i: (ad_hoc_features(db, sample(i)), ad_hoc_features(db, sample(i))), args.runs)
+    print(f"features of both parties, feature store: p50 {store['p50']:.3f} ms, p99 {store['p99']:.3f} ms")
+    print(f"features of both parties, ad-hoc counts: p50 {ad_hoc['p50']:.3f} ms, p99 {ad_hoc['p99']:.3f} ms")
+
+    for checks in (False, True):
+        result = timed(create_trade(first_id, args.users, checks), args.runs)
+        print(f"create_trade, risk checks {'on ' if checks else 'off'}: "
+              f"p50 {result['p50']:.3f} ms, p99 {result['p99']:.3f} ms")
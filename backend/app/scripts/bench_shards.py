@@ -0,0 +1,113 @@
+"""
+Script to benchmark trade write throughput against the number of user shards,
+and the latency of a scatter-gather read (top traders) across them.
+
+Each shard count runs in its own process on fresh SQLite files in a temporary
+directory; 1 shard is the unsharded single database.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+def local_databases(directory: str, shards: int):
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/global.db"
+    if shards > 1:
+        os.environ["SHARD_DATABASE_URLS"] = ",".join(f"sqlite:///{directory}/shard{i}.db" for i in range(shards))
+    else:
+        os.environ.pop("SHARD_DATABASE_URLS", None)
+
+def run(users: int, trades: int, writers: int):
+    from sqlalchemy.exc import OperationalError
+    from app.database import init_db, insert_rows, session_scope, shard_engines
+    from app.models.trade import Trade, TradeType, CryptoCurrency
+    from app.models.user import User
+    from app.services.user_service import UserService
+
+    init_db()
+    run_id = int(time.time())
+    with session_scope() as db:
+        rows = [
+            {"username": f"shard-{run_id}-{i}", "email": f"shard-{run_id}-{i}@example.com", "trust_score": 50.0}
+            for i in range(users)
+        ]
+        insert_rows(db, User, rows)
+        db.commit()
+        user_ids = [row["id"] for row in rows] if shard_engines else [
+            user_id for user_id, in db.query(User.id).filter(User.username.like(f"shard-{run_id}-%"))
+        ]
+
+    retries = 0
+    lock = threading.Lock()
+
+    def writer(count: int, seed: int):
+        nonlocal retries
+        rng = random.Random(seed)
+        with session_scope() as db:
+            for _ in range(count):
+                buyer, seller = rng.sample(user_ids, 2)
+                while True:
+                    db.add(Trade(
+                        trade_id=f"TS{uuid.uuid4().hex[:12].upper()}", buyer_id=buyer, seller_id=seller,
+                        crypto_amount=100, fiat_amount=150000, exchange_rate=1500,
+                        crypto_currency=CryptoCurrency.USDT, trade_type=TradeType.BUY, payment_method="bank_transfer",
+                    ))
+                    try:
+                        db.commit()
+                        break
+                    except OperationalError:
+                        # SQLite allows one writer per file; a busy shard is retried
+                        db.rollback()
+                        with lock:
+                            retries += 1
+
+    per_writer = trades // writers
+    threads = [threading.Thread(target=writer, args=(per_writer, i)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with session_scope() as db:
+        read_started = time.perf_counter()
+        UserService(db).get_top_traders(20)
+        read_ms = (time.perf_counter() - read_started) * 1000
+
+    shards = max(len(shard_engines), 1)
+    print(f"{shards} shard(s): {per_writer * writers / elapsed:,.0f} trades/s with {writers} writers "
+          f"({retries} busy retries), top traders {read_ms:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,2,4", help="comma separated shard counts")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--trades", type=int, default=2_000)
+    parser.add_argument("--writers", type=int, default=8, help="concurrent writing threads")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run(args.users, args.trades, args.writers)
+        sys.exit(0)
+
+    for shards in [int(count) for count in args.shards.split(",")]:
+        # engines are built at import, so every shard count gets a fresh interpreter
+        directory = tempfile.mkdtemp(prefix="trustpeer-shards-")
+        try:
+            local_databases(directory, shards)
+            subprocess.run([
+                sys.executable, os.path.abspath(__file__), "--single", str(shards), "--users", str(args.users),
+                "--trades", str(args.trades), "--writers", str(args.writers),
+            ], check=True)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,137 @@
+"""
+Script to measure what a test database costs per test: create_all and the
+default seeds on a fresh database, against a clone of the seeded template
+(in-memory backup, file copy, and a PostgreSQL template database when
+TEST_DATABASE_URL points at one).
+
+Then runs a service-level suite (users, a trade, its completion and a
+rating, each case on its own clone) in one process and across worker
+processes, as pytest-xdist would, to show the clones never collide.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import multiprocessing
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from app.core.template_db import TEST_DATABASE_URL, TemplateDatabase, seed_defaults
+from app.database import RoutingSession, init_db
+
+def fresh(_):
+    """What a suite without templates does per test"""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    init_db(bind=engine)
+    with RoutingSession(bind=engine) as db:
+        seed_defaults(db)
+        db.commit()
+    engine.dispose()
+
+def cloned(template: TemplateDatabase):
+    def run(_):
+        template.drop(template.clone())
+    return run
+
+def timed(fn, runs: int) -> str:
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    return f"p50 {statistics.median(samples) * 1e3:7.2f} ms, total {sum(samples):6.2f} s"
+
+def case(template: TemplateDatabase, number: int):
+    """One service-level test on its own clone"""
+    from app.models.trade import CryptoCurrency, TradeType
+    from app.schemas.rating import RatingCreate
+    from app.schemas.trade import TradeCreate
+    from app.schemas.user import UserCreate
+    from app.services.rating_service import RatingService
+    from app.services.trade_service import TradeService
+    from app.services.user_service import UserService
+
+    with template.session() as db:
+        users = UserService(db)
+        buyer = users.create_user(UserCreate(username=f"buyer{number}", email=f"buyer{number}@example.com"))
+        seller = users.create_user(UserCreate(username=f"seller{number}", email=f"seller{number}@example.com"))
+        db.commit()
+        trades = TradeService(db)
+        trade = trades.create_trade(buyer.id, TradeCreate(
+            crypto_amount=Decimal("100"), fiat_amount=Decimal("150000"), exchange_rate=Decimal("1500"),
+            crypto_currency=CryptoCurrency.USDT, trade_type=TradeType.BUY, payment_method="bank_transfer",
+            seller_id=seller.id,
+        ))
+        db.commit()
+        trades.complete_trade(trade.trade_id)
+        db.commit()
+        RatingService(db).create_rating(buyer.id, RatingCreate(rating=5, rated_user_id=seller.id, trade_id=trade.id))
+        db.commit()
+        summary = RatingService(db).get_rating_summary(seller.id)
+        assert summary["overall"]["count"] == 1, summary
+        # a clone starts from the template: nothing from other cases is visible
+        assert len(users.search_traders("buyer")) == 1
+
+_template = None
+
+def start_worker(url: str, index):
+    """Pool initializer: a worker id as pytest-xdist hands out, the template, and market rates for trades"""
+    global _template
+    from app.services.crypto_service import crypto_config_cache
+    from app.services.rate_service import FixtureRateProvider, rate_cache, set_rate_provider
+    os.environ["PYTEST_XDIST_WORKER"] = f"gw{index.value}"
+    with index.get_lock():
+        index.value += 1
+    _template = TemplateDatabase(url)
+    set_rate_provider(FixtureRateProvider())
+    with _template.session() as db:
+        rate_cache.refresh(cryptos=list(crypto_config_cache.get(db)))
+
+def run_case(number: int):
+    case(_template, number)
+
+def worker_ready(_):
+    time.sleep(0.1)
+
+def suite(url: str, cases: int, workers: int):
+    """Seconds until the workers are up (imports, template loaded), and running the cases"""
+    context = multiprocessing.get_context("spawn")
+    started = time.perf_counter()
+    with context.Pool(workers, start_worker, (url, context.Value("i", 0))) as pool:
+        pool.map(worker_ready, range(workers), chunksize=1)
+        ready = time.perf_counter()
+        pool.map(run_case, range(cases), chunksize=max(cases // (workers * 4), 1))
+        return ready - started, time.perf_counter() - ready
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="databases set up per method")
+    parser.add_argument("--cases", type=int, default=400, help="service-level cases in the suite")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--file", default=os.path.join("/tmp", "trustpeer-bench.db"),
+                        help="sqlite file URL path for the file copy clones")
+    args = parser.parse_args()
+
+    methods = {"create_all + seed": fresh}
+    templates = {"memory backup": TemplateDatabase("sqlite://"), "file copy": TemplateDatabase(f"sqlite:///{args.file}")}
+    if TEST_DATABASE_URL.startswith("postgresql"):
+        templates["postgres template"] = TemplateDatabase(TEST_DATABASE_URL)
+    for label, template in templates.items():
+        started = time.perf_counter()
+        template.build()
+        print(f"{label} template built or found in {(time.perf_counter() - started) * 1e3:.0f} ms")
+        methods[label] = cloned(template)
+
+    print(f"\nper-test database setup, {args.runs} runs each")
+    for label, fn in methods.items():
+        print(f"  {label:<18} {timed(fn, args.runs)}")
+
+    print(f"\nservice-level suite, {args.cases} cases on their own in-memory clones")
+    for workers in args.workers:
+        startup, seconds = suite("sqlite://", args.cases, workers)
+        print(f"  {workers} worker{'s' if workers > 1 else ' '}  workers up in {startup:5.2f} s, cases {seconds:6.2f} s, "
+              f"{seconds / args.cases * 1e3 * workers:.1f} ms per case and worker")
@@ -0,0 +1,126 @@
+"""
+Script to measure what the access log and tracing cost in request throughput.
+
+Drives the ASGI app directly (no HTTP client or server in the way) over
+public endpoints that run service methods and queries, once uninstrumented,
+with the access log only, and traced at several sample rates. Configurations
+take turns round by round so drift in the machine or the database hits them
+all alike, and each reports its best round: the machine's noise only ever
+slows a round down.
+
+On a noisy machine a few percent of throughput is hard to see, so the
+instrumentation is also timed on its own, around a stand-in endpoint running
+one query, including the background threads' formatting and writing of the
+log lines and spans, and set against the uninstrumented request time.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from app.core.log import access_log, configure_logging
+from app.core.request_tracing import TraceMiddleware
+from app.core.tracing import exporter, trace_queries, untrace_queries
+from app.database import engine, init_db, session_scope
+from app.main import include_routers
+from app.models.user import User
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    assert status == 200, (path, status)
+
+def configurations(sample_rates):
+    """label -> (TraceMiddleware options, None without it; whether queries are traced)"""
+    configs = {
+        "off": (None, False),
+        "access log": ({"access_log": True, "tracing": False}, False),
+    }
+    for rate in sample_rates:
+        configs[f"traced, sample {rate:g}"] = ({"access_log": True, "sample_rate": rate}, True)
+    return configs
+
+async def rounds_of(configs, app, paths, requests: int, rounds: int):
+    """Seconds per request of each configuration's rounds, taking turns"""
+    apps = {label: app if options is None else TraceMiddleware(app, **options) for label, (options, _) in configs.items()}
+    for instrumented in apps.values():
+        for i in range(100):
+            await call(instrumented, paths[i % len(paths)])
+    seconds = {label: [] for label in configs}
+    for _ in range(rounds):
+        for label, (_, traced) in configs.items():
+            trace_queries() if traced else untrace_queries()
+            started = time.perf_counter()
+            for i in range(requests):
+                await call(apps[label], paths[i % len(paths)])
+            # count the background threads' share of the work
+            access_log.flush()
+            exporter.flush()
+            seconds[label].append((time.perf_counter() - started) / requests)
+    untrace_queries()
+    return {label: min(samples) for label, samples in seconds.items()}
+
+async def measure(configs, app, paths, requests: int, rounds: int):
+    throughput = await rounds_of(configs, app, paths, requests, rounds)
+
+    connection = engine.connect()
+
+    async def one_query(scope, receive, send):
+        connection.execute(text("SELECT 1")).all()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    cost = await rounds_of(configs, one_query, ["/"], requests * 4, rounds)
+    connection.close()
+    return throughput, cost
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--sample-rates", type=float, nargs="+", default=[0, 0.01, 0.1, 1])
+    args = parser.parse_args()
+
+    # log lines and spans are formatted and written as in production, then discarded
+    configure_logging(open(os.devnull, "w"))
+    exporter.path = os.devnull
+    init_db()
+    with session_scope() as db:
+        user = User(username=f"bench-tracing-{int(time.time())}", email=f"bench-tracing-{int(time.time())}@example.com",
+                    trust_score=50.0)
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    app = FastAPI()
+    include_routers(app, ["ratings"])
+    paths = [f"/api/ratings/user/{user_id}", f"/api/ratings/user/{user_id}/summary"]
+    seconds, cost = asyncio.run(measure(configurations(args.sample_rates), app, paths, args.requests, args.rounds))
+    access_log.stop()
+    exporter.stop()
+
+    baseline = seconds["off"]
+    print(f"{'configuration':<22} {'req/s':>9} {'overhead':>9} {'added us/req':>13} {'of a request':>13}")
+    for label in seconds:
+        added = (cost[label] - cost["off"]) * 1e6
+        print(f"{label:<22} {1 / seconds[label]:>9,.0f} {(seconds[label] / baseline - 1) * 100:>8.1f}% "
+              f"{added:>13.1f} {added / (baseline * 1e6) * 100:>12.1f}%")
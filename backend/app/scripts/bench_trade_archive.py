@@ -0,0 +1,148 @@
+"""
+Script to measure the hot trades table and trade reads before and after archiving
+finished trades: table size, a user's trade history, trade lookups (hot and
+archived) and the escrow recovery scan over unsettled trades.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, text
+from app.database import engine, init_db, session_scope
+from app.models.rating import Rating
+from app.models.trade import Trade, TradeStatus, TradeType, CryptoCurrency
+from app.models.trade_archive import ArchivedTrade
+from app.models.user import User
+from app.services.trade_archive_job import TradeArchiveJob, TRADE_ARCHIVE_AFTER_DAYS
+from app.services.trade_service import TradeService
+
+def seed(users: int, trades: int, rated: float):
+    """Users with a year of trades; most are finished, a few recent ones are still open"""
+    rng = random.Random(7)
+    run = int(time.time())
+    now = datetime.utcnow()
+    with session_scope() as db:
+        db.execute(insert(User), [
+            {"username": f"archive-{run}-{i}", "email": f"archive-{run}-{i}@example.com", "trust_score": 50.0}
+            for i in range(users)
+        ])
+        first_id = db.query(User.id).filter(User.username == f"archive-{run}-0").scalar()
+
+        rows = []
+        for i in range(trades):
+            buyer, seller = rng.sample(range(first_id, first_id + users), 2)
+            created = now - timedelta(seconds=rng.randrange(365 * 86400))
+            if created > now - timedelta(days=2) and rng.random() < 0.5:
+                status, finished = TradeStatus.INITIATED, None
+            else:
+                status = rng.choice([TradeStatus.COMPLETED] * 9 + [TradeStatus.CANCELLED])
+                finished = created + timedelta(hours=1)
+            rows.append({
+                "trade_id": f"AR{run % 100000:05d}{i:08d}", "buyer_id": buyer, "seller_id": seller,
+                "crypto_amount": 100, "fiat_amount": 150000, "exchange_rate": 1500,
+                "crypto_currency": CryptoCurrency.USDT, "fiat_currency": "NGN", "trade_type": TradeType.BUY,
+                "payment_method": "bank_transfer", "status": status, "is_disputed": False,
+                "escrow_tx_hash": f"{i:064x}" if status == TradeStatus.INITIATED else None,
+                "created_at": created, "updated_at": finished or created,
+                "completed_at": finished if status == TradeStatus.COMPLETED else None,
+            })
+        for start in range(0, len(rows), 10_000):
+            db.execute(insert(Trade), rows[start:start + 10_000])
+
+        trade_ids = dict(db.query(Trade.trade_id, Trade.id).filter(Trade.trade_id.like(f"AR{run % 100000:05d}%")))
+        ratings = [
+            {"rater_id": row["buyer_id"], "rated_user_id": row["seller_id"], "trade_id": trade_ids[row["trade_id"]],
+             "rating": 5.0}
+            for row in rows if row["status"] == TradeStatus.COMPLETED and rng.random() < rated
+        ]
+        for start in range(0, len(ratings), 10_000):
+            db.execute(insert(Rating), ratings[start:start + 10_000])
+        db.commit()
+    return first_id, [row["trade_id"] for row in rows], now
+
+def table_bytes(db, table: str):
+    """Size of a table and its indexes, where the database can tell"""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        return db.execute(text("SELECT pg_total_relation_size(:table)"), {"table": table}).scalar()
+    if dialect == "sqlite":
+        return db.execute(text(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = :table "
+            "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table)"
+        ), {"table": table}).scalar()
+    return None
+
+def timed(fn, runs: int) -> str:
+    samples = []
+    for i in range(runs):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return f"p50 {statistics.median(samples) * 1e3:.2f} ms, p99 {samples[int(len(samples) * 0.99)] * 1e3:.2f} ms"
+
+def measure(label: str, first_id: int, users: int, old_trade_id: str, runs: int):
+    with session_scope() as db:
+        hot = db.query(func.count(Trade.id)).scalar()
+        archived = db.query(func.count(ArchivedTrade.id)).scalar()
+        size = table_bytes(db, "trades")
+    print(f"{label}: {hot:,} hot trades, {archived:,} archived"
+          + (f", trades table and indexes {size / 2**20:.1f} MiB" if size else ""))
+
+    rng = random.Random(1)
+
+    def history(page_offset: int):
+        def run(_):
+            with session_scope() as db:
+                TradeService(db).get_user_trades(first_id + rng.randrange(users), limit=20, offset=page_offset)
+        return run
+
+    def lookup(_):
+        with session_scope() as db:
+            assert TradeService(db).get_trade_by_id(old_trade_id)
+
+    def recovery_scan(_):
+        # what escrow verification recovery queries at startup
+        with session_scope() as db:
+            db.query(Trade.trade_id, Trade.escrow_tx_hash).filter(
+                Trade.status == TradeStatus.INITIATED, Trade.escrow_tx_hash.isnot(None)
+            ).all()
+
+    print(f"  trade history, first page:  {timed(history(0), runs)}")
+    print(f"  trade history, page 5:      {timed(history(80), runs)}")
+    print(f"  old trade by trade_id:      {timed(lookup, runs)}")
+    print(f"  escrow recovery scan:       {timed(recovery_scan, max(runs // 20, 5))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--trades", type=int, default=200_000)
+    parser.add_argument("--rated", type=float, default=0.2, help="share of completed trades with a rating (archived all the same)")
+    parser.add_argument("--runs", type=int, default=500)
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    first_id, trade_ids, now = seed(args.users, args.trades, args.rated)
+    print(f"seeded {args.users:,} users and {args.trades:,} trades in {time.perf_counter() - started:.1f} s")
+
+    with session_scope() as db:
+        old_trade_id = db.query(Trade.trade_id).filter(
+            Trade.trade_id.in_(trade_ids[:1000]), Trade.status == TradeStatus.CANCELLED,
+            Trade.created_at < now - timedelta(days=TRADE_ARCHIVE_AFTER_DAYS + 1)
+        ).limit(1).scalar()
+
+    measure("before", first_id, args.users, old_trade_id, args.runs)
+    stats = TradeArchiveJob().execute()
+    print(f"archived {stats['archived']:,} trades in {stats['seconds']:.1f} s")
+    if engine.dialect.name == "sqlite":
+        # give the deleted rows' pages back so the file size reflects the hot table
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    measure("after", first_id, args.users, old_trade_id, args.runs)
@@ -0,0 +1,95 @@
+"""
+Script to benchmark the batch trust score job against per-user updates on a seeded user base
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import random
+import time
+
+from sqlalchemy import func, insert
+from app.database import init_db, session_scope
+from app.models.rating import Rating
+from app.models.user import User
+from app.scripts.rescore_trust_scores import main as rescore
+from app.services.trust_score import trust_score
+from app.services.user_service import UserService
+
+def seed(users: int, rated_share: float):
+    rng = random.Random(11)
+    run = int(time.time())
+    started = time.perf_counter()
+    with session_scope() as db:
+        first_id = (db.query(func.max(User.id)).scalar() or 0) + 1
+        for start in range(0, users, 50_000):
+            rows = []
+            for i in range(start, min(start + 50_000, users)):
+                total = rng.choice([0, 0, 1, 3, 8, 25, 120])
+                rows.append({
+                    "username": f"score-{run}-{i}", "email": f"score-{run}-{i}@example.com",
+                    "total_trades": total, "successful_trades": rng.randint(0, total),
+                    "is_verified": rng.random() < 0.2, "trust_score": 50.0,
+                })
+            db.execute(insert(User), rows)
+
+            ratings = [
+                {"rater_id": first_id, "rated_user_id": first_id + i, "rating": rng.randint(1, 5)}
+                for i in range(start, min(start + 50_000, users)) if rng.random() < rated_share
+                for _ in range(rng.randint(1, 4))
+            ]
+            if ratings:
+                db.execute(insert(Rating), ratings)
+            db.commit()
+        rating_count = db.query(func.count(Rating.id)).scalar()
+    print(f"seeded {users:,} users and {rating_count:,} ratings in {time.perf_counter() - started:.1f} s")
+    return first_id
+
+def per_user(first_id: int, sample: int, users: int) -> float:
+    """Seconds per user of UserService.update_trust_score"""
+    ids = random.Random(5).sample(range(first_id, first_id + users), sample)
+    started = time.perf_counter()
+    with session_scope() as db:
+        service = UserService(db)
+        for user_id in ids:
+            service.update_trust_score(user_id)
+    return (time.perf_counter() - started) / sample
+
+def verify(first_id: int, users: int, sample: int) -> int:
+    """Users whose batch score differs from the per-user formula"""
+    mismatches = 0
+    with session_scope() as db:
+        for user_id in random.Random(9).sample(range(first_id, first_id + users), sample):
+            user = db.get(User, user_id)
+            average = db.query(func.avg(Rating.rating)).filter(Rating.rated_user_id == user_id).scalar() or 0.0
+            expected = trust_score(user.total_trades, user.successful_trades, average, user.is_verified)
+            mismatches += abs(expected - user.trust_score) > 1e-9
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--rated-share", type=float, default=0.3, help="share of users with ratings")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--sample", type=int, default=2_000, help="users for the per-user baseline")
+    args = parser.parse_args()
+
+    init_db()
+    first_id = seed(args.users, args.rated_share)
+
+    seconds = per_user(first_id, args.sample, args.users)
+    print(f"per-user update_trust_score: {seconds * 1000:.2f} ms/user, "
+          f"~{seconds * args.users / 60:.0f} min for {args.users:,} users")
+
+    run = f"bench-{int(time.time())}"
+    started = time.perf_counter()
+    rescore(run, args.workers, args.chunk_size, recount_trades=False, restart=True)
+    elapsed = time.perf_counter() - started
+    print(f"batch job ({args.workers} workers): {elapsed:.1f} s, {args.users / elapsed:,.0f} users/s")
+
+    started = time.perf_counter()
+    rescore(run, args.workers, args.chunk_size, recount_trades=False, restart=False)
+    print(f"rerun of a finished run resumes at its checkpoints: {time.perf_counter() - started:.2f} s")
+    print(f"mismatches against the per-user formula: {verify(first_id, args.users, 1000)} of 1000 sampled")
@@ -0,0 +1,102 @@
+"""
+Script to benchmark wallet login signature checks: logins/sec inline and with 1..N verification processes
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import time
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from app.core.signatures import principal_from_public_key, verify_signature
+from app.services.wallet_auth import NonceStore, SignatureVerifier, WalletAuth
+
+def wallets(count: int, kind: str):
+    """(address, sign(message) -> (signature, public_key)) pairs"""
+    result = []
+    for _ in range(count):
+        if kind == "evm":
+            account = Account.create()
+            sign = lambda message, account=account: (
+                account.sign_message(encode_defunct(text=message)).signature.hex(), None
+            )
+            result.append((account.address, sign))
+        else:
+            key = Ed25519PrivateKey.generate()
+            der = key.public_key().public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+            sign = lambda message, key=key, der=der: (key.sign(message.encode()).hex(), der.hex())
+            result.append((principal_from_public_key(der), sign))
+    return result
+
+def signed_logins(auth: WalletAuth, keys, logins: int):
+    """Challenges issued and signed up front, so only verification is timed"""
+    attempts = []
+    for i in range(logins):
+        address, sign = keys[i % len(keys)]
+        nonce, message, _ = auth.challenge(address)
+        signature, public_key = sign(message)
+        attempts.append((address, nonce, signature, public_key))
+    return attempts
+
+def inline(keys, logins: int) -> float:
+    """Logins/sec verifying on the calling thread, as a synchronous handler would"""
+    auth = WalletAuth(NonceStore(), SignatureVerifier(0))
+    attempts = signed_logins(auth, keys, logins)
+    started = time.perf_counter()
+    for address, nonce, signature, public_key in attempts:
+        assert verify_signature(address, auth.nonces.get(address, nonce).message, signature, public_key)
+    return logins / (time.perf_counter() - started)
+
+async def pooled(keys, logins: int, processes: int, concurrency: int):
+    """Logins/sec through WalletAuth with concurrent clients, and the worst event loop stall seen meanwhile"""
+    verifier = SignatureVerifier(processes)
+    verifier.start()
+    auth = WalletAuth(NonceStore(), verifier)
+    # let the workers finish importing before timing
+    warm = signed_logins(auth, keys, processes or 1)
+    await asyncio.gather(*(auth.verify_login(*attempt) for attempt in warm))
+
+    attempts = signed_logins(auth, keys, logins)
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - started - 0.001)
+
+    async def client(batch):
+        for attempt in batch:
+            assert await auth.verify_login(*attempt)
+
+    tick = asyncio.ensure_future(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(client(attempts[i::concurrency]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done = True
+    await tick
+    verifier.stop()
+    return logins / elapsed, stall
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=2_000)
+    parser.add_argument("--wallets", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent login clients")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    for kind in ("evm", "icp"):
+        keys = wallets(args.wallets, kind)
+        print(f"{kind}: inline {inline(keys, args.logins):,.0f} logins/s (blocks the event loop for every check)")
+        for processes in [0] + sorted({1, 2, 4, 8, args.max_processes} & set(range(1, args.max_processes + 1))):
+            rate, stall = asyncio.run(pooled(keys, args.logins, processes, args.concurrency))
+            label = f"{processes} processes" if processes else "thread"
+            print(f"{kind}: {label:<12} {rate:,.0f} logins/s, worst event loop stall {stall * 1000:.1f} ms")
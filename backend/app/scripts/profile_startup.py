@@ -0,0 +1,84 @@
+"""
+Script to profile API cold start: -X importtime breakdown and time-to-first-request
+"""
+import sys
+import os
+import time
+import socket
+import subprocess
+import urllib.request
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def import_profile(top: int = 25):
+    """Import app.main under -X importtime and print the slowest modules"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), module.strip()))
+
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "import failed")
+
+    total = max((row[0] for row in rows), default=0)
+    print(f"Total import time: {total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {module}")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_to_first_request(runs: int = 5, timeout: float = 30.0):
+    """Start uvicorn and measure time until /health answers"""
+    samples = []
+    for _ in range(runs):
+        port = free_port()
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+        )
+        try:
+            while time.perf_counter() - started < timeout:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+                    samples.append(time.perf_counter() - started)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            else:
+                print(f"Server did not answer within {timeout}s")
+                return
+        finally:
+            server.terminate()
+            server.wait()
+
+    samples.sort()
+    print(f"Time to first request over {runs} runs:")
+    print(f"  min {samples[0] * 1000:.0f} ms, median {samples[len(samples) // 2] * 1000:.0f} ms, max {samples[-1] * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=25, help="number of modules to list")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to time")
+    parser.add_argument("--skip-server", action="store_true", help="only print the import profile")
+    args = parser.parse_args()
+
+    import_profile(args.top)
+    if not args.skip_server:
+        print()
+        time_to_first_request(args.runs)
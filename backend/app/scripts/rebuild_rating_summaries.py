@@ -0,0 +1,72 @@
+"""
+Script to rebuild the rating_summaries rows (count, sum and star histogram of
+every rated dimension) of every user from their ratings. Run it once after
+upgrading, and whenever ratings were written around RatingService. Safe to rerun.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import time
+
+from sqlalchemy import and_, case, delete, func, insert
+from app.database import init_db, scatter, session_scope
+from app.models.rating import Rating
+from app.models.rating_summary import RatingSummary
+from app.services.rating_summary import DIMENSIONS, STARS
+
+def star_count(column, n: int):
+    """Ratings in the column that round to n stars, as RatingSummaryService buckets them"""
+    bounds = []
+    if n > 1:
+        bounds.append(column >= n - 0.5)
+    if n < 5:
+        bounds.append(column < n + 0.5)
+    return func.sum(case((and_(*bounds), 1), else_=0))
+
+def rebuild(chunk_size: int) -> int:
+    def summarize_users(ratings_db) -> int:
+        after = 0
+        summarized = 0
+        while True:
+            users = [user_id for user_id, in ratings_db.query(Rating.rated_user_id).filter(
+                Rating.rated_user_id > after
+            ).group_by(Rating.rated_user_id).order_by(Rating.rated_user_id).limit(chunk_size)]
+            if not users:
+                ratings_db.rollback()
+                return summarized
+            after = users[-1]
+
+            rows = []
+            for dimension, attribute in DIMENSIONS.items():
+                column = getattr(Rating, attribute)
+                rows.extend(
+                    {"user_id": user_id, "dimension": dimension, "count": count, "total": total,
+                     **{f"stars_{n}": stars or 0 for n, stars in zip(STARS, histogram)}}
+                    for user_id, count, total, *histogram in ratings_db.query(
+                        Rating.rated_user_id, func.count(column), func.sum(column), *(star_count(column, n) for n in STARS)
+                    ).filter(
+                        Rating.rated_user_id.between(users[0], after), column.isnot(None)
+                    ).group_by(Rating.rated_user_id)
+                )
+            # release the read snapshot: summaries are written through another session
+            ratings_db.rollback()
+            with session_scope() as db:
+                db.execute(delete(RatingSummary).where(RatingSummary.user_id.in_(users)))
+                if rows:
+                    db.execute(insert(RatingSummary.__table__), rows)
+                db.commit()
+            summarized += len(users)
+
+    with session_scope() as db:
+        return sum(scatter(db, summarize_users))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=1_000, help="rated users summarized per transaction")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    print(f"Summarized the ratings of {rebuild(args.chunk_size):,} users in {time.perf_counter() - started:.1f} s")
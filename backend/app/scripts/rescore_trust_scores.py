@@ -0,0 +1,51 @@
+"""
+Script to recompute every user's trust score in bulk, e.g. after a formula change.
+
+Progress is checkpointed per worker in sync_state, so rerunning the same --run
+resumes where it stopped; --restart rescans from the first user.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import multiprocessing
+
+from app.database import session_scope
+from app.services.trust_score_job import TrustScoreJob, TRUST_SCORE_CHUNK_SIZE
+
+def rescore(run: str, worker: int, workers: int, chunk_size: int, recount_trades: bool):
+    job = TrustScoreJob(run, worker, workers, chunk_size, recount_trades)
+    stats = job.execute()
+    print(f"[worker {worker}] {stats['users']:,} users, {stats['updated']:,} updated "
+          f"in {stats['seconds']:.1f} s ({stats['chunks']} chunks)")
+
+def main(run: str, workers: int, chunk_size: int, recount_trades: bool, restart: bool):
+    with session_scope() as db:
+        TrustScoreJob.plan(db, run, workers, restart)
+
+    if workers == 1:
+        rescore(run, 0, 1, chunk_size, recount_trades)
+        return
+    # each worker owns a contiguous id slice and its own checkpoint
+    processes = [
+        multiprocessing.Process(target=rescore, args=(run, worker, workers, chunk_size, recount_trades))
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    if any(process.exitcode for process in processes):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run", default="default", help="name of the run; its checkpoints are kept under it")
+    parser.add_argument("--workers", type=int, default=1, help="processes, each scoring one slice of user ids")
+    parser.add_argument("--chunk-size", type=int, default=TRUST_SCORE_CHUNK_SIZE)
+    parser.add_argument("--recount-trades", action="store_true", help="also recount completed trades per user")
+    parser.add_argument("--restart", action="store_true", help="discard the run's checkpoints and start over")
+    args = parser.parse_args()
+
+    main(args.run, args.workers, args.chunk_size, args.recount_trades, args.restart)
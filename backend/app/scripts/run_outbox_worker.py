@@ -0,0 +1,53 @@
+"""
+Script to drain the outbox from separate processes, alongside or instead of the API's in-process workers
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import asyncio
+import multiprocessing
+
+from app.services.notifier import notifier
+from app.services.outbox_worker import OutboxWorker
+
+async def serve(concurrency: int, once: bool):
+    worker = OutboxWorker(concurrency=concurrency)
+    # trade notifications are handed to this process's notifier
+    await notifier.start()
+    try:
+        if once:
+            handled = await worker.drain()
+            print(f"[{os.getpid()}] handled {handled} events")
+            return
+        await worker.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await worker.stop()
+    finally:
+        await notifier.stop()
+
+def run(concurrency: int, once: bool):
+    asyncio.run(serve(concurrency, once))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4, help="workers per process")
+    parser.add_argument("--once", action="store_true", help="exit once no events are due")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        run(args.concurrency, args.once)
+    else:
+        # events are leased with SKIP LOCKED, so processes never pick the same one
+        processes = [
+            multiprocessing.Process(target=run, args=(args.concurrency, args.once))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,80 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import read_only
+from app.core.unit_of_work import transactional, unit_of_work
+from app.models.attachment import TradeAttachment
+from app.services.auth_service import AuthService
+from app.services.trade_service import TradeService
+
+# prefix of the attachment reference stored in a trade's payment_proof
+PROOF_REFERENCE_PREFIX = "attachment:"
+
+def proof_reference(attachment: TradeAttachment) -> str:
+    return f"{PROOF_REFERENCE_PREFIX}{attachment.id}"
+
+class AttachmentService:
+    """Files attached to trades, readable by the trade's participants and moderators"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.uow = unit_of_work(db)
+        self.trade_service = TradeService(db)
+
+    def get_trade_for_upload(self, trade_id: str, user_id: int):
+        """The trade a participant attaches a file to"""
+        trade = self.trade_service.get_trade_by_id(trade_id)
+        if not trade:
+            raise ValueError("Trade not found")
+        if trade.buyer_id != user_id and trade.seller_id != user_id:
+            raise ValueError("Access denied")
+        return trade
+
+    @transactional
+    def attach(self, trade_id: str, user_id: int, sha256: str, size: int, content_type: str,
+               filename: Optional[str] = None) -> TradeAttachment:
+        """Record a stored blob as an attachment of the trade; the same file twice is one attachment"""
+        trade = self.get_trade_for_upload(trade_id, user_id)
+        existing = self._find(trade.id, sha256)
+        if existing:
+            return existing
+        attachment = TradeAttachment(
+            trade_id=trade.id, uploaded_by=user_id, sha256=sha256, size=size,
+            content_type=content_type, filename=filename
+        )
+        try:
+            with self.db.begin_nested():
+                self.db.add(attachment)
+        except IntegrityError:
+            # uploaded concurrently by the other participant or a retry
+            return self._find(trade.id, sha256)
+        return attachment
+
+    def _find(self, trade_pk: int, sha256: str) -> Optional[TradeAttachment]:
+        return self.db.query(TradeAttachment).filter(
+            TradeAttachment.trade_id == trade_pk, TradeAttachment.sha256 == sha256
+        ).first()
+
+    @read_only
+    def get_trade_attachments(self, trade_id: str, user_id: int) -> List[TradeAttachment]:
+        """A trade's attachments, oldest first"""
+        trade = self.trade_service.get_trade_by_id(trade_id)
+        if not trade:
+            raise ValueError("Trade not found")
+        if user_id not in (trade.buyer_id, trade.seller_id) and user_id not in AuthService.ADMIN_USER_IDS:
+            raise ValueError("Access denied")
+        return self.db.query(TradeAttachment).filter(
+            TradeAttachment.trade_id == trade.id
+        ).order_by(TradeAttachment.id).all()
+
+    @read_only
+    def get_attachment(self, attachment_id: int, user_id: int) -> TradeAttachment:
+        """An attachment its trade's participants or a moderator may download"""
+        attachment = self.uow.get(TradeAttachment, attachment_id)
+        if not attachment:
+            raise ValueError("Attachment not found")
+        if user_id not in AuthService.ADMIN_USER_IDS:
+            trade = self.trade_service.get_trade_by_pk(attachment.trade_id)
+            if not trade or user_id not in (trade.buyer_id, trade.seller_id):
+                raise ValueError("Access denied")
+        return attachment
@@ -3,22 +3,30 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
-import jwt
+import logging
 import os
 from app.database import get_db
 
+logger = logging.getLogger(__name__)
+
 security = HTTPBearer()
 
 class AuthService:
     SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
+    # how long an emailed sign-in code can be used
+    EMAIL_CODE_EXPIRE_MINUTES = int(os.getenv("EMAIL_CODE_EXPIRE_MINUTES", "15"))
+    # users allowed on the moderation endpoints
+    ADMIN_USER_IDS = frozenset(int(i) for i in os.getenv("ADMIN_USER_IDS", "").split(",") if i.strip())
     
     def __init__(self, db: Session):
         self.db = db
     
     def create_access_token(self, user_id: int) -> str:
         """Create JWT access token"""
+        import jwt
+
         expire = datetime.utcnow() + timedelta(minutes=self.ACCESS_TOKEN_EXPIRE_MINUTES)
         to_encode = {
             "sub": str(user_id),
@@ -30,6 +38,8 @@ class AuthService:
     
     def verify_token(self, token: str) -> Optional[int]:
         """Verify JWT token and return user ID"""
+        import jwt
+
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             user_id: str = payload.get("sub")
@@ -39,6 +49,32 @@ class AuthService:
         except jwt.PyJWTError:
             return None
     
+    def create_email_code(self, user) -> str:
+        """Sign-in code to email to the user.
+
+        It names the user's last login, which logging in changes, so a code
+        works once. It has no subject, so it is never taken as an access token.
+        """
+        import jwt
+
+        to_encode = {
+            "email_login": str(user.id),
+            "last_login": user.last_login.isoformat() if user.last_login else None,
+            "exp": datetime.utcnow() + timedelta(minutes=self.EMAIL_CODE_EXPIRE_MINUTES),
+        }
+        return jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+    
+    def verify_email_code(self, code: str, user) -> bool:
+        """Whether code is an unused, unexpired sign-in code of user"""
+        import jwt
+
+        try:
+            payload = jwt.decode(code, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except jwt.PyJWTError:
+            return False
+        last_login = user.last_login.isoformat() if user.last_login else None
+        return payload.get("email_login") == str(user.id) and payload.get("last_login") == last_login
+    
     @staticmethod
     def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -55,4 +91,27 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
+        # lets the session keep this user's reads on the primary right after they write
+        db.info["user_id"] = user_id
         return user_id
+    
+    @staticmethod
+    def get_current_admin(current_user_id: int = Depends(get_current_user)) -> int:
+        """Dependency to get the current user, who must be a moderator"""
+        if current_user_id not in AuthService.ADMIN_USER_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Moderator access required"
+            )
+        return current_user_id
+
+async def send_email_code(email: str, code: str):
+    """Email a sign-in code (SMTP settings of the email notification channel)"""
+    from app.services.notification_channels import ChannelError, EmailChannel
+
+    text = (f"Your TrustPeer sign-in code, valid for {AuthService.EMAIL_CODE_EXPIRE_MINUTES} minutes:\n\n{code}\n\n"
+            "Ignore this email if you did not ask to sign in.")
+    try:
+        await EmailChannel().send(email, text)
+    except ChannelError:
+        logger.exception("Sign-in code email to %s failed", email)
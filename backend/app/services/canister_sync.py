@@ -0,0 +1,222 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import update
+from typing import Callable, Dict, Iterable, List, Optional
+import asyncio
+import logging
+import os
+import time
+from app.core.amounts import FIAT_DECIMALS, from_units
+from app.core.metrics import registry
+from app.database import insert_rows, session_scope
+from app.models.sync_state import SyncState
+from app.models.trade import Trade, TradeStatus, TradeType, CryptoCurrency
+from app.models.trade_archive import ArchivedTrade
+from app.models.user import User
+from app.services.user_lookup import TELEGRAM, replace_keys, user_keys
+from app.services.chain_client import (
+    MIRROR_TRADE_ID_PREFIX, CanisterTrade, ChainClient, ChangePage, TradeState, TraderProfile, get_chain_client
+)
+
+logger = logging.getLogger(__name__)
+
+# changes pulled and written per page (the canister returns at most 1000), and seconds between polls once caught up
+CANISTER_SYNC_BATCH_SIZE = int(os.getenv("CANISTER_SYNC_BATCH_SIZE", "1000"))
+CANISTER_SYNC_INTERVAL = float(os.getenv("CANISTER_SYNC_INTERVAL", "5"))
+# run the sync worker inside the API process
+CANISTER_SYNC_ENABLED = os.getenv("CANISTER_SYNC_ENABLED", "false").lower() == "true"
+# the canister holds usdtAmount in the token's smallest unit and ngnAmount in whole naira
+CANISTER_USDT_DECIMALS = int(os.getenv("CANISTER_USDT_DECIMALS", "6"))
+
+TRADES = "canister.trades"
+PROFILES = "canister.profiles"
+
+RATE_QUANTUM = Decimal("0.00000001")
+
+TRADE_STATUSES = {
+    TradeState.CREATED: TradeStatus.INITIATED,
+    TradeState.PAYMENT_SENT: TradeStatus.PAYMENT_SENT,
+    TradeState.PAYMENT_RECEIVED: TradeStatus.PAYMENT_CONFIRMED,
+    TradeState.COMPLETED: TradeStatus.COMPLETED,
+    TradeState.DISPUTED: TradeStatus.DISPUTED,
+    TradeState.CANCELLED: TradeStatus.CANCELLED,
+}
+
+sync_position = registry.gauge("canister_sync_position", "Last change sequence applied to the mirror")
+sync_head = registry.gauge("canister_sync_head", "Latest change sequence reported by the canister")
+sync_lag = registry.gauge("canister_sync_lag", "Changes the mirror is behind the canister")
+sync_lag_seconds = registry.gauge("canister_sync_lag_seconds", "Seconds since the mirror was last caught up")
+sync_applied = registry.counter("canister_sync_applied_total", "Records written to the mirror")
+
+def _timestamp(ns: Optional[int]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(ns / 1e9) if ns else None
+
+class CanisterSyncWorker:
+    """Keeps the trades/users tables in step with the escrow canister.
+
+    Each stream (trades, profiles) has a high-water mark in sync_state. The
+    worker pulls pages of changes after the mark with list_*_since and applies
+    each page with bulk inserts/updates in the same transaction that advances
+    the mark, so a crash resumes exactly where the last page ended.
+    """
+
+    def __init__(self, client_factory: Callable[[], ChainClient] = get_chain_client,
+                 batch_size: int = CANISTER_SYNC_BATCH_SIZE, interval: float = CANISTER_SYNC_INTERVAL):
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self._caught_up_at: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync(self, stream: str) -> int:
+        """Apply changes until caught up; returns the number of records applied"""
+        client = self.client_factory()
+        fetch = client.list_trades_since if stream == TRADES else client.list_profiles_since
+        apply = self._apply_trades if stream == TRADES else self._apply_profiles
+
+        position = await asyncio.to_thread(self._position, stream)
+        applied = 0
+        while True:
+            page: ChangePage = await fetch(position, self.batch_size)
+            if page.next > position:
+                await asyncio.to_thread(apply, stream, page)
+                applied += len(page.items)
+                sync_applied.inc(len(page.items), stream=stream)
+                position = page.next
+            self._observe(stream, position, page.head)
+            if position >= page.head:
+                return applied
+
+    async def sync_all(self) -> int:
+        return sum([await self.sync(PROFILES), await self.sync(TRADES)])
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync_all()
+            except Exception:
+                logger.exception("Canister sync failed")
+            await asyncio.sleep(self.interval)
+
+    def _observe(self, stream: str, position: int, head: int):
+        now = time.time()
+        if position >= head or stream not in self._caught_up_at:
+            self._caught_up_at[stream] = now
+        sync_position.set(position, stream=stream)
+        sync_head.set(head, stream=stream)
+        sync_lag.set(max(head - position, 0), stream=stream)
+        sync_lag_seconds.set(0 if position >= head else now - self._caught_up_at[stream], stream=stream)
+
+    # high-water marks
+
+    def _position(self, stream: str) -> int:
+        with session_scope() as db:
+            state = db.query(SyncState).filter(SyncState.stream == stream).first()
+            return state.position if state else 0
+
+    def _advance(self, db, stream: str, page: ChangePage):
+        state = db.query(SyncState).filter(SyncState.stream == stream).first()
+        if state is None:
+            state = SyncState(stream=stream)
+            db.add(state)
+        state.position = page.next
+        state.head = page.head
+
+    # applying pages
+
+    def _user_ids(self, db, principals: Iterable[str], profiles: Dict[str, TraderProfile] = None) -> Dict[str, int]:
+        """Map principals to user ids, creating users for principals seen for the first time"""
+        principals = set(principals)
+        ids = dict(db.query(User.wallet_address, User.id).filter(User.wallet_address.in_(principals)))
+        missing = principals - ids.keys()
+        if missing:
+            rows = []
+            for principal in missing:
+                profile = (profiles or {}).get(principal)
+                rows.append({
+                    "wallet_address": principal,
+                    "username": principal,
+                    "telegram_handle": profile.telegram_handle if profile else None,
+                    "total_trades": profile.total_trades if profile else 0,
+                    "successful_trades": profile.positive_trades if profile else 0,
+                })
+            insert_rows(db, User, rows)
+            added = dict(db.query(User.wallet_address, User.id).filter(User.wallet_address.in_(missing)))
+            keys = {
+                added[row["wallet_address"]]: user_keys(row["username"], row["telegram_handle"], row["wallet_address"])
+                for row in rows
+            }
+            replace_keys(db, keys)
+            ids.update(added)
+        return ids
+
+    def _apply_profiles(self, stream: str, page: ChangePage):
+        with session_scope() as db:
+            profiles = {profile.principal: profile for _, profile in page.items}
+            existing = dict(db.query(User.wallet_address, User.id).filter(User.wallet_address.in_(profiles)))
+            if existing:
+                db.execute(update(User), [
+                    {"id": user_id, "telegram_handle": profiles[principal].telegram_handle}
+                    for principal, user_id in existing.items()
+                ])
+                replace_keys(db, {
+                    user_id: user_keys(None, profiles[principal].telegram_handle, None)
+                    for principal, user_id in existing.items()
+                }, kinds=(TELEGRAM,))
+            self._user_ids(db, profiles.keys() - existing.keys(), profiles)
+            self._advance(db, stream, page)
+            db.commit()
+
+    def _trade_row(self, trade: CanisterTrade, users: Dict[str, int]) -> Dict:
+        crypto_amount = from_units(trade.usdt_amount, CANISTER_USDT_DECIMALS)
+        fiat_amount = Decimal(trade.ngn_amount).quantize(Decimal(1).scaleb(-FIAT_DECIMALS))
+        status = TRADE_STATUSES[TradeState(trade.state)]
+        return {
+            "trade_id": f"{MIRROR_TRADE_ID_PREFIX}{trade.id}",
+            "buyer_id": users[trade.buyer],
+            "seller_id": users[trade.seller],
+            "crypto_amount": crypto_amount,
+            "fiat_amount": fiat_amount,
+            "exchange_rate": (fiat_amount / crypto_amount).quantize(RATE_QUANTUM) if crypto_amount else Decimal(0),
+            "crypto_currency": CryptoCurrency.USDT,
+            "fiat_currency": "NGN",
+            "trade_type": TradeType.BUY,
+            "payment_method": "bank_transfer",
+            "status": status,
+            "is_disputed": status == TradeStatus.DISPUTED,
+            "dispute_reason": trade.dispute_reason,
+            "created_at": _timestamp(trade.created_at),
+            "updated_at": datetime.utcnow(),
+            "completed_at": _timestamp(trade.release_requested_at) if status == TradeStatus.COMPLETED else None,
+        }
+
+    def _apply_trades(self, stream: str, page: ChangePage):
+        with session_scope() as db:
+            trades: List[CanisterTrade] = [trade for _, trade in page.items]
+            users = self._user_ids(db, [p for trade in trades for p in (trade.buyer, trade.seller)])
+            rows = {row["trade_id"]: row for row in (self._trade_row(trade, users) for trade in trades)}
+            # finished trades may have moved to the archive; they are updated there
+            for model in (Trade, ArchivedTrade):
+                existing = dict(db.query(model.trade_id, model.id).filter(model.trade_id.in_(rows))) if rows else {}
+                if existing:
+                    db.execute(update(model), [
+                        dict(rows.pop(trade_id), id=trade_pk) for trade_id, trade_pk in existing.items()
+                    ])
+            if rows:
+                insert_rows(db, Trade, list(rows.values()))
+            self._advance(db, stream, page)
+            db.commit()
+
+canister_sync = CanisterSyncWorker()
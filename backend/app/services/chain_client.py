@@ -0,0 +1,428 @@
+from bisect import bisect_right
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+import asyncio
+import os
+import time
+import uuid
+from app.core.plugins import load_object
+
+# "module:Class" of the ChainClient to use; the in-process stand-in by default
+CHAIN_CLIENT = os.getenv("CHAIN_CLIENT")
+# account (canister principal) escrow deposits must be sent to
+CHAIN_ESCROW_ACCOUNT = os.getenv("CHAIN_ESCROW_ACCOUNT", os.getenv("ICP_CANISTER_ID", "escrow"))
+CHAIN_MIN_CONFIRMATIONS = int(os.getenv("CHAIN_MIN_CONFIRMATIONS", "1"))
+# treat unknown deposit hashes as confirmed in the local stand-in (development only)
+CHAIN_LOCAL_AUTO_CONFIRM = os.getenv("CHAIN_LOCAL_AUTO_CONFIRM", "false").lower() == "true"
+
+# trade_id prefix of trades mirrored from the canister; the canister settles those itself
+MIRROR_TRADE_ID_PREFIX = "ICP"
+# most changes one list_*_since call returns (maxPageSize in the canister)
+MAX_PAGE_SIZE = 1000
+
+class ChainError(Exception):
+    """Error returned by the chain or canister (the #err side of a Result)"""
+
+class DepositStatus(str, Enum):
+    CONFIRMED = "confirmed"
+    PENDING = "pending"        # seen, not enough confirmations yet
+    NOT_FOUND = "not_found"    # not seen yet, may still propagate
+    INVALID = "invalid"        # wrong sender, recipient, memo or amount, never becomes valid
+
+def deposit_memo(trade_id: str) -> str:
+    """Memo the seller's escrow deposit must carry, tying the transfer to one trade"""
+    return f"escrow:{trade_id}"
+
+@dataclass(frozen=True)
+class Deposit:
+    """An escrow deposit to verify: tx_hash must pay at least amount from sender to the
+    escrow account, with memo naming the trade"""
+    tx_hash: str
+    amount: int  # smallest units
+    sender: str
+    memo: str
+    to: str = CHAIN_ESCROW_ACCOUNT
+
+@dataclass(frozen=True)
+class Transfer:
+    tx_hash: str
+    sender: str
+    to: str
+    amount: int
+    confirmations: int = CHAIN_MIN_CONFIRMATIONS
+    memo: Optional[str] = None
+
+class TradeState(str, Enum):
+    """Mirror of the canister's TradeState variant"""
+    CREATED = "Created"
+    PAYMENT_SENT = "PaymentSent"
+    PAYMENT_RECEIVED = "PaymentReceived"
+    COMPLETED = "Completed"
+    DISPUTED = "Disputed"
+    CANCELLED = "Cancelled"
+
+@dataclass(frozen=True)
+class CanisterTrade:
+    """Mirror of the canister's Trade record; times are nanoseconds like Time.now()"""
+    id: int
+    buyer: str
+    seller: str
+    usdt_amount: int
+    ngn_amount: int
+    state: TradeState
+    created_at: int
+    payment_sent_at: Optional[int] = None
+    payment_received_at: Optional[int] = None
+    release_requested_at: Optional[int] = None
+    dispute_reason: Optional[str] = None
+
+@dataclass(frozen=True)
+class TraderProfile:
+    principal: str
+    telegram_handle: str
+    rating: float = 0.0
+    total_trades: int = 0
+    positive_trades: int = 0
+
+T = TypeVar("T")
+
+@dataclass(frozen=True)
+class ChangePage(Generic[T]):
+    """Mirror of the canister's TradePage/ProfilePage: (sequence, record) pairs after a
+    high-water mark, the mark to resume from and the latest sequence number"""
+    items: List[Tuple[int, T]]
+    next: int
+    head: int
+
+def change_page(log: List[Tuple[int, T]], seq: Dict, get: Callable, since: int, limit: int, head: int) -> ChangePage:
+    """Walk a change log of (sequence, key) entries from since, skipping entries superseded by a later change"""
+    items = []
+    index = bisect_right(log, since, key=lambda entry: entry[0])
+    position = since
+    while index < len(log) and len(items) < min(limit, MAX_PAGE_SIZE):
+        position, key = log[index]
+        index += 1
+        if seq.get(key) == position:
+            items.append((position, get(key)))
+    if index == len(log):
+        position = max(position, head)
+    return ChangePage(items, position, head)
+
+def compact_log(log: List[Tuple[int, T]], seq: Dict) -> List[Tuple[int, T]]:
+    """Entries still holding their key's latest change"""
+    return [(position, key) for position, key in log if seq.get(key) == position]
+
+class ChainClient:
+    """Async access to the escrow canister and the token ledger"""
+
+    async def verify_deposits(self, deposits: List[Deposit]) -> Dict[str, DepositStatus]:
+        """Look up many deposits in one round trip"""
+        raise NotImplementedError
+
+    async def transfer(self, to: str, amount: int, memo: str) -> str:
+        """Pay out of escrow; repeated calls with the same memo must not pay twice"""
+        raise NotImplementedError
+
+    async def list_trades_since(self, since: int, limit: int) -> ChangePage[CanisterTrade]:
+        """Trades changed after change sequence since (listTradesSince)"""
+        raise NotImplementedError
+
+    async def list_profiles_since(self, since: int, limit: int) -> ChangePage[TraderProfile]:
+        """Profiles changed after change sequence since (listProfilesSince)"""
+        raise NotImplementedError
+
+class LocalCanisterClient(ChainClient):
+    """In-process stand-in for the escrow canister (Smart_contract/src/Contract_backend/escrow.mo).
+
+    Keeps trades, profiles and a token ledger in memory and follows the
+    canister's rules and error messages. latency adds a delay to every call
+    to mimic chain round trips.
+    """
+
+    def __init__(self, admin: str = "admin", escrow_account: str = CHAIN_ESCROW_ACCOUNT,
+                 latency: float = 0.0, auto_confirm: bool = CHAIN_LOCAL_AUTO_CONFIRM):
+        self.admin = admin
+        self.escrow_account = escrow_account
+        self.latency = latency
+        self.auto_confirm = auto_confirm
+        self.trades: Dict[int, CanisterTrade] = {}
+        self.profiles: Dict[str, TraderProfile] = {}
+        self.ledger: Dict[str, Transfer] = {}
+        self.balances: Dict[str, int] = {}
+        self.next_trade_id = 1
+        self.calls = 0
+        # change logs backing list_*_since, compacted as in the canister
+        self.trade_log: List[Tuple[int, int]] = []
+        self.trade_seq: Dict[int, int] = {}
+        self.trade_head = 0
+        self.profile_log: List[Tuple[int, str]] = []
+        self.profile_seq: Dict[str, int] = {}
+        self.profile_head = 0
+
+    async def _call(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    # ledger
+
+    def record_transfer(self, tx_hash: str, sender: str, to: str, amount: int,
+                        confirmations: int = CHAIN_MIN_CONFIRMATIONS, memo: Optional[str] = None) -> Transfer:
+        """Put a transfer on the local ledger (tests and development)"""
+        transfer = Transfer(tx_hash, sender, to, amount, confirmations, memo)
+        self.ledger[tx_hash] = transfer
+        self.balances[sender] = self.balances.get(sender, 0) - amount
+        self.balances[to] = self.balances.get(to, 0) + amount
+        return transfer
+
+    def confirm(self, tx_hash: str, confirmations: int):
+        self.ledger[tx_hash] = replace(self.ledger[tx_hash], confirmations=confirmations)
+
+    async def verify_deposits(self, deposits: List[Deposit]) -> Dict[str, DepositStatus]:
+        await self._call()
+        result = {}
+        for deposit in deposits:
+            transfer = self.ledger.get(deposit.tx_hash)
+            if transfer is None:
+                result[deposit.tx_hash] = DepositStatus.CONFIRMED if self.auto_confirm else DepositStatus.NOT_FOUND
+            elif (transfer.to, transfer.sender, transfer.memo) != (deposit.to, deposit.sender, deposit.memo) \
+                    or transfer.amount < deposit.amount:
+                result[deposit.tx_hash] = DepositStatus.INVALID
+            elif transfer.confirmations < CHAIN_MIN_CONFIRMATIONS:
+                result[deposit.tx_hash] = DepositStatus.PENDING
+            else:
+                result[deposit.tx_hash] = DepositStatus.CONFIRMED
+        return result
+
+    async def transfer(self, to: str, amount: int, memo: str) -> str:
+        await self._call()
+        for transfer in self.ledger.values():
+            if transfer.memo == memo and transfer.sender == self.escrow_account:
+                return transfer.tx_hash
+        tx_hash = uuid.uuid4().hex
+        self.record_transfer(tx_hash, self.escrow_account, to, amount, memo=memo)
+        return tx_hash
+
+    # escrow.mo interface
+
+    def _put_trade(self, trade: CanisterTrade):
+        self.trade_head += 1
+        self.trades[trade.id] = trade
+        self.trade_log.append((self.trade_head, trade.id))
+        self.trade_seq[trade.id] = self.trade_head
+        if len(self.trade_log) >= 2 * len(self.trade_seq) + 64:
+            self.trade_log = compact_log(self.trade_log, self.trade_seq)
+
+    def _put_profile(self, profile: TraderProfile):
+        self.profile_head += 1
+        self.profiles[profile.principal] = profile
+        self.profile_log.append((self.profile_head, profile.principal))
+        self.profile_seq[profile.principal] = self.profile_head
+        if len(self.profile_log) >= 2 * len(self.profile_seq) + 64:
+            self.profile_log = compact_log(self.profile_log, self.profile_seq)
+
+    def _trade(self, trade_id: int) -> CanisterTrade:
+        trade = self.trades.get(trade_id)
+        if trade is None:
+            raise ChainError("Trade not found")
+        return trade
+
+    def _update_profile_stats(self, principal: str, positive: bool):
+        profile = self.profiles.get(principal)
+        if profile:
+            total = profile.total_trades + 1
+            positive_trades = profile.positive_trades + (1 if positive else 0)
+            self._put_profile(replace(
+                profile, total_trades=total, positive_trades=positive_trades,
+                rating=positive_trades / total * 5.0
+            ))
+
+    async def create_trade(self, caller: str, buyer: str, usdt_amount: int, ngn_amount: int) -> int:
+        await self._call()
+        for trade in self.trades.values():
+            if (trade.buyer, trade.seller, trade.usdt_amount, trade.ngn_amount, trade.state) == \
+                    (buyer, caller, usdt_amount, ngn_amount, TradeState.CREATED):
+                raise ChainError("Duplicate trade exists")
+        trade = CanisterTrade(self.next_trade_id, buyer, caller, usdt_amount, ngn_amount,
+                              TradeState.CREATED, time.time_ns())
+        self._put_trade(trade)
+        self.next_trade_id += 1
+        return trade.id
+
+    async def confirm_payment_sent(self, caller: str, trade_id: int):
+        await self._call()
+        trade = self._trade(trade_id)
+        if trade.buyer != caller:
+            raise ChainError("Only buyer can confirm payment sent")
+        if trade.state != TradeState.CREATED:
+            raise ChainError("Trade not in Created state")
+        self._put_trade(replace(trade, state=TradeState.PAYMENT_SENT, payment_sent_at=time.time_ns()))
+
+    async def confirm_payment_received(self, caller: str, trade_id: int):
+        await self._call()
+        trade = self._trade(trade_id)
+        if trade.seller != caller:
+            raise ChainError("Only seller can confirm payment received")
+        if trade.state != TradeState.PAYMENT_SENT:
+            raise ChainError("Trade not in PaymentSent state")
+        self._put_trade(replace(trade, state=TradeState.PAYMENT_RECEIVED, payment_received_at=time.time_ns()))
+
+    async def release_crypto(self, caller: str, trade_id: int):
+        await self._call()
+        if caller != self.admin:
+            raise ChainError("Only admin can release crypto")
+        trade = self._trade(trade_id)
+        if trade.state != TradeState.PAYMENT_RECEIVED:
+            raise ChainError("Trade not in PaymentReceived state")
+        if self.balances.get(self.escrow_account, 0) < trade.usdt_amount:
+            raise ChainError("Escrow underfunded. Transfer missing")
+        self._put_trade(replace(trade, state=TradeState.COMPLETED, release_requested_at=time.time_ns()))
+        self.record_transfer(uuid.uuid4().hex, self.escrow_account, trade.buyer, trade.usdt_amount, memo=f"trade:{trade_id}")
+        self._update_profile_stats(trade.buyer, True)
+        self._update_profile_stats(trade.seller, True)
+
+    async def initiate_dispute(self, caller: str, trade_id: int, reason: str):
+        await self._call()
+        trade = self._trade(trade_id)
+        if caller not in (trade.buyer, trade.seller):
+            raise ChainError("Only buyer or seller can dispute")
+        if trade.state in (TradeState.COMPLETED, TradeState.CANCELLED):
+            raise ChainError("Cannot dispute completed/cancelled trade")
+        self._put_trade(replace(trade, state=TradeState.DISPUTED, dispute_reason=reason))
+
+    async def admin_cancel_trade(self, caller: str, trade_id: int, reason: str):
+        await self._call()
+        if caller != self.admin:
+            raise ChainError("Only admin can cancel trade")
+        trade = self._trade(trade_id)
+        if trade.state in (TradeState.COMPLETED, TradeState.CANCELLED):
+            raise ChainError("Trade already completed/cancelled")
+        self._put_trade(replace(trade, state=TradeState.CANCELLED, dispute_reason=reason))
+
+    async def update_profile(self, caller: str, telegram_handle: str):
+        await self._call()
+        profile = self.profiles.get(caller)
+        self._put_profile(replace(profile, telegram_handle=telegram_handle) if profile
+                          else TraderProfile(caller, telegram_handle))
+
+    async def get_trade(self, trade_id: int) -> Optional[CanisterTrade]:
+        await self._call()
+        return self.trades.get(trade_id)
+
+    async def get_profile(self, principal: str) -> Optional[TraderProfile]:
+        await self._call()
+        return self.profiles.get(principal)
+
+    async def list_user_trades(self, user: str) -> List[CanisterTrade]:
+        await self._call()
+        return [t for t in self.trades.values() if user in (t.buyer, t.seller)]
+
+    async def list_all_trades(self) -> List[CanisterTrade]:
+        await self._call()
+        return list(self.trades.values())
+
+    async def list_all_profiles(self) -> List[TraderProfile]:
+        await self._call()
+        return list(self.profiles.values())
+
+    async def list_trades_since(self, since: int, limit: int) -> ChangePage[CanisterTrade]:
+        await self._call()
+        return change_page(self.trade_log, self.trade_seq, self.trades.__getitem__, since, limit, self.trade_head)
+
+    async def list_profiles_since(self, since: int, limit: int) -> ChangePage[TraderProfile]:
+        await self._call()
+        return change_page(self.profile_log, self.profile_seq, self.profiles.__getitem__, since, limit, self.profile_head)
+
+class SyntheticCanisterClient(LocalCanisterClient):
+    """Stand-in serving a large generated dataset for sync tests and benchmarks.
+
+    Trade i (and change sequence i) is derived from i on demand, so a million
+    trades cost no memory until something changes them; touch() records later
+    state changes in the regular change log, after the generated range.
+    """
+
+    STATES = list(TradeState)
+
+    def __init__(self, trades: int = 1_000_000, profiles: int = 10_000, **kwargs):
+        super().__init__(**kwargs)
+        self.generated_trades = trades
+        self.generated_profiles = profiles
+        self.next_trade_id = trades + 1
+        self.started_at = time.time_ns() - trades * 1_000_000_000
+
+    def principal(self, n: int) -> str:
+        return f"synthetic-{n:07d}-cai"
+
+    def generated_trade(self, trade_id: int) -> CanisterTrade:
+        buyer = trade_id * 7919 % self.generated_profiles
+        seller = (buyer + 1 + trade_id % (self.generated_profiles - 1)) % self.generated_profiles
+        usdt = (trade_id * 2654435761 % 5000 + 10) * 10 ** 6
+        state = self.STATES[trade_id % len(self.STATES)]
+        created_at = self.started_at + trade_id * 1_000_000_000
+        return CanisterTrade(
+            trade_id, self.principal(buyer), self.principal(seller), usdt, usdt // 10 ** 6 * 1500, state, created_at,
+            dispute_reason="Synthetic dispute" if state == TradeState.DISPUTED else None,
+        )
+
+    def generated_profile(self, n: int) -> TraderProfile:
+        total = n % 50
+        positive = total - total // 10
+        return TraderProfile(self.principal(n), f"@trader{n}", total and positive / total * 5.0, total, positive)
+
+    def _trade(self, trade_id: int) -> CanisterTrade:
+        if trade_id not in self.trades and 0 < trade_id <= self.generated_trades:
+            return self.generated_trade(trade_id)
+        return super()._trade(trade_id)
+
+    def touch(self, trade_id: int, state: TradeState):
+        """Change a trade's state, appending to the change log"""
+        self._put_trade(replace(self._trade(trade_id), state=state))
+
+    async def list_trades_since(self, since: int, limit: int) -> ChangePage[CanisterTrade]:
+        await self._call()
+        generated = self.generated_trades
+        limit = min(limit, MAX_PAGE_SIZE)
+        items = []
+        position = since
+        while position < generated and len(items) < limit:
+            position += 1
+            if position not in self.trade_seq:  # not superseded by a later change
+                items.append((position, self.generated_trade(position)))
+        if len(items) < limit:
+            page = change_page(self.trade_log, self.trade_seq, self.trades.__getitem__,
+                               position - generated, limit - len(items), self.trade_head)
+            items.extend((seq + generated, trade) for seq, trade in page.items)
+            position = page.next + generated
+        return ChangePage(items, position, generated + self.trade_head)
+
+    async def list_profiles_since(self, since: int, limit: int) -> ChangePage[TraderProfile]:
+        await self._call()
+        generated = self.generated_profiles
+        limit = min(limit, MAX_PAGE_SIZE)
+        items = []
+        position = since
+        while position < generated and len(items) < limit:
+            position += 1
+            if self.principal(position - 1) not in self.profile_seq:
+                items.append((position, self.generated_profile(position - 1)))
+        if len(items) < limit:
+            page = change_page(self.profile_log, self.profile_seq, self.profiles.__getitem__,
+                               position - generated, limit - len(items), self.profile_head)
+            items.extend((seq + generated, profile) for seq, profile in page.items)
+            position = page.next + generated
+        return ChangePage(items, position, generated + self.profile_head)
+
+_client: Optional[ChainClient] = None
+
+def get_chain_client() -> ChainClient:
+    """Return the configured chain client"""
+    global _client
+    if _client is None:
+        _client = load_object(CHAIN_CLIENT)() if CHAIN_CLIENT else LocalCanisterClient()
+    return _client
+
+def set_chain_client(client: ChainClient):
+    """Replace the chain client (tests, custom deployments)"""
+    global _client
+    _client = client
@@ -1,13 +1,267 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, NamedTuple
+from decimal import Decimal
+import json
+import os
+import time
+from app.database import read_only
 from app.models.crypto_config import CryptoConfig
 from app.models.trade import CryptoCurrency
-from app.schemas.crypto import CryptoConfigCreate, CryptoOption
+from app.schemas.crypto import CryptoConfigCreate, CryptoOption, QuoteItem
+from app.core.unit_of_work import transactional, unit_of_work
+from app.core.amounts import Number, to_decimal, to_units, from_units, fee_ratio, fee_units
+
+# For now, all cryptos can be traded against these fiat currencies
+SUPPORTED_FIAT_CURRENCIES = ("NGN", "USD", "EUR", "GBP", "KES", "GHS", "ZAR")
+
+# seconds the active config table is reused for quotes
+CRYPTO_CONFIG_CACHE_TTL = float(os.getenv("CRYPTO_CONFIG_CACHE_TTL", "30"))
+
+# Default cryptocurrency configurations, built once at import
+DEFAULT_CRYPTOCURRENCIES = (
+    {
+        "symbol": "USDT",
+        "name": "Tether",
+        "network": "ethereum",
+        "contract_address": "0xdAC17F958D2ee523a2206206994597C13D831ec7",
+        "decimals": 6,
+        "minimum_amount_trade": 10.0,
+        "maximum_amount_trade": 100000.0,
+        "trade_percentage_fee": 0.1,
+        "icon_url": "https://cryptologos.cc/logos/tether-usdt-logo.png",
+        "color": "#26A17B"
+    },
+    {
+        "symbol": "BTC",
+        "name": "Bitcoin",
+        "network": "bitcoin",
+        "decimals": 8,
+        "minimum_amount_trade": 0.001,
+        "maximum_amount_trade": 10.0,
+        "trade_percentage_fee": 0.15,
+        "icon_url": "https://cryptologos.cc/logos/bitcoin-btc-logo.png",
+        "color": "#F7931A"
+    },
+    {
+        "symbol": "ETH",
+        "name": "Ethereum",
+        "network": "ethereum",
+        "decimals": 18,
+        "minimum_amount_trade": 0.01,
+        "maximum_amount_trade": 100.0,
+        "trade_percentage_fee": 0.12,
+        "icon_url": "https://cryptologos.cc/logos/ethereum-eth-logo.png",
+        "color": "#627EEA"
+    },
+    {
+        "symbol": "USDC",
+        "name": "USD Coin",
+        "network": "ethereum",
+        "contract_address": "0xA0b86a33E6441b8435b662303c0f218C8c7c8e37",
+        "decimals": 6,
+        "minimum_amount_trade": 10.0,
+        "maximum_amount_trade": 100000.0,
+        "trade_percentage_fee": 0.1,
+        "icon_url": "https://cryptologos.cc/logos/usd-coin-usdc-logo.png",
+        "color": "#2775CA"
+    },
+    {
+        "symbol": "BNB",
+        "name": "Binance Coin",
+        "network": "binance-smart-chain",
+        "decimals": 18,
+        "minimum_amount_trade": 0.1,
+        "maximum_amount_trade": 1000.0,
+        "trade_percentage_fee": 0.12,
+        "icon_url": "https://cryptologos.cc/logos/bnb-bnb-logo.png",
+        "color": "#F3BA2F"
+    },
+    {
+        "symbol": "ADA",
+        "name": "Cardano",
+        "network": "cardano",
+        "decimals": 6,
+        "minimum_amount_trade": 10.0,
+        "maximum_amount_trade": 10000.0,
+        "trade_percentage_fee": 0.12,
+        "icon_url": "https://cryptologos.cc/logos/cardano-ada-logo.png",
+        "color": "#0033AD"
+    },
+    {
+        "symbol": "SOL",
+        "name": "Solana",
+        "network": "solana",
+        "decimals": 9,
+        "minimum_amount_trade": 0.1,
+        "maximum_amount_trade": 1000.0,
+        "trade_percentage_fee": 0.12,
+        "icon_url": "https://cryptologos.cc/logos/solana-sol-logo.png",
+        "color": "#9945FF"
+    },
+    {
+        "symbol": "DOT",
+        "name": "Polkadot",
+        "network": "polkadot",
+        "decimals": 10,
+        "minimum_amount_trade": 1.0,
+        "maximum_amount_trade": 1000.0,
+        "trade_percentage_fee": 0.12,
+        "icon_url": "https://cryptologos.cc/logos/polkadot-new-dot-logo.png",
+        "color": "#E6007A"
+    },
+    {
+        "symbol": "MATIC",
+        "name": "Polygon",
+        "network": "polygon",
+        "decimals": 18,
+        "minimum_amount_trade": 10.0,
+        "maximum_amount_trade": 10000.0,
+        "trade_percentage_fee": 0.1,
+        "icon_url": "https://cryptologos.cc/logos/polygon-matic-logo.png",
+        "color": "#8247E5"
+    },
+    {
+        "symbol": "AVAX",
+        "name": "Avalanche",
+        "network": "avalanche",
+        "decimals": 18,
+        "minimum_amount_trade": 0.1,
+        "maximum_amount_trade": 1000.0,
+        "trade_percentage_fee": 0.12,
+        "icon_url": "https://cryptologos.cc/logos/avalanche-avax-logo.png",
+        "color": "#E84142"
+    }
+)
+
+class QuoteTerms(NamedTuple):
+    """Fee and limit terms of one asset in smallest-unit integers"""
+    symbol: str
+    decimals: int
+    min_units: int
+    max_units: int
+    fee_percentage: Decimal
+    fee_numerator: int
+    fee_denominator: int
+
+    @classmethod
+    def from_config(cls, config) -> "QuoteTerms":
+        fee_percentage = to_decimal(config.trade_percentage_fee)
+        numerator, denominator = fee_ratio(fee_percentage)
+        return cls(
+            symbol=config.symbol,
+            decimals=config.decimals,
+            min_units=to_units(config.minimum_amount_trade, config.decimals),
+            max_units=to_units(config.maximum_amount_trade, config.decimals),
+            fee_percentage=fee_percentage,
+            fee_numerator=numerator,
+            fee_denominator=denominator,
+        )
+
+class CryptoConfigCache:
+    """Process-wide snapshot of the active config table, refreshed after ttl seconds"""
+
+    def __init__(self, ttl: float = CRYPTO_CONFIG_CACHE_TTL):
+        self.ttl = ttl
+        self._terms: Optional[Dict[str, QuoteTerms]] = None
+        self._loaded_at = 0.0
+
+    def get(self, db: Session) -> Dict[str, QuoteTerms]:
+        if self._terms is None or time.monotonic() - self._loaded_at > self.ttl:
+            configs = db.query(CryptoConfig).filter(CryptoConfig.is_active == True).all()
+            self._terms = {config.symbol: QuoteTerms.from_config(config) for config in configs}
+            self._loaded_at = time.monotonic()
+        return self._terms
+
+    def invalidate(self):
+        self._terms = None
+
+crypto_config_cache = CryptoConfigCache()
+
+def unquoted(symbol: str, fiat: str, amount: Decimal, message: str) -> Dict:
+    """A QuoteResult-shaped dict for an item that could not be quoted"""
+    return {"symbol": symbol, "fiat": fiat, "amount": amount, "fee": None, "fee_percentage": None,
+            "total_amount": None, "valid": False, "message": message}
+
+def quote_batch(terms: Dict[str, QuoteTerms], items: List[QuoteItem]) -> List[Dict]:
+    """Quote fees, limits and totals for many (symbol, amount, fiat) items at once.
+
+    Items are grouped per asset and each group is evaluated column-wise on
+    smallest-unit integers, so results are exact at the asset's decimals.
+    Fees are rounded up to the smallest unit. Results are plain dicts shaped
+    like QuoteResult; validating 10k models here would dominate the cost.
+
+    The columns are Python ints, not numpy arrays: an 18-decimal asset's
+    units pass int64 from 9.2 of its coins and are no longer exact in
+    float64, and turning Decimal inputs into units costs more than the
+    arithmetic that numpy would speed up.
+    """
+    results: List[Optional[Dict]] = [None] * len(items)
+    groups: Dict[str, List[int]] = {}
+    
+    for index, item in enumerate(items):
+        symbol = item.symbol.upper()
+        fiat = item.fiat.upper()
+        if symbol not in terms:
+            results[index] = unquoted(symbol, fiat, item.amount, f"Cryptocurrency {symbol} not supported")
+        elif fiat not in SUPPORTED_FIAT_CURRENCIES:
+            results[index] = unquoted(symbol, fiat, item.amount, f"Fiat currency {fiat} not supported")
+        else:
+            groups.setdefault(symbol, []).append(index)
+    
+    for symbol, indexes in groups.items():
+        asset = terms[symbol]
+        
+        # column of exact smallest-unit amounts; -1 marks excess precision
+        units = []
+        for index in indexes:
+            try:
+                units.append(to_units(items[index].amount, asset.decimals))
+            except ValueError:
+                units.append(-1)
+        
+        fees = [
+            fee_units(u, asset.fee_numerator, asset.fee_denominator) if u >= 0 else 0
+            for u in units
+        ]
+        in_range = [asset.min_units <= u <= asset.max_units for u in units]
+        
+        range_message = (f"Amount must be between {from_units(asset.min_units, asset.decimals).normalize():f} "
+                         f"and {from_units(asset.max_units, asset.decimals).normalize():f} {symbol}")
+        precision_message = f"Amount has more than {asset.decimals} decimal places"
+        
+        for index, u, fee, ok in zip(indexes, units, fees, in_range):
+            item = items[index]
+            exact = u >= 0
+            message = None if ok else (range_message if exact else precision_message)
+            results[index] = {
+                "symbol": symbol,
+                "fiat": item.fiat.upper(),
+                "amount": item.amount,
+                "fee": from_units(fee, asset.decimals) if exact else None,
+                "fee_percentage": asset.fee_percentage,
+                "total_amount": from_units(u + fee, asset.decimals) if exact else None,
+                "valid": message is None,
+                "message": message
+            }
+    
+    return results
+
+def _plain_decimal(value):
+    if isinstance(value, Decimal):
+        # positional notation: str() gives "0E-18" for a zero fee at 18 decimals
+        return f"{value:f}"
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def encode_quotes(quotes: List[Dict]) -> str:
+    """QuoteResponse JSON of quote_batch results, without validating them into models"""
+    return json.dumps({"quotes": quotes}, default=_plain_decimal, separators=(",", ":"))
 
 class CryptoService:
     def __init__(self, db: Session):
         self.db = db
+        self.uow = unit_of_work(db)
     
+    @read_only
     def get_supported_cryptocurrencies(self) -> List[CryptoOption]:
         """Get all supported cryptocurrencies for trading"""
         configs = self.db.query(CryptoConfig).filter(
@@ -35,12 +289,12 @@ class CryptoService:
             CryptoConfig.is_active == True
         ).first()
     
+    @transactional
     def create_crypto_config(self, config_data: CryptoConfigCreate) -> CryptoConfig:
         """Create a new cryptocurrency configuration"""
         config = CryptoConfig(**config_data.dict())
         self.db.add(config)
-        self.db.commit()
-        self.db.refresh(config)
+        self.uow.on_commit(crypto_config_cache.invalidate)
         return config
     
     def get_trading_pairs(self) -> Dict[str, List[str]]:
@@ -49,30 +303,41 @@ class CryptoService:
             CryptoConfig.is_active == True
         ).all()
         
-        # For now, all cryptos can be traded against fiat currencies
-        fiat_currencies = ["NGN", "USD", "EUR", "GBP", "KES", "GHS", "ZAR"]
-        
         trading_pairs = {}
         for crypto in active_cryptos:
-            trading_pairs[crypto.symbol] = fiat_currencies
+            trading_pairs[crypto.symbol] = list(SUPPORTED_FIAT_CURRENCIES)
         
         return trading_pairs
     
-    def validate_trade_amount(self, symbol: str, amount: float) -> bool:
+    def get_quote_terms(self, symbol: str) -> Optional[QuoteTerms]:
+        """Get cached fee and limit terms for an active cryptocurrency"""
+        return crypto_config_cache.get(self.db).get(symbol.upper())
+    
+    def validate_trade_amount(self, symbol: str, amount: Number) -> bool:
         """Validate if trade amount is within allowed limits"""
-        config = self.get_crypto_config(symbol)
-        if not config:
+        terms = self.get_quote_terms(symbol)
+        if not terms:
             return False
         
-        return config.minimum_amount_trade <= amount <= config.maximum_amount_trade
+        try:
+            units = to_units(amount, terms.decimals)
+        except ValueError:
+            # more precision than the asset supports
+            return False
+        return terms.min_units <= units <= terms.max_units
     
-    def calculate_trading_fee(self, symbol: str, amount: float) -> float:
-        """Calculate trading fee for a cryptocurrency"""
-        config = self.get_crypto_config(symbol)
-        if not config:
-            return 0.0
+    def calculate_trading_fee(self, symbol: str, amount: Number) -> Decimal:
+        """Calculate trading fee for a cryptocurrency, rounded up to the smallest unit"""
+        terms = self.get_quote_terms(symbol)
+        if not terms:
+            return Decimal("0")
         
-        return amount * (config.trade_percentage_fee / 100)
+        units = to_units(amount, terms.decimals)
+        return from_units(fee_units(units, terms.fee_numerator, terms.fee_denominator), terms.decimals)
+    
+    def quote(self, items: List[QuoteItem]) -> List[Dict]:
+        """Quote a batch of trades against the cached config table"""
+        return quote_batch(crypto_config_cache.get(self.db), items)
     
     def get_network_info(self, symbol: str) -> Optional[Dict]:
         """Get network information for a cryptocurrency"""
@@ -87,130 +352,18 @@ class CryptoService:
             "is_testnet": config.is_testnet
         }
     
+    @transactional
     def seed_default_cryptocurrencies(self):
         """Seed database with default cryptocurrency configurations"""
-        default_cryptos = [
-            {
-                "symbol": "USDT",
-                "name": "Tether",
-                "network": "ethereum",
-                "contract_address": "0xdAC17F958D2ee523a2206206994597C13D831ec7",
-                "decimals": 6,
-                "minimum_amount_trade": 10.0,
-                "maximum_amount_trade": 100000.0,
-                "trade_percentage_fee": 0.1,
-                "icon_url": "https://cryptologos.cc/logos/tether-usdt-logo.png",
-                "color": "#26A17B"
-            },
-            {
-                "symbol": "BTC",
-                "name": "Bitcoin",
-                "network": "bitcoin",
-                "decimals": 8,
-                "minimum_amount_trade": 0.001,
-                "maximum_amount_trade": 10.0,
-                "trade_percentage_fee": 0.15,
-                "icon_url": "https://cryptologos.cc/logos/bitcoin-btc-logo.png",
-                "color": "#F7931A"
-            },
-            {
-                "symbol": "ETH",
-                "name": "Ethereum",
-                "network": "ethereum",
-                "decimals": 18,
-                "minimum_amount_trade": 0.01,
-                "maximum_amount_trade": 100.0,
-                "trade_percentage_fee": 0.12,
-                "icon_url": "https://cryptologos.cc/logos/ethereum-eth-logo.png",
-                "color": "#627EEA"
-            },
-            {
-                "symbol": "USDC",
-                "name": "USD Coin",
-                "network": "ethereum",
-                "contract_address": "0xA0b86a33E6441b8435b662303c0f218C8c7c8e37",
-                "decimals": 6,
-                "minimum_amount_trade": 10.0,
-                "maximum_amount_trade": 100000.0,
-                "trade_percentage_fee": 0.1,
-                "icon_url": "https://cryptologos.cc/logos/usd-coin-usdc-logo.png",
-                "color": "#2775CA"
-            },
-            {
-                "symbol": "BNB",
-                "name": "Binance Coin",
-                "network": "binance-smart-chain",
-                "decimals": 18,
-                "minimum_amount_trade": 0.1,
-                "maximum_amount_trade": 1000.0,
-                "trade_percentage_fee": 0.12,
-                "icon_url": "https://cryptologos.cc/logos/bnb-bnb-logo.png",
-                "color": "#F3BA2F"
-            },
-            {
-                "symbol": "ADA",
-                "name": "Cardano",
-                "network": "cardano",
-                "decimals": 6,
-                "minimum_amount_trade": 10.0,
-                "maximum_amount_trade": 10000.0,
-                "trade_percentage_fee": 0.12,
-                "icon_url": "https://cryptologos.cc/logos/cardano-ada-logo.png",
-                "color": "#0033AD"
-            },
-            {
-                "symbol": "SOL",
-                "name": "Solana",
-                "network": "solana",
-                "decimals": 9,
-                "minimum_amount_trade": 0.1,
-                "maximum_amount_trade": 1000.0,
-                "trade_percentage_fee": 0.12,
-                "icon_url": "https://cryptologos.cc/logos/solana-sol-logo.png",
-                "color": "#9945FF"
-            },
-            {
-                "symbol": "DOT",
-                "name": "Polkadot",
-                "network": "polkadot",
-                "decimals": 10,
-                "minimum_amount_trade": 1.0,
-                "maximum_amount_trade": 1000.0,
-                "trade_percentage_fee": 0.12,
-                "icon_url": "https://cryptologos.cc/logos/polkadot-new-dot-logo.png",
-                "color": "#E6007A"
-            },
-            {
-                "symbol": "MATIC",
-                "name": "Polygon",
-                "network": "polygon",
-                "decimals": 18,
-                "minimum_amount_trade": 10.0,
-                "maximum_amount_trade": 10000.0,
-                "trade_percentage_fee": 0.1,
-                "icon_url": "https://cryptologos.cc/logos/polygon-matic-logo.png",
-                "color": "#8247E5"
-            },
-            {
-                "symbol": "AVAX",
-                "name": "Avalanche",
-                "network": "avalanche",
-                "decimals": 18,
-                "minimum_amount_trade": 0.1,
-                "maximum_amount_trade": 1000.0,
-                "trade_percentage_fee": 0.12,
-                "icon_url": "https://cryptologos.cc/logos/avalanche-avax-logo.png",
-                "color": "#E84142"
-            }
-        ]
+        existing = {
+            symbol for (symbol,) in self.db.query(CryptoConfig.symbol).filter(
+                CryptoConfig.symbol.in_([c["symbol"] for c in DEFAULT_CRYPTOCURRENCIES])
+            )
+        }
         
-        for crypto_data in default_cryptos:
-            existing = self.db.query(CryptoConfig).filter(
-                CryptoConfig.symbol == crypto_data["symbol"]
-            ).first()
-            
-            if not existing:
+        for crypto_data in DEFAULT_CRYPTOCURRENCIES:
+            if crypto_data["symbol"] not in existing:
                 config = CryptoConfig(**crypto_data)
                 self.db.add(config)
         
-        self.db.commit()
+        self.uow.on_commit(crypto_config_cache.invalidate)
@@ -1,13 +1,24 @@
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
+from app.database import read_only
+from app.core.unit_of_work import transactional, unit_of_work
+from app.models.attachment import TradeAttachment
 from app.models.trade import Trade, TradeStatus
+from app.models.trade_archive import ArchivedTrade
+from app.models.user import User
+from app.services.attachment_service import proof_reference
 from app.services.trade_service import TradeService
+from app.services.escrow_verification import EscrowJob, FUND, RELEASE, escrow_pipeline
+from app.services.chain_client import MIRROR_TRADE_ID_PREFIX, deposit_memo
 
 class EscrowService:
     def __init__(self, db: Session):
         self.db = db
+        self.uow = unit_of_work(db)
         self.trade_service = TradeService(db)
     
+    @transactional
     def fund_escrow(self, trade_id: str, user_id: int, tx_hash: str) -> dict:
         """Fund escrow with crypto"""
         trade = self.trade_service.get_trade_by_id(trade_id)
@@ -18,21 +29,37 @@ class EscrowService:
         if trade.seller_id != user_id:
             raise ValueError("Only seller can fund escrow")
         
+        if trade.trade_id.startswith(MIRROR_TRADE_ID_PREFIX):
+            raise ValueError("Trade is settled by the escrow canister")
+        
         if trade.status != TradeStatus.INITIATED:
             raise ValueError("Trade is not in correct state for funding")
         
-        # Update trade with escrow details
-        trade.status = TradeStatus.ESCROW_FUNDED
+        if trade.escrow_tx_hash:
+            raise ValueError("Escrow funding is already being verified")
+        
+        # the deposit must come from the seller's wallet
+        seller = self.uow.get(User, user_id)
+        if not seller or not seller.wallet_address:
+            raise ValueError("Set a wallet address before funding escrow")
+        
+        reused = self.db.query(Trade.id).filter(Trade.escrow_tx_hash == tx_hash).union_all(
+            self.db.query(ArchivedTrade.id).filter(ArchivedTrade.escrow_tx_hash == tx_hash)
+        ).first()
+        if reused:
+            raise ValueError("Transaction already used for another trade")
+        
+        # Record the deposit; the trade moves to ESCROW_FUNDED once the chain confirms it
         trade.escrow_tx_hash = tx_hash
         trade.updated_at = datetime.utcnow()
         
-        # In production, verify the transaction on blockchain
-        # For now, we'll assume it's valid
-        
-        self.db.commit()
-        return {"message": "Escrow funded successfully", "tx_hash": tx_hash}
+        self.uow.on_commit(lambda: escrow_pipeline.submit(EscrowJob(FUND, trade_id, tx_hash)))
+        return {"message": "Escrow funding submitted for verification", "tx_hash": tx_hash,
+                "memo": deposit_memo(trade_id)}
     
-    def confirm_payment(self, trade_id: str, user_id: int, payment_reference: str, payment_proof: str = None) -> dict:
+    @transactional
+    def confirm_payment(self, trade_id: str, user_id: int, payment_reference: str,
+                        payment_proof_id: Optional[int] = None) -> dict:
         """Confirm fiat payment has been sent"""
         trade = self.trade_service.get_trade_by_id(trade_id)
         if not trade:
@@ -45,14 +72,22 @@ class EscrowService:
         if trade.status != TradeStatus.ESCROW_FUNDED:
             raise ValueError("Escrow must be funded before payment confirmation")
         
+        # the proof file stays in the blob store; the trade keeps a reference to its attachment
+        proof = None
+        if payment_proof_id is not None:
+            proof = self.uow.get(TradeAttachment, payment_proof_id)
+            if not proof or proof.trade_id != trade.id:
+                raise ValueError("Payment proof is not an attachment of this trade")
+        
         trade.status = TradeStatus.PAYMENT_SENT
         trade.payment_reference = payment_reference
-        trade.payment_proof = payment_proof
+        trade.payment_proof = proof_reference(proof) if proof else None
         trade.updated_at = datetime.utcnow()
+        self.trade_service.publish_status(trade, user_id)
         
-        self.db.commit()
         return {"message": "Payment confirmation recorded"}
     
+    @transactional
     def release_escrow(self, trade_id: str, user_id: int) -> dict:
         """Release escrow funds to buyer"""
         trade = self.trade_service.get_trade_by_id(trade_id)
@@ -63,23 +98,21 @@ class EscrowService:
         if trade.seller_id != user_id:
             raise ValueError("Only seller can release escrow")
         
+        if trade.trade_id.startswith(MIRROR_TRADE_ID_PREFIX):
+            raise ValueError("Trade is settled by the escrow canister")
+        
         if trade.status != TradeStatus.PAYMENT_SENT:
             raise ValueError("Payment must be confirmed before release")
         
-        # In production, execute blockchain transaction to release funds
-        # For now, we'll simulate it
-        release_tx_hash = f"release_{trade_id}_{datetime.utcnow().timestamp()}"
-        
+        # The payout is executed by the verification pipeline, which completes the trade
         trade.status = TradeStatus.PAYMENT_CONFIRMED
-        trade.release_tx_hash = release_tx_hash
         trade.updated_at = datetime.utcnow()
+        self.trade_service.publish_status(trade, user_id)
         
-        # Complete the trade
-        self.trade_service.complete_trade(trade_id)
-        
-        self.db.commit()
-        return {"message": "Escrow released successfully", "tx_hash": release_tx_hash}
+        self.uow.on_commit(lambda: escrow_pipeline.submit(EscrowJob(RELEASE, trade_id)))
+        return {"message": "Escrow release submitted"}
     
+    @read_only
     def get_escrow_status(self, trade_id: str, user_id: int) -> dict:
         """Get current escrow status"""
         trade = self.trade_service.get_trade_by_id(trade_id)
@@ -97,7 +130,10 @@ class EscrowService:
             "payment_sent": trade.status.value in ["payment_sent", "payment_confirmed", "completed"],
             "payment_confirmed": trade.status.value in ["payment_confirmed", "completed"],
             "completed": trade.status == TradeStatus.COMPLETED,
+            "verification_pending": trade.status == TradeStatus.INITIATED and trade.escrow_tx_hash is not None,
+            "release_pending": trade.status == TradeStatus.PAYMENT_CONFIRMED,
             "escrow_tx_hash": trade.escrow_tx_hash,
+            "deposit_memo": deposit_memo(trade.trade_id),
             "release_tx_hash": trade.release_tx_hash,
             "expires_at": trade.expires_at.isoformat() if trade.expires_at else None,
             "payment_deadline": trade.payment_deadline.isoformat() if trade.payment_deadline else None
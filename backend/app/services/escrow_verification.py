@@ -0,0 +1,296 @@
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+from app.database import session_scope
+from app.core.unit_of_work import unit_of_work
+from app.models.trade import Trade, TradeStatus
+from app.models.user import User
+from app.services.chain_client import (
+    MIRROR_TRADE_ID_PREFIX, ChainClient, ChainError, Deposit, DepositStatus, deposit_memo, get_chain_client
+)
+from app.services.crypto_service import CryptoService
+from app.services.moderation_service import ModerationService
+from app.services.risk_service import RiskService, DEPOSIT_REJECTED
+from app.services.trade_service import TradeService
+
+logger = logging.getLogger(__name__)
+
+# deposits looked up per chain call, and how long to wait to fill a batch
+ESCROW_VERIFY_BATCH_SIZE = int(os.getenv("ESCROW_VERIFY_BATCH_SIZE", "100"))
+ESCROW_VERIFY_BATCH_WINDOW = float(os.getenv("ESCROW_VERIFY_BATCH_WINDOW", "0.05"))
+# retries back off exponentially from ESCROW_VERIFY_BACKOFF seconds
+ESCROW_VERIFY_MAX_ATTEMPTS = int(os.getenv("ESCROW_VERIFY_MAX_ATTEMPTS", "10"))
+ESCROW_VERIFY_BACKOFF = float(os.getenv("ESCROW_VERIFY_BACKOFF", "2"))
+ESCROW_VERIFY_BACKOFF_MAX = float(os.getenv("ESCROW_VERIFY_BACKOFF_MAX", "300"))
+
+FUND = "fund"
+RELEASE = "release"
+
+@dataclass(frozen=True)
+class EscrowJob:
+    kind: str  # FUND or RELEASE
+    trade_id: str
+    tx_hash: Optional[str] = None
+    attempt: int = 0
+
+def _symbol(trade: Trade) -> str:
+    return getattr(trade.crypto_currency, "value", trade.crypto_currency)
+
+class EscrowVerificationPipeline:
+    """Verifies escrow deposits and executes releases off the request path.
+
+    Requests only record the tx hash and submit a job. A worker drains the
+    queue in batches: deposits are looked up with one chain call per batch,
+    releases run concurrently. Jobs that are not settled yet are retried with
+    exponential backoff; trades move to ESCROW_FUNDED / COMPLETED only once
+    the chain confirms. Deposits that never verify are rejected; releases
+    that keep failing open a payout case for moderators and go on retrying.
+    """
+
+    def __init__(self, client_factory: Callable[[], ChainClient] = get_chain_client,
+                 batch_size: int = ESCROW_VERIFY_BATCH_SIZE, batch_window: float = ESCROW_VERIFY_BATCH_WINDOW,
+                 max_attempts: int = ESCROW_VERIFY_MAX_ATTEMPTS, backoff: float = ESCROW_VERIFY_BACKOFF):
+        self.client_factory = client_factory
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: List[EscrowJob] = []
+        self._retries: Dict[EscrowJob, asyncio.TimerHandle] = {}
+        self._worker: Optional[asyncio.Task] = None
+
+    def submit(self, job: EscrowJob):
+        """Queue a job; safe to call from request threads"""
+        if self._loop is None:
+            self._pending.append(job)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+    def depth(self) -> int:
+        """Jobs waiting in the queue or for a retry"""
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + len(self._pending) + len(self._retries)
+
+    async def start(self, recover: bool = True):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        if recover:
+            self._pending.extend(await asyncio.to_thread(self._unsettled_jobs))
+        for job in self._pending:
+            self._queue.put_nowait(job)
+        self._pending = []
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._loop = None
+
+    async def drain(self):
+        """Wait until the queue is empty and no batch is in flight (tests, benchmarks)"""
+        await self._queue.join()
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._process(batch)
+            except Exception:
+                logger.exception("Escrow verification batch failed")
+                for job in batch:
+                    self._retry(job)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _process(self, batch: List[EscrowJob]):
+        deposits = [job for job in batch if job.kind == FUND]
+        releases = [job for job in batch if job.kind == RELEASE]
+        if deposits:
+            await self._verify_deposits(deposits)
+        if releases:
+            await asyncio.gather(*(self._release(job) for job in releases))
+
+    def _retry(self, job: EscrowJob):
+        job = replace(job, attempt=job.attempt + 1)
+        if job.attempt >= self.max_attempts and job.kind == FUND:
+            logger.warning("Giving up on escrow fund job for trade %s", job.trade_id)
+            asyncio.create_task(asyncio.to_thread(self._reject_deposit, job))
+            return
+        if job.attempt == self.max_attempts:
+            # the buyer is owed the payout: keep retrying at the slowest pace and have a moderator look
+            logger.error("Escrow release for trade %s still failing, flagged for review", job.trade_id)
+            asyncio.create_task(asyncio.to_thread(self._flag_release, job))
+        delay = min(self.backoff * 2 ** min(job.attempt - 1, 30), ESCROW_VERIFY_BACKOFF_MAX)
+        self._retries[job] = self._loop.call_later(delay, self._requeue, job)
+
+    def _requeue(self, job: EscrowJob):
+        self._retries.pop(job, None)
+        self._queue.put_nowait(job)
+
+    # deposits
+
+    async def _verify_deposits(self, jobs: List[EscrowJob]):
+        expected = await asyncio.to_thread(self._load_deposits, jobs)
+        if not expected:
+            return
+        try:
+            statuses = await self.client_factory().verify_deposits([deposit for _, deposit in expected])
+        except ChainError:
+            logger.exception("Deposit lookup failed")
+            for job, _ in expected:
+                self._retry(job)
+            return
+
+        settled = []
+        for job, deposit in expected:
+            status = statuses.get(deposit.tx_hash, DepositStatus.NOT_FOUND)
+            if status in (DepositStatus.CONFIRMED, DepositStatus.INVALID):
+                settled.append((job, status))
+            else:
+                self._retry(job)
+        if settled:
+            await asyncio.to_thread(self._apply_deposits, settled)
+
+    def _load_deposits(self, jobs: List[EscrowJob]) -> List[Tuple[EscrowJob, Deposit]]:
+        with session_scope() as db:
+            trades = {
+                trade.trade_id: trade for trade in db.query(Trade).filter(
+                    Trade.trade_id.in_([job.trade_id for job in jobs])
+                )
+            }
+            crypto_service = CryptoService(db)
+            pending = []
+            decimals = {}
+            for job in jobs:
+                trade = trades.get(job.trade_id)
+                # skip jobs made stale by a newer submission or a state change
+                if not trade or trade.status != TradeStatus.INITIATED or trade.escrow_tx_hash != job.tx_hash:
+                    continue
+                terms = crypto_service.get_quote_terms(_symbol(trade))
+                if not terms:
+                    continue
+                pending.append((job, trade))
+                decimals[trade.trade_id] = terms.decimals
+            units = TradeService(db).crypto_units([trade for _, trade in pending], decimals)
+            wallets = dict(db.query(User.id, User.wallet_address).filter(
+                User.id.in_({trade.seller_id for _, trade in pending})
+            )) if pending else {}
+            # a seller without a wallet cannot be matched to any sender: the deposit is rejected
+            return [
+                (job, Deposit(job.tx_hash, units[trade.trade_id], wallets.get(trade.seller_id) or "",
+                              deposit_memo(trade.trade_id)))
+                for job, trade in pending
+            ]
+
+    def _apply_deposits(self, settled: List[Tuple[EscrowJob, DepositStatus]]):
+        with session_scope() as db:
+            for job, status in settled:
+                trade = db.query(Trade).filter(Trade.trade_id == job.trade_id).first()
+                if not trade or trade.status != TradeStatus.INITIATED or trade.escrow_tx_hash != job.tx_hash:
+                    continue
+                if status == DepositStatus.CONFIRMED:
+                    trade.status = TradeStatus.ESCROW_FUNDED
+                    TradeService(db).publish_status(trade)
+                else:
+                    # the seller can submit a corrected transaction
+                    trade.escrow_tx_hash = None
+                    RiskService(db).record(trade.seller_id, DEPOSIT_REJECTED)
+                trade.updated_at = datetime.utcnow()
+            db.commit()
+
+    def _reject_deposit(self, job: EscrowJob):
+        self._apply_deposits([(job, DepositStatus.INVALID)])
+
+    # releases
+
+    async def _release(self, job: EscrowJob):
+        payout = await asyncio.to_thread(self._load_release, job)
+        if not payout:
+            return
+        wallet, amount = payout
+        if not wallet:
+            # retried until the buyer adds a wallet or a moderator steps in
+            self._retry(job)
+            return
+        try:
+            # the memo makes a retried payout idempotent on the chain side
+            tx_hash = await self.client_factory().transfer(wallet, amount, memo=f"release:{job.trade_id}")
+        except ChainError:
+            logger.exception("Escrow release failed for trade %s", job.trade_id)
+            self._retry(job)
+            return
+        await asyncio.to_thread(self._apply_release, job, tx_hash)
+
+    def _load_release(self, job: EscrowJob) -> Optional[Tuple[Optional[str], int]]:
+        """(buyer wallet, amount) to pay out, wallet None while the payout cannot be made; None if stale"""
+        with session_scope() as db:
+            trade = db.query(Trade).filter(Trade.trade_id == job.trade_id).first()
+            if not trade or trade.status != TradeStatus.PAYMENT_CONFIRMED or trade.release_tx_hash:
+                return None
+            buyer = db.query(User).filter(User.id == trade.buyer_id).first()
+            terms = CryptoService(db).get_quote_terms(_symbol(trade))
+            if not buyer or not buyer.wallet_address or not terms:
+                logger.error("Cannot release trade %s: missing buyer wallet or asset config", job.trade_id)
+                return None, 0
+            units = TradeService(db).crypto_units([trade], {trade.trade_id: terms.decimals})
+            return buyer.wallet_address, units[trade.trade_id]
+
+    def _apply_release(self, job: EscrowJob, tx_hash: str):
+        with session_scope() as db, unit_of_work(db).transaction():
+            trade_service = TradeService(db)
+            trade = trade_service.get_trade_by_id(job.trade_id)
+            if not trade or trade.status != TradeStatus.PAYMENT_CONFIRMED:
+                return
+            trade.release_tx_hash = tx_hash
+            trade_service.complete_trade(job.trade_id)
+
+    def _flag_release(self, job: EscrowJob):
+        with session_scope() as db:
+            trade = db.query(Trade).filter(Trade.trade_id == job.trade_id).first()
+            if not trade or trade.status != TradeStatus.PAYMENT_CONFIRMED:
+                return
+            ModerationService(db).open_payout_case(trade, f"Escrow release failed {job.attempt} times")
+            db.commit()
+
+    # recovery
+
+    def _unsettled_jobs(self) -> List[EscrowJob]:
+        """Jobs lost with a previous process: unverified deposits and unpaid releases"""
+        with session_scope() as db:
+            funding = db.query(Trade.trade_id, Trade.escrow_tx_hash).filter(
+                Trade.status == TradeStatus.INITIATED,
+                Trade.escrow_tx_hash.isnot(None)
+            ).all()
+            # mirrored canister trades are released by the canister
+            releasing = db.query(Trade.trade_id).filter(
+                Trade.status == TradeStatus.PAYMENT_CONFIRMED,
+                Trade.release_tx_hash.is_(None),
+                ~Trade.trade_id.startswith(MIRROR_TRADE_ID_PREFIX)
+            ).all()
+        return [EscrowJob(FUND, trade_id, tx_hash) for trade_id, tx_hash in funding] + \
+            [EscrowJob(RELEASE, trade_id) for (trade_id,) in releasing]
+
+escrow_pipeline = EscrowVerificationPipeline()
@@ -0,0 +1,242 @@
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime, timedelta
+from decimal import Decimal
+import math
+import os
+from app.database import read_only
+from app.core.unit_of_work import transactional, unit_of_work
+from app.models.moderation import ModerationCase, ModerationCounts
+from app.models.report import Report, ReportStatus
+from app.models.trade import Trade
+from app.models.trade_archive import ArchivedTrade
+from app.models.user import User
+
+# seconds a moderator holds a claimed case before others may take it over
+MODERATION_LEASE_SECONDS = int(os.getenv("MODERATION_LEASE_SECONDS", "900"))
+
+REPORT = "report"
+DISPUTE = "dispute"
+RISK = "risk"
+PAYOUT = "payout"
+
+OPEN = "open"
+CLAIMED = "claimed"
+RESOLVED = "resolved"
+DISMISSED = "dismissed"
+
+# base priority by case kind (report type for reports)
+KIND_PRIORITY = {DISPUTE: 40, PAYOUT: 35, "fraud": 30, "scam": 30, RISK: 20, "other": 10}
+
+# queue orders; each has an index led by status
+SORTS = {
+    "priority": (ModerationCase.priority.desc(), ModerationCase.created_at),
+    "age": (ModerationCase.created_at,),
+    "amount": (ModerationCase.amount.desc(), ModerationCase.created_at),
+    "reporter_trust": (ModerationCase.reporter_trust.desc(), ModerationCase.created_at),
+}
+
+def case_priority(kind: str, amount: Decimal, reporter_trust: float) -> int:
+    """Kind (10-40) + amount at stake (0-30, log scale) + reporter trust (0-30)"""
+    amount_points = min(30, 5 * math.log10(1 + float(amount)))
+    return round(KIND_PRIORITY.get(kind, 10) + amount_points + reporter_trust * 0.3)
+
+class ModerationService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.uow = unit_of_work(db)
+
+    @transactional
+    def open_report_case(self, report: Report) -> ModerationCase:
+        """Queue a new report for moderators"""
+        self.db.flush()
+        amount = Decimal(0)
+        if report.trade_id:
+            trade = self.uow.get(Trade, report.trade_id) or self.uow.get(ArchivedTrade, report.trade_id)
+            amount = Decimal(str(trade.fiat_amount or 0)) if trade else amount
+        return self._open(REPORT, report.reporter_id, report.reported_user_id, amount, report.report_type.value,
+                          report.title, report_id=report.id, trade_id=report.trade_id)
+
+    @transactional
+    def open_dispute_case(self, trade: Trade, user_id: int, reason: str) -> Optional[ModerationCase]:
+        """Queue a disputed trade, once while a case for it is pending"""
+        pending = self.db.query(ModerationCase.id).filter(
+            ModerationCase.trade_id == trade.id,
+            ModerationCase.kind == DISPUTE,
+            ModerationCase.status.in_([OPEN, CLAIMED])
+        ).first()
+        if pending:
+            return None
+
+        counterparty = trade.seller_id if user_id == trade.buyer_id else trade.buyer_id
+        return self._open(DISPUTE, user_id, counterparty, Decimal(str(trade.fiat_amount or 0)), DISPUTE, reason,
+                          trade_id=trade.id)
+
+    @transactional
+    def open_risk_case(self, trade: Trade, user_id: int, reasons: List[str]) -> ModerationCase:
+        """Queue a trade flagged by risk checks for review of one participant"""
+        counterparty = trade.seller_id if user_id == trade.buyer_id else trade.buyer_id
+        return self._open(RISK, counterparty, user_id, Decimal(str(trade.fiat_amount or 0)), RISK,
+                          "; ".join(reasons), trade_id=trade.id)
+
+    @transactional
+    def open_payout_case(self, trade: Trade, reason: str) -> Optional[ModerationCase]:
+        """Queue a trade whose escrow release keeps failing, once while a case for it is pending"""
+        pending = self.db.query(ModerationCase.id).filter(
+            ModerationCase.trade_id == trade.id,
+            ModerationCase.kind == PAYOUT,
+            ModerationCase.status.in_([OPEN, CLAIMED])
+        ).first()
+        if pending:
+            return None
+
+        return self._open(PAYOUT, trade.seller_id, trade.buyer_id, Decimal(str(trade.fiat_amount or 0)), PAYOUT, reason,
+                          trade_id=trade.id)
+
+    def _open(self, kind: str, opened_by: int, reported_user_id: int, amount: Decimal, category: str,
+              reason: str, report_id: int = None, trade_id: int = None) -> ModerationCase:
+        opener = self.uow.get(User, opened_by)
+        reporter_trust = opener.trust_score if opener else 0.0
+        case = ModerationCase(
+            kind=kind,
+            report_id=report_id,
+            trade_id=trade_id,
+            reported_user_id=reported_user_id,
+            opened_by=opened_by,
+            reason=reason,
+            status=OPEN,
+            amount=amount,
+            reporter_trust=reporter_trust,
+            priority=case_priority(category, amount, reporter_trust)
+        )
+        self.db.add(case)
+        self._count(reported_user_id, kind, opened=True)
+        return case
+
+    def _count(self, user_id: int, kind: str, opened: bool):
+        """Adjust the reported user's counts in the same transaction as the case"""
+        if kind not in (REPORT, DISPUTE):
+            return
+        open_column, total_column = (
+            (ModerationCounts.open_reports, ModerationCounts.total_reports) if kind == REPORT
+            else (ModerationCounts.open_disputes, ModerationCounts.total_disputes)
+        )
+        values = {open_column: open_column + (1 if opened else -1)}
+        if opened:
+            values[total_column] = total_column + 1
+        updated = self.db.query(ModerationCounts).filter(
+            ModerationCounts.user_id == user_id
+        ).update(values, synchronize_session=False)
+        if updated or not opened:
+            return
+
+        try:
+            # first case against the user; a concurrent first case wins the insert
+            with self.db.begin_nested():
+                self.db.add(ModerationCounts(user_id=user_id, **{open_column.key: 1, total_column.key: 1}))
+        except IntegrityError:
+            self.db.query(ModerationCounts).filter(
+                ModerationCounts.user_id == user_id
+            ).update(values, synchronize_session=False)
+
+    @read_only
+    def list_cases(self, status: str = OPEN, kind: Optional[str] = None, sort: str = "priority",
+                   limit: int = 50, offset: int = 0) -> List[ModerationCase]:
+        """A page of the queue in the given order"""
+        query = self.db.query(ModerationCase).filter(ModerationCase.status == status)
+        if kind:
+            query = query.filter(ModerationCase.kind == kind)
+        return query.order_by(*SORTS[sort]).offset(offset).limit(limit).all()
+
+    def get_case(self, case_id: int) -> Optional[ModerationCase]:
+        """Get case by ID"""
+        return self.uow.get(ModerationCase, case_id)
+
+    @read_only
+    def get_user_counts(self, user_id: int) -> Optional[ModerationCounts]:
+        """Report and dispute counts of a reported user"""
+        return self.db.get(ModerationCounts, user_id)
+
+    @transactional
+    def claim_next(self, moderator_id: int, kind: Optional[str] = None, sort: str = "priority") -> Optional[ModerationCase]:
+        """Lease the first claimable case in queue order; cases locked by other moderators are skipped"""
+        now = datetime.utcnow()
+        query = self.db.query(ModerationCase).filter(self._claimable(now))
+        if kind:
+            query = query.filter(ModerationCase.kind == kind)
+        case = query.order_by(*SORTS[sort]).limit(1).with_for_update(skip_locked=True).first()
+        if case:
+            self._lease(case, moderator_id, now)
+        return case
+
+    @transactional
+    def claim(self, case_id: int, moderator_id: int) -> ModerationCase:
+        """Lease a specific case, or renew the caller's own lease"""
+        now = datetime.utcnow()
+        # conditional update: only one moderator can win a race for the same case
+        claimed = self.db.query(ModerationCase).filter(
+            ModerationCase.id == case_id,
+            or_(self._claimable(now),
+                (ModerationCase.status == CLAIMED) & (ModerationCase.claimed_by == moderator_id))
+        ).update({
+            ModerationCase.status: CLAIMED,
+            ModerationCase.claimed_by: moderator_id,
+            ModerationCase.lease_until: now + timedelta(seconds=MODERATION_LEASE_SECONDS),
+        }, synchronize_session=False)
+
+        case = self.get_case(case_id)
+        if not case:
+            raise ValueError("Case not found")
+        if not claimed:
+            raise ValueError("Case is closed or claimed by another moderator")
+        self.db.refresh(case)
+        return case
+
+    @transactional
+    def release(self, case_id: int, moderator_id: int) -> ModerationCase:
+        """Give a claimed case back to the queue"""
+        case = self._get_leased(case_id, moderator_id)
+        case.status = OPEN
+        case.claimed_by = None
+        case.lease_until = None
+        return case
+
+    @transactional
+    def resolve(self, case_id: int, moderator_id: int, resolution: str, dismiss: bool = False) -> ModerationCase:
+        """Close a case the caller holds the lease on"""
+        case = self._get_leased(case_id, moderator_id)
+        case.status = DISMISSED if dismiss else RESOLVED
+        case.resolution = resolution
+        case.resolved_by = moderator_id
+        case.resolved_at = datetime.utcnow()
+        case.lease_until = None
+
+        if case.report_id:
+            report = self.uow.get(Report, case.report_id)
+            if report:
+                report.status = ReportStatus.DISMISSED if dismiss else ReportStatus.RESOLVED
+        self._count(case.reported_user_id, case.kind, opened=False)
+        return case
+
+    def _get_leased(self, case_id: int, moderator_id: int) -> ModerationCase:
+        case = self.db.query(ModerationCase).filter(ModerationCase.id == case_id).with_for_update().first()
+        if not case:
+            raise ValueError("Case not found")
+        if case.status != CLAIMED or case.claimed_by != moderator_id or case.lease_until < datetime.utcnow():
+            raise ValueError("Claim the case before changing it")
+        return case
+
+    @staticmethod
+    def _claimable(now: datetime):
+        return or_(
+            ModerationCase.status == OPEN,
+            (ModerationCase.status == CLAIMED) & (ModerationCase.lease_until < now),
+        )
+
+    @staticmethod
+    def _lease(case: ModerationCase, moderator_id: int, now: datetime):
+        case.status = CLAIMED
+        case.claimed_by = moderator_id
+        case.lease_until = now + timedelta(seconds=MODERATION_LEASE_SECONDS)
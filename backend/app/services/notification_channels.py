@@ -0,0 +1,164 @@
+from collections import deque
+from email.message import EmailMessage
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import asyncio
+import json
+import logging
+import os
+import smtplib
+from app.core.plugins import load_object
+from app.services.user_lookup import normalize_telegram
+
+logger = logging.getLogger(__name__)
+
+# comma separated channels notifications are delivered through: built-in names or "module:Class"
+NOTIFICATION_CHANNELS = os.getenv("NOTIFICATION_CHANNELS", "memory")
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+# messages per second and burst; the Bot API allows about 30 per second per bot
+TELEGRAM_RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", "25"))
+TELEGRAM_BURST = int(os.getenv("TELEGRAM_BURST", "30"))
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+NOTIFICATION_EMAIL_FROM = os.getenv("NOTIFICATION_EMAIL_FROM", "notifications@trustpeer.local")
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "5"))
+EMAIL_BURST = int(os.getenv("EMAIL_BURST", "10"))
+
+class ChannelError(Exception):
+    """A delivery that failed but may succeed when retried"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class NotificationChannel:
+    """Delivers a text to one address. send() runs on the event loop.
+
+    rate and burst (messages per second) bound deliveries through the
+    channel across all recipients; None leaves it unlimited.
+    """
+
+    name = "channel"
+    rate: Optional[float] = None
+    burst: int = 1
+
+    def address(self, recipient: Dict) -> Optional[str]:
+        """Where recipient ({"user_id", "email", "telegram_handle"}) is reached, None if not on this channel"""
+        raise NotImplementedError
+
+    async def send(self, address: str, text: str):
+        raise NotImplementedError
+
+class MemoryChannel(NotificationChannel):
+    """Local stand-in that keeps the latest deliveries in memory (development, tests)"""
+
+    name = "memory"
+
+    def __init__(self, max_kept: int = 10_000):
+        self.sent: Deque[Tuple[str, str]] = deque(maxlen=max_kept)  # (address, text)
+
+    def address(self, recipient: Dict) -> Optional[str]:
+        return str(recipient["user_id"])
+
+    async def send(self, address: str, text: str):
+        self.sent.append((address, text))
+        logger.debug("Notification for user %s: %s", address, text)
+
+    def messages(self, address: str) -> List[str]:
+        return [text for to, text in self.sent if to == address]
+
+class TelegramChannel(NotificationChannel):
+    """Bot API sendMessage to the user's telegram handle.
+
+    A bot can only message users who have started a chat with it; point
+    TELEGRAM_API_URL at a relay when handles have to be mapped to chat ids.
+    """
+
+    name = "telegram"
+
+    def __init__(self, token: Optional[str] = TELEGRAM_BOT_TOKEN, api_url: str = TELEGRAM_API_URL,
+                 rate: float = TELEGRAM_RATE_LIMIT, burst: int = TELEGRAM_BURST):
+        if not token:
+            raise ValueError("TELEGRAM_BOT_TOKEN is required for telegram notifications")
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.rate = rate
+        self.burst = burst
+
+    def address(self, recipient: Dict) -> Optional[str]:
+        handle = recipient.get("telegram_handle")
+        telegram = normalize_telegram(handle) if handle else None
+        return f"@{telegram}" if telegram else None
+
+    async def send(self, address: str, text: str):
+        await asyncio.to_thread(self._post, {"chat_id": address, "text": text})
+
+    def _post(self, body: Dict):
+        request = Request(self.url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=10) as response:
+                response.read()
+        except HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                retry_after = e.headers.get("Retry-After")
+                raise ChannelError(f"Telegram returned {e.code}", float(retry_after) if retry_after else None)
+            # unknown chat, bot blocked: retrying will not help
+            logger.warning("Telegram rejected a notification for %s: %s", body["chat_id"], e.code)
+        except OSError as e:
+            raise ChannelError(f"Telegram unreachable: {e}")
+
+class EmailChannel(NotificationChannel):
+    """Plain text email over SMTP (STARTTLS when SMTP_USER is set)"""
+
+    name = "email"
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, user: Optional[str] = SMTP_USER,
+                 password: Optional[str] = SMTP_PASSWORD, sender: str = NOTIFICATION_EMAIL_FROM,
+                 rate: float = EMAIL_RATE_LIMIT, burst: int = EMAIL_BURST):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender
+        self.rate = rate
+        self.burst = burst
+
+    def address(self, recipient: Dict) -> Optional[str]:
+        return recipient.get("email") or None
+
+    async def send(self, address: str, text: str):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = address
+        message["Subject"] = text.splitlines()[0][:100]
+        message.set_content(text)
+        await asyncio.to_thread(self._send, message)
+
+    def _send(self, message: EmailMessage):
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+                if self.user:
+                    smtp.starttls()
+                    smtp.login(self.user, self.password or "")
+                smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused:
+            logger.warning("SMTP refused notification recipient %s", message["To"])
+        except (smtplib.SMTPException, OSError) as e:
+            raise ChannelError(f"SMTP delivery failed: {e}")
+
+CHANNELS = {
+    MemoryChannel.name: MemoryChannel,
+    TelegramChannel.name: TelegramChannel,
+    EmailChannel.name: EmailChannel,
+}
+
+def load_channels(names: str = NOTIFICATION_CHANNELS) -> List[NotificationChannel]:
+    """Instantiate the configured channels"""
+    channels = []
+    for name in (name.strip() for name in names.split(",")):
+        if name:
+            channels.append(CHANNELS[name]() if name in CHANNELS else load_object(name)())
+    return channels
@@ -0,0 +1,314 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+import threading
+import time
+from app.core.metrics import registry
+from app.core.rate_limit import InMemoryBucketBackend
+from app.models.trade import TradeStatus
+from app.services.notification_channels import ChannelError, NotificationChannel, load_channels
+from app.services.user_service import UserService
+
+logger = logging.getLogger(__name__)
+
+# seconds a user's notifications are gathered and sent as one message, and most gathered before sending early
+NOTIFICATION_BATCH_WINDOW = float(os.getenv("NOTIFICATION_BATCH_WINDOW", "2"))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "10"))
+# delivery workers and queued deliveries per channel
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "1000"))
+# notifications waiting in batches before new ones are refused (their outbox events are retried later)
+NOTIFICATION_MAX_PENDING = int(os.getenv("NOTIFICATION_MAX_PENDING", "10000"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_BACKOFF = float(os.getenv("NOTIFICATION_RETRY_BACKOFF", "1"))
+# (user, key) pairs remembered so a retried event is not sent twice
+NOTIFICATION_DEDUPE_KEYS = int(os.getenv("NOTIFICATION_DEDUPE_KEYS", "100000"))
+
+BUYER = "buyer"
+SELLER = "seller"
+
+# what each party hears when a trade reaches a status; the party that made the change is not told
+STATUS_MESSAGES = {
+    TradeStatus.ESCROW_FUNDED.value: {
+        BUYER: "Escrow for trade {trade_id} is funded. Send the payment, then confirm it.",
+        SELLER: "Your escrow deposit for trade {trade_id} is confirmed.",
+    },
+    TradeStatus.PAYMENT_SENT.value: {
+        SELLER: "The buyer of trade {trade_id} has sent the payment. Release the escrow once it arrives.",
+    },
+    TradeStatus.PAYMENT_CONFIRMED.value: {
+        BUYER: "The seller of trade {trade_id} confirmed your payment; the escrow is being released.",
+    },
+    TradeStatus.COMPLETED.value: {
+        BUYER: "Trade {trade_id} is completed.",
+        SELLER: "Trade {trade_id} is completed.",
+    },
+    TradeStatus.CANCELLED.value: {
+        BUYER: "Trade {trade_id} was cancelled by the seller.",
+        SELLER: "Trade {trade_id} was cancelled by the buyer.",
+    },
+    TradeStatus.DISPUTED.value: {
+        BUYER: "Trade {trade_id} was disputed by the seller; a moderator will review it.",
+        SELLER: "Trade {trade_id} was disputed by the buyer; a moderator will review it.",
+    },
+}
+
+submitted = registry.counter("notifications_submitted_total", "Notifications handed to the notifier, by result")
+delivered = registry.counter("notification_deliveries_total", "Notification deliveries, by channel and result")
+backlog = registry.gauge("notification_backlog", "Notifications waiting in batches")
+
+class NotificationBacklogFull(Exception):
+    pass
+
+@dataclass
+class Notification:
+    user_id: int
+    key: str  # the same key for the same user is the same news, sent once
+    text: str
+    recipient: Dict  # user_id, email, telegram_handle
+
+@dataclass
+class Delivery:
+    channel: NotificationChannel
+    address: str
+    text: str
+    attempt: int = 0
+
+@dataclass
+class Batch:
+    recipient: Dict
+    messages: Dict[str, str]  # key -> text, in arrival order
+    due: float  # time.monotonic() it is sent at
+
+def compose(texts: List[str]) -> str:
+    """One message out of a batch"""
+    if len(texts) == 1:
+        return texts[0]
+    return f"{len(texts)} trade updates:\n" + "\n".join(f"- {text}" for text in texts)
+
+def trade_notifications(db: Session, payload: Dict) -> List[Notification]:
+    """Notifications for the participants of a trade.status_changed event"""
+    messages = STATUS_MESSAGES.get(payload["status"], {})
+    parties = {payload["buyer_id"]: BUYER, payload["seller_id"]: SELLER}
+    parties.pop(payload.get("actor_id"), None)
+    user_service = UserService(db)
+    notifications = []
+    for user_id, role in parties.items():
+        template = messages.get(role)
+        user = user_service.get_user_by_id(user_id) if template else None
+        if not user:
+            continue
+        notifications.append(Notification(
+            user_id=user.id,
+            key=f"{payload['trade_id']}:{payload['status']}",
+            text=template.format(trade_id=payload["trade_id"]),
+            recipient={"user_id": user.id, "email": user.email, "telegram_handle": user.telegram_handle},
+        ))
+    return notifications
+
+class Notifier:
+    """Batches notifications per user and delivers them through the channels.
+
+    submit() is called from outbox handler threads and only records the
+    notification in the user's batch: a batch is sent as one message once
+    its window has passed or it is full, and a key already sent to the user
+    is dropped. Each channel has its own bounded queue, worker pool and
+    token bucket, so a slow or rate-limited channel does not hold up the
+    others. When the queues are full batches wait, and past max_pending
+    submit() refuses new notifications; the outbox event is then retried
+    with backoff instead of piling up in memory. Keys are remembered per
+    process, so a retry handled by another process may be sent again.
+    """
+
+    def __init__(self, channels: Optional[List[NotificationChannel]] = None, workers: int = NOTIFICATION_WORKERS,
+                 batch_window: float = NOTIFICATION_BATCH_WINDOW, batch_size: int = NOTIFICATION_BATCH_SIZE,
+                 queue_size: int = NOTIFICATION_QUEUE_SIZE, max_pending: int = NOTIFICATION_MAX_PENDING,
+                 max_attempts: int = NOTIFICATION_MAX_ATTEMPTS, backoff: float = NOTIFICATION_RETRY_BACKOFF,
+                 dedupe_keys: int = NOTIFICATION_DEDUPE_KEYS):
+        self.channels = channels
+        self.workers = workers
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.dedupe_keys = dedupe_keys
+        self.buckets = InMemoryBucketBackend()
+        self._lock = threading.Lock()
+        self._batches: Dict[int, Batch] = {}
+        self._pending = 0
+        self._sent: "OrderedDict[Tuple[int, str], None]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+
+    def submit(self, notification: Notification) -> bool:
+        """Add a notification to its user's batch; safe to call from any thread.
+
+        Returns False for a duplicate and raises NotificationBacklogFull when
+        max_pending notifications are already waiting.
+        """
+        sent_key = (notification.user_id, notification.key)
+        with self._lock:
+            if sent_key in self._sent:
+                submitted.inc(result="duplicate")
+                return False
+            if self._pending >= self.max_pending:
+                submitted.inc(result="refused")
+                raise NotificationBacklogFull(f"{self._pending} notifications are waiting")
+            batch = self._batches.get(notification.user_id)
+            opened = batch is None
+            if opened:
+                batch = self._batches[notification.user_id] = Batch(
+                    notification.recipient, {}, time.monotonic() + self.batch_window
+                )
+            batch.recipient = notification.recipient
+            batch.messages[notification.key] = notification.text
+            full = len(batch.messages) >= self.batch_size
+            if full:
+                batch.due = 0.0
+            self._sent[sent_key] = None
+            if len(self._sent) > self.dedupe_keys:
+                self._sent.popitem(last=False)
+            self._pending += 1
+            backlog.set(self._pending)
+        submitted.inc(result="queued")
+        if (opened or full) and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def pending(self) -> int:
+        """Notifications waiting in batches"""
+        return self._pending
+
+    async def start(self):
+        if self.channels is None:
+            self.channels = load_channels()
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._queues = {channel.name: asyncio.Queue(self.queue_size) for channel in self.channels}
+        self._tasks = [
+            asyncio.create_task(self._deliver_from(self._queues[channel.name]))
+            for channel in self.channels for _ in range(self.workers)
+        ]
+        # batches submitted before start are picked up by the first pass
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Send what is waiting (for up to timeout seconds), then stop the workers"""
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            try:
+                await asyncio.wait_for(self.drain(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Notifications still queued at shutdown were dropped")
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def drain(self):
+        """Send every batch now and wait for the queues to empty (tests, benchmarks, shutdown).
+
+        Deliveries waiting for a retry are not waited for.
+        """
+        batches, _ = self._take_due(force=True)
+        for batch in batches:
+            await self._enqueue(batch)
+        for queue in self._queues.values():
+            await queue.join()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            batches, wait = self._take_due()
+            for batch in batches:
+                # waits while a channel's queue is full; meanwhile batches grow and submit() pushes back
+                await self._enqueue(batch)
+            if batches:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _take_due(self, force: bool = False) -> Tuple[List[Batch], Optional[float]]:
+        """Batches to send now, and seconds until the next one is due"""
+        now = time.monotonic()
+        with self._lock:
+            due = [user_id for user_id, batch in self._batches.items() if force or batch.due <= now]
+            batches = [self._batches.pop(user_id) for user_id in due]
+            self._pending -= sum(len(batch.messages) for batch in batches)
+            backlog.set(self._pending)
+            next_due = min((batch.due for batch in self._batches.values()), default=None)
+        return batches, None if next_due is None else max(next_due - now, 0.0)
+
+    async def _enqueue(self, batch: Batch):
+        text = compose(list(batch.messages.values()))
+        for channel in self.channels:
+            address = channel.address(batch.recipient)
+            if address:
+                await self._queues[channel.name].put(Delivery(channel, address, text))
+
+    async def _deliver_from(self, queue: asyncio.Queue):
+        while True:
+            delivery = await queue.get()
+            try:
+                await self._deliver(delivery)
+            except Exception:
+                logger.exception("Notification delivery through %s failed", delivery.channel.name)
+                delivered.inc(channel=delivery.channel.name, result="failed")
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, delivery: Delivery):
+        channel = delivery.channel
+        if channel.rate:
+            while True:
+                allowed, retry_after = self.buckets.take(channel.name, channel.rate, channel.burst)
+                if allowed:
+                    break
+                await asyncio.sleep(retry_after)
+        try:
+            await channel.send(delivery.address, delivery.text)
+        except ChannelError as e:
+            self._retry(delivery, e)
+            return
+        delivered.inc(channel=channel.name, result="sent")
+
+    def _retry(self, delivery: Delivery, error: ChannelError):
+        channel = delivery.channel.name
+        delivery.attempt += 1
+        if delivery.attempt >= self.max_attempts:
+            logger.warning("Giving up on a %s notification to %s: %s", channel, delivery.address, error)
+            delivered.inc(channel=channel, result="failed")
+            return
+        delivered.inc(channel=channel, result="retry")
+        delay = error.retry_after or self.backoff * 2 ** (delivery.attempt - 1)
+        handle = None
+
+        def requeue():
+            self._retries.discard(handle)
+            try:
+                self._queues[channel].put_nowait(delivery)
+            except asyncio.QueueFull:
+                delivered.inc(channel=channel, result="dropped")
+
+        handle = self._loop.call_later(delay, requeue)
+        self._retries.add(handle)
+
+notifier = Notifier()
@@ -0,0 +1,316 @@
+from bisect import bisect_left, insort
+from collections import namedtuple
+from operator import itemgetter
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy.orm import Session
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import asyncio
+import itertools
+import logging
+import os
+import threading
+from app.core.amounts import FIAT_DECIMALS, to_decimal, to_units
+from app.core.metrics import registry
+from app.database import session_scope, shard_engines
+from app.models.offer import Offer
+from app.models.trade import TradeType
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# seconds between polls for offers written by other processes, and how far back
+# each poll looks so commits that land out of updated_at order are not missed
+OFFER_BOOK_SYNC_INTERVAL = float(os.getenv("OFFER_BOOK_SYNC_INTERVAL", "2"))
+OFFER_BOOK_SYNC_OVERLAP = float(os.getenv("OFFER_BOOK_SYNC_OVERLAP", "10"))
+# seconds between reloads of the makers' trust scores, which other processes and the rescoring job change
+OFFER_BOOK_TRUST_INTERVAL = float(os.getenv("OFFER_BOOK_TRUST_INTERVAL", "60"))
+# most offers one match examines, from the top of the book (of the payment method's offers when filtered)
+OFFER_BOOK_MAX_SCAN = int(os.getenv("OFFER_BOOK_MAX_SCAN", "1000"))
+
+# what the book needs of an offer; plain rows load far faster than entities
+BOOK_COLUMNS = (
+    Offer.id, Offer.user_id, Offer.side, Offer.crypto_currency, Offer.fiat_currency, Offer.price,
+    Offer.min_amount, Offer.max_amount, Offer.payment_methods, Offer.status, Offer.queued_at, Offer.updated_at,
+)
+
+# BOOK_COLUMNS and the owner's trust score, when users are on other databases than offers
+BookRow = namedtuple("BookRow", [column.key for column in BOOK_COLUMNS] + ["trust_score"])
+
+book_offers = registry.gauge("offer_book_offers", "Active offers held in the in-memory book")
+
+_method_sets: Dict[Tuple[str, ...], FrozenSet[str]] = {}
+
+def payment_method_set(methods: List[str]) -> FrozenSet[str]:
+    """Shared frozenset per combination of payment methods; offers repeat a handful of them"""
+    key = tuple(methods)
+    found = _method_sets.get(key)
+    if found is None:
+        found = _method_sets[key] = frozenset(method.lower() for method in methods)
+    return found
+
+class BookOffer:
+    """An active offer as held in the book"""
+    __slots__ = ("offer_id", "user_id", "side", "price", "min_amount", "max_amount", "payment_methods", "key")
+
+    def __init__(self, offer_id: int, user_id: int, side: TradeType, price: Decimal, min_amount: Decimal,
+                 max_amount: Decimal, payment_methods: FrozenSet[str], key: Tuple):
+        self.offer_id = offer_id
+        self.user_id = user_id
+        self.side = side
+        self.price = price
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.payment_methods = payment_methods
+        self.key = key
+
+    @classmethod
+    def from_offer(cls, offer) -> "BookOffer":
+        """From an Offer or a row of BOOK_COLUMNS"""
+        price_units = to_units(offer.price, FIAT_DECIMALS)
+        # best price first: cheapest sell offer, highest buy offer; then oldest first
+        key = (price_units if offer.side == TradeType.SELL else -price_units,
+               offer.queued_at.timestamp(), offer.id)
+        return cls(offer.id, offer.user_id, offer.side, to_decimal(offer.price), to_decimal(offer.min_amount),
+                   to_decimal(offer.max_amount), payment_method_set(offer.payment_methods), key)
+
+def _remove(entries: List[Tuple[Tuple, BookOffer]], key: Tuple):
+    index = bisect_left(entries, (key,))
+    if index < len(entries) and entries[index][0] == key:
+        del entries[index]
+
+class BookSide:
+    """Offers of one side of a pair as (key, offer), kept sorted by (price, time),
+    all of them and per payment method"""
+
+    def __init__(self):
+        self.entries: List[Tuple[Tuple, BookOffer]] = []
+        self.by_method: Dict[str, List[Tuple[Tuple, BookOffer]]] = {}
+
+    def add(self, offer: BookOffer):
+        # keys are unique, so offers themselves are never compared
+        insort(self.entries, (offer.key, offer))
+        for method in offer.payment_methods:
+            insort(self.by_method.setdefault(method, []), (offer.key, offer))
+
+    def remove(self, offer: BookOffer):
+        _remove(self.entries, offer.key)
+        for method in offer.payment_methods:
+            entries = self.by_method.get(method)
+            if entries is not None:
+                _remove(entries, offer.key)
+                if not entries:
+                    del self.by_method[method]
+
+    def sort(self):
+        """Order entries appended out of order, and index them by payment method"""
+        self.entries.sort(key=itemgetter(0))
+        self.by_method = {}
+        for entry in self.entries:
+            for method in entry[1].payment_methods:
+                self.by_method.setdefault(method, []).append(entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+class OfferBook:
+    """Price-time priority books of the active offers, one per (crypto, fiat) pair.
+
+    The offers table is the source of truth: the book is rebuilt from it at
+    startup, updated in place after this process commits an offer change, and
+    polled for changes committed by other processes. Matching reads only
+    memory, so it never waits on the database.
+    """
+
+    def __init__(self, interval: float = OFFER_BOOK_SYNC_INTERVAL, trust_interval: float = OFFER_BOOK_TRUST_INTERVAL,
+                 max_scan: int = OFFER_BOOK_MAX_SCAN):
+        self.interval = interval
+        self.trust_interval = trust_interval
+        self.max_scan = max_scan
+        self._sides: Dict[Tuple[str, str, TradeType], BookSide] = {}
+        self._offers: Dict[int, Tuple[Tuple[str, str, TradeType], BookOffer]] = {}
+        self._trust: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def rebuild(self, db: Session) -> int:
+        """Replace the book with the active offers in the database"""
+        rows = self._rows(db, Offer.status == "active")
+
+        sides: Dict[Tuple[str, str, TradeType], BookSide] = {}
+        offers = {}
+        trust = {}
+        synced_at = None
+        for offer in rows:
+            pair = (offer.crypto_currency, offer.fiat_currency, offer.side)
+            entry = BookOffer.from_offer(offer)
+            side = sides.setdefault(pair, BookSide())
+            side.entries.append((entry.key, entry))
+            offers[offer.id] = (pair, entry)
+            trust[offer.user_id] = offer.trust_score
+            if synced_at is None or offer.updated_at > synced_at:
+                synced_at = offer.updated_at
+        # one sort per side instead of an insort per offer
+        for side in sides.values():
+            side.sort()
+
+        with self._lock:
+            self._sides, self._offers = sides, offers
+            self._trust.update(trust)
+            self._synced_at = synced_at or datetime.utcnow()
+        book_offers.set(len(offers))
+        return len(offers)
+
+    def refresh(self, db: Session) -> int:
+        """Apply offers changed since the last rebuild or refresh"""
+        if self._synced_at is None:
+            return self.rebuild(db)
+
+        since = self._synced_at - timedelta(seconds=OFFER_BOOK_SYNC_OVERLAP)
+        rows = self._rows(db, Offer.updated_at >= since)
+        for offer in rows:
+            self.put(offer, offer.trust_score)
+            if offer.updated_at > self._synced_at:
+                self._synced_at = offer.updated_at
+        return len(rows)
+
+    def refresh_trust(self, db: Session) -> int:
+        """Reload the trust scores of the makers in the book"""
+        with self._lock:
+            user_ids = list(self._trust)
+        scores = {}
+        for start in range(0, len(user_ids), 10_000):
+            scores.update(db.query(User.id, User.trust_score).filter(User.id.in_(user_ids[start:start + 10_000])))
+        with self._lock:
+            for user_id, trust_score in scores.items():
+                if user_id in self._trust:
+                    self._trust[user_id] = trust_score
+        return len(scores)
+
+    @staticmethod
+    def _rows(db: Session, *criteria) -> list:
+        """Book columns of the offers matching criteria, with their owners' trust scores"""
+        if not shard_engines:
+            return db.query(*BOOK_COLUMNS, User.trust_score).join(User, User.id == Offer.user_id).filter(
+                *criteria
+            ).all()
+        # users are sharded: look the owners up by id, which routes to their shards
+        rows = db.query(*BOOK_COLUMNS).filter(*criteria).all()
+        user_ids = list({row.user_id for row in rows})
+        trust = {}
+        for start in range(0, len(user_ids), 10_000):
+            trust.update(db.query(User.id, User.trust_score).filter(User.id.in_(user_ids[start:start + 10_000])))
+        return [BookRow(*row, trust.get(row.user_id, 0.0)) for row in rows]
+
+    def put(self, offer, trust_score: Optional[float] = None):
+        """Insert, move or drop an offer according to its current state"""
+        entry = BookOffer.from_offer(offer) if offer.status == "active" else None
+        with self._lock:
+            self._discard(offer.id)
+            if entry is not None:
+                pair = (offer.crypto_currency, offer.fiat_currency, offer.side)
+                self._sides.setdefault(pair, BookSide()).add(entry)
+                self._offers[offer.id] = (pair, entry)
+            if trust_score is not None:
+                self._trust[offer.user_id] = trust_score
+            count = len(self._offers)
+        book_offers.set(count)
+
+    def set_trust(self, user_id: int, trust_score: float):
+        """Keep the trust score used to filter matches in step with the user's"""
+        with self._lock:
+            if user_id in self._trust:
+                self._trust[user_id] = trust_score
+
+    def match(self, crypto_currency: str, fiat_currency: str, side: TradeType, amount: Optional[Decimal] = None,
+              payment_method: Optional[str] = None, min_trust_score: float = 0, exclude_user_id: Optional[int] = None,
+              limit: int = 10) -> List[Dict]:
+        """Best counterparty offers for a taker who wants to buy or sell.
+
+        A buying taker is matched against sell offers, cheapest first, and a
+        selling taker against buy offers, highest first; equal prices go to
+        the older offer. Results are plain dicts shaped like OfferMatch.
+
+        At most max_scan offers are examined, so a selective filter costs a
+        bounded time under the lock: the matches are the best among the top
+        max_scan offers (of the payment method, when one is given).
+        """
+        wanted = TradeType.SELL if side == TradeType.BUY else TradeType.BUY
+        method = payment_method.lower() if payment_method else None
+        matches = []
+        with self._lock:
+            book = self._sides.get((crypto_currency.upper(), fiat_currency.upper(), wanted))
+            if book is None:
+                return matches
+            trust = self._trust
+            entries = book.entries if method is None else book.by_method.get(method, ())
+            for _, offer in itertools.islice(entries, self.max_scan):
+                if offer.user_id == exclude_user_id:
+                    continue
+                if amount is not None and not offer.min_amount <= amount <= offer.max_amount:
+                    continue
+                trust_score = trust.get(offer.user_id, 0.0)
+                if trust_score < min_trust_score:
+                    continue
+                matches.append({
+                    "offer_id": offer.offer_id,
+                    "user_id": offer.user_id,
+                    "side": offer.side,
+                    "price": offer.price,
+                    "min_amount": offer.min_amount,
+                    "max_amount": offer.max_amount,
+                    "payment_methods": sorted(offer.payment_methods),
+                    "trust_score": trust_score,
+                })
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def depth(self, crypto_currency: str, fiat_currency: str) -> Dict[str, int]:
+        with self._lock:
+            return {
+                side.value: len(self._sides.get((crypto_currency.upper(), fiat_currency.upper(), side), ()))
+                for side in TradeType
+            }
+
+    def __len__(self) -> int:
+        return len(self._offers)
+
+    def _discard(self, offer_id: int):
+        current = self._offers.pop(offer_id, None)
+        if current is not None:
+            pair, entry = current
+            self._sides[pair].remove(entry)
+
+    async def start(self):
+        count = await asyncio.to_thread(self._load, self.rebuild)
+        logger.info("Offer book loaded %d active offers", count)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        trust_loaded = asyncio.get_running_loop().time()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self._load, self.refresh)
+                if asyncio.get_running_loop().time() - trust_loaded >= self.trust_interval:
+                    trust_loaded = asyncio.get_running_loop().time()
+                    await asyncio.to_thread(self._load, self.refresh_trust)
+            except Exception:
+                logger.exception("Offer book refresh failed")
+
+    def _load(self, load) -> int:
+        with session_scope() as db:
+            return load(db)
+
+offer_book = OfferBook()
@@ -0,0 +1,109 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from app.database import read_only
+from app.core.unit_of_work import transactional, unit_of_work
+from app.models.offer import Offer
+from app.models.user import User
+from app.schemas.offer import OfferCreate, OfferUpdate
+from app.services.crypto_service import CryptoService, SUPPORTED_FIAT_CURRENCIES
+from app.services.offer_book import offer_book
+
+class OfferService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.uow = unit_of_work(db)
+
+    @transactional
+    def create_offer(self, user_id: int, offer_data: OfferCreate) -> Offer:
+        """Post a buy or sell offer to the book"""
+        crypto_currency = offer_data.crypto_currency.upper()
+        fiat_currency = offer_data.fiat_currency.upper()
+        self._validate_limits(crypto_currency, fiat_currency, offer_data.min_amount, offer_data.max_amount)
+
+        user = self.uow.get(User, user_id)
+        if not user or not user.is_active:
+            raise ValueError("User not found")
+
+        offer = Offer(
+            user_id=user_id,
+            side=offer_data.side,
+            crypto_currency=crypto_currency,
+            fiat_currency=fiat_currency,
+            price=offer_data.price,
+            min_amount=offer_data.min_amount,
+            max_amount=offer_data.max_amount,
+            payment_methods=offer_data.payment_methods,
+            terms=offer_data.terms
+        )
+        self.db.add(offer)
+
+        trust_score = user.trust_score
+        self.uow.on_commit(lambda: offer_book.put(offer, trust_score))
+        return offer
+
+    def get_offer(self, offer_id: int) -> Optional[Offer]:
+        """Get offer by ID"""
+        return self.uow.get(Offer, offer_id)
+
+    @read_only
+    def get_user_offers(self, user_id: int, include_closed: bool = False) -> List[Offer]:
+        """Get a user's offers, newest first"""
+        query = self.db.query(Offer).filter(Offer.user_id == user_id)
+        if not include_closed:
+            query = query.filter(Offer.status != "closed")
+        return query.order_by(Offer.created_at.desc()).all()
+
+    @transactional
+    def update_offer(self, offer_id: int, user_id: int, offer_update: OfferUpdate) -> Offer:
+        """Reprice, resize, pause or resume an offer"""
+        offer = self._get_own_offer(offer_id, user_id)
+        changes = offer_update.dict(exclude_unset=True)
+
+        if "min_amount" in changes or "max_amount" in changes:
+            self._validate_limits(offer.crypto_currency, offer.fiat_currency,
+                                  changes.get("min_amount", offer.min_amount),
+                                  changes.get("max_amount", offer.max_amount))
+
+        # a new price goes to the back of the queue at that price
+        if "price" in changes and Decimal(changes["price"]) != Decimal(offer.price):
+            offer.queued_at = datetime.utcnow()
+
+        for field, value in changes.items():
+            setattr(offer, field, value)
+
+        self.uow.on_commit(lambda: offer_book.put(offer))
+        return offer
+
+    @transactional
+    def close_offer(self, offer_id: int, user_id: int) -> Offer:
+        """Withdraw an offer from the book for good"""
+        offer = self._get_own_offer(offer_id, user_id)
+        offer.status = "closed"
+
+        self.uow.on_commit(lambda: offer_book.put(offer))
+        return offer
+
+    def _get_own_offer(self, offer_id: int, user_id: int) -> Offer:
+        offer = self.get_offer(offer_id)
+        if not offer:
+            raise ValueError("Offer not found")
+        if offer.user_id != user_id:
+            raise ValueError("Access denied")
+        if offer.status == "closed":
+            raise ValueError("Offer is closed")
+        return offer
+
+    def _validate_limits(self, crypto_currency: str, fiat_currency: str, min_amount, max_amount):
+        if fiat_currency not in SUPPORTED_FIAT_CURRENCIES:
+            raise ValueError(f"Fiat currency {fiat_currency} not supported")
+
+        crypto_service = CryptoService(self.db)
+        if not crypto_service.get_quote_terms(crypto_currency):
+            raise ValueError(f"Cryptocurrency {crypto_currency} not supported")
+        if min_amount > max_amount:
+            raise ValueError("Minimum amount exceeds maximum amount")
+        if not (crypto_service.validate_trade_amount(crypto_currency, min_amount) and
+                crypto_service.validate_trade_amount(crypto_currency, max_amount)):
+            raise ValueError(f"Offer limits outside the allowed trade amounts for {crypto_currency}")
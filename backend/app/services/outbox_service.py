@@ -0,0 +1,90 @@
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+from app.models.outbox import OutboxEvent
+
+# event topics
+RATING_CREATED = "rating.created"
+TRADE_COMPLETED = "trade.completed"
+TRADE_STATUS_CHANGED = "trade.status_changed"
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# called after a commit that wrote outbox events, so in-process workers wake up
+_listeners: List[Callable[[], None]] = []
+
+def on_enqueued(callback: Callable[[], None]):
+    _listeners.append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _notify(session: Session):
+    if session.info.pop("outbox_pending", False):
+        for callback in _listeners:
+            callback()
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session):
+    session.info.pop("outbox_pending", None)
+
+class OutboxService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, topic: str, payload: Dict[str, Any]) -> OutboxEvent:
+        """Record an event in the caller's transaction; it is published when that commits"""
+        outbox_event = OutboxEvent(topic=topic, payload=payload)
+        self.db.add(outbox_event)
+        self.db.info["outbox_pending"] = True
+        return outbox_event
+
+    def claim(self, limit: int, lease: timedelta) -> List[int]:
+        """Lease up to limit due events, including ones whose previous lease expired"""
+        now = datetime.utcnow()
+        events = self.db.query(OutboxEvent).filter(
+            or_(
+                (OutboxEvent.status == PENDING) & (OutboxEvent.available_at <= now),
+                (OutboxEvent.status == PROCESSING) & (OutboxEvent.locked_until < now),
+            )
+        ).order_by(OutboxEvent.id).limit(limit).with_for_update(skip_locked=True).all()
+
+        for outbox_event in events:
+            outbox_event.status = PROCESSING
+            outbox_event.locked_until = now + lease
+        self.db.commit()
+        return [outbox_event.id for outbox_event in events]
+
+    def get(self, event_id: int) -> OutboxEvent:
+        return self.db.query(OutboxEvent).filter(OutboxEvent.id == event_id).first()
+
+    def mark_done(self, outbox_event: OutboxEvent):
+        outbox_event.status = DONE
+        outbox_event.processed_at = datetime.utcnow()
+        outbox_event.locked_until = None
+
+    def mark_failed(self, outbox_event: OutboxEvent, error: str, retry_in: timedelta, max_attempts: int):
+        """Schedule a retry, or give up after max_attempts"""
+        outbox_event.attempts += 1
+        outbox_event.last_error = error
+        outbox_event.locked_until = None
+        if outbox_event.attempts >= max_attempts:
+            outbox_event.status = FAILED
+        else:
+            outbox_event.status = PENDING
+            outbox_event.available_at = datetime.utcnow() + retry_in
+
+    def backlog(self) -> int:
+        """Events not processed yet"""
+        return self.db.query(OutboxEvent).filter(OutboxEvent.status.in_([PENDING, PROCESSING])).count()
+
+    def purge(self, older_than: timedelta) -> int:
+        """Delete processed events older than older_than"""
+        deleted = self.db.query(OutboxEvent).filter(
+            OutboxEvent.status == DONE,
+            OutboxEvent.processed_at < datetime.utcnow() - older_than
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
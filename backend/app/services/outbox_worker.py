@@ -0,0 +1,178 @@
+from sqlalchemy.orm import Session
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+from app.core.metrics import registry
+from app.database import session_scope
+from app.core.unit_of_work import unit_of_work
+from app.services.outbox_service import (
+    OutboxService, FAILED, PROCESSING, RATING_CREATED, TRADE_COMPLETED, TRADE_STATUS_CHANGED, on_enqueued
+)
+from app.services.notifier import notifier, trade_notifications
+from app.services.user_service import UserService
+
+logger = logging.getLogger(__name__)
+
+# concurrent workers in the API process (0 to leave the outbox to app/scripts/run_outbox_worker.py)
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+# seconds between polls when no commit has signalled new events
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_RETRY_BACKOFF = float(os.getenv("OUTBOX_RETRY_BACKOFF", "2"))
+# processed events are deleted once older than OUTBOX_RETENTION_HOURS, checked every OUTBOX_PURGE_INTERVAL seconds
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "168"))
+OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", "3600"))
+
+Handler = Callable[[Session, Dict], None]
+
+# topic -> handlers; every handler must be safe to run more than once per event
+handlers: Dict[str, List[Handler]] = {}
+
+def handles(topic: str):
+    """Register a handler for an outbox topic"""
+    def register(handler: Handler) -> Handler:
+        handlers.setdefault(topic, []).append(handler)
+        return handler
+    return register
+
+@handles(RATING_CREATED)
+def update_rated_user_trust_score(db: Session, payload: Dict):
+    UserService(db).update_trust_score(payload["rated_user_id"])
+
+@handles(TRADE_COMPLETED)
+def update_trader_stats(db: Session, payload: Dict):
+    user_service = UserService(db)
+    for user_id in (payload["buyer_id"], payload["seller_id"]):
+        # recomputed from the trades table, so a retried event cannot double count
+        user_service.refresh_trade_stats(user_id)
+        user_service.update_trust_score(user_id)
+
+@handles(TRADE_STATUS_CHANGED)
+def notify_trade_participants(db: Session, payload: Dict):
+    # a backlogged notifier refuses the event, which is then retried with backoff
+    for notification in trade_notifications(db, payload):
+        notifier.submit(notification)
+
+processed = registry.counter("outbox_events_processed_total", "Outbox events handled, by topic and result")
+purged = registry.counter("outbox_events_purged_total", "Processed outbox events deleted after the retention period")
+
+class OutboxWorker:
+    """Pool of asyncio workers draining the outbox.
+
+    Workers lease batches of due events (SKIP LOCKED, so several processes can
+    share the table) and run each event's handlers in the threadpool, marking
+    the event done in the same transaction. Failures are retried with
+    exponential backoff. Commits that write events wake idle workers; otherwise
+    they poll. A separate task deletes processed events past their retention.
+    """
+
+    def __init__(self, concurrency: int = OUTBOX_WORKERS, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL, lease: float = OUTBOX_LEASE_SECONDS,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS, backoff: float = OUTBOX_RETRY_BACKOFF,
+                 retention: float = OUTBOX_RETENTION_HOURS, purge_interval: float = OUTBOX_PURGE_INTERVAL):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retention = timedelta(hours=retention)
+        self.purge_interval = purge_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        on_enqueued(self.notify)
+
+    def notify(self):
+        """Wake idle workers; safe to call from any thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._purge_periodically()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def drain(self) -> int:
+        """Process due events until none are left; returns the number handled"""
+        handled = 0
+        while True:
+            event_ids = await asyncio.to_thread(self._claim)
+            if not event_ids:
+                return handled
+            for event_id in event_ids:
+                await asyncio.to_thread(self.process, event_id)
+            handled += len(event_ids)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                event_ids = await asyncio.to_thread(self._claim)
+            except Exception:
+                logger.exception("Claiming outbox events failed")
+                event_ids = []
+            if not event_ids:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            for event_id in event_ids:
+                await asyncio.to_thread(self.process, event_id)
+
+    async def _purge_periodically(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.purge)
+            except Exception:
+                logger.exception("Purging outbox events failed")
+            await asyncio.sleep(self.purge_interval)
+
+    def purge(self) -> int:
+        """Delete processed events older than the retention period"""
+        with session_scope() as db:
+            deleted = OutboxService(db).purge(self.retention)
+        purged.inc(deleted)
+        return deleted
+
+    def _claim(self) -> List[int]:
+        with session_scope() as db:
+            return OutboxService(db).claim(self.batch_size, self.lease)
+
+    def process(self, event_id: int):
+        """Run the handlers of a leased event and record the outcome"""
+        with session_scope() as db:
+            outbox = OutboxService(db)
+            outbox_event = outbox.get(event_id)
+            if not outbox_event or outbox_event.status != PROCESSING:
+                return
+            topic = outbox_event.topic
+            try:
+                # handlers and the done mark commit together
+                with unit_of_work(db).transaction():
+                    for handler in handlers.get(topic, []):
+                        handler(db, outbox_event.payload)
+                    outbox.mark_done(outbox_event)
+                processed.inc(topic=topic, result="done")
+            except Exception as e:
+                logger.exception("Outbox event %s (%s) failed", event_id, topic)
+                outbox_event = outbox.get(event_id)
+                retry_in = timedelta(seconds=self.backoff * 2 ** outbox_event.attempts)
+                outbox.mark_failed(outbox_event, repr(e), retry_in, self.max_attempts)
+                db.commit()
+                processed.inc(topic=topic, result="failed" if outbox_event.status == FAILED else "retry")
+
+outbox_worker = OutboxWorker()
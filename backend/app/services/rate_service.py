@@ -0,0 +1,254 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+from urllib.request import urlopen
+import asyncio
+import json
+import logging
+import os
+import time
+from app.core.amounts import FIAT_DECIMALS, Number, to_decimal
+from app.core.metrics import registry
+from app.core.plugins import load_object
+from app.database import session_scope
+from app.models.crypto_config import CryptoConfig
+from app.services.crypto_service import SUPPORTED_FIAT_CURRENCIES
+
+logger = logging.getLogger(__name__)
+
+# market rate source: "coingecko", "fixture" (fixed rates, for development and tests) or "module:Class";
+# required, the API does not start without one
+RATE_PROVIDER = os.getenv("RATE_PROVIDER")
+# seconds between refreshes, and age after which a rate is no longer used
+RATE_REFRESH_INTERVAL = float(os.getenv("RATE_REFRESH_INTERVAL", "60"))
+RATE_MAX_AGE = float(os.getenv("RATE_MAX_AGE", "300"))
+# percent a trade's exchange rate may differ from the market rate
+RATE_MAX_DEVIATION = Decimal(os.getenv("RATE_MAX_DEVIATION", "5"))
+# JSON file of {"USDT/NGN": "1500", ...} overriding the fixture rates
+RATE_FIXTURE_PATH = os.getenv("RATE_FIXTURE_PATH")
+
+RATE_QUANTUM = Decimal("0.00000001")
+FIAT_QUANTUM = Decimal(1).scaleb(-FIAT_DECIMALS)
+
+Pair = Tuple[str, str]
+
+rate_updated = registry.gauge("exchange_rate_updated_timestamp_seconds", "Unix time each pair's rate was last refreshed")
+rate_age = registry.gauge("exchange_rate_age_seconds", "Age of the oldest held exchange rate")
+rate_pairs = registry.gauge("exchange_rate_pairs", "Pairs with a usable exchange rate")
+rate_errors = registry.counter("exchange_rate_refresh_errors_total", "Failed exchange rate refreshes")
+rate_checks_skipped = registry.counter("exchange_rate_checks_skipped_total",
+                                       "Trade rate checks skipped for want of a current market rate")
+
+class Rate(NamedTuple):
+    crypto: str
+    fiat: str
+    value: Decimal  # fiat per unit of crypto
+    source: str
+    fetched_at: float  # unix time
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+class RateProvider:
+    """Source of market rates. fetch() runs in a worker thread."""
+
+    name = "provider"
+
+    def fetch(self, cryptos: Iterable[str], fiats: Iterable[str]) -> Dict[Pair, Decimal]:
+        raise NotImplementedError
+
+class FixtureRateProvider(RateProvider):
+    """Fixed rates for development and tests: USD prices crossed with fiat per USD"""
+
+    name = "fixture"
+
+    USD_PRICES = {
+        "USDT": "1", "USDC": "1", "BTC": "65000", "ETH": "3200", "BNB": "580",
+        "ADA": "0.45", "SOL": "150", "DOT": "6.5", "MATIC": "0.7", "AVAX": "30",
+    }
+    FIAT_PER_USD = {
+        "NGN": "1500", "USD": "1", "EUR": "0.92", "GBP": "0.79", "KES": "129", "GHS": "15.5", "ZAR": "18.2",
+    }
+
+    def __init__(self, rates: Optional[Dict[str, Number]] = None, path: Optional[str] = RATE_FIXTURE_PATH):
+        overrides = dict(rates or {})
+        if path:
+            with open(path) as f:
+                overrides.update(json.load(f))
+        self.overrides = {tuple(pair.upper().split("/")): to_decimal(value) for pair, value in overrides.items()}
+
+    def fetch(self, cryptos: Iterable[str], fiats: Iterable[str]) -> Dict[Pair, Decimal]:
+        rates = {}
+        for crypto in cryptos:
+            for fiat in fiats:
+                if (crypto, fiat) in self.overrides:
+                    rates[(crypto, fiat)] = self.overrides[(crypto, fiat)]
+                elif crypto in self.USD_PRICES and fiat in self.FIAT_PER_USD:
+                    rates[(crypto, fiat)] = Decimal(self.USD_PRICES[crypto]) * Decimal(self.FIAT_PER_USD[fiat])
+        return rates
+
+class CoinGeckoRateProvider(RateProvider):
+    """Rates from the CoinGecko simple price API, one request per refresh"""
+
+    name = "coingecko"
+
+    URL = os.getenv("COINGECKO_URL", "https://api.coingecko.com/api/v3/simple/price")
+    IDS = {
+        "USDT": "tether", "USDC": "usd-coin", "BTC": "bitcoin", "ETH": "ethereum", "BNB": "binancecoin",
+        "ADA": "cardano", "SOL": "solana", "DOT": "polkadot", "MATIC": "matic-network", "AVAX": "avalanche-2",
+    }
+
+    def __init__(self, timeout: float = 10):
+        self.timeout = timeout
+
+    def fetch(self, cryptos: Iterable[str], fiats: Iterable[str]) -> Dict[Pair, Decimal]:
+        ids = {self.IDS[crypto]: crypto for crypto in cryptos if crypto in self.IDS}
+        fiats = list(fiats)
+        query = urlencode({"ids": ",".join(ids), "vs_currencies": ",".join(f.lower() for f in fiats)})
+        with urlopen(f"{self.URL}?{query}", timeout=self.timeout) as response:
+            # parse numbers as Decimal so rates never pass through float
+            prices = json.loads(response.read(), parse_float=Decimal, parse_int=Decimal)
+
+        rates = {}
+        for coin, crypto in ids.items():
+            for fiat in fiats:
+                value = prices.get(coin, {}).get(fiat.lower())
+                if value:
+                    rates[(crypto, fiat)] = value
+        return rates
+
+class RateCache:
+    """Latest rate of every (crypto, fiat) pair, refreshed in the background.
+
+    Reads are dict lookups; only the refresh task talks to the provider, so
+    request handlers never wait on the rate source. Rates older than max_age
+    are treated as missing.
+    """
+
+    def __init__(self, provider: Optional[RateProvider] = None, interval: float = RATE_REFRESH_INTERVAL,
+                 max_age: float = RATE_MAX_AGE):
+        self.provider = provider  # the configured provider when None
+        self.interval = interval
+        self.max_age = max_age
+        self._rates: Dict[Pair, Rate] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, crypto: str, fiat: str) -> Optional[Rate]:
+        """The current rate of a pair, or None when missing or stale"""
+        rate = self._rates.get((crypto.upper(), fiat.upper()))
+        if rate is None or time.time() - rate.fetched_at > self.max_age:
+            return None
+        return rate
+
+    def require(self, crypto: str, fiat: str) -> Rate:
+        rate = self.get(crypto, fiat)
+        if rate is None:
+            raise ValueError(f"No current exchange rate for {crypto.upper()}/{fiat.upper()}")
+        return rate
+
+    def convert(self, amount: Number, crypto: str, fiat: str) -> Decimal:
+        """Fiat value of a crypto amount, rounded to the fiat minor unit"""
+        return (to_decimal(amount) * self.require(crypto, fiat).value).quantize(FIAT_QUANTUM)
+
+    def check_rate(self, crypto: str, fiat: str, rate: Number, max_deviation: Decimal = RATE_MAX_DEVIATION) -> bool:
+        """Raise ValueError when rate is more than max_deviation percent off the market rate.
+
+        Without a current market rate (provider outage, a crypto added since
+        the last refresh) the check is skipped and counted, and False returned:
+        trading does not stop with the rate source.
+        """
+        current = self.get(crypto, fiat)
+        if current is None:
+            rate_checks_skipped.inc(pair=f"{crypto.upper()}/{fiat.upper()}")
+            logger.warning("No current %s/%s rate, trade rate not checked", crypto.upper(), fiat.upper())
+            return False
+        market = current.value
+        if abs(to_decimal(rate) - market) * 100 > market * max_deviation:
+            raise ValueError(f"Exchange rate {rate} deviates more than {max_deviation}% "
+                             f"from the market rate {market.normalize():f}")
+        return True
+
+    def all(self) -> List[Rate]:
+        now = time.time()
+        return [rate for rate in self._rates.values() if now - rate.fetched_at <= self.max_age]
+
+    def refresh(self, cryptos: Optional[Iterable[str]] = None, fiats: Iterable[str] = SUPPORTED_FIAT_CURRENCIES) -> int:
+        """Fetch every pair from the provider; returns the number of pairs updated"""
+        if cryptos is None:
+            # read each time, not through the config cache, so newly added cryptos get rates on the next refresh
+            with session_scope() as db:
+                cryptos = [symbol for symbol, in db.query(CryptoConfig.symbol).filter(CryptoConfig.is_active == True)]
+        provider = self.provider or get_rate_provider()
+        try:
+            fetched = provider.fetch(list(cryptos), list(fiats))
+        except Exception:
+            rate_errors.inc(provider=provider.name)
+            raise
+
+        now = time.time()
+        # swap in a new dict so readers never see a partial update
+        rates = dict(self._rates)
+        for (crypto, fiat), value in fetched.items():
+            rates[(crypto, fiat)] = Rate(crypto, fiat, to_decimal(value).quantize(RATE_QUANTUM), provider.name, now)
+            rate_updated.set(now, pair=f"{crypto}/{fiat}")
+        self._rates = rates
+        self._observe()
+        return len(fetched)
+
+    def _observe(self):
+        now = time.time()
+        ages = [now - rate.fetched_at for rate in self._rates.values()]
+        rate_age.set(max(ages) if ages else 0)
+        rate_pairs.set(sum(1 for age in ages if age <= self.max_age))
+
+    async def start(self):
+        # without a provider fail now, not with every trade
+        self.provider = self.provider or get_rate_provider()
+        try:
+            await asyncio.to_thread(self.refresh)
+        except Exception:
+            logger.exception("Initial exchange rate refresh failed")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("Exchange rate refresh failed")
+                self._observe()
+
+PROVIDERS = {
+    FixtureRateProvider.name: FixtureRateProvider,
+    CoinGeckoRateProvider.name: CoinGeckoRateProvider,
+}
+
+_provider: Optional[RateProvider] = None
+
+def get_rate_provider() -> RateProvider:
+    """Return the configured rate provider"""
+    global _provider
+    if _provider is None:
+        if not RATE_PROVIDER:
+            raise RuntimeError("RATE_PROVIDER is not set: use coingecko, fixture (development and tests) "
+                               "or a module:Class RateProvider")
+        _provider = PROVIDERS[RATE_PROVIDER]() if RATE_PROVIDER in PROVIDERS else load_object(RATE_PROVIDER)()
+    return _provider
+
+def set_rate_provider(provider: RateProvider):
+    """Replace the rate provider (tests, custom deployments)"""
+    global _provider
+    _provider = provider
+
+rate_cache = RateCache()
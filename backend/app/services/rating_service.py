@@ -1,21 +1,30 @@
 from sqlalchemy.orm import Session
 from typing import List
+from app.database import read_only
+from app.core.unit_of_work import transactional, unit_of_work
 from app.models.rating import Rating
 from app.models.report import Report
 from app.models.trade import Trade
+from app.models.trade_archive import ArchivedTrade
 from app.schemas.rating import RatingCreate
 from app.schemas.report import ReportCreate
 from app.services.user_service import UserService
+from app.services.outbox_service import OutboxService, RATING_CREATED
+from app.services.moderation_service import ModerationService
+from app.services.risk_service import RiskService, REPORT_RECEIVED
+from app.services.rating_summary import RatingSummaryService
 
 class RatingService:
     def __init__(self, db: Session):
         self.db = db
+        self.uow = unit_of_work(db)
         self.user_service = UserService(db)
     
+    @transactional
     def create_rating(self, rater_id: int, rating_data: RatingCreate) -> Rating:
         """Create a rating for a user"""
         # Check if trade exists and rater was participant
-        trade = self.db.query(Trade).filter(Trade.id == rating_data.trade_id).first()
+        trade = self.uow.get(Trade, rating_data.trade_id) or self.uow.get(ArchivedTrade, rating_data.trade_id)
         if not trade:
             raise ValueError("Trade not found")
         
@@ -37,20 +46,28 @@ class RatingService:
         )
         
         self.db.add(rating)
-        self.db.commit()
-        self.db.refresh(rating)
-        
-        # Update user's trust score
-        self.user_service.update_trust_score(rating_data.rated_user_id)
+        self.db.flush()
+        RatingSummaryService(self.db).add(rating)
         
+        # Trust score is recomputed by the outbox worker after commit
+        OutboxService(self.db).enqueue(RATING_CREATED, {
+            "rating_id": rating.id,
+            "rated_user_id": rating_data.rated_user_id
+        })
         return rating
     
+    @read_only
     def get_user_ratings(self, user_id: int, limit: int = 20, offset: int = 0) -> List[Rating]:
         """Get ratings for a specific user"""
         return self.db.query(Rating).filter(
             Rating.rated_user_id == user_id
         ).order_by(Rating.created_at.desc()).offset(offset).limit(limit).all()
     
+    def get_rating_summary(self, user_id: int) -> dict:
+        """Rating count, average and star histogram per dimension for a user"""
+        return RatingSummaryService(self.db).get(user_id)
+    
+    @transactional
     def create_report(self, reporter_id: int, report_data: ReportCreate) -> Report:
         """Create a report against a user"""
         report = Report(
@@ -59,12 +76,18 @@ class RatingService:
         )
         
         self.db.add(report)
-        self.db.commit()
-        self.db.refresh(report)
+        
+        if report.trade_id:
+            trade = self.uow.get(Trade, report.trade_id) or self.uow.get(ArchivedTrade, report.trade_id)
+            RiskService(self.db).record_complaint(REPORT_RECEIVED, reporter_id, report.reported_user_id, trade)
+        
+        # Queue the report for moderators in the same transaction
+        ModerationService(self.db).open_report_case(report)
         return report
     
-    def get_user_reports(self, user_id: int) -> List[Report]:
+    @read_only
+    def get_user_reports(self, user_id: int, limit: int = 20, offset: int = 0) -> List[Report]:
         """Get reports made by a user"""
         return self.db.query(Report).filter(
             Report.reporter_id == user_id
-        ).order_by(Report.created_at.desc()).all()
+        ).order_by(Report.created_at.desc()).offset(offset).limit(limit).all()
@@ -0,0 +1,98 @@
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+from app.database import read_only
+from app.models.rating import Rating
+from app.models.rating_summary import RatingSummary
+
+OVERALL = "overall"
+
+# summary dimension -> Rating attribute
+DIMENSIONS = {
+    OVERALL: "rating",
+    "communication": "communication_rating",
+    "reliability": "reliability_rating",
+    "speed": "speed_rating",
+}
+
+STARS = range(1, 6)
+
+def stars(value: float) -> int:
+    """Histogram bucket of a rating: the nearest whole star, halves rounded up"""
+    return min(5, max(1, int(value + 0.5)))
+
+def stars_column(n: int):
+    return getattr(RatingSummary, f"stars_{n}")
+
+class RatingSummaryService:
+    """Per-user rating counts, sums and star histograms, kept up to date as ratings are created"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add(self, rating: Rating):
+        """Count a new rating in its rated user's summary, in the caller's transaction"""
+        values = {
+            dimension: getattr(rating, attribute) for dimension, attribute in DIMENSIONS.items()
+            if getattr(rating, attribute) is not None
+        }
+        self._add(rating.rated_user_id, values)
+
+    def _add(self, user_id: int, values: Dict[str, float]):
+        # one UPDATE adds to every dimension row at once
+        def plus(column, amounts: Dict[str, float]):
+            return column + case(*((RatingSummary.dimension == d, amount) for d, amount in amounts.items()), else_=0)
+
+        assignments = {"count": RatingSummary.count + 1, "total": plus(RatingSummary.total, values)}
+        for n in STARS:
+            rated = {dimension: 1 for dimension, value in values.items() if stars(value) == n}
+            if rated:
+                assignments[f"stars_{n}"] = plus(stars_column(n), rated)
+        updated = self.db.execute(
+            update(RatingSummary).where(
+                RatingSummary.user_id == user_id, RatingSummary.dimension.in_(values)
+            ).values(**assignments).execution_options(synchronize_session=False)
+        ).rowcount
+        if updated == len(values):
+            return
+
+        # first ratings in some dimensions: create their rows
+        existing = set()
+        if updated:
+            existing = {dimension for dimension, in self.db.query(RatingSummary.dimension).filter(
+                RatingSummary.user_id == user_id, RatingSummary.dimension.in_(values)
+            )}
+        missing = {dimension: value for dimension, value in values.items() if dimension not in existing}
+        try:
+            with self.db.begin_nested():
+                self.db.add_all([
+                    RatingSummary(user_id=user_id, dimension=dimension, count=1, total=value,
+                                  **{f"stars_{n}": int(stars(value) == n) for n in STARS})
+                    for dimension, value in missing.items()
+                ])
+        except IntegrityError:
+            # a concurrent first rating created the rows; add on top of them
+            self._add(user_id, missing)
+
+    @read_only
+    def get(self, user_id: int) -> dict:
+        """Counts, averages and star histograms of every dimension, from one indexed query"""
+        rows = {row.dimension: row for row in self.db.query(RatingSummary).filter(RatingSummary.user_id == user_id)}
+        summary = {"user_id": user_id}
+        for dimension in DIMENSIONS:
+            row = rows.get(dimension)
+            count = row.count if row else 0
+            summary[dimension] = {
+                "count": count,
+                "average": round(row.total / count, 2) if count else None,
+                "histogram": {n: getattr(row, f"stars_{n}") if row else 0 for n in STARS},
+            }
+        return summary
+
+    def average(self, user_id: int) -> Optional[float]:
+        """Average overall rating, None without ratings"""
+        row = self.db.query(RatingSummary.total, RatingSummary.count).filter(
+            RatingSummary.user_id == user_id, RatingSummary.dimension == OVERALL
+        ).first()
+        return row.total / row.count if row and row.count else None
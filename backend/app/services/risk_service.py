@@ -0,0 +1,197 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import json
+import os
+import time
+from app.core.metrics import registry
+from app.models.risk import RiskComplaint, RiskCounter
+from app.models.trade import TradeStatus
+
+# check trades against the risk features in create_trade
+RISK_CHECKS_ENABLED = os.getenv("RISK_CHECKS_ENABLED", "true").lower() == "true"
+
+TRADE_CREATED = "trade_created"
+TRADE_CANCELLED = "trade_cancelled"
+DISPUTE_RECEIVED = "dispute_received"
+REPORT_RECEIVED = "report_received"
+DEPOSIT_REJECTED = "deposit_rejected"
+
+# events counted on another user's word: they flag the user for review, never block
+COMPLAINTS = (REPORT_RECEIVED, DISPUTE_RECEIVED)
+
+# a complaint counts only about a trade that got this far: earlier ones cost the complainant nothing
+ESCROWED_STATUSES = (TradeStatus.ESCROW_FUNDED, TradeStatus.PAYMENT_SENT, TradeStatus.PAYMENT_CONFIRMED,
+                     TradeStatus.COMPLETED)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# feature -> (event it counts, window seconds)
+RISK_FEATURES = {
+    "trades_1h": (TRADE_CREATED, HOUR),
+    "trades_24h": (TRADE_CREATED, DAY),
+    "cancellations_7d": (TRADE_CANCELLED, 7 * DAY),
+    "disputes_30d": (DISPUTE_RECEIVED, 30 * DAY),
+    "reports_30d": (REPORT_RECEIVED, 30 * DAY),
+    "deposits_rejected_7d": (DEPOSIT_REJECTED, 7 * DAY),
+}
+
+# feature -> (flag at, block at); RISK_THRESHOLDS='{"trades_1h": [5, 15]}' overrides
+RISK_THRESHOLDS = {
+    "trades_1h": (10, 30),
+    "trades_24h": (50, 200),
+    "cancellations_7d": (3, 10),
+    "disputes_30d": (2, None),
+    "reports_30d": (2, None),
+    "deposits_rejected_7d": (1, 3),
+}
+RISK_THRESHOLDS.update({
+    feature: tuple(limits) for feature, limits in json.loads(os.getenv("RISK_THRESHOLDS", "{}")).items()
+})
+
+ALLOW = "allow"
+FLAG = "flag"
+BLOCK = "block"
+
+risk_decisions = registry.counter("risk_decisions_total", "Trade risk decisions by action")
+
+class RiskAssessment(NamedTuple):
+    action: str  # allow, flag, block
+    reasons: List[str]  # e.g. "user 12 cancellations_7d=4.0 >= 3"
+    flagged_user_ids: List[int]
+
+def estimate(counter: RiskCounter, window: int, now: float) -> float:
+    """Events in the last window seconds: the current window plus the overlapping share of the previous one"""
+    start = int(now) // window * window
+    if counter.window_start == start:
+        current, previous = counter.current, counter.previous
+    elif counter.window_start == start - window:
+        current, previous = 0, counter.current
+    else:
+        return 0.0
+    return current + previous * (1 - (now - start) / window)
+
+def add(counter: RiskCounter, window: int, start: int, count: int):
+    """Count events in the window starting at start, rolling the counter forward if needed"""
+    if counter.window_start == start:
+        counter.current += count
+        return
+    # anything older than the previous window drops out
+    counter.previous = counter.current if counter.window_start == start - window else 0
+    counter.current = count
+    counter.window_start = start
+
+class RiskService:
+    """Per-user sliding window counts of risk events.
+
+    Each (user, feature) is one row holding the counts of the current and
+    previous fixed window, so recording an event and reading a user's
+    features are single-row operations regardless of how much history the
+    user has. Events are recorded in the transaction of the state change
+    that caused them.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(self, user_id: Optional[int], event: str, count: int = 1, now: Optional[float] = None):
+        """Count an event against a user"""
+        if not user_id:
+            return
+        now = time.time() if now is None else now
+        features = {feature: window for feature, (counted, window) in RISK_FEATURES.items() if counted == event}
+        if not features:
+            return
+
+        counters = {
+            counter.feature: counter for counter in self.db.query(RiskCounter).filter(
+                RiskCounter.user_id == user_id, RiskCounter.feature.in_(features)
+            ).with_for_update()
+        }
+        for feature, window in features.items():
+            start = int(now) // window * window
+            counter = counters.get(feature)
+            if counter is None:
+                try:
+                    with self.db.begin_nested():
+                        self.db.add(RiskCounter(user_id=user_id, feature=feature, window_start=start,
+                                                current=count, previous=0))
+                    continue
+                except IntegrityError:
+                    # a concurrent first event created the row; count on top of it
+                    counter = self.db.query(RiskCounter).filter(
+                        RiskCounter.user_id == user_id, RiskCounter.feature == feature
+                    ).with_for_update().one()
+            add(counter, window, start, count)
+
+    def record_complaint(self, event: str, complainant_id: int, user_id: int, trade, now: Optional[float] = None) -> bool:
+        """Count a report or dispute against user_id, when it holds up; returns whether it was counted.
+
+        The complaint must be about a trade between the two that reached
+        escrow, and each complainant counts once per window however many
+        complaints they file.
+        """
+        if trade is None or user_id == complainant_id or trade.status not in ESCROWED_STATUSES:
+            return False
+        if {complainant_id, user_id} != {trade.buyer_id, trade.seller_id}:
+            return False
+        now = time.time() if now is None else now
+        window = max(seconds for counted_event, seconds in RISK_FEATURES.values() if counted_event == event)
+        counted = self.db.query(RiskComplaint).filter(
+            RiskComplaint.user_id == user_id, RiskComplaint.complainant_id == complainant_id,
+            RiskComplaint.event == event
+        ).with_for_update().first()
+        if counted is None:
+            try:
+                with self.db.begin_nested():
+                    self.db.add(RiskComplaint(user_id=user_id, complainant_id=complainant_id, event=event,
+                                              counted_at=int(now)))
+            except IntegrityError:
+                # a concurrent complaint from the same complainant was counted
+                return False
+        elif counted.counted_at > now - window:
+            return False
+        else:
+            counted.counted_at = int(now)
+        self.record(user_id, event, now=now)
+        return True
+
+    def features(self, user_ids: Iterable[int], now: Optional[float] = None) -> Dict[int, Dict[str, float]]:
+        """Current feature values of users, all in one indexed query"""
+        now = time.time() if now is None else now
+        user_ids = [user_id for user_id in user_ids if user_id]
+        values = {user_id: dict.fromkeys(RISK_FEATURES, 0.0) for user_id in user_ids}
+        if not user_ids:
+            return values
+        for counter in self.db.query(RiskCounter).filter(RiskCounter.user_id.in_(user_ids)):
+            if counter.feature in RISK_FEATURES:
+                values[counter.user_id][counter.feature] = estimate(counter, RISK_FEATURES[counter.feature][1], now)
+        return values
+
+    def assess(self, user_ids: Iterable[int], now: Optional[float] = None) -> RiskAssessment:
+        """Block when any feature of any user reaches its block threshold, flag at the flag threshold.
+
+        Complaints received only ever flag: whatever the thresholds, other
+        users cannot get someone blocked by reporting them.
+        """
+        action = ALLOW
+        reasons: List[str] = []
+        flagged: List[int] = []
+        for user_id, features in self.features(user_ids, now).items():
+            for feature, value in features.items():
+                flag_at, block_at = RISK_THRESHOLDS.get(feature, (None, None))
+                if RISK_FEATURES[feature][0] in COMPLAINTS:
+                    block_at = None
+                if block_at is not None and value >= block_at:
+                    action = BLOCK
+                    reasons.append(f"user {user_id} {feature}={value:.1f} >= {block_at}")
+                elif flag_at is not None and value >= flag_at:
+                    action = FLAG if action == ALLOW else action
+                    reasons.append(f"user {user_id} {feature}={value:.1f} >= {flag_at}")
+                else:
+                    continue
+                if user_id not in flagged:
+                    flagged.append(user_id)
+        risk_decisions.inc(action=action)
+        return RiskAssessment(action, reasons, flagged)
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+import os
+import time
+from app.database import scatter, session_scope
+from app.models.trade import Trade, TradeStatus
+from app.models.trade_archive import ArchivedTrade
+
+# days after finishing that completed and cancelled trades move to trades_archive
+TRADE_ARCHIVE_AFTER_DAYS = int(os.getenv("TRADE_ARCHIVE_AFTER_DAYS", "90"))
+# trades moved per transaction
+TRADE_ARCHIVE_BATCH_SIZE = int(os.getenv("TRADE_ARCHIVE_BATCH_SIZE", "5000"))
+
+ARCHIVED_STATUSES = (TradeStatus.COMPLETED, TradeStatus.CANCELLED)
+
+def archive_cutoff(now: datetime = None) -> datetime:
+    """Trades finished before this are archived; every archived trade was also created before it"""
+    return (now or datetime.utcnow()) - timedelta(days=TRADE_ARCHIVE_AFTER_DAYS)
+
+def finished_at(model):
+    return func.coalesce(model.completed_at, model.updated_at, model.created_at)
+
+class TradeArchiveJob:
+    """Move finished trades out of the hot trades table.
+
+    Completed and cancelled trades that finished more than
+    TRADE_ARCHIVE_AFTER_DAYS ago are copied into trades_archive and deleted
+    from trades in the same transaction, in id order batches, keeping their
+    ids: ratings, reports and moderation cases still point at them (those
+    tables have no foreign key to trades). Reads go through TradeService,
+    which falls back to the archive. With shards each shard archives its own
+    trades.
+    """
+
+    def __init__(self, batch_size: int = TRADE_ARCHIVE_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def execute(self, now: datetime = None) -> dict:
+        started = time.perf_counter()
+        cutoff = archive_cutoff(now)
+        with session_scope() as db:
+            archived = sum(scatter(db, lambda trades_db: self._archive(trades_db, cutoff)))
+        return {"archived": archived, "seconds": time.perf_counter() - started}
+
+    def _archive(self, db: Session, cutoff: datetime) -> int:
+        columns = [column.name for column in Trade.__table__.columns]
+        archived = 0
+        after = 0
+        while True:
+            ids = [trade_pk for trade_pk, in db.query(Trade.id).filter(
+                Trade.id > after,
+                Trade.status.in_(ARCHIVED_STATUSES),
+                finished_at(Trade) < cutoff
+            ).order_by(Trade.id).limit(self.batch_size)]
+            if not ids:
+                return archived
+            after = ids[-1]
+
+            db.execute(insert(ArchivedTrade.__table__).from_select(
+                columns, select(*Trade.__table__.columns).where(Trade.id.in_(ids))
+            ))
+            db.execute(delete(Trade.__table__).where(Trade.id.in_(ids)))
+            db.commit()
+            archived += len(ids)
@@ -1,23 +1,48 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy import and_, or_
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 import uuid
+import heapq
+import itertools
+from app.database import read_only, scatter, shard_engines
+from app.core.amounts import round_units, to_units
+from app.core.unit_of_work import transactional, unit_of_work
 from app.models.trade import Trade, TradeStatus, TradeType
-from app.models.user import User
+from app.models.trade_amount import TradeAmount
+from app.models.trade_archive import ArchivedTrade
 from app.schemas.trade import TradeCreate, TradeUpdate
 from app.services.crypto_service import CryptoService
+from app.services.outbox_service import OutboxService, TRADE_COMPLETED, TRADE_STATUS_CHANGED
+from app.services.rate_service import rate_cache
+from app.services.moderation_service import ModerationService
+from app.services.risk_service import (
+    RiskService, RISK_CHECKS_ENABLED, BLOCK, FLAG, TRADE_CREATED, TRADE_CANCELLED, DISPUTE_RECEIVED
+)
+from app.services.trade_archive_job import ARCHIVED_STATUSES, archive_cutoff
+
+# trades read per query by exports
+EXPORT_BATCH_SIZE = 200
+
+def newest_first(trade) -> Tuple[datetime, int]:
+    """Sort key of trade histories, used in reverse: created_at, then id between trades created together"""
+    return trade.created_at, trade.id
 
 class TradeService:
     def __init__(self, db: Session):
         self.db = db
+        self.uow = unit_of_work(db)
     
+    @transactional
     def create_trade(self, user_id: int, trade_data: TradeCreate) -> Trade:
         """Create a new trade"""
         # Validate cryptocurrency and amount
         crypto_service = CryptoService(self.db)
         if not crypto_service.validate_trade_amount(trade_data.crypto_currency.value, trade_data.crypto_amount):
             raise ValueError(f"Invalid trade amount for {trade_data.crypto_currency.value}")
+        
+        # Reject rates too far from the market
+        rate_cache.check_rate(trade_data.crypto_currency.value, trade_data.fiat_currency, trade_data.exchange_rate)
     
         # Generate unique trade ID
         trade_id = f"TP{uuid.uuid4().hex[:8].upper()}"
@@ -30,6 +55,12 @@ class TradeService:
             buyer_id = trade_data.buyer_id
             seller_id = user_id
         
+        # Block or flag trades with risky participants
+        risk = RiskService(self.db)
+        assessment = risk.assess([buyer_id, seller_id]) if RISK_CHECKS_ENABLED else None
+        if assessment and assessment.action == BLOCK:
+            raise ValueError("Trade blocked by risk checks: " + "; ".join(assessment.reasons))
+        
         # Calculate expiration time (24 hours from now)
         expires_at = datetime.utcnow() + timedelta(hours=24)
         payment_deadline = datetime.utcnow() + timedelta(hours=2)
@@ -50,32 +81,109 @@ class TradeService:
         )
         
         self.db.add(trade)
-        self.db.commit()
-        self.db.refresh(trade)
+        # the exact amount the escrow deposit and payout are checked against
+        terms = crypto_service.get_quote_terms(trade_data.crypto_currency.value)
+        self.db.add(TradeAmount(
+            trade_id=trade_id, crypto_units=str(to_units(trade_data.crypto_amount, terms.decimals)),
+            decimals=terms.decimals
+        ))
+        # velocity of the user creating trades; naming a counterparty must not count against them
+        risk.record(user_id, TRADE_CREATED)
+        
+        if assessment and assessment.action == FLAG:
+            self.db.flush()
+            moderation = ModerationService(self.db)
+            for flagged_id in assessment.flagged_user_ids:
+                moderation.open_risk_case(trade, flagged_id, assessment.reasons)
         return trade
     
+    def crypto_units(self, trades: List[Trade], decimals: Dict[str, int]) -> Dict[str, int]:
+        """Crypto amounts of trades in smallest units, by trade_id; decimals maps each trade_id to its asset's.
+
+        Exact where recorded at creation; older trades only have the float
+        column, which is rounded to the asset's decimals.
+        """
+        recorded = {
+            amount.trade_id: amount for amount in self.db.query(TradeAmount).filter(
+                TradeAmount.trade_id.in_([trade.trade_id for trade in trades])
+            )
+        } if trades else {}
+        units = {}
+        for trade in trades:
+            amount = recorded.get(trade.trade_id)
+            places = decimals[trade.trade_id]
+            if amount is not None and amount.decimals == places:
+                units[trade.trade_id] = int(amount.crypto_units)
+            else:
+                units[trade.trade_id] = round_units(trade.crypto_amount, places)
+        return units
+    
     def get_trade_by_id(self, trade_id: str) -> Optional[Trade]:
-        """Get trade by trade ID"""
-        return self.db.query(Trade).filter(Trade.trade_id == trade_id).first()
+        """Get trade by trade ID, from the archive once it has been archived"""
+        return self.uow.get_by(Trade, "trade_id", trade_id) or self.uow.get_by(ArchivedTrade, "trade_id", trade_id)
     
+    def get_trade_by_pk(self, trade_pk: int) -> Optional[Trade]:
+        """Get trade by primary key, from the archive once it has been archived"""
+        return self.uow.get(Trade, trade_pk) or self.uow.get(ArchivedTrade, trade_pk)
+    
+    @read_only
     def get_user_trades(self, user_id: int, status: Optional[TradeStatus] = None, 
-                       limit: int = 20, offset: int = 0) -> List[Trade]:
-        """Get trades for a user"""
-        query = self.db.query(Trade).filter(
-            or_(Trade.buyer_id == user_id, Trade.seller_id == user_id)
-        )
+                       limit: int = 20, offset: int = 0, before: Optional[Tuple[datetime, int]] = None) -> List[Trade]:
+        """Get trades for a user, archived ones included, newest first; before is the (created_at, id) of the last trade already seen"""
+        def page(db: Session, model, take: int) -> list:
+            query = db.query(model).filter(
+                or_(model.buyer_id == user_id, model.seller_id == user_id)
+            )
+            
+            if status:
+                query = query.filter(model.status == status)
+            
+            if before:
+                query = query.filter(or_(
+                    model.created_at < before[0], and_(model.created_at == before[0], model.id < before[1])
+                ))
+            
+            return query.order_by(model.created_at.desc(), model.id.desc()).limit(take).all()
         
-        if status:
-            query = query.filter(Trade.status == status)
+        def newest(db: Session, skip: int, take: int) -> list:
+            trades = page(db, Trade, skip + take)
+            # archived trades were created before the cutoff, so a full page newer than it has none
+            if (status and status not in ARCHIVED_STATUSES) or (
+                len(trades) == skip + take and trades[-1].created_at >= archive_cutoff()
+            ):
+                return trades[skip:]
+            archived = page(db, ArchivedTrade, skip + take)
+            merged = heapq.merge(trades, archived, key=newest_first, reverse=True)
+            return list(itertools.islice(merged, skip, skip + take))
         
-        return query.order_by(Trade.created_at.desc()).offset(offset).limit(limit).all()
+        if not shard_engines:
+            return newest(self.db, offset, limit)
+        # trades the user bought sit on the sellers' shards: merge every shard's newest
+        parts = scatter(self.db, lambda db: newest(db, 0, offset + limit))
+        merged = heapq.merge(*parts, key=newest_first, reverse=True)
+        return list(itertools.islice(merged, offset, offset + limit))
     
+    def iter_user_trades(self, user_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Trade]]:
+        """Every trade of a user, archived ones included, newest first, in batches read as they are consumed"""
+        before = None
+        while True:
+            trades = self.get_user_trades(user_id, limit=batch_size, before=before)
+            if trades:
+                yield trades
+            if len(trades) < batch_size:
+                return
+            before = newest_first(trades[-1])
+    
+    @transactional
     def update_trade(self, trade_id: str, user_id: int, trade_update: TradeUpdate) -> Trade:
         """Update trade details"""
         trade = self.get_trade_by_id(trade_id)
         if not trade:
             raise ValueError("Trade not found")
         
+        if isinstance(trade, ArchivedTrade):
+            raise ValueError("Archived trades cannot be changed")
+        
         # Check if user is participant
         if trade.buyer_id != user_id and trade.seller_id != user_id:
             raise ValueError("Access denied")
@@ -85,10 +193,9 @@ class TradeService:
             setattr(trade, field, value)
         
         trade.updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(trade)
         return trade
     
+    @transactional
     def cancel_trade(self, trade_id: str, user_id: int, reason: str) -> dict:
         """Cancel a trade"""
         trade = self.get_trade_by_id(trade_id)
@@ -106,30 +213,41 @@ class TradeService:
         trade.status = TradeStatus.CANCELLED
         trade.dispute_reason = reason
         trade.updated_at = datetime.utcnow()
-        
-        self.db.commit()
+        RiskService(self.db).record(user_id, TRADE_CANCELLED)
+        self.publish_status(trade, user_id)
         return {"message": "Trade cancelled successfully"}
     
+    @transactional
     def dispute_trade(self, trade_id: str, user_id: int, reason: str, evidence: str = None) -> dict:
         """Dispute a trade"""
         trade = self.get_trade_by_id(trade_id)
         if not trade:
             raise ValueError("Trade not found")
         
+        if isinstance(trade, ArchivedTrade):
+            raise ValueError("Archived trades cannot be changed")
+        
         # Check if user is participant
         if trade.buyer_id != user_id and trade.seller_id != user_id:
             raise ValueError("Access denied")
         
+        # against the status the dispute is raised from
+        counterparty = trade.seller_id if user_id == trade.buyer_id else trade.buyer_id
+        RiskService(self.db).record_complaint(DISPUTE_RECEIVED, user_id, counterparty, trade)
+        
         trade.status = TradeStatus.DISPUTED
         trade.is_disputed = True
         trade.dispute_reason = reason
         trade.updated_at = datetime.utcnow()
         
-        self.db.commit()
+        # Queue the dispute for moderators in the same transaction
+        ModerationService(self.db).open_dispute_case(trade, user_id, reason)
+        self.publish_status(trade, user_id)
         return {"message": "Trade disputed successfully"}
     
+    @transactional
     def complete_trade(self, trade_id: str) -> Trade:
-        """Mark trade as completed and update user statistics"""
+        """Mark trade as completed; user statistics are updated by the outbox worker"""
         trade = self.get_trade_by_id(trade_id)
         if not trade:
             raise ValueError("Trade not found")
@@ -138,18 +256,20 @@ class TradeService:
         trade.completed_at = datetime.utcnow()
         trade.updated_at = datetime.utcnow()
         
-        # Update user statistics
-        buyer = self.db.query(User).filter(User.id == trade.buyer_id).first()
-        seller = self.db.query(User).filter(User.id == trade.seller_id).first()
-        
-        if buyer:
-            buyer.total_trades += 1
-            buyer.successful_trades += 1
-        
-        if seller:
-            seller.total_trades += 1
-            seller.successful_trades += 1
-        
-        self.db.commit()
-        self.db.refresh(trade)
+        OutboxService(self.db).enqueue(TRADE_COMPLETED, {
+            "trade_id": trade.trade_id,
+            "buyer_id": trade.buyer_id,
+            "seller_id": trade.seller_id
+        })
+        self.publish_status(trade)
         return trade
+    
+    def publish_status(self, trade: Trade, actor_id: Optional[int] = None):
+        """Record the trade's new status in the outbox, to notify its participants (except the actor)"""
+        OutboxService(self.db).enqueue(TRADE_STATUS_CHANGED, {
+            "trade_id": trade.trade_id,
+            "status": getattr(trade.status, "value", trade.status),
+            "buyer_id": trade.buyer_id,
+            "seller_id": trade.seller_id,
+            "actor_id": actor_id
+        })
@@ -0,0 +1,36 @@
+"""Trust score formula, shared by the per-user update and the batch rescore job.
+
+score = base + success rate (0-30) + volume (0-10) + rating above 3 stars (0-10)
+        + verification bonus, clamped to 0-100
+"""
+
+BASE_SCORE = 50.0
+SUCCESS_POINTS = 30.0
+VOLUME_POINTS_PER_TRADE = 0.5
+VOLUME_POINTS_MAX = 10.0
+RATING_POINTS_PER_STAR = 5.0  # per star above RATING_NEUTRAL
+RATING_NEUTRAL = 3.0
+VERIFICATION_BONUS = 10.0
+
+def trust_score(total_trades: int, successful_trades: int, average_rating: float, is_verified: bool) -> float:
+    """Score of one user"""
+    success_points = successful_trades / total_trades * SUCCESS_POINTS if total_trades > 0 else 0
+    volume_points = min(total_trades * VOLUME_POINTS_PER_TRADE, VOLUME_POINTS_MAX)
+    rating_points = (average_rating - RATING_NEUTRAL) * RATING_POINTS_PER_STAR if average_rating > RATING_NEUTRAL else 0
+    verification_bonus = VERIFICATION_BONUS if is_verified else 0
+
+    score = BASE_SCORE + success_points + volume_points + rating_points + verification_bonus
+    return max(0, min(100, score))
+
+def trust_scores(total_trades, successful_trades, average_rating, is_verified):
+    """Scores of many users at once from numpy arrays; same formula as trust_score"""
+    import numpy as np
+
+    total = total_trades.astype(np.float64)
+    success_points = np.divide(successful_trades * SUCCESS_POINTS, total, out=np.zeros_like(total), where=total > 0)
+    volume_points = np.minimum(total * VOLUME_POINTS_PER_TRADE, VOLUME_POINTS_MAX)
+    rating_points = np.maximum(average_rating - RATING_NEUTRAL, 0) * RATING_POINTS_PER_STAR
+    verification_bonus = np.where(is_verified, VERIFICATION_BONUS, 0.0)
+
+    score = BASE_SCORE + success_points + volume_points + rating_points + verification_bonus
+    return np.clip(score, 0, 100)
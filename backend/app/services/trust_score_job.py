@@ -0,0 +1,164 @@
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from typing import Dict, List, Tuple
+import os
+import time
+from app.database import session_scope, shard_engines
+from app.models.rating import Rating
+from app.models.sync_state import SyncState
+from app.models.trade import Trade, TradeStatus
+from app.models.trade_archive import ArchivedTrade
+from app.models.user import User
+from app.services.trust_score import trust_scores
+
+# users read, scored and written per transaction
+TRUST_SCORE_CHUNK_SIZE = int(os.getenv("TRUST_SCORE_CHUNK_SIZE", "20000"))
+
+# scores closer than this to the stored one are not rewritten
+SCORE_TOLERANCE = 1e-9
+
+CHECKPOINT_PREFIX = "trust_scores"
+
+def id_slices(first_id: int, last_id: int, workers: int) -> List[Tuple[int, int]]:
+    """Split [first_id, last_id] into contiguous (after, until) slices, one per worker"""
+    span = last_id - first_id + 1
+    bounds = [first_id - 1 + span * i // workers for i in range(workers + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(workers)]
+
+class TrustScoreJob:
+    """Rescore every user in keyset chunks.
+
+    Each chunk reads users, their rating averages and (optionally) completed
+    trade counts with a few range queries, scores them with numpy, writes the
+    changed scores with one bulk UPDATE and advances its checkpoint in the
+    same transaction. Checkpoints are sync_state rows, one per worker slice
+    of the id range, so an interrupted run resumes where each slice stopped
+    and slices can run in separate processes.
+    """
+
+    def __init__(self, run: str = "default", worker: int = 0, workers: int = 1,
+                 chunk_size: int = TRUST_SCORE_CHUNK_SIZE, recount_trades: bool = False):
+        self.run = run
+        self.worker = worker
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.recount_trades = recount_trades
+
+    @property
+    def stream(self) -> str:
+        return f"{CHECKPOINT_PREFIX}/{self.run}/{self.worker}-of-{self.workers}"
+
+    @classmethod
+    def plan(cls, db: Session, run: str, workers: int, restart: bool = False) -> List[SyncState]:
+        """Create (or with restart, reset) the checkpoints of every worker slice"""
+        if shard_engines:
+            # chunks are keyset ranges over one users table
+            raise ValueError("The trust score job runs against a single database; unset SHARD_DATABASE_URLS")
+        prefix = f"{CHECKPOINT_PREFIX}/{run}/"
+        existing = db.query(SyncState).filter(SyncState.stream.like(f"{prefix}%")).all()
+        if existing and not restart:
+            if len(existing) != workers:
+                raise ValueError(f"Run {run} was planned for {len(existing)} workers; use restart to replan")
+            return existing
+        for checkpoint in existing:
+            db.delete(checkpoint)
+
+        first_id, last_id = db.query(func.min(User.id), func.max(User.id)).one()
+        slices = id_slices(first_id or 1, last_id or 0, workers)
+        checkpoints = [
+            SyncState(stream=f"{prefix}{worker}-of-{workers}", position=after, head=until)
+            for worker, (after, until) in enumerate(slices)
+        ]
+        db.add_all(checkpoints)
+        db.commit()
+        return checkpoints
+
+    def execute(self) -> Dict[str, float]:
+        """Score the worker's slice from its checkpoint to the end"""
+        stats = {"users": 0, "updated": 0, "chunks": 0}
+        started = time.perf_counter()
+        while True:
+            with session_scope() as db:
+                checkpoint = db.get(SyncState, self.stream)
+                if checkpoint is None:
+                    raise ValueError(f"No checkpoint {self.stream}; plan the run first")
+                if checkpoint.position >= checkpoint.head:
+                    break
+                users, updated = self.score_chunk(db, checkpoint)
+            stats["users"] += users
+            stats["updated"] += updated
+            stats["chunks"] += 1
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+    def score_chunk(self, db: Session, checkpoint: SyncState) -> Tuple[int, int]:
+        import numpy as np
+
+        rows = db.query(User.id, User.total_trades, User.successful_trades, User.is_verified, User.trust_score).filter(
+            User.id > checkpoint.position, User.id <= checkpoint.head
+        ).order_by(User.id).limit(self.chunk_size).all()
+        if not rows:
+            checkpoint.position = checkpoint.head
+            db.commit()
+            return 0, 0
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        low, high = int(ids[0]), int(ids[-1])
+        total = np.fromiter((row[1] or 0 for row in rows), dtype=np.int64, count=len(rows))
+        successful = np.fromiter((row[2] or 0 for row in rows), dtype=np.int64, count=len(rows))
+        verified = np.fromiter((bool(row[3]) for row in rows), dtype=bool, count=len(rows))
+        current = np.fromiter((row[4] if row[4] is not None else -1.0 for row in rows), dtype=np.float64,
+                              count=len(rows))
+
+        average_rating = self._lookup(ids, db.query(Rating.rated_user_id, func.avg(Rating.rating)).filter(
+            Rating.rated_user_id.between(low, high)
+        ).group_by(Rating.rated_user_id), np.float64)
+
+        counts_changed = np.zeros(len(ids), dtype=bool)
+        if self.recount_trades:
+            completed = np.zeros(len(ids), dtype=np.int64)
+            for model in (Trade, ArchivedTrade):
+                # trades where the user is buyer or seller, as refresh_trade_stats counts them:
+                # a self-trade is counted once, on the buyer side
+                for column, other in ((model.buyer_id, None), (model.seller_id, model.buyer_id)):
+                    query = db.query(column, func.count(model.id)).filter(
+                        column.between(low, high), model.status == TradeStatus.COMPLETED
+                    )
+                    if other is not None:
+                        query = query.filter(column != other)
+                    completed += self._lookup(ids, query.group_by(column), np.int64)
+            counts_changed = (completed != total) | (completed != successful)
+            total = successful = completed
+
+        scores = trust_scores(total, successful, average_rating, verified)
+        changed = np.flatnonzero(counts_changed | (np.abs(scores - current) > SCORE_TOLERANCE))
+
+        if len(changed):
+            if self.recount_trades:
+                params = [{"id": int(ids[i]), "trust_score": float(scores[i]),
+                           "total_trades": int(total[i]), "successful_trades": int(successful[i])} for i in changed]
+            else:
+                params = [{"id": int(ids[i]), "trust_score": float(scores[i])} for i in changed]
+            # executemany UPDATE ... WHERE id = :id
+            db.execute(update(User), params)
+
+        # full chunk: resume after its last id; short chunk: the slice is done
+        checkpoint.position = high if len(rows) == self.chunk_size else checkpoint.head
+        db.commit()
+        return len(rows), len(changed)
+
+    @staticmethod
+    def _lookup(ids, query, dtype):
+        """Values of a (user_id, value) query aligned to ids, zero where absent"""
+        import numpy as np
+
+        result = np.zeros(len(ids), dtype=dtype)
+        pairs = query.all()
+        if pairs:
+            keys = np.fromiter((pair[0] for pair in pairs), dtype=np.int64, count=len(pairs))
+            values = np.fromiter((pair[1] for pair in pairs), dtype=dtype, count=len(pairs))
+            positions = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+            # keys without a user row (deleted users) are dropped
+            found = ids[positions] == keys
+            result[positions[found]] = values[found]
+        return result
@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import re
+import threading
+from app.core.bloom import BloomFilter
+from app.core.metrics import registry
+from app.core.signatures import canonical_principal, is_evm_address
+from app.database import session_scope
+from app.models.user_lookup import UserLookupKey
+
+logger = logging.getLogger(__name__)
+
+# seconds between polls for lookup keys written by other processes, and how far back
+# each poll looks so commits that land out of created_at order are not missed
+LOOKUP_FILTER_SYNC_INTERVAL = float(os.getenv("LOOKUP_FILTER_SYNC_INTERVAL", "2"))
+LOOKUP_FILTER_SYNC_OVERLAP = float(os.getenv("LOOKUP_FILTER_SYNC_OVERLAP", "10"))
+# share of unknown identifiers the filter lets through to the database
+LOOKUP_FILTER_ERROR_RATE = float(os.getenv("LOOKUP_FILTER_ERROR_RATE", "0.01"))
+
+USERNAME = "username"
+TELEGRAM = "telegram"
+WALLET = "wallet"
+
+# rows fetched at a time while loading the filter
+LOAD_BATCH_SIZE = 50_000
+
+TELEGRAM_LINK = re.compile(r"^(?:https?://)?(?:t|telegram)\.me/", re.IGNORECASE)
+
+filter_checks = registry.counter("user_lookup_filter_checks_total", "Trader lookups by lookup filter result")
+
+LookupKeys = List[Tuple[str, str]]
+
+def normalize_telegram(handle: str) -> Optional[str]:
+    """Canonical telegram handle: "@Alice", "alice" and "t.me/alice" are all "alice" """
+    handle = TELEGRAM_LINK.sub("", handle.strip()).lstrip("@").strip().lower()
+    return handle or None
+
+def normalize_wallet(address: str) -> Optional[str]:
+    """Lowercase EVM addresses and canonical ICP principals; other addresses may be case-sensitive and stay as given"""
+    address = address.strip()
+    if not address:
+        return None
+    if is_evm_address(address):
+        return address.lower()
+    return canonical_principal(address) or address
+
+def user_keys(username: Optional[str], telegram_handle: Optional[str], wallet_address: Optional[str]) -> LookupKeys:
+    """Lookup keys of a user's identifiers"""
+    keys = []
+    if username:
+        keys.append((USERNAME, username))
+    telegram = normalize_telegram(telegram_handle) if telegram_handle else None
+    if telegram:
+        keys.append((TELEGRAM, telegram))
+    wallet = normalize_wallet(wallet_address) if wallet_address else None
+    if wallet:
+        keys.append((WALLET, wallet))
+    return keys
+
+def identifier_keys(identifier: str) -> LookupKeys:
+    """Keys an identifier could be, in the order verify_trader tries them"""
+    return [(USERNAME, identifier)] + user_keys(None, identifier, identifier)
+
+def replace_keys(db: Session, keys_by_user: Dict[int, LookupKeys], kinds: Iterable[str] = (USERNAME, TELEGRAM, WALLET)):
+    """Bulk replace the lookup keys of the given kinds for many users"""
+    if not keys_by_user:
+        return
+    db.execute(delete(UserLookupKey).where(
+        UserLookupKey.user_id.in_(keys_by_user), UserLookupKey.kind.in_(kinds)
+    ))
+    rows = [
+        {"kind": kind, "key": key, "user_id": user_id, "created_at": datetime.utcnow()}
+        for user_id, keys in keys_by_user.items() for kind, key in keys if kind in kinds
+    ]
+    if rows:
+        # a table insert: ORM bulk inserts are not routed when users are sharded
+        db.execute(insert(UserLookupKey.__table__), rows)
+
+def _member(kind: str, key: str) -> str:
+    return f"{kind}\0{key}"
+
+class LookupFilter:
+    """Bloom filter of every lookup key, answering "certainly unknown" without a query.
+
+    Loaded from user_lookup_keys at startup, added to after this process
+    commits new keys and polled for keys committed by other processes, so a
+    key written elsewhere can be missed for up to one sync interval. Until
+    it is loaded every key may exist.
+    """
+
+    def __init__(self, interval: float = LOOKUP_FILTER_SYNC_INTERVAL, error_rate: float = LOOKUP_FILTER_ERROR_RATE):
+        self.interval = interval
+        self.error_rate = error_rate
+        self._bloom: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def might_exist(self, kind: str, key: str) -> bool:
+        bloom = self._bloom
+        return bloom is None or _member(kind, key) in bloom
+
+    def screen(self, keys: LookupKeys) -> LookupKeys:
+        """The keys that may belong to a user"""
+        found = [key for key in keys if self.might_exist(*key)]
+        filter_checks.inc(result="maybe" if found else "unknown")
+        return found
+
+    def add(self, keys: Iterable[Tuple[str, str]]):
+        with self._lock:
+            if self._bloom is not None:
+                for kind, key in keys:
+                    member = _member(kind, key)
+                    # polls overlap; count each key once towards the capacity
+                    if member not in self._bloom:
+                        self._bloom.add(member)
+
+    def rebuild(self, db: Session) -> int:
+        """Replace the filter with every key in the database, sized for twice as many"""
+        started = datetime.utcnow()
+        count = db.query(func.count()).select_from(UserLookupKey).scalar() or 0
+        bloom = BloomFilter(max(2 * count, 1024), self.error_rate)
+        for kind, key in db.query(UserLookupKey.kind, UserLookupKey.key).yield_per(LOAD_BATCH_SIZE):
+            bloom.add(_member(kind, key))
+        with self._lock:
+            self._bloom = bloom
+            self._synced_at = started
+        return bloom.count
+
+    def refresh(self, db: Session) -> int:
+        """Add keys written since the last rebuild or refresh; rebuild once the filter is full"""
+        if self._bloom is None or self._bloom.count > self._bloom.capacity:
+            return self.rebuild(db)
+        started = datetime.utcnow()
+        since = self._synced_at - timedelta(seconds=LOOKUP_FILTER_SYNC_OVERLAP)
+        rows = db.query(UserLookupKey.kind, UserLookupKey.key).filter(UserLookupKey.created_at >= since).all()
+        self.add(rows)
+        self._synced_at = started
+        return len(rows)
+
+    async def start(self):
+        count = await asyncio.to_thread(self._load, self.rebuild)
+        logger.info("Lookup filter loaded %d keys", count)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self._load, self.refresh)
+            except Exception:
+                logger.exception("Lookup filter refresh failed")
+
+    def _load(self, load) -> int:
+        with session_scope() as db:
+            return load(db)
+
+lookup_filter = LookupFilter()
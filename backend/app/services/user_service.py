@@ -1,78 +1,131 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import and_, or_, func
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import heapq
+import itertools
+from app.database import read_only, scatter, shard_engines
+from app.core.unit_of_work import transactional, unit_of_work
 from app.models.user import User
-from app.models.trade import Trade
-from app.models.rating import Rating
+from app.models.trade import Trade, TradeStatus
+from app.models.trade_archive import ArchivedTrade
+from app.models.user_lookup import UserLookupKey
 from app.schemas.user import UserCreate, UserUpdate
+from app.services.offer_book import offer_book
+from app.services.rating_summary import RatingSummaryService
+from app.services.trust_score import trust_score
+from app.services.user_lookup import (
+    LookupKeys, TELEGRAM, WALLET, identifier_keys, lookup_filter, normalize_telegram, normalize_wallet, user_keys
+)
 
 class UserService:
     def __init__(self, db: Session):
         self.db = db
+        self.uow = unit_of_work(db)
     
+    @transactional
     def create_user(self, user_data: UserCreate) -> User:
         """Create a new user"""
         user = User(**user_data.dict())
         self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        self.db.flush()
+        self._index_keys(user)
         return user
     
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        return self.db.query(User).filter(User.id == user_id).first()
+        return self.uow.get(User, user_id)
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email"""
-        return self.db.query(User).filter(User.email == email).first()
+        return self.uow.get_by(User, "email", email)
     
     def get_user_by_wallet(self, wallet_address: str) -> Optional[User]:
-        """Get user by wallet address"""
-        return self.db.query(User).filter(User.wallet_address == wallet_address).first()
+        """Get user by wallet address; EVM addresses in any letter case"""
+        wallet = normalize_wallet(wallet_address)
+        return self._find_by_keys([(WALLET, wallet)]) if wallet else None
     
     def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
-        return self.db.query(User).filter(User.username == username).first()
+        return self.uow.get_by(User, "username", username)
     
     def get_user_by_telegram(self, telegram_handle: str) -> Optional[User]:
-        """Get user by telegram handle"""
-        return self.db.query(User).filter(User.telegram_handle == telegram_handle).first()
+        """Get user by telegram handle, with or without @ and in any letter case"""
+        telegram = normalize_telegram(telegram_handle)
+        return self._find_by_keys([(TELEGRAM, telegram)]) if telegram else None
     
+    def find_trader(self, identifier: str) -> Optional[User]:
+        """Get user by username, telegram handle or wallet address, tried in that order.
+        
+        Identifiers the lookup filter knows to be unknown are answered without a query.
+        """
+        keys = lookup_filter.screen(identifier_keys(identifier))
+        return self._find_by_keys(keys) if keys else None
+    
+    def _find_by_keys(self, keys: LookupKeys) -> Optional[User]:
+        """The user holding the first of keys anyone holds, the oldest account on ties"""
+        match = or_(*(and_(UserLookupKey.kind == kind, UserLookupKey.key == key) for kind, key in keys))
+        rank = {key: i for i, key in enumerate(keys)}
+        if shard_engines:
+            # lookup keys stay in the global database, users are on their shards
+            rows = self.db.query(UserLookupKey.kind, UserLookupKey.key, UserLookupKey.user_id).filter(match).all()
+            best = min(rows, key=lambda row: (rank[row[0], row[1]], row[2]), default=None)
+            return self.get_user_by_id(best[2]) if best else None
+        rows = self.db.query(UserLookupKey.kind, UserLookupKey.key, User).join(
+            User, User.id == UserLookupKey.user_id
+        ).filter(match).all()
+        best = min(rows, key=lambda row: (rank[row[0], row[1]], row[2].id), default=None)
+        return best[2] if best else None
+    
+    def _index_keys(self, user: User, replace: bool = False):
+        """Write the lookup keys of the user's identifiers, replacing the old ones"""
+        keys = user_keys(user.username, user.telegram_handle, user.wallet_address)
+        if replace:
+            self.db.query(UserLookupKey).filter(UserLookupKey.user_id == user.id).delete()
+        self.db.add_all(UserLookupKey(kind=kind, key=key, user_id=user.id) for kind, key in keys)
+        self.uow.on_commit(lambda: lookup_filter.add(keys))
+    
+    @read_only
     def search_traders(self, query: str, limit: int = 10) -> List[User]:
         """Search for traders by username or telegram handle"""
-        return self.db.query(User).filter(
+        parts = scatter(self.db, lambda db: db.query(User).filter(
             or_(
                 User.username.ilike(f"%{query}%"),
                 User.telegram_handle.ilike(f"%{query}%")
             )
-        ).filter(User.is_active == True).limit(limit).all()
+        ).filter(User.is_active == True).limit(limit).all())
+        return list(itertools.islice(itertools.chain.from_iterable(parts), limit))
     
+    @read_only
     def get_top_traders(self, limit: int = 10) -> List[User]:
         """Get top traders by trust score"""
-        return self.db.query(User).filter(
+        parts = scatter(self.db, lambda db: db.query(User).filter(
             User.is_active == True
-        ).order_by(User.trust_score.desc()).limit(limit).all()
+        ).order_by(User.trust_score.desc()).limit(limit).all())
+        # each shard's top traders, merged
+        return heapq.nlargest(limit, itertools.chain.from_iterable(parts), key=lambda user: user.trust_score)
     
+    @transactional
     def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[User]:
         """Update user profile"""
         user = self.get_user_by_id(user_id)
         if not user:
             return None
         
-        for field, value in user_data.dict(exclude_unset=True).items():
+        changes = user_data.dict(exclude_unset=True)
+        for field, value in changes.items():
             setattr(user, field, value)
         
-        self.db.commit()
-        self.db.refresh(user)
+        if changes.keys() & {"username", "telegram_handle", "wallet_address"}:
+            self._index_keys(user, replace=True)
         return user
     
+    @transactional
     def update_last_login(self, user_id: int):
         """Update user's last login timestamp"""
         user = self.get_user_by_id(user_id)
         if user:
             user.last_login = datetime.utcnow()
-            self.db.commit()
     
     def get_trader_stats(self, user_id: int) -> dict:
         """Get comprehensive trader statistics"""
@@ -81,15 +134,14 @@ class UserService:
             return {}
         
         # Get average rating
-        avg_rating = self.db.query(func.avg(Rating.rating)).filter(
-            Rating.rated_user_id == user_id
-        ).scalar() or 0.0
+        avg_rating = RatingSummaryService(self.db).average(user_id) or 0.0
         
-        # Get recent trades count (last 30 days)
-        recent_trades = self.db.query(func.count(Trade.id)).filter(
+        # Get recent trades count (last 30 days); trades bought sit on the sellers' shards
+        since = datetime.utcnow() - timedelta(days=30)
+        recent_trades = sum(scatter(self.db, lambda db: db.query(func.count(Trade.id)).filter(
             or_(Trade.buyer_id == user_id, Trade.seller_id == user_id),
-            Trade.created_at >= datetime.utcnow() - timedelta(days=30)
-        ).scalar() or 0
+            Trade.created_at >= since
+        ).scalar() or 0))
         
         return {
             "average_rating": round(avg_rating, 2),
@@ -98,35 +150,33 @@ class UserService:
             "member_since": user.created_at.strftime("%Y-%m-%d")
         }
     
+    @transactional
+    def refresh_trade_stats(self, user_id: int):
+        """Recount the user's completed trades"""
+        user = self.get_user_by_id(user_id)
+        if not user:
+            return
+        
+        completed = sum(scatter(self.db, lambda db: sum(
+            db.query(func.count(model.id)).filter(
+                or_(model.buyer_id == user_id, model.seller_id == user_id),
+                model.status == TradeStatus.COMPLETED
+            ).scalar() for model in (Trade, ArchivedTrade)
+        )))
+        user.total_trades = completed
+        user.successful_trades = completed
+    
+    @transactional
     def update_trust_score(self, user_id: int):
         """Recalculate and update user's trust score"""
         user = self.get_user_by_id(user_id)
         if not user:
             return
         
-        # Calculate trust score based on various factors
-        base_score = 50.0  # Starting score
-        
-        # Success rate factor (0-30 points)
-        if user.total_trades > 0:
-            success_rate = user.successful_trades / user.total_trades
-            success_points = success_rate * 30
-        else:
-            success_points = 0
-        
-        # Volume factor (0-10 points)
-        volume_points = min(user.total_trades * 0.5, 10)
-        
-        # Rating factor (0-10 points)
-        avg_rating = self.db.query(func.avg(Rating.rating)).filter(
-            Rating.rated_user_id == user_id
-        ).scalar() or 0.0
-        rating_points = (avg_rating - 3) * 5 if avg_rating > 3 else 0
-        
-        # Verification bonus
-        verification_bonus = 10 if user.is_verified else 0
+        avg_rating = RatingSummaryService(self.db).average(user_id) or 0.0
         
-        new_trust_score = base_score + success_points + volume_points + rating_points + verification_bonus
-        user.trust_score = max(0, min(100, new_trust_score))  # Clamp between 0-100
+        score = trust_score(user.total_trades, user.successful_trades, avg_rating, user.is_verified)
+        user.trust_score = score
         
-        self.db.commit()
+        # offers are matched on the trust score held in the book
+        self.uow.on_commit(lambda: offer_book.set_trust(user_id, score))
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import secrets
+import time
+from app.core.metrics import registry
+from app.core.signatures import verify_signature, warm_up
+
+logger = logging.getLogger(__name__)
+
+# require a signed challenge for wallet logins
+WALLET_SIGNATURE_REQUIRED = os.getenv("WALLET_SIGNATURE_REQUIRED", "true").lower() == "true"
+# seconds a login challenge can be signed and used
+AUTH_NONCE_TTL = int(os.getenv("AUTH_NONCE_TTL", "300"))
+# outstanding challenges kept per process; the oldest are evicted first
+AUTH_NONCE_MAX = int(os.getenv("AUTH_NONCE_MAX", "100000"))
+# processes verifying login signatures; 0 verifies in a thread of the API process
+AUTH_VERIFY_PROCESSES = int(os.getenv("AUTH_VERIFY_PROCESSES", str(os.cpu_count() or 1)))
+
+# different signatures tried against one challenge before it is refused
+MAX_ATTEMPTS = 3
+
+signature_checks = registry.counter("wallet_signature_checks_total", "Wallet login signature checks by result")
+
+class Challenge:
+    __slots__ = ("address", "nonce", "message", "expires_at", "attempts", "used")
+
+    def __init__(self, address: str, nonce: str, message: str, expires_at: float):
+        self.address = address
+        self.nonce = nonce
+        self.message = message
+        self.expires_at = expires_at  # monotonic
+        self.attempts: Dict[bytes, asyncio.Future] = {}  # signature digest -> verification
+        self.used = False
+
+def challenge_message(address: str, nonce: str, issued_at: datetime) -> str:
+    return (
+        "Sign in to TrustPeer\n\n"
+        f"Wallet: {address}\n"
+        f"Nonce: {nonce}\n"
+        f"Issued: {issued_at.replace(microsecond=0).isoformat()}Z"
+    )
+
+class NonceStore:
+    """Outstanding login challenges by (address, nonce).
+
+    A single TTL keeps insertion order equal to expiry order, so eviction
+    pops from the front. Challenges are per process: a client signs in on the
+    instance that issued its challenge (or against a single auth instance).
+    """
+
+    def __init__(self, ttl: int = AUTH_NONCE_TTL, max_challenges: int = AUTH_NONCE_MAX):
+        self.ttl = ttl
+        self.max_challenges = max_challenges
+        self._challenges: "OrderedDict[Tuple[str, str], Challenge]" = OrderedDict()
+
+    def issue(self, address: str) -> Challenge:
+        nonce = secrets.token_urlsafe(16)
+        challenge = Challenge(address, nonce, challenge_message(address, nonce, datetime.utcnow()),
+                              time.monotonic() + self.ttl)
+        self._challenges[(address, nonce)] = challenge
+        self._evict()
+        return challenge
+
+    def get(self, address: str, nonce: str) -> Optional[Challenge]:
+        challenge = self._challenges.get((address, nonce))
+        if challenge is None or challenge.expires_at <= time.monotonic():
+            return None
+        return challenge
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._challenges:
+            oldest = next(iter(self._challenges.values()))
+            if oldest.expires_at > now and len(self._challenges) <= self.max_challenges:
+                break
+            self._challenges.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._challenges)
+
+class SignatureVerifier:
+    """Runs signature checks in a process pool so they never hold the event loop or the GIL"""
+
+    def __init__(self, processes: int = AUTH_VERIFY_PROCESSES):
+        self.processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self.processes and multiprocessing.current_process().daemon:
+            # server worker processes (hypercorn's) are daemonic and may not start children
+            logger.warning("Checking login signatures in threads: daemonic worker processes cannot start a pool")
+            self.processes = 0
+        if self.processes and self._pool is None:
+            # spawned workers import only app.core.signatures, not the API process' state
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+            # load the crypto libraries in every worker ahead of the first login
+            for _ in range(self.processes):
+                self._pool.submit(warm_up)
+
+    def stop(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def verify(self, address: str, message: str, signature: str, public_key: Optional[str] = None) -> bool:
+        if not self.processes:
+            return await asyncio.to_thread(verify_signature, address, message, signature, public_key)
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool, verify_signature, address, message, signature, public_key
+        )
+
+class WalletAuth:
+    """Challenge-nonce wallet login.
+
+    The client asks for a challenge, signs its message with the wallet and
+    logs in with the nonce and signature. Verification results are cached on
+    the challenge per signature, so concurrent or repeated submissions of
+    the same signature are verified once; a challenge logs in at most once
+    and refuses more than MAX_ATTEMPTS different signatures.
+    """
+
+    def __init__(self, nonces: NonceStore = None, verifier: SignatureVerifier = None):
+        self.nonces = nonces or NonceStore()
+        self.verifier = verifier or SignatureVerifier()
+
+    def challenge(self, address: str) -> Tuple[str, str, datetime]:
+        """Issue a challenge; returns (nonce, message to sign, expiry)"""
+        challenge = self.nonces.issue(address)
+        return challenge.nonce, challenge.message, datetime.utcnow() + timedelta(seconds=self.nonces.ttl)
+
+    async def verify_login(self, address: str, nonce: str, signature: str, public_key: Optional[str] = None) -> bool:
+        """True once for a valid signature of an outstanding challenge"""
+        challenge = self.nonces.get(address, nonce)
+        if challenge is None or challenge.used:
+            signature_checks.inc(result="unknown_challenge")
+            return False
+
+        key = hashlib.sha256(f"{signature}\0{public_key or ''}".encode()).digest()
+        verification = challenge.attempts.get(key)
+        cached = verification is not None
+        if not cached:
+            if len(challenge.attempts) >= MAX_ATTEMPTS:
+                signature_checks.inc(result="too_many_attempts")
+                return False
+            verification = asyncio.ensure_future(
+                self.verifier.verify(address, challenge.message, signature, public_key)
+            )
+            challenge.attempts[key] = verification
+
+        valid = await asyncio.shield(verification)
+        signature_checks.inc(result="cached" if cached else "valid" if valid else "invalid")
+        # concurrent duplicates share the verification, only the first of them logs in
+        if not valid or challenge.used:
+            return False
+        challenge.used = True
+        return True
+
+    def stop(self):
+        self.verifier.stop()
+
+wallet_auth = WalletAuth()
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# the app under test writes to a scratch database, never the configured one
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='trustpeer-tests-')}/app.db"
+# fixed market rates
+os.environ.setdefault("RATE_PROVIDER", "fixture")
+
+# template_database and db: sessions over seeded per-test database clones
+pytest_plugins = ["app.core.template_db"]
@@ -0,0 +1,36 @@
+from decimal import Decimal
+from fractions import Fraction
+from hypothesis import given, strategies as st
+import pytest
+from app.core.amounts import fee_ratio, fee_units, from_units, round_units, to_units
+
+decimals = st.integers(min_value=0, max_value=18)
+units = st.integers(min_value=0, max_value=10**40 - 1)
+
+@given(units, decimals)
+def test_units_round_trip_through_decimal_strings(amount, places):
+    # format, parse back as the API does, and scale again
+    formatted = f"{from_units(amount, places):f}"
+    assert to_units(Decimal(formatted), places) == amount
+    assert to_units(formatted, places) == amount
+
+@given(units, decimals)
+def test_excess_precision_is_rejected(amount, places):
+    with pytest.raises(ValueError):
+        to_units(from_units(amount * 10 + 1, places + 1), places)
+
+@given(units, decimals)
+def test_round_units_is_exact_for_exact_amounts(amount, places):
+    assert round_units(from_units(amount, places), places) == amount
+
+@given(st.floats(min_value=0, max_value=1e12, allow_nan=False, allow_infinity=False), decimals)
+def test_round_units_of_floats_is_within_half_a_unit(value, places):
+    exact = Decimal(str(value)).scaleb(places)
+    assert abs(round_units(value, places) - exact) <= Decimal("0.5")
+
+@given(units, st.decimals(min_value=0, max_value=100, places=4))
+def test_fees_round_up_to_a_whole_unit(amount, percentage):
+    numerator, denominator = fee_ratio(percentage)
+    fee = fee_units(amount, numerator, denominator)
+    exact = Fraction(amount) * Fraction(percentage) / 100
+    assert fee - 1 < exact <= fee
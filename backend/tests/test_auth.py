@@ -0,0 +1,19 @@
+from app.schemas.user import UserCreate
+from app.services.auth_service import AuthService
+from app.services.user_service import UserService
+
+def test_email_codes_work_once_and_only_for_their_user(db):
+    users = UserService(db)
+    user = users.create_user(UserCreate(username="email-login", email="login@example.com"))
+    other = users.create_user(UserCreate(username="email-other", email="other@example.com"))
+    auth = AuthService(db)
+    code = auth.create_email_code(user)
+
+    assert auth.verify_email_code(code, user)
+    assert not auth.verify_email_code(code, other)
+    assert not auth.verify_email_code("not-a-code", user)
+    # a code is not an access token
+    assert auth.verify_token(code) is None
+
+    users.update_last_login(user.id)
+    assert not auth.verify_email_code(code, users.get_user_by_id(user.id))
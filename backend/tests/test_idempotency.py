@@ -0,0 +1,46 @@
+import asyncio
+import threading
+from starlette.requests import Request
+from app.core.idempotency import IdempotencyStore, digest, idempotent
+
+def post(path: str) -> Request:
+    return Request({"type": "http", "method": "POST", "path": path, "query_string": b"", "headers": []})
+
+def test_execution_outlives_a_caller_that_went_away():
+    store = IdempotencyStore()
+    started, finish = threading.Event(), threading.Event()
+
+    def mutation():
+        started.set()
+        finish.wait(5)
+        return {"ok": True}
+
+    async def scenario():
+        key = digest("1", "POST", "/fund", "key")
+        first = asyncio.ensure_future(store.run(key, b"", mutation))
+        await asyncio.to_thread(started.wait, 5)
+        first.cancel()
+        finish.set()
+        # the retry gets the first execution's result instead of running again
+        return await store.run(key, b"", lambda: {"ok": False})
+
+    stored, outcome = asyncio.run(scenario())
+    assert stored.body == b'{"ok": true}' and outcome == "waited"
+
+def test_mutations_run_off_the_event_loop_with_their_own_session():
+    seen = {}
+
+    def mutation(db):
+        seen["thread"] = threading.get_ident()
+        seen["user_id"] = db.info["user_id"]
+        return {"ok": True}
+
+    async def scenario():
+        seen["loop"] = threading.get_ident()
+        unkeyed = await idempotent(post("/fund"), 7, None, mutation)
+        keyed = await idempotent(post("/fund"), 7, "key", mutation)
+        return unkeyed, keyed
+
+    unkeyed, keyed = asyncio.run(scenario())
+    assert unkeyed == {"ok": True} and keyed.status_code == 200
+    assert seen["thread"] != seen["loop"] and seen["user_id"] == 7
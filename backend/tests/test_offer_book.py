@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from app.models.trade import TradeType
+from app.models.user import User
+from app.services.offer_book import OfferBook
+
+START = datetime(2026, 1, 1)
+
+def offer(offer_id, price, methods, user_id=None, max_amount=1000, status="active"):
+    return SimpleNamespace(id=offer_id, user_id=user_id or offer_id, side=TradeType.SELL, crypto_currency="USDT",
+                           fiat_currency="NGN", price=Decimal(price), min_amount=Decimal(10),
+                           max_amount=Decimal(max_amount), payment_methods=methods, status=status,
+                           queued_at=START + timedelta(seconds=offer_id))
+
+def matched(book, **filters):
+    return [match["offer_id"] for match in book.match("USDT", "NGN", TradeType.BUY, **filters)]
+
+def test_payment_method_filters_use_the_method_index():
+    book = OfferBook(max_scan=2)
+    for offer_id in range(1, 6):
+        book.put(offer(offer_id, 1500 + offer_id, ["bank_transfer"]))
+    book.put(offer(6, 1600, ["opay", "Kuda"]))
+    book.put(offer(7, 1601, ["opay"]))
+
+    # the opay offers are the worst priced, yet found without scanning past the others
+    assert matched(book, payment_method="OPAY") == [6, 7]
+    assert matched(book, payment_method="kuda") == [6]
+    assert matched(book, payment_method="paypal") == []
+
+    book.put(offer(6, 1600, ["opay", "Kuda"], status="closed"))
+    assert matched(book, payment_method="opay") == [7]
+    assert "kuda" not in book._sides[("USDT", "NGN", TradeType.SELL)].by_method
+
+def test_matches_examine_at_most_max_scan_offers():
+    book = OfferBook(max_scan=3)
+    for offer_id in range(1, 6):
+        book.put(offer(offer_id, 1500 + offer_id, ["bank_transfer"], max_amount=100 if offer_id < 5 else 1000))
+    assert matched(book) == [1, 2, 3]
+    # offer 5 would fit, but lies past the top 3
+    assert matched(book, amount=Decimal(500)) == []
+
+def test_trust_scores_are_reloaded_from_the_database(db):
+    maker = User(username="maker", email="maker@example.com", trust_score=80.0)
+    db.add(maker)
+    db.commit()
+    book = OfferBook()
+    book.put(offer(1, 1500, ["opay"], user_id=maker.id), trust_score=80.0)
+    assert matched(book, min_trust_score=70) == [1]
+
+    # rescored by another process or the trust score job
+    maker.trust_score = 40.0
+    db.commit()
+    assert book.refresh_trust(db) == 1
+    assert matched(book, min_trust_score=70) == []
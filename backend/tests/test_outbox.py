@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from app.models.outbox import OutboxEvent
+from app.services.outbox_service import DONE, FAILED, PENDING, PROCESSING, TRADE_STATUS_CHANGED, OutboxService
+
+LEASE = timedelta(seconds=60)
+
+def enqueue(db, count: int):
+    outbox = OutboxService(db)
+    for i in range(count):
+        outbox.enqueue(TRADE_STATUS_CHANGED, {"trade_id": f"T{i}"})
+    db.commit()
+
+def test_backlog_is_claimed_in_batches_oldest_first(db):
+    enqueue(db, 50)
+    outbox = OutboxService(db)
+    assert outbox.backlog() == 50
+
+    batches = [outbox.claim(20, LEASE) for _ in range(4)]
+    assert [len(batch) for batch in batches] == [20, 20, 10, 0]
+    claimed = [event_id for batch in batches for event_id in batch]
+    assert claimed == sorted(claimed) and len(set(claimed)) == 50
+    # leased events are still owed until they are done
+    assert outbox.backlog() == 50
+
+    for event_id in claimed[:30]:
+        outbox.mark_done(outbox.get(event_id))
+    db.commit()
+    assert outbox.backlog() == 20
+
+def test_expired_leases_are_claimed_again(db):
+    enqueue(db, 5)
+    outbox = OutboxService(db)
+    abandoned = outbox.claim(5, timedelta(seconds=-1))
+    assert outbox.claim(5, LEASE) == abandoned
+    assert outbox.claim(5, LEASE) == []
+
+def test_failed_events_wait_for_their_retry_and_give_up(db):
+    enqueue(db, 1)
+    outbox = OutboxService(db)
+    [event_id] = outbox.claim(1, LEASE)
+    outbox.mark_failed(outbox.get(event_id), "boom", timedelta(minutes=5), max_attempts=2)
+    db.commit()
+    assert outbox.get(event_id).status == PENDING
+    assert outbox.claim(1, LEASE) == []
+
+    outbox.get(event_id).available_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert outbox.claim(1, LEASE) == [event_id]
+    outbox.mark_failed(outbox.get(event_id), "boom", timedelta(minutes=5), max_attempts=2)
+    db.commit()
+    assert outbox.get(event_id).status == FAILED
+    assert outbox.backlog() == 0
+
+def test_purge_deletes_only_old_processed_events(db):
+    now = datetime.utcnow()
+    old = now - timedelta(days=8)
+    db.add_all([
+        OutboxEvent(topic=TRADE_STATUS_CHANGED, payload={}, status=DONE, processed_at=old),
+        OutboxEvent(topic=TRADE_STATUS_CHANGED, payload={}, status=DONE, processed_at=now),
+        OutboxEvent(topic=TRADE_STATUS_CHANGED, payload={}, status=FAILED, available_at=old),
+        OutboxEvent(topic=TRADE_STATUS_CHANGED, payload={}, status=PENDING, available_at=old),
+        OutboxEvent(topic=TRADE_STATUS_CHANGED, payload={}, status=PROCESSING, locked_until=now),
+    ])
+    db.commit()
+
+    assert OutboxService(db).purge(timedelta(days=7)) == 1
+    assert sorted(status for (status,) in db.query(OutboxEvent.status)) == sorted([DONE, FAILED, PENDING, PROCESSING])
@@ -0,0 +1,99 @@
+"""
+Number of SQL queries each endpoint issues, against a budget.
+
+Runs a register -> signed wallet login -> fund (and a retried fund) -> rate
+flow through the app once. Only the statements of each request are counted,
+not those of the background workers running alongside it.
+"""
+import os
+import pytest
+
+os.environ.setdefault("API_ROUTERS", "auth,traders,trades,escrow,ratings")
+
+# endpoint -> maximum queries per request
+QUERY_BUDGETS = {
+    "POST /api/auth/register": 6,  # the user row and its lookup keys
+    "POST /api/auth/challenge": 0,
+    "POST /api/auth/login": 3,
+    "GET /api/auth/me": 1,
+    "POST /api/escrow/{trade_id}/fund": 4,
+    "POST /api/escrow/{trade_id}/fund (replay)": 0,
+    "GET /api/escrow/{trade_id}/status": 1,
+    "GET /api/trades/{trade_id}": 1,
+    "GET /api/trades/": 2,  # the archive is read when the hot page is short or reaches past the archive cutoff
+    "POST /api/ratings/": 9,  # a user's first rating creates their summary rows; later ones are one UPDATE
+    "GET /api/ratings/user/{user_id}": 1,
+    "GET /api/ratings/user/{user_id}/summary": 1,
+    "GET /api/traders/verify/{identifier}": 4,
+    "GET /api/traders/verify/{identifier} (unknown)": 0,
+}
+
+@pytest.fixture(scope="module")
+def query_counts():
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+    from fastapi.testclient import TestClient
+    from app.core.query_count import QueryCountingApp
+    from app.database import session_scope
+    from app.main import app
+    from app.models.trade import Trade, TradeStatus
+
+    counting = QueryCountingApp(app)
+    results = {}
+
+    def call(client, name, method, url, expected_status=None, **kwargs):
+        response = client.request(method, url, **kwargs)
+        assert response.status_code < 400 or response.status_code == expected_status, \
+            f"{name} failed: {response.status_code} {response.text}"
+        results[name] = counting.last
+        return response.json()
+
+    with TestClient(counting) as client:
+        users = {}
+        for role in ("seller", "buyer"):
+            wallet = Account.create()
+            user = call(client, "POST /api/auth/register", "POST", "/api/auth/register", json={
+                "username": f"query-{role}", "email": f"{role}@example.com", "wallet_address": wallet.address,
+            })
+            challenge = call(client, "POST /api/auth/challenge", "POST", "/api/auth/challenge",
+                             json={"wallet_address": wallet.address})
+            signature = wallet.sign_message(encode_defunct(text=challenge["message"])).signature.hex()
+            login = call(client, "POST /api/auth/login", "POST", "/api/auth/login", json={
+                "wallet_address": wallet.address, "nonce": challenge["nonce"], "signature": signature,
+            })
+            users[role] = (user["id"], {"Authorization": f"Bearer {login['access_token']}"})
+        seller_id, seller = users["seller"]
+        buyer_id, buyer = users["buyer"]
+
+        with session_scope() as db:
+            trade = Trade(trade_id="TPQUERIES", buyer_id=buyer_id, seller_id=seller_id,
+                          crypto_amount="100", fiat_amount="150000", exchange_rate="1500",
+                          crypto_currency="USDT", fiat_currency="NGN", trade_type="buy",
+                          payment_method="bank_transfer", status=TradeStatus.INITIATED)
+            db.add(trade)
+            db.commit()
+            trade_pk = trade.id
+
+        call(client, "GET /api/auth/me", "GET", "/api/auth/me", headers=seller)
+        retried = dict(seller, **{"Idempotency-Key": "fund-queries"})
+        call(client, "POST /api/escrow/{trade_id}/fund", "POST", "/api/escrow/TPQUERIES/fund",
+             params={"tx_hash": "0xqueries"}, headers=retried)
+        call(client, "POST /api/escrow/{trade_id}/fund (replay)", "POST", "/api/escrow/TPQUERIES/fund",
+             params={"tx_hash": "0xqueries"}, headers=retried)
+        call(client, "GET /api/escrow/{trade_id}/status", "GET", "/api/escrow/TPQUERIES/status", headers=seller)
+        call(client, "GET /api/trades/{trade_id}", "GET", "/api/trades/TPQUERIES", headers=buyer)
+        call(client, "GET /api/trades/", "GET", "/api/trades/", headers=buyer)
+        call(client, "POST /api/ratings/", "POST", "/api/ratings/", headers=buyer,
+             json={"rating": 5, "rated_user_id": seller_id, "trade_id": trade_pk})
+        call(client, "GET /api/ratings/user/{user_id}", "GET", f"/api/ratings/user/{seller_id}")
+        call(client, "GET /api/ratings/user/{user_id}/summary", "GET", f"/api/ratings/user/{seller_id}/summary")
+        call(client, "GET /api/traders/verify/{identifier}", "GET", "/api/traders/verify/query-seller", headers=buyer)
+        call(client, "GET /api/traders/verify/{identifier} (unknown)", "GET", "/api/traders/verify/@nobody-here",
+             expected_status=404, headers=buyer)
+    return results
+
+@pytest.mark.parametrize("endpoint", QUERY_BUDGETS)
+def test_endpoint_stays_within_its_query_budget(query_counts, endpoint):
+    queries = query_counts[endpoint]
+    statements = "\n".join("    " + " ".join(statement.split())[:140] for statement in queries.statements)
+    assert queries.count <= QUERY_BUDGETS[endpoint], f"{endpoint} ran {queries.count} queries:\n{statements}"
@@ -0,0 +1,35 @@
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+from app.schemas.crypto import QuoteItem
+from app.services.crypto_service import QuoteTerms, encode_quotes, quote_batch
+
+ETH = QuoteTerms.from_config(SimpleNamespace(
+    symbol="ETH", decimals=18, minimum_amount_trade=0, maximum_amount_trade=1000, trade_percentage_fee=0.1
+))
+USDT = QuoteTerms.from_config(SimpleNamespace(
+    symbol="USDT", decimals=6, minimum_amount_trade=10, maximum_amount_trade=100000, trade_percentage_fee=0.1
+))
+
+def quote(*items):
+    return json.loads(encode_quotes(quote_batch({"ETH": ETH, "USDT": USDT}, [QuoteItem(**item) for item in items])))["quotes"]
+
+def test_decimals_are_encoded_in_positional_notation():
+    zero, tiny = quote({"symbol": "eth", "amount": "0"}, {"symbol": "ETH", "amount": "0.000000000000000005"})
+    assert zero["fee"] == "0.000000000000000000" and zero["total_amount"] == "0.000000000000000000"
+    # fees round up to the smallest unit
+    assert tiny["fee"] == "0.000000000000000001" and tiny["total_amount"] == "0.000000000000000006"
+    assert tiny["fee_percentage"] == "0.1" and tiny["valid"]
+
+def test_amounts_past_int64_stay_exact():
+    (large,) = quote({"symbol": "ETH", "amount": "999.999999999999999999", "fiat": "usd"})
+    assert large["fiat"] == "USD"
+    assert Decimal(large["total_amount"]) == Decimal("999.999999999999999999") + Decimal(large["fee"])
+    assert large["fee"] == "1.000000000000000000"
+
+def test_unquotable_items():
+    unknown, precise, small = quote({"symbol": "DOGE", "amount": "1"}, {"symbol": "USDT", "amount": "10.0000001"},
+                                    {"symbol": "USDT", "amount": "5"})
+    assert not unknown["valid"] and unknown["fee"] is None
+    assert not precise["valid"] and "decimal places" in precise["message"]
+    assert not small["valid"] and small["message"] == "Amount must be between 10 and 100000 USDT"
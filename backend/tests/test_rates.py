@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+from decimal import Decimal
+import asyncio
+import pytest
+from app.models.crypto_config import CryptoConfig
+from app.services import rate_service
+from app.services.rate_service import FixtureRateProvider, RateCache
+
+def test_missing_rates_skip_the_check():
+    rates = RateCache(FixtureRateProvider())
+    assert rates.check_rate("USDT", "NGN", Decimal("3000")) is False
+
+    rates.refresh(["USDT"])
+    assert rates.check_rate("USDT", "NGN", Decimal("1500")) is True
+    with pytest.raises(ValueError, match="deviates"):
+        rates.check_rate("USDT", "NGN", Decimal("3000"))
+
+def test_stale_rates_skip_the_check():
+    rates = RateCache(FixtureRateProvider(), max_age=0)
+    rates.refresh(["USDT"])
+    assert rates.check_rate("USDT", "NGN", Decimal("3000")) is False
+
+def test_startup_needs_a_provider(monkeypatch):
+    monkeypatch.setattr(rate_service, "RATE_PROVIDER", None)
+    monkeypatch.setattr(rate_service, "_provider", None)
+    with pytest.raises(RuntimeError, match="RATE_PROVIDER"):
+        asyncio.run(RateCache().start())
+
+def test_providers_by_name(monkeypatch):
+    monkeypatch.setattr(rate_service, "RATE_PROVIDER", "fixture")
+    monkeypatch.setattr(rate_service, "_provider", None)
+    assert isinstance(rate_service.get_rate_provider(), FixtureRateProvider)
+
+def test_refresh_picks_up_cryptos_added_since(db, monkeypatch):
+    monkeypatch.setattr(rate_service, "session_scope", contextmanager(lambda: (yield db)))
+    rates = RateCache(FixtureRateProvider({"NEW/NGN": "42"}))
+    rates.refresh(fiats=["NGN"])
+    assert rates.get("NEW", "NGN") is None
+
+    db.add(CryptoConfig(symbol="NEW", name="New", network="ethereum"))
+    db.commit()
+    rates.refresh(fiats=["NGN"])
+    assert rates.get("NEW", "NGN").value == Decimal("42")
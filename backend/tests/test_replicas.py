@@ -0,0 +1,67 @@
+from collections import Counter
+from sqlalchemy import event
+import itertools
+import pytest
+from app import database
+from app.database import RoutingSession
+from app.models.outbox import OutboxEvent
+from app.services.rating_service import RatingService
+
+@pytest.fixture
+def cluster(template_database, monkeypatch):
+    """A primary and two replicas, each its own clone, counting the statements each one runs"""
+    engines = {name: template_database.clone() for name in ("primary", "replica1", "replica2")}
+    statements = Counter()
+    for name, engine in engines.items():
+        event.listen(engine, "before_cursor_execute",
+                     lambda *args, name=name: statements.update([name]))
+    replicas = [engines["replica1"], engines["replica2"]]
+    monkeypatch.setattr(database, "replica_engines", replicas)
+    monkeypatch.setattr(database, "_replicas", itertools.cycle(replicas))
+    monkeypatch.setattr(database, "_recent_writes", {})
+    yield engines, statements
+    for engine in engines.values():
+        template_database.drop(engine)
+
+def test_read_only_reads_are_spread_across_replicas(cluster):
+    engines, statements = cluster
+    with RoutingSession(bind=engines["primary"]) as db:
+        for user_id in range(10):
+            RatingService(db).get_user_ratings(user_id)
+    assert statements == {"replica1": 5, "replica2": 5}
+
+def test_other_reads_stay_on_the_primary(cluster):
+    engines, statements = cluster
+    with RoutingSession(bind=engines["primary"]) as db:
+        db.query(OutboxEvent).count()
+    assert statements == {"primary": 1}
+
+def test_a_user_reads_their_own_writes_from_the_primary(cluster, monkeypatch):
+    engines, statements = cluster
+    with RoutingSession(bind=engines["primary"], info={"user_id": 7}) as db:
+        db.add(OutboxEvent(topic="test", payload={}))
+        db.commit()
+    statements.clear()
+
+    with RoutingSession(bind=engines["primary"], info={"user_id": 7}) as db:
+        RatingService(db).get_user_ratings(7)
+    with RoutingSession(bind=engines["primary"], info={"user_id": 8}) as db:
+        RatingService(db).get_user_ratings(7)
+    assert statements["primary"] == 1 and statements["replica1"] + statements["replica2"] == 1
+
+    # once the window has passed, the writer's reads go back to the replicas
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 0)
+    statements.clear()
+    with RoutingSession(bind=engines["primary"], info={"user_id": 7}) as db:
+        RatingService(db).get_user_ratings(7)
+    assert statements["primary"] == 0
+
+def test_reads_after_a_write_in_the_same_transaction_use_the_primary(cluster):
+    engines, statements = cluster
+    with RoutingSession(bind=engines["primary"]) as db:
+        db.add(OutboxEvent(topic="test", payload={}))
+        db.flush()
+        statements.clear()
+        RatingService(db).get_user_ratings(1)
+        db.rollback()
+    assert statements == {"primary": 1}
@@ -0,0 +1,162 @@
+"""
+Trade, escrow, rating and report flows through the services, each test on
+its own clone of the seeded template database (the db fixture), so the
+suite runs in parallel with pytest -n auto.
+"""
+from decimal import Decimal
+import pytest
+from app.models.moderation import ModerationCase
+from app.models.report import ReportType
+from app.models.trade import CryptoCurrency, TradeStatus, TradeType
+from app.models.trade_amount import TradeAmount
+from app.schemas.rating import RatingCreate
+from app.schemas.report import ReportCreate
+from app.schemas.trade import TradeCreate
+from app.schemas.user import UserCreate
+from app.services.crypto_service import CryptoService, crypto_config_cache
+from app.services.escrow_service import EscrowService
+from app.services.rate_service import FixtureRateProvider, rate_cache
+from app.services.rating_service import RatingService
+from app.services.risk_service import FLAG, RiskService
+from app.services.trade_service import TradeService
+from app.services.user_service import UserService
+
+@pytest.fixture
+def market(monkeypatch):
+    """Fixture rates for USDT, the market trades are checked against"""
+    monkeypatch.setattr(rate_cache, "provider", FixtureRateProvider())
+    monkeypatch.setattr(rate_cache, "_rates", {})
+    rate_cache.refresh(["USDT"])
+    return rate_cache.require("USDT", "NGN").value
+
+@pytest.fixture
+def trade(db, market):
+    """A buy of 100 USDT between a seller with a wallet and a buyer"""
+    # process-wide: may hold the configs of another test's database
+    crypto_config_cache.invalidate()
+    users = UserService(db)
+    seller = users.create_user(UserCreate(username="seller", email="seller@example.com",
+                                          wallet_address="0x" + "5" * 40))
+    buyer = users.create_user(UserCreate(username="buyer", email="buyer@example.com"))
+    return TradeService(db).create_trade(buyer.id, TradeCreate(
+        crypto_amount=Decimal("100"), fiat_amount=Decimal("100") * market, exchange_rate=market,
+        crypto_currency=CryptoCurrency.USDT, trade_type=TradeType.BUY, payment_method="bank_transfer",
+        seller_id=seller.id
+    ))
+
+def test_template_is_seeded(db):
+    symbols = {crypto.symbol for crypto in CryptoService(db).get_supported_cryptocurrencies()}
+    assert "USDT" in symbols
+
+@pytest.mark.parametrize("attempt", [1, 2])
+def test_each_test_gets_its_own_database(db, attempt):
+    # the same unique username in every test: clones never see each other's rows
+    UserService(db).create_user(UserCreate(username="isolated", email="isolated@example.com"))
+    assert UserService(db).get_user_by_username("isolated")
+
+def test_trade_records_its_exact_amount(db, trade):
+    amount = db.get(TradeAmount, trade.trade_id)
+    assert int(amount.crypto_units) == 100 * 10 ** amount.decimals
+    assert trade.status == TradeStatus.INITIATED
+
+def test_trades_off_the_market_rate_are_rejected(db, trade, market):
+    with pytest.raises(ValueError, match="deviates"):
+        TradeService(db).create_trade(trade.buyer_id, TradeCreate(
+            crypto_amount=Decimal("100"), fiat_amount=Decimal("200") * market, exchange_rate=market * 2,
+            crypto_currency=CryptoCurrency.USDT, trade_type=TradeType.BUY, payment_method="bank_transfer",
+            seller_id=trade.seller_id
+        ))
+
+def test_escrow_flow(db, trade):
+    escrow = EscrowService(db)
+    with pytest.raises(ValueError, match="Only seller"):
+        escrow.fund_escrow(trade.trade_id, trade.buyer_id, "0xfund")
+
+    funded = escrow.fund_escrow(trade.trade_id, trade.seller_id, "0xfund")
+    assert funded["memo"] == f"escrow:{trade.trade_id}"
+    with pytest.raises(ValueError, match="already being verified"):
+        escrow.fund_escrow(trade.trade_id, trade.seller_id, "0xfund")
+    with pytest.raises(ValueError, match="must be funded"):
+        escrow.confirm_payment(trade.trade_id, trade.buyer_id, "REF-1")
+
+    # what the verification pipeline does once the deposit is on chain
+    trade.status = TradeStatus.ESCROW_FUNDED
+    db.commit()
+    escrow.confirm_payment(trade.trade_id, trade.buyer_id, "REF-1")
+    with pytest.raises(ValueError, match="Only seller"):
+        escrow.release_escrow(trade.trade_id, trade.buyer_id)
+    escrow.release_escrow(trade.trade_id, trade.seller_id)
+    assert TradeService(db).get_trade_by_id(trade.trade_id).status == TradeStatus.PAYMENT_CONFIRMED
+
+def test_funding_needs_a_seller_wallet(db, trade):
+    UserService(db).get_user_by_id(trade.seller_id).wallet_address = None
+    db.commit()
+    with pytest.raises(ValueError, match="wallet address"):
+        EscrowService(db).fund_escrow(trade.trade_id, trade.seller_id, "0xfund")
+
+def test_ratings_are_once_per_trade_and_participant(db, trade):
+    ratings = RatingService(db)
+    rating = RatingCreate(trade_id=trade.id, rated_user_id=trade.seller_id, rating=4)
+    ratings.create_rating(trade.buyer_id, rating)
+    with pytest.raises(ValueError, match="already rated"):
+        ratings.create_rating(trade.buyer_id, rating)
+
+    outsider = UserService(db).create_user(UserCreate(username="outsider", email="outsider@example.com"))
+    with pytest.raises(ValueError, match="your own trades"):
+        ratings.create_rating(outsider.id, rating)
+
+    summary = ratings.get_rating_summary(trade.seller_id)
+    assert summary["overall"]["count"] == 1 and summary["overall"]["average"] == 4
+
+def test_reports_open_a_moderation_case(db, trade):
+    report = RatingService(db).create_report(trade.buyer_id, ReportCreate(
+        report_type=ReportType.FRAUD, title="No release", description="Paid, nothing released",
+        reported_user_id=trade.seller_id, trade_id=trade.id
+    ))
+    case = db.query(ModerationCase).filter(ModerationCase.report_id == report.id).one()
+    assert case.trade_id == trade.id and case.reported_user_id == trade.seller_id
+    assert case.amount == trade.fiat_amount
+
+def report(db, reporter_id, trade, reported_user_id=None):
+    return RatingService(db).create_report(reporter_id, ReportCreate(
+        report_type=ReportType.SCAM, title="Scam", description="Never paid",
+        reported_user_id=reported_user_id or (trade.seller_id if reporter_id == trade.buyer_id else trade.buyer_id),
+        trade_id=trade.id
+    ))
+
+def test_trade_velocity_counts_against_the_initiator_only(db, trade):
+    features = RiskService(db).features([trade.buyer_id, trade.seller_id])
+    assert features[trade.buyer_id]["trades_1h"] == 1
+    assert features[trade.seller_id]["trades_1h"] == 0
+
+def test_reports_count_once_per_reporter_on_escrowed_trades(db, trade):
+    risk = RiskService(db)
+    report(db, trade.buyer_id, trade)
+    assert risk.features([trade.seller_id])[trade.seller_id]["reports_30d"] == 0
+
+    trade.status = TradeStatus.ESCROW_FUNDED
+    db.commit()
+    report(db, trade.buyer_id, trade)
+    report(db, trade.buyer_id, trade)
+    outsider = UserService(db).create_user(UserCreate(username="outsider", email="outsider@example.com"))
+    report(db, outsider.id, trade, reported_user_id=trade.seller_id)
+    assert risk.features([trade.seller_id])[trade.seller_id]["reports_30d"] == 1
+
+def test_disputes_count_on_escrowed_trades(db, trade):
+    trades = TradeService(db)
+    trades.dispute_trade(trade.trade_id, trade.buyer_id, "Not released")
+    assert RiskService(db).features([trade.seller_id])[trade.seller_id]["disputes_30d"] == 0
+
+    trade.status = TradeStatus.PAYMENT_SENT
+    db.commit()
+    trades.dispute_trade(trade.trade_id, trade.buyer_id, "Not released")
+    # raised again on the now disputed trade
+    trades.dispute_trade(trade.trade_id, trade.buyer_id, "Still not released")
+    assert RiskService(db).features([trade.seller_id])[trade.seller_id]["disputes_30d"] == 1
+
+def test_complaints_received_only_flag(db, trade):
+    risk = RiskService(db)
+    risk.record(trade.seller_id, "report_received", count=100)
+    risk.record(trade.seller_id, "dispute_received", count=100)
+    assessment = risk.assess([trade.seller_id])
+    assert assessment.action == FLAG and assessment.flagged_user_ids == [trade.seller_id]
@@ -0,0 +1,120 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, or_
+import pytest
+from app import database
+from app.database import ShardedRoutingSession, allocate_ids, shard_metadata
+from app.models.trade import CryptoCurrency, Trade, TradeType
+from app.models.user import User
+from app.services import trade_service, user_service
+from app.services.trade_service import TradeService
+from app.services.user_service import UserService
+
+@pytest.fixture
+def shards(template_database, monkeypatch):
+    """DATABASE_URL and two shards, each its own clone, counting the statements each one runs"""
+    engines = {name: template_database.clone() for name in ("global", "0", "1")}
+    statements = Counter()
+    for name, engine in engines.items():
+        event.listen(engine, "before_cursor_execute",
+                     lambda *args, name=name: statements.update([name]))
+    shard_engines = [engines["0"], engines["1"]]
+    for shard_engine in shard_engines:
+        shard_metadata.create_all(bind=shard_engine)
+    monkeypatch.setattr(database, "engine", engines["global"])
+    for module in (database, trade_service, user_service):
+        monkeypatch.setattr(module, "shard_engines", shard_engines)
+    yield engines, statements
+    for engine in engines.values():
+        template_database.drop(engine)
+
+def add_users(db, *trust_scores, ids=None):
+    """Users placed on random shards, or on the shards their given ids name"""
+    ids = ids or [None] * len(trust_scores)
+    users = [User(id=user_id, username=f"user{i}", email=f"user{i}@example.com", trust_score=score)
+             for i, (user_id, score) in enumerate(zip(ids, trust_scores))]
+    db.add_all(users)
+    db.commit()
+    return users
+
+def add_trade(db, buyer, seller, created_at):
+    trade = Trade(trade_id=f"TP{buyer.id}-{seller.id}-{created_at:%H%M}", buyer_id=buyer.id, seller_id=seller.id,
+                  crypto_amount=100, fiat_amount=150000, exchange_rate=1500, crypto_currency=CryptoCurrency.USDT,
+                  trade_type=TradeType.BUY, payment_method="bank_transfer", created_at=created_at)
+    db.add(trade)
+    db.commit()
+    return trade
+
+def rows(engine, model):
+    with engine.connect() as conn:
+        return {row.id: row for row in conn.execute(model.__table__.select())}
+
+def test_rows_are_placed_by_their_user(shards):
+    engines, _ = shards
+    with ShardedRoutingSession(expire_on_commit=False) as db:
+        users = add_users(db, 50, 50, 50, 50)
+        seller = users[0]
+        trade = add_trade(db, users[1], seller, datetime.utcnow())
+
+    for user in users:
+        assert user.id in rows(engines[str(user.id % 2)], User)
+        assert user.id not in rows(engines[str(1 - user.id % 2)], User)
+    # a trade lives with its seller, and its id names that shard
+    assert trade.id % 2 == seller.id % 2
+    assert trade.id in rows(engines[str(seller.id % 2)], Trade)
+    assert not rows(engines["global"], User) and not rows(engines["global"], Trade)
+
+def test_primary_key_loads_hit_one_shard(shards):
+    engines, statements = shards
+    with ShardedRoutingSession(expire_on_commit=False) as db:
+        users = add_users(db, 50, 50)
+    for user in users:
+        statements.clear()
+        with ShardedRoutingSession(expire_on_commit=False) as db:
+            assert db.get(User, user.id).username == user.username
+        assert set(statements) == {str(user.id % 2)}
+
+def test_allocated_ids_never_collide(shards):
+    engines, _ = shards
+    allocated = []
+    for shard, shard_engine in enumerate([engines["0"], engines["1"]]):
+        for count in (1, 3, 5):
+            with shard_engine.begin() as conn:
+                ids = allocate_ids(conn, "users", shard, count)
+            assert len(ids) == count and all(user_id % 2 == shard for user_id in ids)
+            allocated += ids
+    assert len(set(allocated)) == len(allocated)
+
+def test_scatter_reads_are_merged_in_order(shards):
+    now = datetime.utcnow()
+    with ShardedRoutingSession(expire_on_commit=False) as db:
+        buyer, *others = add_users(db, 10, 90, 40, 70, 60, 20, ids=[101, 102, 103, 104, 105, 106])
+        sellers = {user.id % 2: user for user in others}
+        # alternate shards from oldest to newest
+        for minutes in range(6):
+            add_trade(db, buyer, sellers[minutes % 2], now - timedelta(minutes=minutes))
+
+        trades = TradeService(db).get_user_trades(buyer.id, limit=4, offset=1)
+        assert [trade.created_at for trade in trades] == [now - timedelta(minutes=m) for m in range(1, 5)]
+        assert {trade.seller_id % 2 for trade in trades} == {0, 1}
+
+        top = UserService(db).get_top_traders(3)
+        assert [user.trust_score for user in top] == [90, 70, 60]
+
+def test_or_filters_on_placement_columns_read_every_shard(shards):
+    _, statements = shards
+    with ShardedRoutingSession(expire_on_commit=False) as db:
+        user, other = add_users(db, 50, 50, ids=[101, 102])
+        sold = add_trade(db, other, user, datetime.utcnow())
+        bought = add_trade(db, user, other, datetime.utcnow())
+
+        # bought lives on the seller's shard: only a query of every shard finds both
+        statements.clear()
+        found = db.query(Trade).filter(or_(Trade.buyer_id == user.id, Trade.seller_id == user.id)).all()
+        assert {trade.id for trade in found} == {sold.id, bought.id}
+        assert {"0", "1"} <= set(statements)
+
+        # the placement column alone pins the seller's shard
+        statements.clear()
+        assert [trade.id for trade in db.query(Trade).filter(Trade.seller_id == user.id)] == [sold.id]
+        assert set(statements) == {str(user.id % 2)}
@@ -0,0 +1,36 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.streaming import FileRangeResponse
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"<script>alert(1)</script>")
+    app = FastAPI()
+
+    @app.get("/named")
+    def named():
+        return FileRangeResponse(str(path), "abc", "text/html", "proof.html")
+
+    @app.get("/unnamed")
+    def unnamed():
+        return FileRangeResponse(str(path), "abc", "text/html")
+
+    return TestClient(app)
+
+@pytest.mark.parametrize("url, disposition", [
+    ("/named", "attachment; filename*=UTF-8''proof.html"),
+    ("/unnamed", "attachment"),
+])
+def test_files_are_always_downloads(client, url, disposition):
+    for headers in ({}, {"Range": "bytes=0-7"}, {"If-None-Match": '"abc"'}):
+        response = client.get(url, headers=headers)
+        assert response.headers["content-disposition"] == disposition
+        assert response.headers["x-content-type-options"] == "nosniff"
+
+def test_ranges(client):
+    response = client.get("/unnamed", headers={"Range": "bytes=0-7"})
+    assert response.status_code == 206 and response.content == b"<script>"
+    assert response.headers["content-range"] == "bytes 0-7/25"
+    assert client.get("/unnamed", headers={"Range": "bytes=100-"}).status_code == 416
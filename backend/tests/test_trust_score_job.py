@@ -0,0 +1,25 @@
+from app.models.trade import CryptoCurrency, Trade, TradeStatus, TradeType
+from app.models.user import User
+from app.services.trust_score_job import TrustScoreJob
+
+def completed_trade(trade_id: str, buyer: User, seller: User) -> Trade:
+    return Trade(trade_id=trade_id, buyer_id=buyer.id, seller_id=seller.id, crypto_amount=100,
+                 fiat_amount=150000, exchange_rate=1500, crypto_currency=CryptoCurrency.USDT,
+                 trade_type=TradeType.BUY, payment_method="bank_transfer", status=TradeStatus.COMPLETED)
+
+def test_recount_counts_a_self_trade_once(db):
+    alice, bob = User(username="alice"), User(username="bob")
+    db.add_all([alice, bob])
+    db.flush()
+    db.add_all([completed_trade("TP1", alice, bob), completed_trade("TP2", bob, alice),
+                completed_trade("TP3", alice, alice)])
+    db.commit()
+
+    job = TrustScoreJob(run="recount", recount_trades=True)
+    checkpoint, = TrustScoreJob.plan(db, job.run, workers=1)
+    job.score_chunk(db, checkpoint)
+
+    db.refresh(alice)
+    db.refresh(bob)
+    assert (alice.total_trades, alice.successful_trades) == (3, 3)
+    assert (bob.total_trades, bob.successful_trades) == (2, 2)